@@ -0,0 +1,186 @@
+"""
+Metriche di performance per richiesta.
+
+RequestMetricsMiddleware misura per ogni richiesta:
+- numero e durata delle query sul database (execute_wrapper, anche con DEBUG=False);
+- hit e miss della cache, segnalati dal codice con record_cache_access()
+  (tra cui il decoratore cache_calendar_data, vedi shared_cache);
+- durata totale della vista.
+
+I valori vengono aggregati in un istogramma mobile in memoria per nome di
+route (ultimi REQUEST_METRICS_SAMPLES campioni negli ultimi
+REQUEST_METRICS_WINDOW secondi), consultabile dallo staff con l'endpoint
+admin_panel:metrics. Le statistiche sono per processo.
+
+L'header Server-Timing espone dettagli interni e viene aggiunto solo con
+DEBUG attivo, con REQUEST_METRICS_SERVER_TIMING = True nei settings o per
+gli utenti staff (se la vista ha caricato l'utente).
+
+Le risposte in streaming (StreamingHttpResponse, es. l'export iCal) generano
+il corpo dopo l'uscita dal middleware: query e tempi del corpo non sarebbero
+misurati, quindi queste risposte non hanno l'header e non entrano
+nell'istogramma.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_SAMPLES = 1000
+DEFAULT_WINDOW = 15 * 60
+PERCENTILES = (50, 95, 99)
+
+
+class RequestMetrics:
+    """Contatori di una singola richiesta."""
+
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: conta e cronometra ogni query
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def record_cache_access(hit: bool, count: int = 1) -> None:
+    """Registra hit o miss di cache per la richiesta in corso (no-op fuori da una richiesta)."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += count
+    else:
+        metrics.cache_misses += count
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+    # Nearest-rank su valori ordinati
+    index = max(0, min(len(values) - 1, -(-len(values) * percentile // 100) - 1))
+    return values[index]
+
+
+class RouteHistogram:
+    """
+    Campioni recenti (durata, query, tempo DB) per route.
+
+    Ogni route tiene al massimo max_samples campioni; quelli più vecchi di
+    window secondi vengono ignorati al momento della lettura.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_SAMPLES, window: float = DEFAULT_WINDOW):
+        self.max_samples = max_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._cache: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+    def add(self, route: str, total_ms: float, metrics: RequestMetrics) -> None:
+        sample = (time.monotonic(), total_ms, metrics.queries, metrics.db_time * 1000)
+        with self._lock:
+            self._samples[route].append(sample)
+            counters = self._cache[route]
+            counters[0] += metrics.cache_hits
+            counters[1] += metrics.cache_misses
+
+    def snapshot(self) -> List[Dict]:
+        """Percentili p50/p95/p99 per route, ordinati per p95 decrescente."""
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            samples = {route: [s for s in values if s[0] >= cutoff] for route, values in self._samples.items()}
+            cache = {route: tuple(counters) for route, counters in self._cache.items()}
+
+        routes = []
+        for route, values in samples.items():
+            if not values:
+                continue
+            row = {'route': route, 'count': len(values)}
+            for field, position in (('ms', 1), ('queries', 2), ('db_ms', 3)):
+                ordered = sorted(sample[position] for sample in values)
+                for percentile in PERCENTILES:
+                    row[f'{field}_p{percentile}'] = round(_percentile(ordered, percentile), 2)
+            hits, misses = cache.get(route, (0, 0))
+            row['cache_hits'] = hits
+            row['cache_misses'] = misses
+            row['cache_hit_rate'] = round(hits / (hits + misses), 3) if hits + misses else None
+            routes.append(row)
+        routes.sort(key=lambda row: row['ms_p95'], reverse=True)
+        return routes
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._cache.clear()
+
+
+histogram = RouteHistogram(
+    max_samples=getattr(settings, 'REQUEST_METRICS_SAMPLES', DEFAULT_SAMPLES),
+    window=getattr(settings, 'REQUEST_METRICS_WINDOW', DEFAULT_WINDOW),
+)
+
+
+def server_timing(metrics: RequestMetrics, total_ms: float) -> str:
+    """Valore dell'header Server-Timing."""
+    return ', '.join((
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} query"',
+        f'cache;desc="hit={metrics.cache_hits} miss={metrics.cache_misses}"',
+        f'app;dur={total_ms:.1f}',
+    ))
+
+
+def server_timing_enabled(request) -> bool:
+    """True se la risposta può includere l'header Server-Timing."""
+    if settings.DEBUG or getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False):
+        return True
+    # Solo se la vista ha già caricato l'utente (AuthenticationMiddleware lo
+    # mette in cache sulla richiesta): niente query di sessione in più
+    user = getattr(request, '_cached_user', None)
+    return bool(user is not None and user.is_staff)
+
+
+class RequestMetricsMiddleware:
+    """Misura query, cache e durata di ogni richiesta (escluse le risposte in streaming)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if response.streaming:
+            # Il corpo non è ancora stato generato: misure incomplete
+            return response
+        if server_timing_enabled(request):
+            response['Server-Timing'] = server_timing(metrics, total_ms)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name:
+            histogram.add(match.view_name, total_ms, metrics)
+        return response
@@ -66,6 +66,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Rhome_book.metrics.RequestMetricsMiddleware',  # Primo: misura l'intera richiesta
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Aggiungi dopo SessionMiddleware
@@ -121,8 +122,30 @@ CACHES = {
     }
 }
 
+# Cache condivisa tra i processi per i dati calendario (generazioni e
+# disponibilità): di default un file SQLite, con CALENDAR_CACHE_URL=redis://...
+# usa Redis (richiede il pacchetto redis). Vedi calendar_rules/services/shared_cache.py
+CALENDAR_CACHE_URL = config('CALENDAR_CACHE_URL', default='')
+if CALENDAR_CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES['calendar'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CALENDAR_CACHE_URL,
+        'TIMEOUT': 300,
+    }
+else:
+    CACHES['calendar'] = {
+        'BACKEND': 'calendar_rules.cache_backends.SQLiteCache',
+        'LOCATION': CALENDAR_CACHE_URL or str(BASE_DIR / 'calendar_cache.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000
+        }
+    }
+
 # Debug calendario - abilita logging dettagliato (disabilitare in produzione)
 DEBUG_CALENDAR = config('DEBUG_CALENDAR', default=False, cast=bool)
+# Frazione dei calcoli calendario di cui registrare i tempi delle fasi (0 = mai, 1 = sempre)
+CALENDAR_TRACE_SAMPLE_RATE = config('CALENDAR_TRACE_SAMPLE_RATE', default=0.0, cast=float)
 
 
 # Password validation
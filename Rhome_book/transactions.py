@@ -0,0 +1,48 @@
+"""
+Callback on_commit raggruppati per transazione.
+
+on_commit_batch(name, item, callback) raccoglie gli item di tutte le chiamate
+con lo stesso name nella transazione corrente e registra un solo callback
+on_commit, che riceve l'insieme degli item al commit. Aggiungere un item è
+O(1): non si scorre la coda dei callback della connessione.
+
+Fuori da un blocco atomic (autocommit) il callback viene eseguito subito con
+il solo item, come transaction.on_commit.
+"""
+
+from django.db import transaction
+
+# Attributo della connessione con i batch della transazione corrente
+_BATCHES_ATTR = '_rhome_on_commit_batches'
+
+
+def on_commit_batch(name, item, callback, using=None):
+    """
+    Aggiunge item al batch name e chiama callback(items) una volta al commit.
+
+    Args:
+        name: Nome del batch (es. 'listing_days')
+        item: Elemento da aggiungere (hashable, es. l'id di un listing)
+        callback: Funzione chiamata con il set degli item
+        using: Alias del database (default: quello di default)
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        callback({item})
+        return
+
+    batches = connection.__dict__.setdefault(_BATCHES_ATTR, {})
+    batch = batches.get(name)
+    # Commit e rollback (anche di un savepoint) sostituiscono la coda dei
+    # callback: un batch registrato su una coda precedente non verrà eseguito
+    if batch is None or batch['queue'] is not connection.run_on_commit:
+        items = set()
+
+        def run():
+            if batches.get(name, {}).get('items') is items:
+                del batches[name]
+            callback(items)
+
+        transaction.on_commit(run, using=using)
+        batch = batches[name] = {'items': items, 'queue': connection.run_on_commit}
+    batch['items'].add(item)
@@ -19,5 +19,6 @@ app_name = 'admin_panel'
 
 urlpatterns = [
     path('', views.admin_panel_view, name='admin_panel'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('api/', include(router.urls)),
 ]
@@ -5,6 +5,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db import transaction
@@ -16,6 +17,7 @@ from images.models import Image
 from bookings.models import Booking
 from calendar_rules.models import PriceRule, ExternalCalendar, ClosureRule
 from amenities.models import Amenity
+from Rhome_book.metrics import histogram
 
 from .serializers import (
     ListingSerializer, RoomSerializer, RoomTypeSerializer,
@@ -267,3 +269,13 @@ class AmenityViewSet(viewsets.ReadOnlyModelViewSet):
 def admin_panel_view(request):
     """View per servire il pannello admin HTML"""
     return render(request, 'admin_panel/index.html')
+
+
+@staff_member_required
+def metrics_view(request):
+    """Percentili p50/p95/p99 di durata, query e tempo DB per route (questo processo)"""
+    return JsonResponse({
+        'window_seconds': histogram.window,
+        'max_samples': histogram.max_samples,
+        'routes': histogram.snapshot(),
+    })
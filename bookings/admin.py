@@ -1,9 +1,20 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import Booking, BookingPayment, MultiBooking, Message
 
 
+def report_rejected_bookings(modeladmin, request, rejected):
+    """Segnala le prenotazioni cancellate che non possono essere riattivate"""
+    for booking, error in rejected:
+        modeladmin.message_user(
+            request,
+            f'Prenotazione {booking.pk} non confermata: {"; ".join(error.messages)}',
+            level=messages.WARNING,
+        )
+
+
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = [
@@ -158,18 +169,18 @@ class BookingAdmin(admin.ModelAdmin):
     actions = ['confirm_bookings', 'cancel_bookings']
 
     def confirm_bookings(self, request, queryset):
-        updated = queryset.update(status='confirmed')
-        # Genera codici di accesso per le prenotazioni confermate
-        for booking in queryset:
-            if not booking.check_in_code:
-                booking.generate_check_in_code()
-                booking.save()
+        # Gli id vanno letti prima dell'update: se la changelist è filtrata per
+        # stato, dopo l'update il queryset non li contiene più
+        booking_ids = list(queryset.values_list('id', flat=True))
+        updated, rejected = Booking.objects.filter(id__in=booking_ids).confirm()
+        Booking.objects.filter(id__in=booking_ids).generate_missing_check_in_codes()
 
         self.message_user(request, f'{updated} prenotazioni confermate.')
+        report_rejected_bookings(self, request, rejected)
     confirm_bookings.short_description = "Conferma prenotazioni selezionate"
 
     def cancel_bookings(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = queryset.update_status('cancelled')
         self.message_user(request, f'{updated} prenotazioni cancellate.')
     cancel_bookings.short_description = "Cancella prenotazioni selezionate"
 
@@ -368,17 +379,19 @@ class MultiBookingAdmin(admin.ModelAdmin):
         """Conferma tutte le prenotazioni combinate selezionate"""
         updated_count = 0
         for multi_booking in queryset:
-            # Conferma la prenotazione combinata
-            multi_booking.status = 'confirmed'
-            multi_booking.save()
-            
-            # Conferma tutte le prenotazioni individuali
-            individual_bookings = multi_booking.individual_bookings.all()
-            for booking in individual_bookings:
-                booking.status = 'confirmed'
-                if not booking.check_in_code:
-                    booking.generate_check_in_code()
-                booking.save()
+            with transaction.atomic():
+                # Conferma tutte le prenotazioni individuali
+                _, rejected = multi_booking.individual_bookings.confirm()
+                if rejected:
+                    # Una prenotazione non riattivabile: la combinata resta com'è
+                    transaction.set_rollback(True)
+                    report_rejected_bookings(self, request, rejected)
+                    continue
+                multi_booking.individual_bookings.generate_missing_check_in_codes()
+                
+                # Conferma la prenotazione combinata
+                multi_booking.status = 'confirmed'
+                multi_booking.save()
             
             updated_count += 1
         
@@ -394,10 +407,7 @@ class MultiBookingAdmin(admin.ModelAdmin):
             multi_booking.save()
             
             # Cancella tutte le prenotazioni individuali
-            individual_bookings = multi_booking.individual_bookings.all()
-            for booking in individual_bookings:
-                booking.status = 'cancelled'
-                booking.save()
+            multi_booking.individual_bookings.update_status('cancelled')
             
             updated_count += 1
         
@@ -8,6 +8,64 @@ from listings.models import Listing
 from calendar_rules.models import PriceRule
 
 
+class BookingQuerySet(models.QuerySet):
+    def update_status(self, status):
+        """
+        Cambia lo stato di tutte le prenotazioni del queryset con un solo UPDATE.
+
+        Non passa da save(): nessuna rivalidazione né ricalcolo prezzi. Va
+        usato solo per transizioni che non occupano nuove date (cancellazione,
+        conferma di prenotazioni in attesa); per riattivare prenotazioni
+        cancellate usare confirm(). La cache calendario viene invalidata una
+        volta per listing.
+
+        Returns:
+            Numero di prenotazioni aggiornate
+        """
+        from calendar_rules.services.calendar_cache import bump_calendar_generation
+
+        listing_ids = set(self.values_list('listing_id', flat=True))
+        updated = self.update(status=status, updated_at=timezone.now())
+        for listing_id in listing_ids:
+            bump_calendar_generation(listing_id)
+        return updated
+
+    def confirm(self):
+        """
+        Conferma le prenotazioni del queryset.
+
+        Le prenotazioni in attesa vengono confermate con un solo UPDATE
+        (update_status). Quelle cancellate passano da save(), che le
+        rivalida (sovrapposizioni, giorni di gap, chiusure) prima di
+        riattivarle; le altre restano invariate.
+
+        Returns:
+            Tuple (numero di prenotazioni confermate, lista di (prenotazione,
+            ValidationError) per quelle cancellate non riattivabili)
+        """
+        reactivate = list(self.filter(status='cancelled'))
+        confirmed = self.filter(status='pending').update_status('confirmed')
+
+        rejected = []
+        for booking in reactivate:
+            booking.status = 'confirmed'
+            try:
+                booking.save()
+            except ValidationError as e:
+                rejected.append((booking, e))
+            else:
+                confirmed += 1
+        return confirmed, rejected
+
+    def generate_missing_check_in_codes(self):
+        """Genera il codice di accesso per le prenotazioni confermate che non lo hanno, con un solo bulk_update."""
+        bookings = list(self.filter(status='confirmed', check_in_code='').only('id', 'check_in_code'))
+        for booking in bookings:
+            booking.generate_check_in_code()
+        self.model.objects.bulk_update(bookings, ['check_in_code'])
+        return len(bookings)
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'In Attesa'),
@@ -93,10 +151,39 @@ class Booking(models.Model):
         related_name='individual_bookings'
     )
 
+    objects = BookingQuerySet.as_manager()
+
+    ACTIVE_STATUSES = ['pending', 'confirmed']
+
+    # PriceQuote già calcolato per questo soggiorno, usato da save() invece di
+    # ricalcolare i prezzi (vedi calculate_pricing)
+    price_quote = None
+
+    # Campi da cui dipendono validazione e prezzi: se non cambiano, save()
+    # non rivalida né ricalcola
+    PRICING_FIELDS = ('listing_id', 'check_in_date', 'check_out_date', 'num_guests')
+    COMPUTED_PRICING_FIELDS = (
+        'base_price_per_night', 'total_nights', 'subtotal',
+        'cleaning_fee', 'extra_guest_fee', 'total_amount'
+    )
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Prenotazione'
         verbose_name_plural = 'Prenotazioni'
+        indexes = [
+            # Ricerche di disponibilità: listing + stato + sovrapposizione date
+            models.Index(
+                fields=['listing', 'status', 'check_in_date', 'check_out_date'],
+                name='booking_listing_status_idx'
+            ),
+            # Solo prenotazioni attive (indice parziale, dove supportato dal database)
+            models.Index(
+                fields=['listing', 'check_in_date', 'check_out_date'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='booking_active_dates_idx'
+            ),
+        ]
 
     def clean(self):
         """Validazione del modello usando CalendarManager"""
@@ -198,14 +285,18 @@ class Booking(models.Model):
             booking = real_conflicts[0]
             raise ValidationError(f"Conflitto con prenotazione esistente dal {booking.check_in_date} al {booking.check_out_date}")
 
-    def calculate_pricing(self):
-        """Calcola automaticamente tutti i prezzi usando CalendarManager"""
+    def calculate_pricing(self, quote=None):
+        """
+        Calcola automaticamente tutti i prezzi da un PriceQuote.
+
+        Args:
+            quote: Preventivo già calcolato (es. dalla vista che ha verificato la
+                   disponibilità); se None o relativo a un altro soggiorno viene
+                   ricalcolato con CalendarManager
+        """
         if not all([self.check_in_date, self.check_out_date, self.listing]):
             return
 
-        from calendar_rules.managers import CalendarManager
-        calendar = CalendarManager(self.listing)
-
         # Calcola notti
         self.total_nights = (self.check_out_date - self.check_in_date).days
 
@@ -219,50 +310,29 @@ class Booking(models.Model):
             self.total_amount = self.listing.base_price + self.listing.cleaning_fee
             return
 
-        # Usa CalendarManager per calcolo avanzato
-        try:
-            total_price = calendar.calculate_total_price(
-                self.check_in_date,
-                self.check_out_date,
-                self.num_guests
+        if quote is None or not quote.matches(self.listing_id, self.check_in_date,
+                                              self.check_out_date, self.num_guests):
+            from calendar_rules.managers import CalendarManager
+            quote = CalendarManager(self.listing).get_price_quote(
+                self.check_in_date, self.check_out_date, self.num_guests
             )
 
-            # Calcola prezzo medio per notte (per visualizzazione) - con protezione overflow
-            price_without_cleaning = total_price - self.listing.cleaning_fee
-            if price_without_cleaning > 0:
-                calculated_price = Decimal(str(price_without_cleaning)) / self.total_nights
-
-                # Limita a un valore ragionevole per evitare overflow
-                max_reasonable_price = Decimal('99999.99')  # Solo 7 cifre totali per sicurezza
-                self.base_price_per_night = min(calculated_price, max_reasonable_price)
-            else:
-                self.base_price_per_night = self.listing.base_price
-
-            # Breakdown dei costi
-            subtotal_without_extras = sum(
-                calendar.get_price_per_day(self.check_in_date + timedelta(days=i))
-                for i in range(self.total_nights)
-            )
+        # Calcola prezzo medio per notte (per visualizzazione) - con protezione overflow
+        price_without_cleaning = quote.total - quote.cleaning_fee
+        if price_without_cleaning > 0:
+            calculated_price = price_without_cleaning / self.total_nights
 
-            self.subtotal = Decimal(str(subtotal_without_extras))
-            self.cleaning_fee = self.listing.cleaning_fee
-
-            # Ospiti extra
-            if self.num_guests > self.listing.included_guests:
-                extra_guests = self.num_guests - self.listing.included_guests
-                self.extra_guest_fee = extra_guests * self.listing.extra_guest_fee * self.total_nights
-            else:
-                self.extra_guest_fee = Decimal('0.00')
-
-            self.total_amount = Decimal(str(total_price))
-
-        except ValueError as e:
-            # Fallback se CalendarManager fallisce
+            # Limita a un valore ragionevole per evitare overflow
+            max_reasonable_price = Decimal('99999.99')  # Solo 7 cifre totali per sicurezza
+            self.base_price_per_night = min(calculated_price, max_reasonable_price)
+        else:
             self.base_price_per_night = self.listing.base_price
-            self.subtotal = self.base_price_per_night * self.total_nights
-            self.cleaning_fee = self.listing.cleaning_fee
-            self.extra_guest_fee = Decimal('0.00')
-            self.total_amount = self.subtotal + self.cleaning_fee
+
+        # Breakdown dei costi
+        self.subtotal = quote.subtotal
+        self.cleaning_fee = quote.cleaning_fee
+        self.extra_guest_fee = quote.extra_guest_fee
+        self.total_amount = quote.total
 
     def get_price_for_period(self):
         """Ottiene il prezzo considerando le regole di pricing personalizzate"""
@@ -314,20 +384,93 @@ class Booking(models.Model):
         import string
         self.check_in_code = ''.join(random.choices(string.digits, k=6))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valori caricati, per capire in save() cosa è cambiato
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.PRICING_FIELDS or name == 'status'
+        }
+        return instance
+
+    def _changed_fields(self, fields):
+        """Campi (attname) tra fields modificati rispetto ai valori caricati dal database."""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return set(fields)
+        return {
+            name for name in fields
+            # Un campo differito mai assegnato non è cambiato
+            if (name in loaded and getattr(self, name) != loaded[name])
+            or (name not in loaded and name in self.__dict__)
+        }
+
     def save(self, *args, **kwargs):
-        """Override save per calcoli automatici e validazioni"""
-        # Esegui sempre le validazioni prima del salvataggio
-        self.full_clean()
+        """
+        Override save per calcoli automatici e validazioni.
+
+        Validazione completa e ricalcolo prezzi vengono eseguiti solo se cambiano
+        listing, date o ospiti (o se la prenotazione torna attiva); con
+        update_fields contano solo i campi indicati. Un cambio del solo stato
+        (conferma, cancellazione) salva direttamente.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {
+                self._meta.get_field(name).attname for name in update_fields
+            }
+            pricing_changed = bool(update_fields & set(self.PRICING_FIELDS))
+            status_changed = 'status' in update_fields
+        else:
+            pricing_changed = bool(self._changed_fields(self.PRICING_FIELDS))
+            status_changed = bool(self._changed_fields(('status',)))
+
+        loaded_status = getattr(self, '_loaded_values', {}).get('status')
+        reactivated = (
+            status_changed and not self._state.adding
+            and self.status in self.ACTIVE_STATUSES
+            and loaded_status not in self.ACTIVE_STATUSES
+        )
+
+        if pricing_changed or reactivated:
+            self.full_clean()
+
+        if pricing_changed:
+            self._update_pricing()
+            if update_fields is not None:
+                update_fields.update(self.COMPUTED_PRICING_FIELDS)
+
+        if not self.check_in_code and self.status == 'confirmed':
+            self.generate_check_in_code()
+            if update_fields is not None:
+                update_fields.add('check_in_code')
+
+        if update_fields is not None:
+            update_fields.add('updated_at')
+            kwargs['update_fields'] = update_fields
 
+        super().save(*args, **kwargs)
+
+        self._loaded_values = {
+            name: getattr(self, name) for name in self.PRICING_FIELDS + ('status',)
+        }
+
+        # Invalida cache calendario solo se cambia qualcosa che il calendario mostra
+        if pricing_changed or status_changed:
+            self._invalidate_calendar_cache()
+
+    def _update_pricing(self):
+        """Ricalcola i prezzi, con fallback ai valori base se il calcolo fallisce."""
         try:
             # Se base_price_per_night è già stato inserito dall'admin, non ricalcolarlo
-            preserve_manual_price = self.base_price_per_night and self.base_price_per_night > 0
+            manual_price = self.base_price_per_night if self.base_price_per_night and self.base_price_per_night > 0 else None
 
-            self.calculate_pricing()
+            self.calculate_pricing(self.price_quote)
 
             # Se era stato inserito manualmente, ripristinalo
-            if preserve_manual_price:
-                self.base_price_per_night = preserve_manual_price
+            if manual_price is not None:
+                self.base_price_per_night = manual_price
 
         except Exception as e:
             # Fallback: usa valori base senza calcoli avanzati
@@ -340,43 +483,21 @@ class Booking(models.Model):
             self.cleaning_fee = self.listing.cleaning_fee if self.listing else Decimal('50.00')
             self.extra_guest_fee = Decimal('0.00')
             self.total_amount = self.subtotal + self.cleaning_fee
-
-        if not self.check_in_code and self.status == 'confirmed':
-            self.generate_check_in_code()
-
-        super().save(*args, **kwargs)
-        
-        # Invalida cache calendario per questo listing dopo il salvataggio
-        self._invalidate_calendar_cache()
     
+    def delete(self, *args, **kwargs):
+        """Override delete per invalidare cache calendario"""
+        listing_id = self.listing_id
+        result = super().delete(*args, **kwargs)
+        if listing_id:
+            from calendar_rules.services.calendar_cache import bump_calendar_generation
+            bump_calendar_generation(listing_id)
+        return result
+
     def _invalidate_calendar_cache(self):
         """Invalida la cache del calendario per questo listing"""
-        try:
-            from django.core.cache import cache
-            from datetime import timedelta
-            from django.utils import timezone
-            
-            # Invalida tutte le cache per questo listing
-            # Pattern: calendar:{listing_id}:*
-            # Django cache non supporta delete_pattern nativamente, quindi invalidiamo manualmente
-            # Per ora invalidiamo tutte le cache (in produzione si può usare redis con pattern delete)
-            listing_id = getattr(self, 'listing_id', None) or (self.listing.id if hasattr(self, 'listing') and self.listing else None)
-            
-            if listing_id:
-                # Invalida cache per un range ampio di date (ultimi 6 mesi e prossimi 12 mesi)
-                today = timezone.now().date()
-                start_date = today - timedelta(days=180)  # 6 mesi fa
-                end_date = today + timedelta(days=365)     # 12 mesi avanti
-                
-                # Invalida cache per range di date comuni (ogni 30 giorni)
-                current = start_date
-                while current <= end_date:
-                    cache_key = f"calendar:{listing_id}:{current.isoformat()}:{(current + timedelta(days=30)).isoformat()}"
-                    cache.delete(cache_key)
-                    current += timedelta(days=30)
-        except Exception:
-            # Se la cache fallisce, non bloccare il salvataggio
-            pass
+        from calendar_rules.services.calendar_cache import bump_calendar_generation
+
+        bump_calendar_generation(self.listing_id)
 
     @property
     def can_cancel(self):
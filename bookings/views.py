@@ -57,59 +57,32 @@ def check_availability(request):
         if num_guests > listing.max_guests:
             return JsonResponse({'error': f'Massimo {listing.max_guests} ospiti'}, status=400)
 
-        # Usa CalendarManager per verifica completa
-        from calendar_rules.managers import CalendarManager
-        calendar = CalendarManager(listing)
+        # Disponibilità e prezzi con un solo caricamento delle regole
+        from calendar_rules.services import BatchAvailabilityEngine
+        engine = BatchAvailabilityEngine([listing], check_in, check_out)
 
-        # Verifica disponibilità completa
-        is_available, message = calendar.check_availability(check_in, check_out)
+        # Verifica disponibilità completa (include i conflitti con le prenotazioni)
+        is_available, message = engine.check_availability(listing)
         if not is_available:
             return JsonResponse({'available': False, 'error': message})
 
-        # Verifica conflitti prenotazioni
-        conflicting_bookings = Booking.objects.filter(
-            listing=listing,
-            status__in=['confirmed', 'pending'],
-            check_in_date__lt=check_out,
-            check_out_date__gt=check_in
-        )
-
-        if conflicting_bookings.exists():
-            return JsonResponse({'available': False, 'error': 'Date già prenotate'})
-
-        # Calcola prezzi usando CalendarManager
+        # Preventivo: ogni notte prezzata una sola volta
         try:
-            total_price = calendar.calculate_total_price(check_in, check_out, num_guests)
-            total_nights = (check_out - check_in).days
-
-            # Calcola breakdown dettagliato
-            daily_prices = []
-            subtotal = 0
-            for i in range(total_nights):
-                day_date = check_in + timedelta(days=i)
-                day_price = calendar.get_price_per_day(day_date)
-                daily_prices.append({
-                    'date': day_date.isoformat(),
-                    'price': float(day_price)
-                })
-                subtotal += day_price
-
-            # Ospiti extra
-            extra_guest_fee = 0
-            if num_guests > listing.included_guests:
-                extra_guests = num_guests - listing.included_guests
-                extra_guest_fee = extra_guests * listing.extra_guest_fee * total_nights
+            quote = engine.get_price_quote(listing, num_guests)
 
             return JsonResponse({
                 'available': True,
                 'pricing': {
-                    'base_price_per_night': float(subtotal / total_nights) if total_nights > 0 else 0,
-                    'total_nights': total_nights,
-                    'subtotal': float(subtotal),
-                    'cleaning_fee': float(listing.cleaning_fee),
-                    'extra_guest_fee': float(extra_guest_fee),
-                    'total_amount': float(total_price),
-                    'daily_prices': daily_prices  # Nuovo: prezzi giornalieri dettagliati
+                    'base_price_per_night': float(quote.average_price_per_night),
+                    'total_nights': quote.nights,
+                    'subtotal': float(quote.subtotal),
+                    'cleaning_fee': float(quote.cleaning_fee),
+                    'extra_guest_fee': float(quote.extra_guest_fee),
+                    'total_amount': float(quote.total),
+                    'daily_prices': [  # Prezzi giornalieri dettagliati
+                        {'date': day.isoformat(), 'price': float(price)}
+                        for day, price in quote.daily_prices()
+                    ]
                 }
             })
 
@@ -168,10 +141,11 @@ def create_booking(request):
                     'error': 'Date già prenotate da un altro utente'
                 }, status=400)
 
-            # Verify availability with CalendarManager inside the transaction
-            from calendar_rules.managers import CalendarManager
-            calendar = CalendarManager(listing)
-            is_available, message = calendar.check_availability(check_in, check_out)
+            # Verify availability inside the transaction; the same rule fetch
+            # prices the stay, and the quote is reused by Booking.save
+            from calendar_rules.services import BatchAvailabilityEngine
+            engine = BatchAvailabilityEngine([listing], check_in, check_out)
+            is_available, message = engine.check_availability(listing)
 
             if not is_available:
                 return JsonResponse({'error': message}, status=400)
@@ -190,8 +164,9 @@ def create_booking(request):
                 guest_email=data.get('guest_email', request.user.email)
             )
 
-            # Validazione e calcolo prezzi automatici
-            booking.full_clean()
+            booking.price_quote = engine.get_price_quote(listing, num_guests)
+
+            # Validazione e calcolo prezzi automatici (save() esegue full_clean)
             booking.save()
 
             return JsonResponse({
@@ -260,7 +235,7 @@ def cancel_booking(request, booking_id):
 
     if request.method == 'POST':
         booking.status = 'cancelled'
-        booking.save()
+        booking.save(update_fields=['status'])
         messages.success(request, 'Prenotazione cancellata')
         return redirect('account:dashboard')
 
@@ -287,7 +262,7 @@ def cancel_multi_booking(request, multi_booking_id):
     if request.method == 'POST':
         multi_booking.status = 'cancelled'
         multi_booking.save(update_fields=['status'])
-        multi_booking.individual_bookings.update(status='cancelled')
+        multi_booking.individual_bookings.update_status('cancelled')
         messages.success(request, 'Prenotazione combinata cancellata')
         return redirect('account:dashboard')
 
@@ -554,18 +529,21 @@ def find_combined_availability(check_in_date, check_out_date, total_guests):
     Usa solo i gruppi di appartamenti definiti dall'host
     """
     from itertools import combinations, chain
-    from calendar_rules.managers import CalendarManager
+    from django.db.models import Prefetch
+    from calendar_rules.services import BatchAvailabilityEngine
     from decimal import Decimal
     from listings.models import ListingGroup
     
-    # Ottieni tutti i gruppi attivi di appartamenti
-    groups = ListingGroup.objects.filter(is_active=True).prefetch_related('listings')
+    # Ottieni tutti i gruppi attivi con i soli appartamenti attivi (2 query)
+    groups = ListingGroup.objects.filter(is_active=True).prefetch_related(
+        Prefetch('listings', queryset=Listing.objects.filter(status='active'), to_attr='active_listings')
+    )
     
     all_combinations = []
     
     # Per ogni gruppo, trova le combinazioni valide (evitando duplicati)
     for group in groups:
-        group_listings = list(group.listings.filter(status='active'))
+        group_listings = list(group.active_listings)
         
         if not group_listings:
             continue
@@ -610,6 +588,13 @@ def find_combined_availability(check_in_date, check_out_date, total_guests):
         if best_combo is not None:
             all_combinations.append(best_combo)
     
+    # Carica in batch i dati di tutti gli appartamenti coinvolti (una query per tabella)
+    engine = BatchAvailabilityEngine(
+        {l.id: l for combo_info in all_combinations for l in combo_info['combo']}.values(),
+        check_in_date,
+        check_out_date
+    )
+    
     # Verifica disponibilità per ogni combinazione
     available_combinations = []
     
@@ -624,9 +609,8 @@ def find_combined_availability(check_in_date, check_out_date, total_guests):
         combo_details = []
         
         for listing in combo:
-            # Verifica disponibilità usando CalendarManager
-            calendar = CalendarManager(listing)
-            is_available, message = calendar.check_availability(check_in_date, check_out_date)
+            # Verifica disponibilità in memoria (stesse regole di CalendarManager)
+            is_available, message = engine.check_availability(listing)
             
             if not is_available:
                 combination_available = False
@@ -664,12 +648,8 @@ def find_combined_availability(check_in_date, check_out_date, total_guests):
                             combination_available = False
                             break
                 
-                # Calcola prezzo usando CalendarManager
-                listing_price = calendar.calculate_total_price(
-                    check_in_date, 
-                    check_out_date, 
-                    guests_for_listing
-                )
+                # Calcola prezzo (stessa formula di CalendarManager.calculate_total_price)
+                listing_price = engine.calculate_total_price(listing, guests_for_listing)
                 
                 # Calcola ospiti extra
                 extra_guests = max(0, guests_for_listing - listing.included_guests)
@@ -819,20 +799,19 @@ def create_combined_booking(request):
             # Lock all relevant listings to prevent concurrent bookings
             listing_ids = [item['listing_id'] for item in combination_data]
 
-            # Lock existing bookings for all listings in the combination
-            for listing_id in listing_ids:
-                locked_bookings = Booking.objects.select_for_update().filter(
-                    listing_id=listing_id,
-                    status__in=['confirmed', 'pending'],
-                    check_in_date__lt=check_out,
-                    check_out_date__gt=check_in
-                )
+            # Lock existing bookings for all listings in the combination (one query)
+            locked_bookings = Booking.objects.select_for_update().filter(
+                listing_id__in=listing_ids,
+                status__in=['confirmed', 'pending'],
+                check_in_date__lt=check_out,
+                check_out_date__gt=check_in
+            )
 
-                # If any listing has conflicting bookings, abort
-                if locked_bookings.exists():
-                    return JsonResponse({
-                        'error': 'Una o più proprietà non sono più disponibili per queste date'
-                    }, status=400)
+            # If any listing has conflicting bookings, abort
+            if locked_bookings.exists():
+                return JsonResponse({
+                    'error': 'Una o più proprietà non sono più disponibili per queste date'
+                }, status=400)
 
             # Re-verify availability inside transaction
             combinations = find_combined_availability(check_in, check_out, total_guests)
@@ -867,8 +846,11 @@ def create_combined_booking(request):
 
             # Crea i booking individuali
             individual_bookings = []
+            combo_listings = Listing.objects.in_bulk(
+                [item['listing']['id'] for item in selected_combination['combination']]
+            )
             for combo_item in selected_combination['combination']:
-                listing = Listing.objects.get(id=combo_item['listing']['id'])
+                listing = combo_listings[combo_item['listing']['id']]
                 guests_for_listing = combo_item['guests']
 
                 # Crea booking individuale
@@ -20,7 +20,7 @@ class ClosureRuleAdmin(admin.ModelAdmin):
             'fields': ('listing', ('start_date', 'end_date'))
         }),
         ('Dettagli', {
-            'fields': ('is_external_booking', 'reason')
+            'fields': ('is_external_booking', 'reason', 'external_uid')
         }),
     )
 
@@ -83,7 +83,10 @@ class ExternalCalendarAdmin(admin.ModelAdmin):
     ]
     list_filter = ['provider', 'is_active', 'last_sync_status', 'listing']
     search_fields = ['name', 'listing__title', 'ical_url']
-    readonly_fields = ['last_sync', 'last_sync_status', 'last_sync_error', 'created_at', 'updated_at']
+    readonly_fields = [
+        'last_sync', 'last_sync_status', 'last_sync_error',
+        'etag', 'last_modified', 'created_at', 'updated_at'
+    ]
     
     fieldsets = (
         ('Informazioni Base', {
@@ -93,7 +96,7 @@ class ExternalCalendarAdmin(admin.ModelAdmin):
             'fields': ('ical_url', 'is_active', 'sync_interval_minutes')
         }),
         ('Stato Sincronizzazione', {
-            'fields': ('last_sync', 'last_sync_status', 'last_sync_error'),
+            'fields': ('last_sync', 'last_sync_status', 'last_sync_error', 'etag', 'last_modified'),
             'classes': ('collapse',)
         }),
         ('Metadati', {
@@ -5,19 +5,26 @@ Endpoints per frontend Airbnb-style:
 - GET /api/listings/{id}/calendar/ - Dati calendario (disponibilità + prezzi)
 - POST /api/listings/{id}/check-availability/ - Verifica disponibilità specifica
 - POST /api/listings/{id}/calculate-price/ - Calcola prezzo per periodo
+- GET /api/listings/search/ - Appartamenti liberi per un soggiorno
+- GET /ical/{id}.ics - Export iCal per gli OTA
 """
 
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from decimal import Decimal
 import json
 
 from listings.models import Listing
 from .availability import AvailabilityChecker
 from .pricing import PriceCalculator
+from .services.cache_warmer import get_calendar_data
+from .services.combined_calendar import get_combined_calendar, get_groups_payload
+from .services.ical_export import check_ical_export_token, get_ical_feed, iter_chunks
+from .services.listing_search import search_available_listings
 
 
 @require_http_methods(["GET"])
@@ -86,18 +93,12 @@ def calendar_data(request, listing_id):
                 'error': f'Range massimo: {max_days} giorni'
             }, status=400)
 
-        # Ottieni dati disponibilità
-        availability_checker = AvailabilityChecker(listing)
-        availability_data = availability_checker.get_calendar_data(start_date, end_date)
-
-        # Ottieni prezzi
-        price_calculator = PriceCalculator(listing)
-        prices = price_calculator.get_calendar_prices(start_date, end_date)
+        # Disponibilità e prezzi dalla cache condivisa (preriscaldata da warm_calendar_cache)
+        calendar = get_calendar_data(listing, start_date, end_date)
 
         # Costruisci response
         response_data = {
-            **availability_data,
-            'prices': prices,
+            **calendar,
             'listing': {
                 'id': listing.id,
                 'title': listing.title,
@@ -360,8 +361,6 @@ def combined_calendar_data(request):
         }
     """
     try:
-        from listings.models import ListingGroup
-
         # Parse date parameters
         start_str = request.GET.get('start')
         end_str = request.GET.get('end')
@@ -391,109 +390,25 @@ def combined_calendar_data(request):
                 'error': f'Range massimo: {max_days} giorni'
             }, status=400)
 
-        # Ottieni tutti i gruppi attivi
-        groups = ListingGroup.objects.filter(is_active=True).prefetch_related('listings')
+        # Gruppi e membri dalla cache (invalidata dai segnali su gruppi e listing)
+        payload = get_groups_payload()
 
-        if not groups.exists():
+        if not payload['groups']:
             return JsonResponse({
                 'error': 'Nessun gruppo di appartamenti attivo'
             }, status=404)
 
-        # Raccogli tutti gli appartamenti da TUTTI i gruppi
-        all_listings = set()
-        for group in groups:
-            for listing in group.listings.filter(status='active'):
-                all_listings.add(listing)
-
-        if not all_listings:
+        if not payload['listing_ids']:
             return JsonResponse({
                 'error': 'Nessun appartamento attivo nei gruppi'
             }, status=404)
 
-        # Inizializza strutture dati per aggregazione
-        blocked_dates_sets = []  # Include tutte le date bloccate (gap, prenotazioni, chiusure)
-        prices_per_listing = []
-        min_stays = []
-        gap_days_list = []
-
-        # Per ogni appartamento, ottieni i suoi dati
-        for listing in all_listings:
-            # Ottieni dati completi di disponibilità (include gap rules, bookings, closures)
-            availability_checker = AvailabilityChecker(listing)
-            availability_data = availability_checker.get_calendar_data(start_date, end_date)
-
-            # Aggrega tutte le date bloccate (include gap rules, prenotazioni, chiusure)
-            blocked_dates_sets.append(set(availability_data['blocked_dates']))
-
-            min_stays.append(availability_data['min_stay'])
-            gap_days_list.append(availability_data['gap_days'])
-
-            # Ottieni prezzi
-            price_calculator = PriceCalculator(listing)
-            listing_prices = price_calculator.get_calendar_prices(start_date, end_date)
-            prices_per_listing.append(listing_prices)
-
-        # Aggrega: include gap rules, prenotazioni, chiusure (UNION = se QUALSIASI è bloccato)
-        aggregated_blocked = set.union(*blocked_dates_sets) if blocked_dates_sets else set()
-        # In modalità combinata, non usiamo checkin/checkout disabled
-        aggregated_checkin_disabled = set()
-        aggregated_checkout_disabled = set()
-
-        # Somma prezzi: nascondi prezzi per date bloccate
-        aggregated_prices = {}
-        current_date = start_date
-        while current_date < end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-
-            # Mostra prezzi solo per date disponibili (non bloccate)
-            if date_str not in aggregated_blocked:
-                total_price = sum(
-                    prices.get(date_str, 0)
-                    for prices in prices_per_listing
-                )
-                if total_price > 0:
-                    aggregated_prices[date_str] = float(total_price)
-
-            current_date += timedelta(days=1)
-
-        # Usa il min_stay e gap più restrittivo (il massimo)
-        max_min_stay = max(min_stays) if min_stays else 1
-        max_gap_days = max(gap_days_list) if gap_days_list else 0
-
-        # Serializza informazioni gruppi
-        groups_data = []
-        for group in groups:
-            group_listings = group.listings.filter(status='active')
-            groups_data.append({
-                'id': group.id,
-                'name': group.name,
-                'description': group.description,
-                'total_capacity': group.total_capacity,
-                'total_bedrooms': group.total_bedrooms,
-                'listing_count': group_listings.count(),
-                'listings': [
-                    {
-                        'id': listing.id,
-                        'title': listing.title,
-                        'slug': listing.slug,
-                        'max_guests': listing.max_guests,
-                        'bedrooms': listing.bedrooms,
-                        'base_price': float(listing.base_price),
-                        'cleaning_fee': float(listing.cleaning_fee),
-                    }
-                    for listing in group_listings
-                ]
-            })
-
+        # Stato aggregato mantenuto in modo incrementale: si ricalcolano solo
+        # i listing il cui calendario è cambiato dall'ultima richiesta
         response_data = {
-            'blocked_dates': sorted(list(aggregated_blocked)),
-            'checkin_disabled': sorted(list(aggregated_checkin_disabled)),
-            'checkout_disabled': sorted(list(aggregated_checkout_disabled)),
-            'prices': aggregated_prices,
-            'min_stay': max_min_stay,
-            'gap_days': max_gap_days,
-            'groups': groups_data,
-            'total_listings': len(all_listings),
+            **get_combined_calendar(start_date, end_date, payload['listing_ids']),
+            'groups': payload['groups'],
+            'total_listings': len(payload['listing_ids']),
         }
 
         return JsonResponse(response_data)
@@ -504,3 +419,119 @@ def combined_calendar_data(request):
         return JsonResponse({
             'error': f'Errore interno: {str(e)}'
         }, status=500)
+
+
+@require_http_methods(["GET"])
+def search_listings(request):
+    """
+    Cerca gli appartamenti attivi liberi per un soggiorno.
+
+    GET /api/listings/search/?check_in=2025-01-15&check_out=2025-01-18&guests=3
+
+    Query Parameters:
+        check_in: Data di check-in (formato: YYYY-MM-DD)
+        check_out: Data di check-out (formato: YYYY-MM-DD)
+        guests: Numero di ospiti (default: 1)
+
+    Response:
+        {
+            "check_in": "2025-01-15",
+            "check_out": "2025-01-18",
+            "guests": 3,
+            "count": 2,
+            "results": [  // Ordinati per totale crescente
+                {
+                    "id": 1,
+                    "title": "Appartamento Centro",
+                    "slug": "appartamento-centro",
+                    "nights": 3,
+                    "total": 400.00,
+                    "price_per_night_avg": 106.67,
+                    ...
+                }
+            ]
+        }
+    """
+    try:
+        check_in_str = request.GET.get('check_in')
+        check_out_str = request.GET.get('check_out')
+
+        if not check_in_str or not check_out_str:
+            return JsonResponse({
+                'error': 'Parametri check_in e check_out richiesti'
+            }, status=400)
+
+        try:
+            check_in = datetime.strptime(check_in_str, '%Y-%m-%d').date()
+            check_out = datetime.strptime(check_out_str, '%Y-%m-%d').date()
+            num_guests = int(request.GET.get('guests', 1))
+        except (ValueError, TypeError):
+            return JsonResponse({
+                'error': 'Formato parametri non valido'
+            }, status=400)
+
+        if check_in >= check_out:
+            return JsonResponse({
+                'error': 'La data di check-out deve essere successiva al check-in'
+            }, status=400)
+
+        if num_guests < 1:
+            return JsonResponse({
+                'error': 'Il numero di ospiti deve essere almeno 1'
+            }, status=400)
+
+        max_days = 365
+        if (check_out - check_in).days > max_days:
+            return JsonResponse({
+                'error': f'Range massimo: {max_days} giorni'
+            }, status=400)
+
+        results = search_available_listings(check_in, check_out, num_guests)
+
+        return JsonResponse({
+            'check_in': check_in_str,
+            'check_out': check_out_str,
+            'guests': num_guests,
+            'count': len(results),
+            'results': results,
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'error': f'Errore interno: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET", "HEAD"])
+def ical_export(request, listing_id, token):
+    """
+    Export iCal delle date occupate di un listing attivo, per la sincronizzazione con gli OTA.
+
+    GET /ical/{listing_id}/{token}.ics (vedi ical_export_path)
+
+    Il feed è in cache finché il calendario del listing non cambia; con
+    If-None-Match uguale all'ETag corrente risponde 304 senza corpo.
+    """
+    # Token verificato prima di cache e database: ID a caso non creano chiavi in cache
+    if not check_ical_export_token(listing_id, token):
+        raise Http404("Listing non trovato")
+    feed = get_ical_feed(listing_id)
+    if feed is None:
+        raise Http404("Listing non trovato")
+    body, etag = feed
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if '*' in etags or etag in etags or f'W/{etag}' in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+    response = StreamingHttpResponse(iter_chunks(body), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Content-Length'] = str(len(body))
+    response['Content-Disposition'] = f'inline; filename="listing-{listing_id}.ics"'
+    # Gli OTA devono sempre rivalidare: il feed cambia a ogni prenotazione
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CalendarRulesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calendar_rules'
+
+    def ready(self):
+        import calendar_rules.signals
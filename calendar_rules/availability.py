@@ -12,10 +12,105 @@ Logica chiara e lineare:
 
 from datetime import date, timedelta
 from typing import Dict, List, Tuple, Set
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 
 
+class AvailabilitySnapshot:
+    """
+    Dati necessari a verificare un soggiorno, caricati una sola volta.
+
+    Le query sono limitate alla finestra del soggiorno allargata del gap
+    richiesto, così tutte le verifiche di AvailabilityChecker girano in memoria
+    senza scansionare lo storico delle prenotazioni.
+
+    Attributi (nello stesso ordine delle query originali, così i messaggi
+    restituiti non cambiano):
+        bookings: [(check_in_date, check_out_date)] attive, per -created_at
+        closures: [(start_date, end_date, is_external_booking)] per start_date
+        min_nights_rules: [(start_date, end_date, min_nights)] con min_nights valorizzato
+        checkinout_rules: [(rule_type, recurrence_type, specific_date, day_of_week)]
+    """
+
+    ACTIVE_STATUSES = ['confirmed', 'pending']
+
+    def __init__(self, bookings=None, closures=None, min_nights_rules=None, checkinout_rules=None):
+        self.bookings = bookings or []
+        self.closures = closures or []
+        self.min_nights_rules = min_nights_rules or []
+        self.checkinout_rules = checkinout_rules or []
+
+    @classmethod
+    def querysets(cls, listing, check_in: date, check_out: date, exclude_booking_id=None) -> Dict[str, QuerySet]:
+        """
+        QuerySet usati da load(), uno per tabella.
+
+        Prenotazioni: solo quelle con check-out dopo (check_in - gap) e check-in
+        prima di (check_out + gap): è il superinsieme esatto di quelle che
+        possono generare un conflitto o violare il gap.
+
+        Returns:
+            Dict {'bookings', 'closures', 'min_nights_rules', 'checkinout_rules'}
+        """
+        from bookings.models import Booking
+        from .models import ClosureRule, PriceRule, CheckInOutRule
+
+        gap = timedelta(days=listing.gap_between_bookings or 0)
+
+        bookings = Booking.objects.filter(
+            listing=listing,
+            status__in=cls.ACTIVE_STATUSES,
+            check_out_date__gt=check_in - gap,
+            check_in_date__lt=check_out + gap
+        )
+        if exclude_booking_id:
+            bookings = bookings.exclude(pk=exclude_booking_id)
+
+        closures = ClosureRule.objects.filter(
+            listing=listing,
+            start_date__lt=check_out,
+            end_date__gte=check_in
+        ).order_by('start_date', 'pk')
+
+        min_nights_rules = PriceRule.objects.filter(
+            listing=listing,
+            min_nights__isnull=False,
+            start_date__lte=check_in,
+            end_date__gte=check_out
+        ).order_by('min_nights')
+
+        checkinout_rules = CheckInOutRule.objects.filter(
+            Q(recurrence_type='weekly') | Q(specific_date__in=[check_in, check_out]),
+            listing=listing
+        )
+
+        return {
+            'bookings': bookings.order_by('-created_at').values_list('check_in_date', 'check_out_date'),
+            'closures': closures.values_list('start_date', 'end_date', 'is_external_booking'),
+            'min_nights_rules': min_nights_rules.values_list('start_date', 'end_date', 'min_nights')[:1],
+            'checkinout_rules': checkinout_rules.values_list(
+                'rule_type', 'recurrence_type', 'specific_date', 'day_of_week'
+            ),
+        }
+
+    @classmethod
+    def load(cls, listing, check_in: date, check_out: date, exclude_booking_id=None) -> 'AvailabilitySnapshot':
+        """
+        Carica lo snapshot per un soggiorno con query limitate (vedi querysets()).
+
+        Args:
+            listing: Listing da verificare
+            check_in: Data di check-in
+            check_out: Data di check-out
+            exclude_booking_id: ID di booking da escludere (per modifiche)
+
+        Returns:
+            AvailabilitySnapshot
+        """
+        querysets = cls.querysets(listing, check_in, check_out, exclude_booking_id)
+        return cls(**{name: list(queryset) for name, queryset in querysets.items()})
+
+
 class AvailabilityChecker:
     """
     Verifica disponibilità di un listing per un periodo specifico.
@@ -27,12 +122,16 @@ class AvailabilityChecker:
     4. Gap tra prenotazioni (gap_between_bookings)
     5. Soggiorno minimo (min_stay_nights, può essere sovrascritto da PriceRule)
     6. Regole check-in/out (CheckInOutRule per giorni specifici o ricorrenti)
+
+    I dati vengono letti da un AvailabilitySnapshot: quattro query limitate
+    al soggiorno, poi tutte le verifiche avvengono in memoria.
     """
 
     def __init__(self, listing):
         self.listing = listing
 
-    def check_availability(self, check_in: date, check_out: date, exclude_booking_id=None) -> Tuple[bool, str]:
+    def check_availability(self, check_in: date, check_out: date, exclude_booking_id=None,
+                           snapshot: AvailabilitySnapshot = None) -> Tuple[bool, str]:
         """
         Verifica se un periodo è disponibile per prenotazione.
 
@@ -40,6 +139,8 @@ class AvailabilityChecker:
             check_in: Data di check-in
             check_out: Data di check-out
             exclude_booking_id: ID di booking da escludere (per modifiche)
+            snapshot: Dati già caricati (es. in batch per più listing);
+                      se None vengono caricati dopo la validazione delle date
 
         Returns:
             (disponibile, messaggio) - True se disponibile, False + motivo se non disponibile
@@ -49,28 +150,31 @@ class AvailabilityChecker:
         if not valid:
             return False, message
 
+        if snapshot is None:
+            snapshot = AvailabilitySnapshot.load(self.listing, check_in, check_out, exclude_booking_id)
+
         # 2. Verifica chiusure
-        closed, message = self._check_closures(check_in, check_out)
+        closed, message = self._check_closures(check_in, check_out, snapshot)
         if closed:
             return False, message
 
         # 3. Verifica conflitti con prenotazioni esistenti
-        conflict, message = self._check_booking_conflicts(check_in, check_out, exclude_booking_id)
+        conflict, message = self._check_booking_conflicts(check_in, check_out, snapshot)
         if conflict:
             return False, message
 
         # 4. Verifica gap tra prenotazioni
-        gap_ok, message = self._check_gap_requirement(check_in, check_out, exclude_booking_id)
+        gap_ok, message = self._check_gap_requirement(check_in, check_out, snapshot)
         if not gap_ok:
             return False, message
 
         # 5. Verifica soggiorno minimo
-        min_stay_ok, message = self._check_min_stay(check_in, check_out)
+        min_stay_ok, message = self._check_min_stay(check_in, check_out, snapshot)
         if not min_stay_ok:
             return False, message
 
         # 6. Verifica regole check-in/out
-        rules_ok, message = self._check_checkinout_rules(check_in, check_out)
+        rules_ok, message = self._check_checkinout_rules(check_in, check_out, snapshot)
         if not rules_ok:
             return False, message
 
@@ -95,52 +199,34 @@ class AvailabilityChecker:
 
         return True, "Date valide"
 
-    def _check_closures(self, check_in: date, check_out: date) -> Tuple[bool, str]:
+    def _check_closures(self, check_in: date, check_out: date, snapshot: AvailabilitySnapshot) -> Tuple[bool, str]:
         """Verifica se il periodo include chiusure."""
-        from .models import ClosureRule
-
-        # Verifica chiusure che si sovrappongono al periodo richiesto
-        # Una chiusura blocca se c'è qualsiasi sovrapposizione con il soggiorno
-        closures = ClosureRule.objects.filter(
-            listing=self.listing,
-            start_date__lt=check_out,  # Chiusura inizia prima del nostro check-out
-            end_date__gte=check_in      # Chiusura finisce dopo (o nel) nostro check-in
-        )
-
-        if closures.exists():
-            closure = closures.first()
-            if closure.is_external_booking:
-                return True, f"Periodo non disponibile (prenotazione esterna dal {closure.start_date} al {closure.end_date})"
-            return True, f"Struttura chiusa dal {closure.start_date} al {closure.end_date}"
+        # Una chiusura blocca se c'è qualsiasi sovrapposizione con il soggiorno:
+        # inizia prima del nostro check-out e finisce dopo (o nel) nostro check-in
+        for start_date, end_date, is_external_booking in snapshot.closures:
+            if start_date < check_out and end_date >= check_in:
+                if is_external_booking:
+                    return True, f"Periodo non disponibile (prenotazione esterna dal {start_date} al {end_date})"
+                return True, f"Struttura chiusa dal {start_date} al {end_date}"
 
         return False, "Nessuna chiusura"
 
-    def _check_booking_conflicts(self, check_in: date, check_out: date, exclude_booking_id=None) -> Tuple[bool, str]:
+    def _check_booking_conflicts(self, check_in: date, check_out: date,
+                                 snapshot: AvailabilitySnapshot) -> Tuple[bool, str]:
         """Verifica conflitti con prenotazioni esistenti."""
-        from bookings.models import Booking
-
-        # Trova prenotazioni che si sovrappongono
         # Regola: Una prenotazione occupa dal check_in (incluso) al check_out (escluso)
         # Quindi: check_out di una prenotazione = check_in di un'altra è OK (turnover stesso giorno)
-        conflicting_bookings = Booking.objects.filter(
-            listing=self.listing,
-            status__in=['confirmed', 'pending'],
-            check_in_date__lt=check_out,      # Prenotazione inizia prima del nostro check-out
-            check_out_date__gt=check_in        # Prenotazione finisce dopo il nostro check-in
-        )
-
-        if exclude_booking_id:
-            conflicting_bookings = conflicting_bookings.exclude(pk=exclude_booking_id)
-
-        # Verifica sovrapposizione reale (permetti turnover stesso giorno)
-        for booking in conflicting_bookings:
+        for booking_check_in, booking_check_out in snapshot.bookings:
+            if not (booking_check_in < check_out and booking_check_out > check_in):
+                continue
             # Sovrapposizione reale se NON è un semplice turnover
-            if not (booking.check_out_date == check_in or booking.check_in_date == check_out):
-                return True, f"Periodo già prenotato (conflitto con prenotazione dal {booking.check_in_date} al {booking.check_out_date})"
+            if not (booking_check_out == check_in or booking_check_in == check_out):
+                return True, f"Periodo già prenotato (conflitto con prenotazione dal {booking_check_in} al {booking_check_out})"
 
         return False, "Nessun conflitto"
 
-    def _check_gap_requirement(self, check_in: date, check_out: date, exclude_booking_id=None) -> Tuple[bool, str]:
+    def _check_gap_requirement(self, check_in: date, check_out: date,
+                               snapshot: AvailabilitySnapshot) -> Tuple[bool, str]:
         """
         Verifica che il gap tra prenotazioni sia rispettato.
 
@@ -154,48 +240,34 @@ class AvailabilityChecker:
         if gap_days == 0:
             return True, "Nessun gap richiesto"
 
-        from bookings.models import Booking
-
-        # Trova prenotazioni vicine
-        nearby_bookings = Booking.objects.filter(
-            listing=self.listing,
-            status__in=['confirmed', 'pending']
-        )
-
-        if exclude_booking_id:
-            nearby_bookings = nearby_bookings.exclude(pk=exclude_booking_id)
-
-        for booking in nearby_bookings:
+        for booking_check_in, booking_check_out in snapshot.bookings:
             # Gap PRIMA del nostro check-in (dopo il check-out di un'altra prenotazione)
-            days_after_previous = (check_in - booking.check_out_date).days
+            days_after_previous = (check_in - booking_check_out).days
             # Se gap_days > 0, blocca se il gap è insufficiente (incluso gap = 0)
             if 0 <= days_after_previous < gap_days:
                 return False, f"Richiesto gap di {gap_days} giorni tra prenotazioni (solo {days_after_previous} giorni dopo prenotazione precedente)"
 
             # Gap DOPO il nostro check-out (prima del check-in di un'altra prenotazione)
-            days_before_next = (booking.check_in_date - check_out).days
+            days_before_next = (booking_check_in - check_out).days
             # Se gap_days > 0, blocca se il gap è insufficiente (incluso gap = 0)
             if 0 <= days_before_next < gap_days:
                 return False, f"Richiesto gap di {gap_days} giorni tra prenotazioni (solo {days_before_next} giorni prima della prossima prenotazione)"
 
         return True, "Gap rispettato"
 
-    def _check_min_stay(self, check_in: date, check_out: date) -> Tuple[bool, str]:
+    def _check_min_stay(self, check_in: date, check_out: date, snapshot: AvailabilitySnapshot) -> Tuple[bool, str]:
         """Verifica soggiorno minimo."""
-        from .models import PriceRule
-
         nights = (check_out - check_in).days
 
-        # Prima verifica se c'è una PriceRule con min_nights per questo periodo
-        price_rules_with_min = PriceRule.objects.filter(
-            listing=self.listing,
-            min_nights__isnull=False,
-            start_date__lte=check_in,
-            end_date__gte=check_out
-        ).order_by('min_nights')
+        # Prima verifica se c'è una PriceRule con min_nights che copre tutto il periodo
+        covering = [
+            min_nights
+            for start_date, end_date, min_nights in snapshot.min_nights_rules
+            if min_nights is not None and start_date <= check_in and end_date >= check_out
+        ]
 
-        if price_rules_with_min.exists():
-            min_nights = price_rules_with_min.first().min_nights
+        if covering:
+            min_nights = min(covering)
             if nights < min_nights:
                 return False, f"Soggiorno minimo richiesto: {min_nights} notti per questo periodo"
         else:
@@ -206,35 +278,32 @@ class AvailabilityChecker:
 
         return True, "Soggiorno minimo rispettato"
 
-    def _check_checkinout_rules(self, check_in: date, check_out: date) -> Tuple[bool, str]:
+    def _check_checkinout_rules(self, check_in: date, check_out: date,
+                                snapshot: AvailabilitySnapshot) -> Tuple[bool, str]:
         """Verifica regole di check-in/out per giorni specifici o ricorrenti."""
-        from .models import CheckInOutRule
-
-        rules = CheckInOutRule.objects.filter(listing=self.listing)
+        days = ['Lunedì', 'Martedì', 'Mercoledì', 'Giovedì', 'Venerdì', 'Sabato', 'Domenica']
 
-        for rule in rules:
-            if rule.rule_type == 'no_checkin':
+        for rule_type, recurrence_type, specific_date, day_of_week in snapshot.checkinout_rules:
+            if rule_type == 'no_checkin':
                 # Verifica se il check-in cade in un giorno bloccato
-                if rule.recurrence_type == 'specific_date' and rule.specific_date:
-                    if check_in == rule.specific_date:
+                if recurrence_type == 'specific_date' and specific_date:
+                    if check_in == specific_date:
                         return False, f"Check-in non permesso il {check_in.strftime('%d/%m/%Y')}"
 
-                elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
+                elif recurrence_type == 'weekly' and day_of_week is not None:
                     # day_of_week: 0=Lunedì, 6=Domenica
-                    if check_in.weekday() == rule.day_of_week:
-                        days = ['Lunedì', 'Martedì', 'Mercoledì', 'Giovedì', 'Venerdì', 'Sabato', 'Domenica']
-                        return False, f"Check-in non permesso di {days[rule.day_of_week]}"
+                    if check_in.weekday() == day_of_week:
+                        return False, f"Check-in non permesso di {days[day_of_week]}"
 
-            elif rule.rule_type == 'no_checkout':
+            elif rule_type == 'no_checkout':
                 # Verifica se il check-out cade in un giorno bloccato
-                if rule.recurrence_type == 'specific_date' and rule.specific_date:
-                    if check_out == rule.specific_date:
+                if recurrence_type == 'specific_date' and specific_date:
+                    if check_out == specific_date:
                         return False, f"Check-out non permesso il {check_out.strftime('%d/%m/%Y')}"
 
-                elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
-                    if check_out.weekday() == rule.day_of_week:
-                        days = ['Lunedì', 'Martedì', 'Mercoledì', 'Giovedì', 'Venerdì', 'Sabato', 'Domenica']
-                        return False, f"Check-out non permesso di {days[rule.day_of_week]}"
+                elif recurrence_type == 'weekly' and day_of_week is not None:
+                    if check_out.weekday() == day_of_week:
+                        return False, f"Check-out non permesso di {days[day_of_week]}"
 
         return True, "Regole check-in/out rispettate"
 
@@ -470,14 +539,19 @@ class AvailabilityChecker:
             return set()  # ✅ Nessun gap = turnover stesso giorno permesso
 
         blocked = set()
+
+        # Ottieni min_stay effettivo
+        min_stay = self.listing.min_stay_nights or 1
+        gap_before_days = gap_days + min_stay - 1
+
+        # Solo le prenotazioni i cui giorni di gap cadono nella finestra
         bookings = Booking.objects.filter(
+            Q(check_out_date__gt=start_date - timedelta(days=gap_days), check_out_date__lte=end_date) |
+            Q(check_in_date__gt=start_date, check_in_date__lte=end_date + timedelta(days=gap_before_days)),
             listing=self.listing,
             status__in=['confirmed', 'pending']
         )
 
-        # Ottieni min_stay effettivo
-        min_stay = self.listing.min_stay_nights or 1
-
         for booking in bookings:
             if gap_days >= 1:
                 # 1. Blocca i gap_days giorni DOPO ogni check-out
@@ -496,7 +570,6 @@ class AvailabilityChecker:
                 # Gap effettivo = gap_days + min_stay - 1
                 # Esempio: gap=5, min_stay=3 → blocca 7 giorni prima
                 # Perché: check-in a -6 giorni + min_stay 3 = check-out a -3 giorni → dentro gap!
-                gap_before_days = gap_days + min_stay - 1
 
                 gap_start_before = booking.check_in_date - timedelta(days=gap_before_days)
                 gap_end_before = booking.check_in_date - timedelta(days=1)
@@ -0,0 +1,166 @@
+# calendar_rules/benchmarking.py
+"""
+Utility condivise dai comandi di benchmark del calendario.
+
+I dati sintetici vengono creati dentro una transazione annullata alla fine
+(rollback_after), così i benchmark possono girare anche su un database reale
+senza lasciare tracce.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, List, Tuple
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def rollback_after():
+    """Esegue il blocco in una transazione che viene sempre annullata."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(func: Callable, *args, repeat: int = 1, **kwargs) -> Tuple[Any, int, float]:
+    """
+    Esegue func e misura query e tempo.
+
+    Args:
+        func: Funzione da misurare
+        repeat: Numero di esecuzioni (il tempo restituito è la media)
+
+    Returns:
+        Tuple (risultato dell'ultima esecuzione, query per esecuzione, millisecondi medi)
+    """
+    result = None
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000 / repeat
+    return result, len(ctx.captured_queries) // repeat, elapsed
+
+
+def create_benchmark_listing(title: str = 'Benchmark', **overrides):
+    """
+    Crea un listing sintetico per i benchmark.
+
+    Args:
+        title: Titolo (usato anche per lo slug)
+        **overrides: Valori dei campi da sovrascrivere
+
+    Returns:
+        Listing salvato
+    """
+    from listings.models import Listing
+
+    fields = {
+        'title': title,
+        'description': 'Listing sintetico per benchmark',
+        'status': 'active',
+        'max_guests': 4,
+        'bedrooms': 2,
+        'bathrooms': Decimal('1.0'),
+        'address': 'Via del Benchmark 1',
+        'city': 'Roma',
+        'zone': 'Centro',
+        'base_price': Decimal('100.00'),
+        'cleaning_fee': Decimal('50.00'),
+        'included_guests': 2,
+        'extra_guest_fee': Decimal('15.00'),
+        'gap_between_bookings': 1,
+        'min_stay_nights': 2,
+    }
+    fields.update(overrides)
+
+    listing = Listing(**fields)
+    listing.save()
+    return listing
+
+
+def seed_price_rules(listing, start_date: date, days: int) -> int:
+    """
+    Crea un set di PriceRule realistico: una stagione lunga, weekend più cari
+    e un prezzo importato per ogni giorno.
+
+    Returns:
+        Numero di regole create
+    """
+    from .models import PriceRule
+
+    rules = [
+        PriceRule(
+            listing=listing,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=days),
+            price=Decimal('110.00'),
+            min_nights=2,
+        )
+    ]
+    for offset in range(0, days, 7):
+        weekend = start_date + timedelta(days=offset + 4)
+        rules.append(PriceRule(
+            listing=listing,
+            start_date=weekend,
+            end_date=weekend + timedelta(days=1),
+            price=Decimal('140.00'),
+        ))
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        rules.append(PriceRule(
+            listing=listing,
+            start_date=day,
+            end_date=day,
+            price=Decimal('100.00') + offset % 30,
+        ))
+
+    PriceRule.objects.bulk_create(rules)
+    return len(rules)
+
+
+def calendar_hot_queries(listing, check_in: date, check_out: date) -> List[Tuple[str, Any]]:
+    """
+    QuerySet delle query più frequenti del calendario, per EXPLAIN.
+
+    Returns:
+        Lista di tuple (nome, queryset)
+    """
+    from .availability import AvailabilitySnapshot
+    from .services.price_resolver import PriceResolver
+    from .services.query_optimizer import QueryOptimizer
+
+    optimizer = QueryOptimizer()
+    gap_start = check_in - timedelta(days=listing.gap_between_bookings or 0)
+    queries = [
+        ('QueryOptimizer.bookings', optimizer._get_optimized_bookings_query(listing, gap_start, check_out)),
+        ('QueryOptimizer.closures', optimizer._get_optimized_closures_query(listing, check_in, check_out)),
+        ('QueryOptimizer.checkinout_rules', optimizer._get_optimized_checkinout_rules(listing)),
+        ('QueryOptimizer.price_rules', optimizer._get_optimized_price_rules(listing, check_in, check_out)),
+    ]
+    queries.extend(
+        (f'AvailabilityChecker.{name}', queryset)
+        for name, queryset in AvailabilitySnapshot.querysets(listing, check_in, check_out).items()
+    )
+    queries.append(('PriceCalculator.price_rules', PriceResolver.rules_queryset(listing, check_in, check_out)))
+    return queries
+
+
+def find_full_scans(plan: str) -> List[str]:
+    """
+    Righe del piano EXPLAIN che indicano una scansione completa di tabella.
+
+    Riconosce il formato di SQLite (SCAN, anche su un intero indice, invece
+    di SEARCH) e di PostgreSQL (Seq Scan).
+    """
+    full_scans = []
+    for line in plan.splitlines():
+        detail = line.strip()
+        if 'Seq Scan' in detail:
+            full_scans.append(detail)
+        elif ' SCAN ' in f' {detail} ' and 'CONSTANT ROW' not in detail:
+            full_scans.append(detail)
+    return full_scans
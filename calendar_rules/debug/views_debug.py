@@ -47,8 +47,8 @@ class CalendarDebugView(View):
             # Crea il servizio calendario
             calendar_service = CalendarService(listing)
             
-            # Usa il metodo principale per ottenere la nuova struttura
-            calendar_result = calendar_service.get_unavailable_dates(start_date, end_date)
+            # Calcolo senza cache con i tempi di ogni fase (load, day_states, consolidate, ...)
+            calendar_result, trace = calendar_service.trace_unavailable_dates(start_date, end_date)
             
             # Ottieni anche i dati raw per l'analisi dettagliata
             calendar_data = calendar_service._get_optimized_calendar_data(start_date, end_date)
@@ -147,6 +147,10 @@ class CalendarDebugView(View):
                         for d in calendar_result['checkin_blocked_gap']
                     ],
                 },
+                'timings': {
+                    'total_ms': trace.total_ms(),
+                    'phases': trace.timings(),
+                },
                 'summary': {
                     'total_blocked_ranges': len(calendar_result['blocked_ranges']),
                     'total_checkin_dates': len(calendar_result['checkin_dates']),
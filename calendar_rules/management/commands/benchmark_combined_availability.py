@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from bookings.models import Booking
+from bookings.views import find_combined_availability
+from calendar_rules.benchmarking import (
+    create_benchmark_listing,
+    measure,
+    rollback_after,
+    seed_price_rules,
+)
+from calendar_rules.managers import CalendarManager
+from listings.models import ListingGroup
+
+
+def per_listing_availability(check_in, check_out, num_guests):
+    """Vecchio schema di accesso: query per gruppo e per appartamento."""
+    available = {}
+    for group in ListingGroup.objects.filter(is_active=True):
+        ok = True
+        for listing in group.listings.filter(status='active'):
+            calendar = CalendarManager(listing)
+            if not calendar.check_availability(check_in, check_out)[0]:
+                ok = False
+                break
+            calendar.calculate_total_price(check_in, check_out, num_guests)
+        available[group.id] = ok
+    return available
+
+
+class Command(BaseCommand):
+    help = 'Misura query e latenza della ricerca combinata su gruppi di appartamenti'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=20, help='Numero di gruppi (default: 20)')
+        parser.add_argument('--listings', type=int, default=5, help='Appartamenti per gruppo (default: 5)')
+        parser.add_argument('--repeat', type=int, default=3, help='Ripetizioni per misura (default: 3)')
+
+    def handle(self, *args, **options):
+        today = date.today()
+        check_in = today + timedelta(days=30)
+        check_out = check_in + timedelta(days=4)
+        # Ogni appartamento ospita 2 persone: servono tutti quelli del gruppo
+        total_guests = 2 * options['listings']
+
+        with rollback_after():
+            from django.contrib.auth.models import User
+            guest = User.objects.create_user(username='benchmark-guest')
+
+            bookings = []
+            for g in range(options['groups']):
+                group = ListingGroup.objects.create(name=f'Gruppo benchmark {g}')
+                for n in range(options['listings']):
+                    listing = create_benchmark_listing(
+                        f'Benchmark {g}-{n}', slug=f'benchmark-{g}-{n}', gap_between_bookings=n % 3,
+                        max_guests=2, included_guests=2
+                    )
+                    group.listings.add(listing)
+                    seed_price_rules(listing, today, 90)
+                    # Storico e prenotazioni future; un gruppo su quattro è occupato
+                    for k in range(20):
+                        start = today - timedelta(days=400 - k * 15)
+                        bookings.append(Booking(listing=listing, guest=guest, check_in_date=start,
+                                                check_out_date=start + timedelta(days=3), num_guests=2,
+                                                status='confirmed', total_amount=Decimal('0')))
+                    if g % 4 == 0 and n == 0:
+                        bookings.append(Booking(listing=listing, guest=guest, check_in_date=check_in,
+                                                check_out_date=check_out, num_guests=2, status='confirmed'))
+            Booking.objects.bulk_create(bookings)
+
+            self.stdout.write(
+                f"Dati: {options['groups']} gruppi x {options['listings']} appartamenti, "
+                f"{len(bookings)} prenotazioni"
+            )
+
+            legacy, legacy_queries, legacy_ms = measure(
+                per_listing_availability, check_in, check_out, 2, repeat=options['repeat']
+            )
+            batch, batch_queries, batch_ms = measure(
+                find_combined_availability, check_in, check_out, total_guests, repeat=options['repeat']
+            )
+
+            self.stdout.write(f"{'percorso':>12} | {'query':>6} | {'ms':>8}")
+            self.stdout.write('-' * 32)
+            self.stdout.write(f"{'per listing':>12} | {legacy_queries:>6} | {legacy_ms:>8.1f}")
+            self.stdout.write(f"{'batch':>12} | {batch_queries:>6} | {batch_ms:>8.1f}")
+
+            available_groups = {combo['group_id'] for combo in batch}
+            expected_groups = {group_id for group_id, ok in legacy.items() if ok}
+            if available_groups != expected_groups:
+                self.stdout.write(self.style.ERROR('I gruppi disponibili non coincidono!'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Gruppi disponibili: {len(available_groups)}'))
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+
+def synthetic_feed(path, events, start_date):
+    """Scrive un feed .ics con eventi di 2-4 notti, righe piegate e TZID."""
+    with open(path, 'w', encoding='utf-8', newline='') as feed:
+        feed.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Rhome//Benchmark//IT\r\n')
+        for i in range(events):
+            check_in = start_date + timedelta(days=(i * 3) % 700)
+            check_out = check_in + timedelta(days=2 + i % 3)
+            feed.write('BEGIN:VEVENT\r\n')
+            feed.write(f'DTSTAMP:20260101T000000Z\r\nUID:{i:08d}-benchmark-event@rhome.example\r\n')
+            if i % 2:
+                feed.write(f'DTSTART;TZID=Europe/Rome:{check_in:%Y%m%d}T150000\r\n')
+                feed.write(f'DTEND;TZID=Europe/Rome:{check_out:%Y%m%d}T100000\r\n')
+            else:
+                feed.write(f'DTSTART;VALUE=DATE:{check_in:%Y%m%d}\r\n')
+                feed.write(f'DTEND;VALUE=DATE:{check_out:%Y%m%d}\r\n')
+            feed.write('SUMMARY:Reserved\r\n')
+            feed.write('DESCRIPTION:Reservation URL: https://www.example.com/hosting/reservations/details/\r\n'
+                       f' HM{i:010d}\\nPhone Number (Last 4 Digits): 1234\r\n')
+            feed.write(f"STATUS:{'CANCELLED' if i % 10 == 0 else 'CONFIRMED'}\r\n")
+            feed.write('END:VEVENT\r\n')
+        feed.write('END:VCALENDAR\r\n')
+
+
+def _rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _parse_in_child(parser, path, chunk_size, queue):
+    """Eseguito in un processo nuovo: misura tempo e picco RSS del solo parsing."""
+    import django
+    django.setup()
+
+    from calendar_rules.services.ical_stream import iter_vevents
+    from calendar_rules.services.ical_sync import ICalSyncService
+
+    baseline = _rss_kb()
+    started = time.perf_counter()
+    with open(path, 'rb') as feed:
+        if parser == 'streaming':
+            events = sum(1 for _ in iter_vevents(iter(lambda: feed.read(chunk_size), b'')))
+        else:
+            events = sum(1 for _ in ICalSyncService._iter_icalendar_events(feed.read()))
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((events, elapsed, max(peak - baseline, 0)))
+
+
+class Command(BaseCommand):
+    help = 'Confronta tempo e picco di memoria del parser iCal in streaming con icalendar'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--events',
+            type=int,
+            default=10000,
+            help='Numero di VEVENT nel feed sintetico (default: 10000)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=64 * 1024,
+            help='Dimensione dei blocchi letti dal parser in streaming (default: 65536)',
+        )
+
+    def handle(self, *args, **options):
+        from calendar_rules.services.ical_sync import ICALENDAR_AVAILABLE
+
+        parsers = ['streaming'] + (['icalendar'] if ICALENDAR_AVAILABLE else [])
+        # Ogni misura gira in un processo nuovo, così il picco RSS è solo quello del parser
+        context = multiprocessing.get_context('spawn')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'feed.ics')
+            synthetic_feed(path, options['events'], date.today())
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self.stdout.write(f"Feed sintetico: {options['events']} eventi, {size_mb:.1f} MB")
+            self.stdout.write(f"{'parser':>10} | {'eventi':>7} | {'ms':>8} | {'picco RSS MB':>12}")
+            self.stdout.write('-' * 48)
+
+            for parser in parsers:
+                queue = context.Queue()
+                process = context.Process(
+                    target=_parse_in_child,
+                    args=(parser, path, options['chunk_size'], queue),
+                )
+                process.start()
+                events, elapsed, peak_kb = queue.get()
+                process.join()
+                self.stdout.write(
+                    f'{parser:>10} | {events:>7} | {elapsed:>8.1f} | {peak_kb / 1024:>12.1f}'
+                )
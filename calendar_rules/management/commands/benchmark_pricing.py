@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from calendar_rules.benchmarking import (
+    create_benchmark_listing,
+    measure,
+    rollback_after,
+    seed_price_rules,
+)
+from calendar_rules.models import PriceRule
+from calendar_rules.pricing import PriceCalculator
+from listings.models import Listing
+
+
+def legacy_calendar_prices(listing, start_date, end_date):
+    """Vecchio percorso: due query (exists + first) per ogni giorno."""
+    prices = {}
+    current = start_date
+    while current <= end_date:
+        rules = PriceRule.objects.filter(
+            listing=listing,
+            start_date__lte=current,
+            end_date__gte=current
+        ).order_by('-start_date', 'end_date', '-id')
+        price = rules.first().price if rules.exists() else listing.base_price
+        prices[current.isoformat()] = float(price)
+        current += timedelta(days=1)
+    return prices
+
+
+class Command(BaseCommand):
+    help = 'Misura query e latenza del calcolo prezzi per finestre di 30/90/365 giorni'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            help='ID del listing da usare (se non specificato, crea dati sintetici poi annullati)',
+        )
+        parser.add_argument(
+            '--windows',
+            default='30,90,365',
+            help='Finestre in giorni separate da virgola (default: 30,90,365)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Ripetizioni per ogni misura (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        windows = [int(value) for value in options['windows'].split(',') if value.strip()]
+        start_date = date.today()
+
+        with rollback_after():
+            if options.get('listing_id'):
+                try:
+                    listing = Listing.objects.get(id=options['listing_id'])
+                except Listing.DoesNotExist:
+                    self.stdout.write(
+                        self.style.ERROR(f"Listing con ID {options['listing_id']} non trovato")
+                    )
+                    return
+            else:
+                listing = create_benchmark_listing('Benchmark prezzi')
+                created = seed_price_rules(listing, start_date, max(windows))
+                self.stdout.write(f'Creati dati sintetici: {created} PriceRule')
+
+            self.stdout.write(f'Listing ID: {listing.id}')
+            self.stdout.write(
+                f"{'giorni':>7} | {'legacy query':>12} | {'legacy ms':>10} | "
+                f"{'bulk query':>10} | {'bulk ms':>8} | {'speedup':>7}"
+            )
+            self.stdout.write('-' * 70)
+
+            calculator = PriceCalculator(listing)
+            for days in windows:
+                end_date = start_date + timedelta(days=days - 1)
+
+                legacy, legacy_queries, legacy_ms = measure(
+                    legacy_calendar_prices, listing, start_date, end_date,
+                    repeat=options['repeat'],
+                )
+                bulk, bulk_queries, bulk_ms = measure(
+                    calculator.get_calendar_prices, start_date, end_date,
+                    repeat=options['repeat'],
+                )
+
+                if legacy != bulk:
+                    self.stdout.write(self.style.ERROR(f'Risultati diversi per {days} giorni!'))
+
+                speedup = legacy_ms / bulk_ms if bulk_ms else 0
+                self.stdout.write(
+                    f'{days:>7} | {legacy_queries:>12} | {legacy_ms:>10.1f} | '
+                    f'{bulk_queries:>10} | {bulk_ms:>8.1f} | {speedup:>6.1f}x'
+                )
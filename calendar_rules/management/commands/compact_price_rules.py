@@ -0,0 +1,86 @@
+"""
+Management command per compattare le PriceRule dei listing.
+Riscrive le regole senza soggiorno minimo come segmenti minimi non sovrapposti
+con lo stesso prezzo per ogni giorno; le regole con min_nights restano
+invariate. Con --dry-run mostra solo il diff.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from calendar_rules.services.price_compaction import compact_price_rules
+
+
+class Command(BaseCommand):
+    help = 'Compatta le regole di prezzo in segmenti non sovrapposti equivalenti'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            action='append',
+            help='Compatta solo questo listing (ripetibile)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra il diff senza modificare il database',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Righe di diff mostrate per listing (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        from listings.models import Listing
+
+        listings = Listing.objects.order_by('pk')
+        if options.get('listing_id'):
+            listings = listings.filter(pk__in=options['listing_id'])
+
+        dry_run = options['dry_run']
+        totals = {'before': 0, 'after': 0, 'listings': 0}
+        inconsistent = 0
+        for listing in listings.iterator():
+            result = compact_price_rules(listing, dry_run=dry_run)
+            totals['before'] += result['before']
+            totals['after'] += result['after']
+
+            if result['differences']:
+                inconsistent += 1
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {listing.title} (ID {listing.pk}): {len(result["differences"])} giorni non equivalenti'
+                ))
+                for difference in result['differences'][:10]:
+                    self.stdout.write(
+                        f"    {difference['date']} {difference['field']}: atteso {difference['expected']}, "
+                        f"trovato {difference['actual']}"
+                    )
+                continue
+
+            if not (result['removed'] or result['added']):
+                continue
+
+            totals['listings'] += 1
+            self.stdout.write(f'{listing.title} (ID {listing.pk}): {result["before"]} -> {result["after"]} regole')
+            if dry_run:
+                self._write_diff(result, options['show'])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write('Riepilogo compattazione' + (' (dry-run):' if dry_run else ':'))
+        self.stdout.write(f'  Listing modificati: {totals["listings"]}')
+        self.stdout.write(self.style.SUCCESS(f'  Regole: {totals["before"]} -> {totals["after"]}'))
+        self.stdout.write('='*50)
+
+        if inconsistent:
+            raise CommandError(f'{inconsistent} listing non compattati: risoluzione non equivalente')
+
+    def _write_diff(self, result, limit):
+        lines = [('-', rule) for rule in result['removed']] + [('+', segment) for segment in result['added']]
+        for sign, (start, end, price, min_nights) in lines[:limit]:
+            min_stay = f', min {min_nights} notti' if min_nights else ''
+            style = self.style.ERROR if sign == '-' else self.style.SUCCESS
+            self.stdout.write(style(f'    {sign} {start} -> {end}: €{price}{min_stay}'))
+        if len(lines) > limit:
+            self.stdout.write(f'    ... altre {len(lines) - limit} righe')
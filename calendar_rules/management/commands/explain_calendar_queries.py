@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from calendar_rules.benchmarking import (
+    calendar_hot_queries,
+    create_benchmark_listing,
+    find_full_scans,
+    rollback_after,
+)
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    help = 'Esegue EXPLAIN sulle query del calendario e segnala le scansioni complete di tabella'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            help='ID del listing da usare (se non specificato, crea un listing sintetico poi annullato)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Durata del soggiorno usato per le query, a partire da oggi (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        check_in = date.today()
+        check_out = check_in + timedelta(days=options['days'])
+
+        with rollback_after():
+            if options.get('listing_id'):
+                try:
+                    listing = Listing.objects.get(id=options['listing_id'])
+                except Listing.DoesNotExist:
+                    self.stdout.write(
+                        self.style.ERROR(f"Listing con ID {options['listing_id']} non trovato")
+                    )
+                    return
+            else:
+                listing = create_benchmark_listing('Explain calendario')
+
+            self.stdout.write(f'Database: {connection.vendor}, listing ID: {listing.id}')
+            total_full_scans = 0
+            for name, queryset in calendar_hot_queries(listing, check_in, check_out):
+                plan = queryset.explain()
+                full_scans = find_full_scans(plan)
+                total_full_scans += len(full_scans)
+
+                style = self.style.ERROR if full_scans else self.style.SUCCESS
+                self.stdout.write(style(f"\n{name}: {'SCANSIONE COMPLETA' if full_scans else 'ok'}"))
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+            if total_full_scans:
+                self.stdout.write(self.style.ERROR(f'\n{total_full_scans} scansioni complete trovate'))
+            else:
+                self.stdout.write(self.style.SUCCESS('\nNessuna scansione completa'))
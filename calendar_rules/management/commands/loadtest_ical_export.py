@@ -0,0 +1,127 @@
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+from calendar_rules.benchmarking import create_benchmark_listing
+from calendar_rules.services.ical_export import ical_export_path
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def seed_calendar(listing, events):
+    """Prenotazioni e chiusure alternate per i prossimi mesi."""
+    from django.contrib.auth.models import User
+    from bookings.models import Booking
+    from calendar_rules.models import ClosureRule
+
+    guest, _ = User.objects.get_or_create(username='loadtest-ical', defaults={'email': 'loadtest@example.com'})
+    bookings, closures = [], []
+    for i in range(events):
+        start = date.today() + timedelta(days=i * 4)
+        if i % 3:
+            bookings.append(Booking(
+                listing=listing, guest=guest, check_in_date=start, check_out_date=start + timedelta(days=3),
+                num_guests=2, status='confirmed'
+            ))
+        else:
+            closures.append(ClosureRule(listing=listing, start_date=start, end_date=start + timedelta(days=2)))
+    Booking.objects.bulk_create(bookings)
+    ClosureRule.objects.bulk_create(closures)
+
+
+def poll(url, requests_per_poller, conditional):
+    """Un poller OTA: ripete il GET ricordando l'ETag ricevuto."""
+    session = requests.Session()
+    etag = None
+    results = []
+    for _ in range(requests_per_poller):
+        headers = {'If-None-Match': etag} if conditional and etag else {}
+        started = time.perf_counter()
+        response = session.get(url, headers=headers, timeout=30)
+        size = len(response.content)
+        results.append((response.status_code, (time.perf_counter() - started) * 1000, size))
+        etag = response.headers.get('ETag', etag)
+    return results
+
+
+class Command(BaseCommand):
+    help = "Load test dell'export iCal con molti poller concorrenti"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help="URL del feed da interrogare (se non specificato avvia un server locale con dati sintetici)",
+        )
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            help='Listing da esportare con il server locale (default: listing sintetico, poi eliminato)',
+        )
+        parser.add_argument('--pollers', type=int, default=50, help='Poller concorrenti (default: 50)')
+        parser.add_argument('--requests', type=int, default=20, help='Richieste per poller (default: 20)')
+        parser.add_argument('--events', type=int, default=150, help='Eventi nel calendario sintetico (default: 150)')
+        parser.add_argument(
+            '--no-conditional',
+            action='store_true',
+            help='Non inviare If-None-Match (ogni risposta contiene il feed completo)',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('url'):
+            self.run(options['url'], options)
+            return
+
+        listing = None
+        if options.get('listing_id'):
+            listing_id = options['listing_id']
+        else:
+            listing = create_benchmark_listing('Loadtest iCal')
+            seed_calendar(listing, options['events'])
+            listing_id = listing.id
+
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            host, port = server.server_address
+            self.run(f"http://{host}:{port}{ical_export_path(listing_id)}", options)
+        finally:
+            server.shutdown()
+            server.server_close()
+            if listing is not None:
+                listing.delete()
+
+    def run(self, url, options):
+        pollers = options['pollers']
+        conditional = not options['no_conditional']
+        self.stdout.write(f"URL: {url}")
+        self.stdout.write(f"Poller: {pollers} x {options['requests']} richieste, condizionali: {conditional}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pollers) as executor:
+            futures = [executor.submit(poll, url, options['requests'], conditional) for _ in range(pollers)]
+            results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(status for status, _, _ in results)
+        latencies = sorted(latency for _, latency, _ in results)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        transferred = sum(size for _, _, size in results)
+
+        self.stdout.write(f"Richieste: {len(results)} in {elapsed:.2f} s ({len(results) / elapsed:.0f} req/s)")
+        self.stdout.write('Stati: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+        self.stdout.write(
+            f"Latenza ms: p50 {quantiles[49]:.1f} | p95 {quantiles[94]:.1f} | p99 {quantiles[98]:.1f} | max {latencies[-1]:.1f}"
+        )
+        self.stdout.write(f"Byte trasferiti: {transferred}")
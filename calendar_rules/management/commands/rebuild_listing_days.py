@@ -0,0 +1,90 @@
+"""
+Management command per ricostruire la tabella ListingDay.
+Da eseguire ogni notte (cron): fa avanzare l'orizzonte e riallinea i giorni
+modificati da percorsi che non inviano segnali. Con --pending aggiorna solo i
+listing accodati dalle modifiche al calendario (cron ogni pochi minuti).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from calendar_rules.models import ListingDayRefresh
+from calendar_rules.services.listing_days import (
+    check_listing_days,
+    refresh_listing_days,
+    refresh_pending_listing_days,
+)
+
+
+class Command(BaseCommand):
+    help = 'Ricostruisce i giorni materializzati (ListingDay) di tutti i listing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            action='append',
+            help='Ricostruisci solo questo listing (ripetibile)',
+        )
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Aggiorna solo i listing accodati dalle modifiche al calendario',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Con --pending, numero massimo di listing da aggiornare',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Dopo la ricostruzione confronta la tabella con CalendarService',
+        )
+
+    def handle(self, *args, **options):
+        from listings.models import Listing
+
+        if options['pending']:
+            totals = refresh_pending_listing_days(limit=options.get('limit'))
+            self.stdout.write(self.style.SUCCESS(
+                f"Listing aggiornati: {totals['listings']} "
+                f"(creati {totals['created']}, aggiornati {totals['updated']}, eliminati {totals['deleted']})"
+            ))
+            return
+
+        listings = Listing.objects.order_by('pk')
+        if options.get('listing_id'):
+            listings = listings.filter(pk__in=options['listing_id'])
+
+        totals = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        inconsistent = 0
+        for listing in listings.iterator():
+            # La ricostruzione completa soddisfa anche le richieste in coda
+            ListingDayRefresh.objects.filter(listing=listing).delete()
+            stats = refresh_listing_days(listing)
+            for key, value in stats.items():
+                totals[key] += value
+
+            if options['check']:
+                differences = check_listing_days(listing)
+                if differences:
+                    inconsistent += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'✗ {listing.title} (ID {listing.pk}): {len(differences)} differenze'
+                    ))
+                    for difference in differences[:10]:
+                        self.stdout.write(
+                            f"    {difference['date']} {difference['field']}: "
+                            f"atteso {difference['expected']}, trovato {difference['actual']}"
+                        )
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write('Riepilogo ricostruzione:')
+        self.stdout.write(self.style.SUCCESS(f'  Creati: {totals["created"]}'))
+        self.stdout.write(self.style.SUCCESS(f'  Aggiornati: {totals["updated"]}'))
+        self.stdout.write(f'  Eliminati: {totals["deleted"]}')
+        self.stdout.write(f'  Invariati: {totals["unchanged"]}')
+        self.stdout.write('='*50)
+
+        if inconsistent:
+            raise CommandError(f'{inconsistent} listing non coerenti con CalendarService')
@@ -4,7 +4,11 @@ Può essere eseguito manualmente o tramite cron job.
 """
 
 from django.core.management.base import BaseCommand
-from calendar_rules.services.ical_sync import ICalSyncService
+from calendar_rules.services.ical_sync import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PER_HOST_LIMIT,
+    ICalSyncService,
+)
 
 
 class Command(BaseCommand):
@@ -21,6 +25,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Forza la sincronizzazione anche se non necessaria',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help=f'Numero massimo di download paralleli (default: {DEFAULT_CONCURRENCY})',
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=DEFAULT_PER_HOST_LIMIT,
+            help=f'Numero massimo di download paralleli verso lo stesso host (default: {DEFAULT_PER_HOST_LIMIT})',
+        )
 
     def handle(self, *args, **options):
         from calendar_rules.models import ExternalCalendar
@@ -65,7 +81,10 @@ class Command(BaseCommand):
         else:
             # Sincronizza tutti i calendari attivi
             self.stdout.write('Sincronizzazione di tutti i calendari esterni attivi...')
-            stats = ICalSyncService.sync_all_active()
+            stats = ICalSyncService.sync_all_active(
+                concurrency=options['concurrency'],
+                per_host_limit=options['per_host'],
+            )
             
             self.stdout.write('\n' + '='*50)
             self.stdout.write('Riepilogo sincronizzazione:')
@@ -73,6 +92,9 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS(f'  Sincronizzati: {stats["synced"]}')
             )
+            self.stdout.write(
+                self.style.SUCCESS(f'  Non modificati (304): {stats["not_modified"]}')
+            )
             self.stdout.write(
                 self.style.WARNING(f'  Saltati: {stats["skipped"]}')
             )
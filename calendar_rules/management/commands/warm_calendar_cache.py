@@ -0,0 +1,69 @@
+"""
+Management command per preriscaldare la cache calendario condivisa.
+Può essere eseguito da cron oppure restare attivo come worker (--loop):
+ogni passaggio ricalcola solo le finestre dei listing modificati.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from calendar_rules.services.cache_warmer import DEFAULT_WORKERS, CalendarCacheWarmer
+
+
+class Command(BaseCommand):
+    help = 'Precalcola nella cache condivisa le finestre calendario dei listing attivi'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing-id',
+            type=int,
+            action='append',
+            help='Preriscalda solo questo listing (ripetibile)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help=f'Numero di thread del pool (default: {DEFAULT_WORKERS})',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Resta attivo e ripete il preriscaldamento ogni --interval secondi',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Secondi tra due passaggi in modalità --loop (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        from listings.models import Listing
+
+        while True:
+            listings = Listing.objects.filter(status='active').order_by('pk')
+            if options.get('listing_id'):
+                listings = listings.filter(pk__in=options['listing_id'])
+
+            # Nuovo warmer a ogni passaggio: le finestre seguono la data corrente
+            stats = CalendarCacheWarmer(workers=options['workers']).warm(listings)
+            self._report(stats)
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _report(self, stats):
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write('Riepilogo preriscaldamento:')
+        self.stdout.write(f'  Listing: {stats["listings"]} (ricalcolati: {stats["warmed_listings"]})')
+        self.stdout.write(f'  Finestre: {stats["windows"]}')
+        self.stdout.write(self.style.SUCCESS(f'  Già in cache: {stats["hits"]} (hit rate {stats["hit_rate"]:.1%})'))
+        self.stdout.write(self.style.SUCCESS(f'  Calcolate: {stats["computed"]}'))
+        if stats['errors']:
+            self.stdout.write(self.style.ERROR(f'  Errori: {stats["errors"]}'))
+        self.stdout.write(f'  Copertura: {stats["coverage"]:.1%}')
+        self.stdout.write(f'  Tempo: {stats["elapsed"]:.2f}s')
+        self.stdout.write('='*50)
@@ -16,6 +16,7 @@ class CalendarManager:
     def __init__(self, listing):
         self.listing = listing
         self.calendar_service = CalendarService(listing)
+        self._price_resolver = None
     
     def check_availability(self, start_date, end_date) -> Tuple[bool, str]:
         """
@@ -178,6 +179,27 @@ class CalendarManager:
         else:
             return rule.day_of_week == date.weekday()
     
+    def get_price_resolver(self, start_date, end_date):
+        """
+        Restituisce un PriceResolver che copre [start_date, end_date].
+
+        Il resolver viene riutilizzato finché la finestra richiesta è coperta,
+        così il calcolo del totale e i prezzi per notte della stessa prenotazione
+        condividono un'unica query sulle PriceRule.
+
+        Args:
+            start_date: Primo giorno (incluso)
+            end_date: Ultimo giorno (incluso)
+
+        Returns:
+            PriceResolver
+        """
+        from .services.price_resolver import PriceResolver
+
+        if self._price_resolver is None or not self._price_resolver.covers(start_date, end_date):
+            self._price_resolver = PriceResolver(self.listing, start_date, end_date)
+        return self._price_resolver
+
     def get_price_per_day(self, date) -> Decimal:
         """
         Calcola il prezzo per un giorno specifico.
@@ -188,20 +210,25 @@ class CalendarManager:
         Returns:
             Decimal: Prezzo per il giorno specificato
         """
-        # Cerca regole di prezzo per la data
-        price_rules = PriceRule.objects.filter(
-            listing=self.listing,
-            start_date__lte=date,
-            end_date__gte=date
-        ).order_by('-start_date')
-        
-        if price_rules.exists():
-            rule = price_rules.first()
-            return rule.price
-        
-        # Usa il prezzo base dell'appartamento
-        return self.listing.base_price
+        return self.get_price_resolver(date, date).price_for_date(date)
     
+    def get_price_quote(self, start_date, end_date, num_guests):
+        """
+        Preventivo del soggiorno, calcolato sul resolver condiviso.
+
+        Args:
+            start_date: Data di check-in
+            end_date: Data di check-out
+            num_guests: Numero di ospiti
+
+        Returns:
+            PriceQuote
+        """
+        from .services.price_quote import PriceQuote
+
+        resolver = self.get_price_resolver(start_date, max(start_date, end_date - timedelta(days=1)))
+        return PriceQuote.from_resolver(self.listing, resolver, start_date, end_date, num_guests)
+
     def calculate_total_price(self, start_date, end_date, num_guests) -> Decimal:
         """
         Calcola il prezzo totale per un periodo.
@@ -220,26 +247,7 @@ class CalendarManager:
         # Nota: La disponibilità dovrebbe essere già verificata dal chiamante
         # per evitare doppia validazione e circular dependency.
         # Se necessario verificare disponibilità, farlo PRIMA di chiamare questo metodo.
-
-        # Calcola il prezzo per ogni giorno
-        total_price = Decimal('0.00')
-        current_date = start_date
-        
-        while current_date < end_date:
-            daily_price = self.get_price_per_day(current_date)
-            total_price += daily_price
-            current_date += timedelta(days=1)
-        
-        # Aggiungi costi extra per ospiti
-        if num_guests > self.listing.included_guests:
-            extra_guests = num_guests - self.listing.included_guests
-            extra_cost = extra_guests * self.listing.extra_guest_fee * (end_date - start_date).days
-            total_price += extra_cost
-        
-        # Aggiungi costo pulizie
-        total_price += self.listing.cleaning_fee
-        
-        return total_price
+        return self.get_price_quote(start_date, end_date, num_guests).total
     
     def get_detailed_pricing(self, start_date, end_date, num_guests) -> Dict:
         """
@@ -263,29 +271,13 @@ class CalendarManager:
             }
         
         # Calcola prezzi dettagliati
-        daily_prices = []
-        current_date = start_date
-        total_price = Decimal('0.00')
-        
-        while current_date < end_date:
-            daily_price = self.get_price_per_day(current_date)
-            daily_prices.append({
-                'date': current_date,
-                'price': daily_price
-            })
-            total_price += daily_price
-            current_date += timedelta(days=1)
-        
-        # Calcola costi extra
-        extra_guest_cost = Decimal('0.00')
-        if num_guests > self.listing.included_guests:
-            extra_guests = num_guests - self.listing.included_guests
-            extra_guest_cost = extra_guests * self.listing.extra_guest_fee * (end_date - start_date).days
-        
-        cleaning_cost = self.listing.cleaning_fee
-        
+        quote = self.get_price_quote(start_date, end_date, num_guests)
+        daily_prices = [{'date': day, 'price': price} for day, price in quote.daily_prices()]
+        total_price = quote.subtotal
+        extra_guest_cost = quote.extra_guest_fee
+        cleaning_cost = quote.cleaning_fee
         num_nights = (end_date - start_date).days
-        average_price_per_night = total_price / num_nights if num_nights > 0 else Decimal('0.00')
+        average_price_per_night = quote.average_price_per_night
         
         return {
             'available': True,
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.13 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_rules', '0002_alter_checkinoutrule_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='externalcalendar',
+            name='etag',
+            field=models.CharField(blank=True, help_text="ETag dell'ultimo download, inviato come If-None-Match", max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='externalcalendar',
+            name='last_modified',
+            field=models.CharField(blank=True, help_text="Last-Modified dell'ultimo download, inviato come If-Modified-Since", max_length=64, verbose_name='Last-Modified'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_rules', '0003_externalcalendar_etag_last_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='closurerule',
+            name='external_uid',
+            field=models.CharField(blank=True, default='', help_text="UID dell'evento iCal da cui è stata importata la chiusura, se presente", max_length=255, verbose_name='UID evento esterno'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.13 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_rules', '0004_closurerule_external_uid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='closurerule',
+            index=models.Index(fields=['listing', 'start_date', 'end_date'], name='closure_listing_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkinoutrule',
+            index=models.Index(fields=['listing', 'rule_type'], name='checkinout_listing_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkinoutrule',
+            index=models.Index(fields=['listing', 'specific_date'], name='checkinout_listing_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerule',
+            index=models.Index(fields=['listing', 'start_date', 'end_date'], name='pricerule_listing_dates_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.13 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_rules', '0005_calendar_indexes'),
+        ('listings', '0018_listing_airbnb_accuracy_avg_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('flags', models.PositiveSmallIntegerField(default=0, help_text='Bitmask dello stato del giorno (vedi calendar_rules.services.day_state)', verbose_name='Flag')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Prezzo per notte')),
+                ('min_nights', models.PositiveIntegerField(help_text='Dalla PriceRule che vale per la notte, altrimenti dal listing', verbose_name='Soggiorno minimo')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='listings.listing', verbose_name='Appartamento')),
+            ],
+            options={
+                'verbose_name': 'Giorno calendario',
+                'verbose_name_plural': 'Giorni calendario',
+                'ordering': ['listing', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'date'), name='listingday_listing_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.13 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_rules', '0006_listingday'),
+        ('listings', '0018_listing_airbnb_accuracy_avg_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingDayRefresh',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='listings.listing', verbose_name='Appartamento')),
+                ('requested_at', models.DateTimeField(auto_now_add=True, verbose_name='Richiesto il')),
+            ],
+            options={
+                'verbose_name': 'Giorni calendario da aggiornare',
+                'verbose_name_plural': 'Giorni calendario da aggiornare',
+            },
+        ),
+    ]
@@ -25,11 +25,21 @@ class ClosureRule(models.Model):
         verbose_name='Prenotazione esterna',
         help_text='Se true, indica prenotazione da altra piattaforma (Airbnb, Booking.com, ecc.)'
     )
+    external_uid = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name='UID evento esterno',
+        help_text='UID dell\'evento iCal da cui è stata importata la chiusura, se presente'
+    )
     
     class Meta:
         ordering = ['start_date']
         verbose_name = 'Regola di Chiusura'
         verbose_name_plural = 'Regole di Chiusura'
+        indexes = [
+            models.Index(fields=['listing', 'start_date', 'end_date'], name='closure_listing_dates_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """Override save per invalidare cache calendario"""
@@ -51,22 +61,9 @@ class ClosureRule(models.Model):
     @staticmethod
     def _invalidate_calendar_cache_for_listing(listing_id):
         """Invalida cache calendario per un listing specifico"""
-        try:
-            from django.core.cache import cache
-            from datetime import date, timedelta
-            from django.utils import timezone
-            
-            today = timezone.now().date()
-            start_date = today - timedelta(days=180)
-            end_date = today + timedelta(days=365)
-            
-            current = start_date
-            while current <= end_date:
-                cache_key = f"calendar:{listing_id}:{current.isoformat()}:{(current + timedelta(days=30)).isoformat()}"
-                cache.delete(cache_key)
-                current += timedelta(days=30)
-        except Exception:
-            pass
+        from .services.calendar_cache import bump_calendar_generation
+
+        bump_calendar_generation(listing_id)
     
     def __str__(self):
         return f"{self.listing.title} - {self.start_date} to {self.end_date}"
@@ -119,6 +116,10 @@ class CheckInOutRule(models.Model):
         ordering = ['rule_type', 'recurrence_type']
         verbose_name = 'Regola Check-in/Check-out'
         verbose_name_plural = 'Regole Check-in/Check-out'
+        indexes = [
+            models.Index(fields=['listing', 'rule_type'], name='checkinout_listing_type_idx'),
+            models.Index(fields=['listing', 'specific_date'], name='checkinout_listing_date_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """Override save per invalidare cache calendario"""
@@ -169,6 +170,9 @@ class PriceRule(models.Model):
         ordering = ['-start_date']
         verbose_name = 'Regola Prezzo'
         verbose_name_plural = 'Regole Prezzo'
+        indexes = [
+            models.Index(fields=['listing', 'start_date', 'end_date'], name='pricerule_listing_dates_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """Override save per invalidare cache calendario"""
@@ -257,6 +261,20 @@ class ExternalCalendar(models.Model):
         help_text='Messaggio di errore dell\'ultima sincronizzazione, se presente'
     )
     
+    etag = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='ETag',
+        help_text='ETag dell\'ultimo download, inviato come If-None-Match'
+    )
+    
+    last_modified = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Last-Modified',
+        help_text='Last-Modified dell\'ultimo download, inviato come If-Modified-Since'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -281,3 +299,88 @@ class ExternalCalendar(models.Model):
         
         next_sync = self.last_sync + timedelta(minutes=self.sync_interval_minutes)
         return timezone.now() >= next_sync
+
+
+class ListingDayQuerySet(models.QuerySet):
+    def window(self, start_date, end_date):
+        """Giorni da start_date a end_date inclusi (range scan sull'indice listing+data)."""
+        return self.filter(date__gte=start_date, date__lte=end_date)
+
+    def with_flags(self, mask):
+        """Giorni con almeno uno dei flag di mask (vedi services.day_state)."""
+        return self.alias(matched=models.F('flags').bitand(mask)).filter(matched__gt=0)
+
+    def without_flags(self, mask):
+        """Giorni senza nessuno dei flag di mask."""
+        return self.alias(matched=models.F('flags').bitand(mask)).filter(matched=0)
+
+
+class ListingDay(models.Model):
+    """
+    Stato materializzato di un listing per un giorno dell'orizzonte di prenotazione.
+
+    Una riga per listing per giorno con i flag di services.day_state (notte
+    occupata, chiusa, gap, check-in/out vietati, ...), il prezzo effettivo
+    della notte e il soggiorno minimo. Mantenuta da services.listing_days
+    (segnali e comando rebuild_listing_days): non va modificata a mano.
+    Letta dalla ricerca dei listing disponibili (services.listing_search).
+    """
+    listing = models.ForeignKey(
+        'listings.Listing',
+        on_delete=models.CASCADE,
+        related_name='days',
+        verbose_name='Appartamento'
+    )
+    date = models.DateField(verbose_name='Data')
+    flags = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Flag',
+        help_text='Bitmask dello stato del giorno (vedi calendar_rules.services.day_state)'
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Prezzo per notte'
+    )
+    min_nights = models.PositiveIntegerField(
+        verbose_name='Soggiorno minimo',
+        help_text='Dalla PriceRule che vale per la notte, altrimenti dal listing'
+    )
+
+    objects = ListingDayQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['listing', 'date']
+        verbose_name = 'Giorno calendario'
+        verbose_name_plural = 'Giorni calendario'
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'date'], name='listingday_listing_date_uniq'),
+        ]
+
+    def has_flag(self, flag):
+        return bool(self.flags & flag)
+
+    def __str__(self):
+        return f"{self.listing_id} - {self.date}: {self.flags:#04x} €{self.price}"
+
+
+class ListingDayRefresh(models.Model):
+    """
+    Listing i cui ListingDay vanno ricalcolati.
+
+    Le modifiche al calendario accodano il listing invece di ricalcolare
+    l'orizzonte nella richiesta; la coda viene svuotata dal comando
+    rebuild_listing_days --pending (cron) e dal rebuild notturno.
+    """
+    listing = models.OneToOneField(
+        'listings.Listing',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Appartamento'
+    )
+    requested_at = models.DateTimeField(auto_now_add=True, verbose_name='Richiesto il')
+
+    class Meta:
+        verbose_name = 'Giorni calendario da aggiornare'
+        verbose_name_plural = 'Giorni calendario da aggiornare'
@@ -9,8 +9,11 @@ Logica chiara:
 """
 
 from datetime import date, timedelta
-from typing import Dict, List
-from decimal import Decimal
+from typing import IO, Dict, Iterable, Iterator, List, Tuple, Union
+from decimal import Decimal, InvalidOperation
+
+# Date scritte per ogni batch dal PriceImporter
+IMPORT_BATCH_SIZE = 500
 
 
 class PriceCalculator:
@@ -25,11 +28,21 @@ class PriceCalculator:
     def __init__(self, listing):
         self.listing = listing
 
+    def get_price_resolver(self, start_date: date, end_date: date):
+        """
+        Crea un PriceResolver per la finestra [start_date, end_date].
+
+        Tutte le PriceRule della finestra vengono caricate con una sola query.
+        """
+        from .services.price_resolver import PriceResolver
+
+        return PriceResolver(self.listing, start_date, end_date)
+
     def get_price_for_date(self, target_date: date) -> Decimal:
         """
         Ottiene il prezzo per una singola notte.
 
-        Priorità:
+        Priorità (regola più specifica vince, vedi PriceResolver):
         1. PriceRule per questa data specifica (importato da tool esterno)
         2. PriceRule per periodo che include questa data
         3. Prezzo base del listing
@@ -40,21 +53,7 @@ class PriceCalculator:
         Returns:
             Prezzo per notte in Decimal
         """
-        from .models import PriceRule
-
-        # Cerca prima una regola di prezzo che copre esattamente questa data
-        # Ordina per specificità: date ranges più piccoli hanno priorità
-        price_rules = PriceRule.objects.filter(
-            listing=self.listing,
-            start_date__lte=target_date,
-            end_date__gte=target_date
-        ).order_by('start_date', '-end_date')  # Più specifico prima
-
-        if price_rules.exists():
-            return price_rules.first().price
-
-        # Nessuna regola trovata, usa prezzo base
-        return self.listing.base_price
+        return self.get_price_resolver(target_date, target_date).price_for_date(target_date)
 
     def get_prices_for_range(self, check_in: date, check_out: date) -> Dict[str, Decimal]:
         """
@@ -68,15 +67,12 @@ class PriceCalculator:
             Dict con date ISO come chiavi e prezzi come valori
             Es: {'2025-01-15': Decimal('100.00'), '2025-01-16': Decimal('120.00'), ...}
         """
-        prices = {}
-        current = check_in
+        if check_in >= check_out:
+            return {}
 
         # Il check-out non è incluso nel calcolo (la struttura è libera quel giorno)
-        while current < check_out:
-            prices[current.isoformat()] = self.get_price_for_date(current)
-            current += timedelta(days=1)
-
-        return prices
+        resolver = self.get_price_resolver(check_in, check_out - timedelta(days=1))
+        return resolver.prices_for_range(check_in, check_out)
 
     def calculate_total(self, check_in: date, check_out: date, num_guests: int) -> Dict:
         """
@@ -112,48 +108,30 @@ class PriceCalculator:
         if num_guests > self.listing.max_guests:
             raise ValueError(f"Numero massimo di ospiti superato ({self.listing.max_guests})")
 
-        # Calcola notti
-        nights = (check_out - check_in).days
-
-        # Ottieni prezzi per ogni notte
-        prices_by_date = self.get_prices_for_range(check_in, check_out)
-        nightly_prices = list(prices_by_date.values())
-
-        # Calcola subtotal (somma prezzi per notte)
-        subtotal = sum(nightly_prices)
+        from .services.price_quote import PriceQuote
 
-        # Cleaning fee (una tantum)
-        cleaning_fee = self.listing.cleaning_fee
-
-        # Ospiti extra
-        extra_guest_fee = Decimal('0.00')
-        if num_guests > self.listing.included_guests:
-            extra_guests = num_guests - self.listing.included_guests
-            # Fee per ospite extra per notte
-            extra_guest_fee = extra_guests * self.listing.extra_guest_fee * nights
-
-        # Totale
-        total = subtotal + cleaning_fee + extra_guest_fee
+        # Prezzi per ogni notte, ospiti extra e pulizie (una sola query)
+        quote = PriceQuote.for_stay(self.listing, check_in, check_out, num_guests)
 
         # Breakdown dettagliato per ogni notte (utile per mostrare nel frontend)
         breakdown_by_night = {}
-        for date_str, price in prices_by_date.items():
+        for night, price in quote.daily_prices():
             # Verifica se è un prezzo personalizzato o base
             is_custom = price != self.listing.base_price
-            breakdown_by_night[date_str] = {
+            breakdown_by_night[night.isoformat()] = {
                 'price': float(price),
                 'is_custom': is_custom
             }
 
         return {
-            'nights': nights,
-            'nightly_prices': [float(p) for p in nightly_prices],
-            'subtotal': float(subtotal),
-            'cleaning_fee': float(cleaning_fee),
-            'extra_guest_fee': float(extra_guest_fee),
-            'total': float(total),
+            'nights': quote.nights,
+            'nightly_prices': [float(p) for p in quote.nightly_prices],
+            'subtotal': float(quote.subtotal),
+            'cleaning_fee': float(quote.cleaning_fee),
+            'extra_guest_fee': float(quote.extra_guest_fee),
+            'total': float(quote.total),
             'breakdown_by_night': breakdown_by_night,
-            'price_per_night_avg': float(subtotal / nights) if nights > 0 else 0,
+            'price_per_night_avg': float(quote.average_price_per_night),
         }
 
     def get_calendar_prices(self, start_date: date, end_date: date) -> Dict[str, float]:
@@ -168,15 +146,10 @@ class PriceCalculator:
             Dict con date ISO come chiavi e prezzi come valori
             Es: {'2025-01-15': 100.00, '2025-01-16': 120.00, ...}
         """
-        prices = {}
-        current = start_date
+        if start_date > end_date:
+            return {}
 
-        while current <= end_date:
-            price = self.get_price_for_date(current)
-            prices[current.isoformat()] = float(price)
-            current += timedelta(days=1)
-
-        return prices
+        return self.get_price_resolver(start_date, end_date).calendar_prices()
 
 
 class PriceImporter:
@@ -184,13 +157,17 @@ class PriceImporter:
     Tool per importare prezzi da fonti esterne (es. CSV, API, etc.).
 
     Questo permette di impostare prezzi specifici per singole date,
-    creando o aggiornando PriceRule con range di 1 giorno.
+    creando o aggiornando PriceRule con range di 1 giorno (o range più
+    lunghi con coalesce=True). Le scritture avvengono a batch con
+    bulk_create/bulk_update e la cache calendario viene invalidata una volta
+    sola per import.
     """
 
     def __init__(self, listing):
         self.listing = listing
 
-    def import_prices_from_dict(self, prices: Dict[date, Decimal], overwrite=False) -> Dict:
+    def import_prices_from_dict(self, prices: Dict[date, Decimal], overwrite=False,
+                                coalesce=False, batch_size=IMPORT_BATCH_SIZE) -> Dict:
         """
         Importa prezzi da un dizionario.
 
@@ -198,60 +175,26 @@ class PriceImporter:
             prices: Dict con date come chiavi e prezzi come valori
                    Es: {date(2025, 1, 15): Decimal('120.00'), ...}
             overwrite: Se True, sovrascrive prezzi esistenti
+            coalesce: Se True, i giorni consecutivi con lo stesso prezzo
+                      diventano un'unica regola di range
+            batch_size: Numero di date scritte per ogni batch
 
         Returns:
             Dict con statistiche import:
             {
-                'created': 10,
+                'created': 10,   # giorni con una nuova regola
                 'updated': 5,
                 'skipped': 2,
+                'rules': 4,      # PriceRule effettivamente create
                 'errors': []
             }
         """
-        from .models import PriceRule
-
-        stats = {
-            'created': 0,
-            'updated': 0,
-            'skipped': 0,
-            'errors': []
-        }
-
-        for target_date, price in prices.items():
-            try:
-                # Cerca se esiste già una regola per questo giorno specifico
-                existing = PriceRule.objects.filter(
-                    listing=self.listing,
-                    start_date=target_date,
-                    end_date=target_date
-                ).first()
-
-                if existing:
-                    if overwrite:
-                        existing.price = price
-                        existing.save()
-                        stats['updated'] += 1
-                    else:
-                        stats['skipped'] += 1
-                else:
-                    # Crea nuova regola per singolo giorno
-                    PriceRule.objects.create(
-                        listing=self.listing,
-                        start_date=target_date,
-                        end_date=target_date,
-                        price=price
-                    )
-                    stats['created'] += 1
-
-            except Exception as e:
-                stats['errors'].append({
-                    'date': target_date.isoformat(),
-                    'error': str(e)
-                })
-
+        stats = self._empty_stats()
+        self._import_rows(sorted(prices.items()), stats, overwrite, coalesce, batch_size)
         return stats
 
-    def import_prices_from_csv(self, csv_content: str, overwrite=False) -> Dict:
+    def import_prices_from_csv(self, csv_content: Union[str, IO[str]], overwrite=False,
+                               coalesce=False, batch_size=IMPORT_BATCH_SIZE) -> Dict:
         """
         Importa prezzi da CSV.
 
@@ -260,21 +203,44 @@ class PriceImporter:
         2025-01-15,120.00
         2025-01-16,130.00
 
+        Le righe vengono lette in streaming e scritte a batch: le righe non
+        valide finiscono in 'errors' senza interrompere l'import.
+
         Args:
-            csv_content: Contenuto del file CSV
+            csv_content: Contenuto del file CSV o file aperto in modalità testo
             overwrite: Se True, sovrascrive prezzi esistenti
+            coalesce: Se True, unisce i giorni consecutivi con lo stesso prezzo
+            batch_size: Numero di righe scritte per ogni batch
 
         Returns:
             Dict con statistiche import
         """
+        stats = self._empty_stats()
+        rows = self._iter_csv_rows(csv_content, stats)
+        self._import_rows(rows, stats, overwrite, coalesce, batch_size)
+        return stats
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'rules': 0,
+            'errors': []
+        }
+
+    @staticmethod
+    def _iter_csv_rows(csv_content: Union[str, IO[str]], stats: Dict) -> Iterator[Tuple[date, Decimal]]:
+        """Genera (data, prezzo) riga per riga, registrando in stats le righe non valide."""
         import csv
         from io import StringIO
         from datetime import datetime
 
-        prices = {}
+        source = StringIO(csv_content) if isinstance(csv_content, str) else csv_content
+        reader = csv.DictReader(source)
 
         try:
-            reader = csv.DictReader(StringIO(csv_content))
             for row in reader:
                 date_str = row.get('date')
                 price_str = row.get('price')
@@ -282,22 +248,145 @@ class PriceImporter:
                 if not date_str or not price_str:
                     continue
 
-                # Parse date
-                target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                # Parse price
-                price = Decimal(price_str)
+                try:
+                    target_date = datetime.strptime(date_str.strip(), '%Y-%m-%d').date()
+                    price = Decimal(price_str.strip())
+                except (ValueError, InvalidOperation):
+                    stats['errors'].append({
+                        'line': reader.line_num,
+                        'error': f'Riga non valida: {date_str},{price_str}'
+                    })
+                    continue
 
-                prices[target_date] = price
+                yield target_date, price
 
-        except Exception as e:
-            return {
-                'created': 0,
-                'updated': 0,
-                'skipped': 0,
-                'errors': [{'error': f'Errore parsing CSV: {str(e)}'}]
-            }
+        except csv.Error as e:
+            stats['errors'].append({'error': f'Errore parsing CSV: {str(e)}'})
 
-        return self.import_prices_from_dict(prices, overwrite)
+    def _import_rows(self, rows: Iterable[Tuple[date, Decimal]], stats: Dict,
+                     overwrite: bool, coalesce: bool, batch_size: int) -> None:
+        """
+        Scrive le righe a batch di batch_size date.
+
+        Ogni batch è atomico; la cache calendario viene invalidata una sola
+        volta alla fine, e solo se qualcosa è cambiato.
+        """
+        from django.db import transaction
+
+        from .models import ClosureRule
+
+        changed = False
+        for batch in self._batches(rows, batch_size):
+            counters = {key: stats[key] for key in ('created', 'updated', 'skipped', 'rules')}
+            try:
+                with transaction.atomic():
+                    changed |= self._import_batch(batch, stats, overwrite, coalesce, batch_size)
+            except Exception as e:
+                # Batch annullato: i contatori tornano al valore precedente
+                stats.update(counters)
+                stats['errors'].append({
+                    'date': f'{min(batch).isoformat()} - {max(batch).isoformat()}',
+                    'error': str(e)
+                })
+
+        if changed:
+            ClosureRule._invalidate_calendar_cache_for_listing(self.listing.id)
+
+    @staticmethod
+    def _batches(rows: Iterable[Tuple[date, Decimal]], batch_size: int) -> Iterator[Dict[date, Decimal]]:
+        # Dict per batch: a parità di data vince l'ultima riga
+        batch = {}
+        for target_date, price in rows:
+            batch[target_date] = price
+            if len(batch) >= batch_size:
+                yield batch
+                batch = {}
+        if batch:
+            yield batch
+
+    def _import_batch(self, batch: Dict[date, Decimal], stats: Dict,
+                      overwrite: bool, coalesce: bool, batch_size: int) -> bool:
+        """
+        Crea o aggiorna le regole di un batch con bulk_create/bulk_update.
+
+        Le regole esistenti che iniziano nel batch vengono lette con una sola
+        query. Con coalesce un range non include né prosegue oltre un giorno in
+        cui inizia una regola esistente: così ogni giorno si risolve allo
+        stesso prezzo che avrebbe con regole di un giorno (vedi PriceResolver).
+
+        Returns:
+            True se il batch ha scritto qualcosa
+        """
+        from django.db.models import F
+
+        from .models import PriceRule
+
+        first, last = min(batch), max(batch)
+        # Righe bloccate fino alla fine del batch: una compattazione concorrente
+        # (services.price_compaction) non le riscrive a metà import
+        existing = PriceRule.objects.select_for_update().filter(
+            listing=self.listing,
+            start_date__range=(first, last)
+        )
+        if not coalesce:
+            existing = existing.filter(end_date=F('start_date'))
+
+        single_day = {}
+        range_starts = set()
+        for rule in existing.only('id', 'start_date', 'end_date', 'price').order_by('id'):
+            if rule.start_date == rule.end_date:
+                # Con più regole sullo stesso giorno vale l'ultima creata
+                single_day[rule.start_date] = rule
+            else:
+                range_starts.add(rule.start_date)
+
+        to_create = []
+        to_update = []
+        run = None
+
+        for target_date in sorted(batch):
+            try:
+                price = Decimal(str(batch[target_date]))
+            except InvalidOperation:
+                stats['errors'].append({
+                    'date': target_date.isoformat(),
+                    'error': f'Prezzo non valido: {batch[target_date]}'
+                })
+                run = None
+                continue
+
+            rule = single_day.get(target_date)
+            if rule is not None:
+                run = None
+                if overwrite:
+                    if rule.price != price:
+                        rule.price = price
+                        to_update.append(rule)
+                    stats['updated'] += 1
+                else:
+                    stats['skipped'] += 1
+                continue
+
+            stats['created'] += 1
+            if (coalesce and run is not None and run.price == price
+                    and run.end_date + timedelta(days=1) == target_date
+                    and target_date not in range_starts):
+                run.end_date = target_date
+                continue
+
+            run = PriceRule(listing=self.listing, start_date=target_date,
+                            end_date=target_date, price=price)
+            to_create.append(run)
+            if target_date in range_starts:
+                run = None
+
+        if to_create:
+            PriceRule.objects.bulk_create(to_create, batch_size=batch_size)
+            stats['rules'] += len(to_create)
+        if to_update:
+            PriceRule.objects.bulk_update(to_update, ['price'], batch_size=batch_size)
+
+        return bool(to_create or to_update)
 
     def clear_prices_for_range(self, start_date: date, end_date: date) -> int:
         """
@@ -312,7 +401,7 @@ class PriceImporter:
         Returns:
             Numero di regole eliminate
         """
-        from .models import PriceRule
+        from .models import ClosureRule, PriceRule
 
         deleted = PriceRule.objects.filter(
             listing=self.listing,
@@ -320,4 +409,7 @@ class PriceImporter:
             end_date__lte=end_date
         ).delete()
 
+        # Il delete su queryset non passa da PriceRule.delete()
+        ClosureRule._invalidate_calendar_cache_for_listing(self.listing.id)
+
         return deleted[0] if deleted else 0
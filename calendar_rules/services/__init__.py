@@ -7,6 +7,10 @@ Questo modulo contiene i servizi specializzati per:
 - GapCalculator: Calcolo gap days
 - RangeConsolidator: Gestione range bloccati
 - QueryOptimizer: Ottimizzazione query database
+- PriceResolver: Risoluzione bulk dei prezzi per giorno
+- PriceQuote: Preventivo immutabile di un soggiorno
+- BatchAvailabilityEngine: Disponibilità e prezzi di più listing in batch
+- CalendarCacheWarmer: Preriscaldamento della cache calendario condivisa
 """
 
 from .calendar_service import CalendarService
@@ -14,6 +18,10 @@ from .gap_calculator import GapCalculator
 from .range_consolidator import RangeConsolidator
 from .query_optimizer import QueryOptimizer
 from .ical_sync import ICalSyncService
+from .price_resolver import PriceResolver
+from .price_quote import PriceQuote
+from .batch_availability import BatchAvailabilityEngine
+from .cache_warmer import CalendarCacheWarmer
 from .exceptions import (
     CalendarServiceError, 
     InvalidDateRangeError, 
@@ -28,6 +36,10 @@ __all__ = [
     'RangeConsolidator', 
     'QueryOptimizer',
     'ICalSyncService',
+    'PriceResolver',
+    'PriceQuote',
+    'BatchAvailabilityEngine',
+    'CalendarCacheWarmer',
     'CalendarServiceError', 
     'InvalidDateRangeError',
     'GapCalculationError',
@@ -0,0 +1,151 @@
+# calendar_rules/services/batch_availability.py
+"""
+Valutazione in batch di disponibilità e prezzi per più listing.
+
+Carica con una query per tabella (filtrando per listing_id__in) prenotazioni,
+chiusure, regole check-in/out e regole di prezzo di tutti i listing richiesti
+per lo stesso soggiorno, poi verifica disponibilità e calcola i prezzi in
+memoria riutilizzando AvailabilityChecker e PriceResolver.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.db.models import Q
+
+from .price_quote import PriceQuote
+from .price_resolver import PriceResolver
+
+
+class BatchAvailabilityEngine:
+    """
+    Disponibilità e prezzi di un insieme di listing per un soggiorno [check_in, check_out).
+    """
+
+    ACTIVE_STATUSES = ['confirmed', 'pending']
+
+    def __init__(self, listings: Iterable, check_in: date, check_out: date):
+        """
+        Args:
+            listings: Listing da valutare (istanze già caricate)
+            check_in: Data di check-in
+            check_out: Data di check-out
+        """
+        self.listings = {listing.id: listing for listing in listings}
+        self.check_in = check_in
+        self.check_out = check_out
+
+        self._snapshots = {}
+        self._resolvers = {}
+        self._availability = {}
+
+        if self.listings and check_in < check_out:
+            self._load()
+
+    def _load(self) -> None:
+        """Carica tutti i dati con una query per tabella."""
+        from bookings.models import Booking
+        from ..availability import AvailabilitySnapshot
+        from ..models import ClosureRule, PriceRule, CheckInOutRule
+
+        listing_ids = list(self.listings)
+        check_in, check_out = self.check_in, self.check_out
+        max_gap = timedelta(days=max((l.gap_between_bookings or 0) for l in self.listings.values()))
+
+        bookings = defaultdict(list)
+        for listing_id, ci, co in Booking.objects.filter(
+            listing_id__in=listing_ids,
+            status__in=self.ACTIVE_STATUSES,
+            check_out_date__gt=check_in - max_gap,
+            check_in_date__lt=check_out + max_gap
+        ).order_by('-created_at').values_list('listing_id', 'check_in_date', 'check_out_date'):
+            bookings[listing_id].append((ci, co))
+
+        closures = defaultdict(list)
+        for listing_id, start, end, external in ClosureRule.objects.filter(
+            listing_id__in=listing_ids,
+            start_date__lt=check_out,
+            end_date__gte=check_in
+        ).order_by('start_date', 'pk').values_list('listing_id', 'start_date', 'end_date', 'is_external_booking'):
+            closures[listing_id].append((start, end, external))
+
+        checkinout_rules = defaultdict(list)
+        for row in CheckInOutRule.objects.filter(
+            Q(recurrence_type='weekly') | Q(specific_date__in=[check_in, check_out]),
+            listing_id__in=listing_ids
+        ).values_list('listing_id', 'rule_type', 'recurrence_type', 'specific_date', 'day_of_week'):
+            checkinout_rules[row[0]].append(row[1:])
+
+        # Una sola query per i prezzi delle notti e per i min_nights che coprono il soggiorno
+        last_night = check_out - timedelta(days=1)
+        price_rules = defaultdict(list)
+        min_nights_rules = defaultdict(list)
+        for rule in PriceRule.objects.filter(
+            listing_id__in=listing_ids,
+            start_date__lte=check_out,
+            end_date__gte=check_in
+        ).values('listing_id', *PriceResolver.RULE_FIELDS):
+            if rule['start_date'] <= last_night:
+                price_rules[rule['listing_id']].append(rule)
+            if rule['min_nights'] is not None and rule['start_date'] <= check_in and rule['end_date'] >= check_out:
+                min_nights_rules[rule['listing_id']].append(
+                    (rule['start_date'], rule['end_date'], rule['min_nights'])
+                )
+
+        for listing_id, listing in self.listings.items():
+            self._snapshots[listing_id] = AvailabilitySnapshot(
+                bookings=bookings[listing_id],
+                closures=closures[listing_id],
+                min_nights_rules=min_nights_rules[listing_id],
+                checkinout_rules=checkinout_rules[listing_id],
+            )
+            self._resolvers[listing_id] = PriceResolver(
+                listing, check_in, last_night, rules=price_rules[listing_id]
+            )
+
+    def check_availability(self, listing) -> Tuple[bool, str]:
+        """
+        Verifica la disponibilità (stesse regole e messaggi di AvailabilityChecker).
+
+        Returns:
+            (disponibile, messaggio)
+        """
+        from ..availability import AvailabilityChecker
+
+        if listing.id not in self._availability:
+            self._availability[listing.id] = AvailabilityChecker(listing).check_availability(
+                self.check_in, self.check_out, snapshot=self._snapshots.get(listing.id)
+            )
+        return self._availability[listing.id]
+
+    def get_price_resolver(self, listing) -> PriceResolver:
+        """PriceResolver per le notti del soggiorno."""
+        return self._resolvers[listing.id]
+
+    def get_price_quote(self, listing, num_guests: int) -> PriceQuote:
+        """Preventivo del soggiorno, calcolato sul resolver già caricato (nessuna query)."""
+        return PriceQuote.from_resolver(
+            listing, self._resolvers[listing.id], self.check_in, self.check_out, num_guests
+        )
+
+    def calculate_total_price(self, listing, num_guests: int) -> Decimal:
+        """
+        Prezzo totale del soggiorno, come CalendarManager.calculate_total_price.
+
+        Args:
+            listing: Listing
+            num_guests: Numero di ospiti
+
+        Returns:
+            Decimal: notti + ospiti extra + pulizie
+        """
+        return self.get_price_quote(listing, num_guests).total
+
+    def available_listings(self) -> Dict[int, bool]:
+        """Dict {listing_id: disponibile} per tutti i listing del batch."""
+        return {
+            listing_id: self.check_availability(listing)[0]
+            for listing_id, listing in self.listings.items()
+        }
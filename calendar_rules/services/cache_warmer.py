@@ -0,0 +1,186 @@
+# calendar_rules/services/cache_warmer.py
+"""
+Preriscaldamento della cache calendario condivisa.
+
+Per ogni listing attivo vengono precalcolate le finestre richieste dal
+frontend:
+- get_unavailable_dates: da oggi a oggi + max_booking_advance (default 365),
+  come la vista listings:unavailable_dates;
+- calendar_data: la finestra di tre mesi dal mese corrente caricata
+  all'apertura del calendario di prenotazione e le finestre di due mesi
+  (dal primo giorno del mese all'ultimo del mese successivo) caricate
+  cambiando mese.
+
+Le chiavi includono la generazione del listing: una lettura get_many per
+listing basta a capire quali finestre mancano, quindi si ricalcolano solo i
+listing i cui dati sono cambiati (o le cui chiavi sono state espulse).
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.utils import timezone
+
+from .calendar_cache import calendar_cache_key
+from .shared_cache import get_or_compute, get_shared_cache
+
+logger = logging.getLogger('calendar_debug')
+
+DEFAULT_WORKERS = 4
+# Mesi di calendario preriscaldati (finestre da due mesi)
+WARM_MONTHS = 12
+# Mesi caricati all'apertura del calendario (booking-calendar.js, init)
+INITIAL_MONTHS = 3
+# Le chiavi sono legate alla generazione: possono restare a lungo in cache
+WARM_TIMEOUT = 24 * 60 * 60
+CALENDAR_DATA_TIMEOUT = 300
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def calendar_data_windows(today: date, months: int = WARM_MONTHS) -> List[Tuple[date, date]]:
+    """Finestre di calendar_data richieste dal frontend a partire dal mese corrente."""
+    first = today.replace(day=1)
+    return [(first, _add_months(first, INITIAL_MONTHS) - timedelta(days=1))] + [
+        (_add_months(first, i), _add_months(first, i + 2) - timedelta(days=1))
+        for i in range(months)
+    ]
+
+
+def unavailable_dates_window(listing, today: date) -> Tuple[date, date]:
+    """Finestra di get_unavailable_dates usata dalla vista listings:unavailable_dates."""
+    return today, today + timedelta(days=listing.max_booking_advance or 365)
+
+
+def build_calendar_data(listing, start_date: date, end_date: date) -> Dict:
+    """Disponibilità e prezzi per l'endpoint calendar_data (senza cache)."""
+    from ..availability import AvailabilityChecker
+    from ..pricing import PriceCalculator
+
+    return {
+        **AvailabilityChecker(listing).get_calendar_data(start_date, end_date),
+        'prices': PriceCalculator(listing).get_calendar_prices(start_date, end_date),
+    }
+
+
+def get_calendar_data(listing, start_date: date, end_date: date) -> Dict:
+    """Dati di calendar_data dalla cache condivisa (calcolati al miss)."""
+    key = calendar_cache_key(listing.id, start_date, end_date, prefix='calendar_data')
+    return get_or_compute(key, lambda: build_calendar_data(listing, start_date, end_date),
+                          CALENDAR_DATA_TIMEOUT)
+
+
+class CalendarCacheWarmer:
+    """
+    Precalcola nella cache condivisa le finestre standard dei listing attivi.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, today: Optional[date] = None):
+        """
+        Args:
+            workers: Numero di thread del pool (1 = nel thread chiamante)
+            today: Data di riferimento delle finestre (default: oggi, ora locale)
+        """
+        self.workers = max(workers, 1)
+        self.today = today or timezone.localdate()
+
+    def windows(self, listing) -> List[Tuple[str, Tuple[date, date]]]:
+        """Chiavi cache e finestre standard di un listing."""
+        start, end = unavailable_dates_window(listing, self.today)
+        windows = [(calendar_cache_key(listing.id, start, end), ('unavailable', start, end))]
+        for start, end in calendar_data_windows(self.today):
+            key = calendar_cache_key(listing.id, start, end, prefix='calendar_data')
+            windows.append((key, ('calendar_data', start, end)))
+        return windows
+
+    def _compute(self, listing, kind: str, start: date, end: date):
+        if kind == 'unavailable':
+            from .calendar_service import CalendarService
+
+            # __wrapped__ salta il decoratore: il valore viene scritto qui sotto
+            return CalendarService.get_unavailable_dates.__wrapped__(CalendarService(listing), start, end)
+        return build_calendar_data(listing, start, end)
+
+    def warm_listing(self, listing) -> Dict[str, int]:
+        """
+        Calcola le finestre mancanti di un listing.
+
+        Returns:
+            Dict con statistiche: windows, hits, computed, errors
+        """
+        cache = get_shared_cache()
+        windows = self.windows(listing)
+        found = cache.get_many([key for key, _ in windows])
+
+        stats = {'windows': len(windows), 'hits': len(found), 'computed': 0, 'errors': 0}
+        for key, (kind, start, end) in windows:
+            if key in found:
+                continue
+            try:
+                started = time.perf_counter()
+                value = self._compute(listing, kind, start, end)
+                compute_time = time.perf_counter() - started
+            except Exception as e:
+                stats['errors'] += 1
+                logger.warning("Preriscaldamento %s %s->%s del listing %s fallito: %s",
+                               kind, start, end, listing.id, e)
+                continue
+            # Stesso formato di get_or_compute: (valore, tempo di calcolo, scadenza)
+            cache.set(key, (value, compute_time, time.time() + WARM_TIMEOUT), WARM_TIMEOUT)
+            stats['computed'] += 1
+        return stats
+
+    def warm(self, listings: Optional[Iterable] = None) -> Dict:
+        """
+        Preriscalda le finestre standard dei listing (default: tutti gli attivi).
+
+        Returns:
+            Dict con statistiche: listings, warmed_listings, windows, hits,
+            computed, errors, hit_rate (finestre già in cache prima del
+            passaggio), coverage (finestre in cache dopo), elapsed
+        """
+        if listings is None:
+            from listings.models import Listing
+
+            listings = Listing.objects.filter(status='active').order_by('pk')
+        listings = list(listings)
+
+        started = time.perf_counter()
+        totals = {'listings': len(listings), 'warmed_listings': 0,
+                  'windows': 0, 'hits': 0, 'computed': 0, 'errors': 0}
+
+        def collect(stats):
+            for key, value in stats.items():
+                totals[key] += value
+            if stats['computed']:
+                totals['warmed_listings'] += 1
+
+        if self.workers == 1:
+            for listing in listings:
+                collect(self.warm_listing(listing))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self._warm_in_thread, listing) for listing in listings]
+                for future in as_completed(futures):
+                    collect(future.result())
+
+        windows = totals['windows'] or 1
+        totals['hit_rate'] = totals['hits'] / windows
+        totals['coverage'] = (totals['hits'] + totals['computed']) / windows
+        totals['elapsed'] = time.perf_counter() - started
+        logger.info("Preriscaldamento cache calendario completato: %s", totals)
+        return totals
+
+    def _warm_in_thread(self, listing) -> Dict[str, int]:
+        try:
+            return self.warm_listing(listing)
+        finally:
+            # Ogni thread del pool apre la propria connessione al database
+            connection.close()
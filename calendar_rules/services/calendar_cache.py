@@ -0,0 +1,129 @@
+# calendar_rules/services/calendar_cache.py
+"""
+Invalidazione della cache calendario tramite contatore di generazione.
+
+Ogni listing ha un numero di generazione salvato in cache che fa parte di
+tutte le chiavi dei dati calendario. Quando cambia qualcosa che influenza il
+calendario (prenotazioni, chiusure, regole, prezzi, impostazioni del listing)
+basta incrementare la generazione: le vecchie chiavi non vengono più lette e
+scadono da sole, qualunque sia la finestra di date con cui sono state create.
+
+Le generazioni vivono nella cache condivisa tra i processi (shared_cache):
+un incremento fatto da un worker invalida i dati in cache di tutti.
+"""
+
+import logging
+import time
+from datetime import date
+from typing import Dict
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .shared_cache import get_shared_cache
+
+logger = logging.getLogger('calendar_debug')
+
+# Inviato a ogni bump_calendar_generation di un listing (argomento: listing_id),
+# anche dai percorsi bulk che non passano dai segnali dei modelli
+calendar_changed = Signal()
+
+
+def _generation_key(listing_id) -> str:
+    return f"calendar:gen:{listing_id}"
+
+
+def _seed_generation() -> int:
+    # Valore iniziale basato sul tempo: se la chiave viene espulsa dalla cache
+    # non si torna mai a una generazione già usata in precedenza.
+    return int(time.time() * 1000)
+
+
+def get_calendar_generation(listing_id) -> int:
+    """
+    Restituisce la generazione corrente del calendario di un listing.
+
+    Args:
+        listing_id: ID del listing (o nome di un ambito condiviso, es. 'groups')
+
+    Returns:
+        Numero di generazione (creato se assente)
+    """
+    cache = get_shared_cache()
+    key = _generation_key(listing_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _seed_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_calendar_generations(listing_ids) -> Dict:
+    """
+    Generazioni correnti di più listing con una sola lettura dalla cache.
+
+    Args:
+        listing_ids: ID dei listing
+
+    Returns:
+        Dict {listing_id: generazione}
+    """
+    keys = {_generation_key(listing_id): listing_id for listing_id in listing_ids}
+    found = get_shared_cache().get_many(list(keys))
+    generations = {keys[key]: generation for key, generation in found.items()}
+    for listing_id in listing_ids:
+        if listing_id not in generations:
+            generations[listing_id] = get_calendar_generation(listing_id)
+    return generations
+
+
+def bump_calendar_generation(listing_id) -> None:
+    """
+    Incrementa la generazione del calendario di un listing.
+
+    Se chiamato dentro una transazione, la generazione viene incrementata anche
+    al commit: una lettura concorrente che ha ricalcolato i dati vecchi prima
+    del commit non resta in cache con la nuova generazione.
+
+    Args:
+        listing_id: ID del listing
+    """
+    if not listing_id:
+        return
+
+    _bump(listing_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(listing_id))
+
+    if isinstance(listing_id, int):
+        calendar_changed.send(sender=None, listing_id=listing_id)
+
+
+def _bump(listing_id) -> None:
+    cache = get_shared_cache()
+    key = _generation_key(listing_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Chiave assente o espulsa: riparti da un valore mai usato
+        cache.set(key, _seed_generation(), None)
+    except Exception as e:
+        # Se la cache fallisce, non bloccare il salvataggio
+        logger.warning("Impossibile invalidare la cache calendario del listing %s: %s", listing_id, e)
+
+
+def calendar_cache_key(listing_id, start_date: date, end_date: date, prefix: str = 'calendar') -> str:
+    """
+    Chiave cache per i dati calendario di un listing in una finestra di date.
+
+    Args:
+        listing_id: ID del listing
+        start_date: Data inizio
+        end_date: Data fine
+        prefix: Namespace della chiave
+
+    Returns:
+        Chiave che include la generazione corrente del listing
+    """
+    generation = get_calendar_generation(listing_id)
+    return f"{prefix}:{listing_id}:g{generation}:{start_date.isoformat()}:{end_date.isoformat()}"
@@ -11,44 +11,45 @@ from datetime import date, timedelta
 from typing import Dict, List, Set, Tuple, Any
 from functools import wraps
 from django.db.models import QuerySet
-from django.core.cache import cache
-from django.conf import settings
 
 from ..models import ClosureRule, CheckInOutRule, PriceRule
 from bookings.models import Booking
 from .exceptions import CalendarServiceError, InvalidDateRangeError
 from .query_optimizer import QueryOptimizer
 from .range_consolidator import RangeConsolidator
+from .calendar_cache import calendar_cache_key
+from .shared_cache import get_or_compute
+from .tracing import NULL_TRACE, Trace, debug_enabled, start_trace
+from . import day_state
+from .day_state import DayStateMap
 
 # Configura logger per debug calendario
 logger = logging.getLogger('calendar_debug')
 
-# Flag per abilitare/disabilitare debug logging (da settings o env)
-DEBUG_CALENDAR = getattr(settings, 'DEBUG_CALENDAR', False)
-
 
 def cache_calendar_data(timeout=300):
-    """Decoratore per caching dei risultati calendario"""
+    """
+    Decoratore per caching dei risultati calendario nella cache condivisa.
+
+    Al miss un solo processo ricalcola (single-flight), e le chiavi calde
+    vengono rinfrescate prima della scadenza (vedi shared_cache).
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(self, start_date, end_date):
-            # Genera chiave cache
-            cache_key = f"calendar:{self.listing.id}:{start_date.isoformat()}:{end_date.isoformat()}"
-            
-            # Prova a recuperare da cache
-            cached = cache.get(cache_key)
-            if cached is not None:
-                if hasattr(self, '_log_if_debug'):
-                    self._log_if_debug(logging.INFO, f"[CACHE HIT] Calendario per Listing {self.listing.id}")
-                return cached
-            
-            # Calcola risultato
-            if hasattr(self, '_log_if_debug'):
-                self._log_if_debug(logging.INFO, f"[CACHE MISS] Calcolo calendario per Listing {self.listing.id}")
-            result = func(self, start_date, end_date)
-            
-            # Salva in cache
-            cache.set(cache_key, result, timeout)
+            # Genera chiave cache (include la generazione del listing)
+            cache_key = calendar_cache_key(self.listing.id, start_date, end_date)
+            computed = []
+
+            def compute():
+                if debug_enabled():
+                    logger.info("[CACHE MISS] Calcolo calendario per Listing %s", self.listing.id)
+                computed.append(True)
+                return func(self, start_date, end_date)
+
+            result = get_or_compute(cache_key, compute, timeout)
+            if not computed and debug_enabled():
+                logger.info("[CACHE HIT] Calendario per Listing %s", self.listing.id)
             return result
         return wrapper
     return decorator
@@ -74,11 +75,17 @@ class CalendarService:
         self.listing = listing
         self.query_optimizer = QueryOptimizer()
         self.range_consolidator = RangeConsolidator()
+        # Trace del calcolo in corso (NULL_TRACE fuori da get_unavailable_dates)
+        self._trace = NULL_TRACE
     
-    def _log_if_debug(self, level, message):
-        """Logging condizionale - solo se DEBUG_CALENDAR è True o livello logger è DEBUG"""
-        if DEBUG_CALENDAR or logger.level <= logging.DEBUG:
-            logger.log(level, message)
+    def _log_if_debug(self, level, message, *args):
+        """
+        Logging condizionale - solo se DEBUG_CALENDAR è True o livello logger è DEBUG.
+
+        Il messaggio usa argomenti in stile logging ("%s", valore): viene
+        formattato solo quando il debug è attivo.
+        """
+        self._trace.log(level, message, *args)
     
     @cache_calendar_data(timeout=300)
     def get_unavailable_dates(self, start_date: date, end_date: date) -> Dict[str, Any]:
@@ -96,59 +103,104 @@ class CalendarService:
             InvalidDateRangeError: Se il range di date non  valido
             CalendarServiceError: Per altri errori del calendario
         """
+        trace = start_trace(f"get_unavailable_dates listing={self.listing.id}")
+        return self._traced_unavailable_dates(start_date, end_date, trace)
+    
+    def trace_unavailable_dates(self, start_date: date, end_date: date) -> Tuple[Dict[str, Any], Trace]:
+        """
+        Calcola la disponibilità senza cache misurando i tempi di ogni fase.
+
+        Usato dalla vista di debug.
+
+        Returns:
+            Tuple (risultato di get_unavailable_dates, Trace con i tempi)
+        """
+        trace = start_trace(f"get_unavailable_dates listing={self.listing.id}", force=True)
+        return self._traced_unavailable_dates(start_date, end_date, trace), trace
+    
+    def _traced_unavailable_dates(self, start_date: date, end_date: date, trace: Trace) -> Dict[str, Any]:
+        self._trace = trace
+        try:
+            return self._compute_unavailable_dates(start_date, end_date)
+        finally:
+            self._trace = NULL_TRACE
+            trace.finish()
+    
+    def _compute_unavailable_dates(self, start_date: date, end_date: date) -> Dict[str, Any]:
+        trace = self._trace
+
         # Validazione input
         self._validate_date_range(start_date, end_date)
         
         # DEBUG: Inizio calcolo disponibilit
-        self._log_if_debug(logging.INFO, f"[CALENDAR DEBUG] Inizio calcolo disponibilit per Listing {self.listing.id}")
-        self._log_if_debug(logging.INFO, f"[CALENDAR DEBUG] Periodo richiesto: {start_date} -> {end_date}")
-        self._log_if_debug(logging.INFO, f"[CALENDAR DEBUG] Gap tra prenotazioni: {self.listing.gap_between_bookings or 0} giorni")
+        self._log_if_debug(logging.INFO, "[CALENDAR DEBUG] Inizio calcolo disponibilit per Listing %s", self.listing.id)
+        self._log_if_debug(logging.INFO, "[CALENDAR DEBUG] Periodo richiesto: %s -> %s", start_date, end_date)
+        self._log_if_debug(logging.INFO, "[CALENDAR DEBUG] Gap tra prenotazioni: %s giorni", self.listing.gap_between_bookings or 0)
         
         try:
             # Ottieni dati ottimizzati usando QueryOptimizer
-            calendar_data = self._get_optimized_calendar_data(start_date, end_date)
+            with trace.span('load'):
+                calendar_data = self._get_optimized_calendar_data(start_date, end_date)
             
             # DEBUG: Dati ottenuti
             self._debug_calendar_data(calendar_data)
             
             # Prepara periods UNA VOLTA per evitare iterazioni multiple
-            periods = self._prepare_periods(calendar_data, start_date, end_date)
+            with trace.span('periods'):
+                periods = self._prepare_periods(calendar_data, start_date, end_date)
             
-            # Calcola componenti separati con la nuova logica (usa periods preparati)
-            blocked_ranges = self._calculate_blocked_ranges_only_bookings(calendar_data, start_date, end_date)
-            checkin_dates = self._extract_checkin_dates(calendar_data, start_date, end_date)
-            checkout_dates = self._extract_checkout_dates(calendar_data, start_date, end_date)
-            gap_days = self._calculate_gap_days_optimized(periods, calendar_data, start_date, end_date)
-            checkin_blocked_rules = self._calculate_checkin_blocked_by_rules(calendar_data, start_date, end_date)
-            checkout_blocked_rules = self._calculate_checkout_blocked_by_rules(calendar_data, start_date, end_date)
-            checkin_blocked_gap = self._calculate_checkin_blocked_by_gap_optimized(periods, calendar_data, start_date, end_date)
+            # Applica tutte le regole a una bitmask per giorno (operazioni su slice)
+            with trace.span('day_states'):
+                states, checkin_weekdays, checkout_weekdays = self._build_day_states(
+                    periods, calendar_data, start_date, end_date
+                )
             
-            # DEBUG: Risultati calcoli
-            self._debug_new_calculation_results(
-                blocked_ranges, checkin_dates, checkout_dates, gap_days,
-                checkin_blocked_rules, checkout_blocked_rules, checkin_blocked_gap
-            )
+            # Serializza in un solo passaggio: le stringhe ISO nascono solo qui
+            with trace.span('serialize_dates'):
+                dates = states.dates_by_flag((
+                    day_state.CHECKIN, day_state.CHECKOUT, day_state.GAP,
+                    day_state.NO_CHECKIN, day_state.NO_CHECKOUT, day_state.MIN_STAY_BLOCKED,
+                ))
+            with trace.span('consolidate'):
+                consolidated_ranges = states.ranges(day_state.OCCUPIED)
+            checkin_dates = dates[day_state.CHECKIN]
+            checkout_dates = dates[day_state.CHECKOUT]
+            gap_days = dates[day_state.GAP]
+            checkin_blocked_rules = {
+                'dates': dates[day_state.NO_CHECKIN],
+                'weekdays': sorted(checkin_weekdays),
+            }
+            checkout_blocked_rules = {
+                'dates': dates[day_state.NO_CHECKOUT],
+                'weekdays': sorted(checkout_weekdays),
+            }
+            checkin_blocked_gap = dates[day_state.MIN_STAY_BLOCKED]
             
-            # Consolida i range bloccati
-            consolidated_ranges = self._consolidate_ranges(blocked_ranges)
+            # DEBUG: Risultati calcoli
+            if trace.verbose:
+                self._debug_new_calculation_results(
+                    [(r['from'], r['to']) for r in consolidated_ranges], checkin_dates, checkout_dates, gap_days,
+                    checkin_blocked_rules, checkout_blocked_rules, checkin_blocked_gap
+                )
             
             # DEBUG: Range consolidati
             self._debug_consolidated_ranges(consolidated_ranges)
             
-            # Genera metadata
-            metadata = self._generate_metadata(start_date, end_date)
-            
-            # Formatta response con la nuova struttura
-            result = self._format_new_response(
-                consolidated_ranges=consolidated_ranges,
-                checkin_dates=checkin_dates,
-                checkout_dates=checkout_dates,
-                gap_days=gap_days,
-                checkin_blocked_rules=checkin_blocked_rules,
-                checkout_blocked_rules=checkout_blocked_rules,
-                checkin_blocked_gap=checkin_blocked_gap,
-                metadata=metadata
-            )
+            with trace.span('format'):
+                # Genera metadata
+                metadata = self._generate_metadata(start_date, end_date)
+                
+                # Formatta response con la nuova struttura
+                result = self._format_new_response(
+                    consolidated_ranges=consolidated_ranges,
+                    checkin_dates=checkin_dates,
+                    checkout_dates=checkout_dates,
+                    gap_days=gap_days,
+                    checkin_blocked_rules=checkin_blocked_rules,
+                    checkout_blocked_rules=checkout_blocked_rules,
+                    checkin_blocked_gap=checkin_blocked_gap,
+                    metadata=metadata
+                )
             
             # DEBUG: Risultato finale
             self._debug_final_result(result)
@@ -156,7 +208,7 @@ class CalendarService:
             return result
             
         except Exception as e:
-            self._log_if_debug(logging.ERROR, f"[ERROR] [CALENDAR DEBUG] Errore durante il calcolo: {str(e)}")
+            self._log_if_debug(logging.ERROR, "[ERROR] [CALENDAR DEBUG] Errore durante il calcolo: %s", str(e))
             if isinstance(e, CalendarServiceError):
                 raise
             raise CalendarServiceError(f"Errore durante il calcolo disponibilit: {str(e)}")
@@ -222,6 +274,70 @@ class CalendarService:
         
         return periods
     
+    def _build_day_states(self, periods: List[Tuple[date, date]], calendar_data: Dict[str, Any],
+                          start_date: date, end_date: date) -> Tuple[DayStateMap, Set[int], Set[int]]:
+        """
+        Costruisce la bitmask dello stato dei giorni della finestra.
+
+        Applica, come OR su slice, le stesse regole dei metodi per singola sezione
+        (_calculate_blocked_ranges_only_bookings, _extract_checkin_dates,
+        _extract_checkout_dates, _calculate_gap_days_optimized,
+        _calculate_check*_blocked_by_rules, _calculate_checkin_blocked_by_gap_optimized).
+
+        Returns:
+            Tuple (DayStateMap, weekday check-in vietati, weekday check-out vietati)
+        """
+        states = DayStateMap(start_date, end_date)
+        one_day = timedelta(days=1)
+        gap_days = calendar_data['gap_days']
+        min_stay = calendar_data.get('min_nights', 1)
+
+        # Prenotazioni: notti occupate (check-in incluso, check-out escluso), arrivi e partenze
+        for booking in calendar_data['bookings']:
+            ci, co = booking['check_in_date'], booking['check_out_date']
+            if ci and co:
+                states.mark(day_state.OCCUPIED, ci, co - one_day)
+            if ci:
+                states.mark_day(day_state.CHECKIN, ci)
+            if co:
+                states.mark_day(day_state.CHECKOUT, co)
+
+        # Chiusure
+        for closure in calendar_data['closures']:
+            states.mark(day_state.OCCUPIED, closure['start_date'], closure['end_date'])
+
+        for period_start, period_end in periods:
+            # Gap days prima e dopo ogni periodo
+            if gap_days > 0:
+                states.mark(day_state.GAP, period_start - timedelta(days=gap_days), period_start - one_day)
+                states.mark(day_state.GAP, period_end, period_end + timedelta(days=gap_days - 1))
+
+            # Soggiorno troppo corto prima del periodo
+            if min_stay > 1:
+                short_range_end = min(period_start - one_day, end_date)
+                short_range_start = max(start_date, short_range_end - timedelta(days=min_stay - 2))
+                states.mark(day_state.GAP, short_range_start, short_range_end)
+
+            # Check-in impossibili per gap + min_nights
+            if gap_days > 0 and min_stay > 1:
+                first_gap_day = period_start - timedelta(days=gap_days)
+                last_valid_checkin = first_gap_day - one_day - timedelta(days=min_stay)
+                states.mark(day_state.MIN_STAY_BLOCKED, last_valid_checkin + one_day, first_gap_day - one_day)
+
+        # Regole check-in/out: date specifiche nella bitmask, ricorrenze settimanali come weekday
+        checkin_weekdays: Set[int] = set()
+        checkout_weekdays: Set[int] = set()
+        for rule in calendar_data['checkinout_rules']:
+            if rule.rule_type not in ('no_checkin', 'no_checkout'):
+                continue
+            is_checkin = rule.rule_type == 'no_checkin'
+            if rule.recurrence_type == 'specific_date' and rule.specific_date:
+                states.mark_day(day_state.NO_CHECKIN if is_checkin else day_state.NO_CHECKOUT, rule.specific_date)
+            elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
+                (checkin_weekdays if is_checkin else checkout_weekdays).add(rule.day_of_week)
+
+        return states, checkin_weekdays, checkout_weekdays
+    
     def _calculate_blocked_ranges(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> List[Tuple[date, date]]:
         """
         Calcola i range *totalmente* non selezionabili:
@@ -229,7 +345,7 @@ class CalendarService:
         - Chiusure
         (Niente logica di gap/min_notti qui: quella è competenza dei blocchi di check-in/out)
         """
-        logger.info("[BLOCKED] [CALENDAR DEBUG] === CALCOLO RANGE BLOCCATI (PULITI) ===")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] === CALCOLO RANGE BLOCCATI (PULITI) ===")
 
         blocked_ranges: List[Tuple[date, date]] = []
         bookings = calendar_data['bookings']
@@ -246,7 +362,7 @@ class CalendarService:
             interior_end   = min(co - timedelta(days=1), end_date)
             if interior_start <= interior_end:
                 blocked_ranges.append((interior_start, interior_end))
-                logger.info(f"   [INTERIOR] {interior_start} -> {interior_end}")
+                self._log_if_debug(logging.INFO, "   [INTERIOR] %s -> %s", interior_start, interior_end)
 
         # 2) Chiusure
         for i, closure in enumerate(closures, 1):
@@ -254,9 +370,9 @@ class CalendarService:
             r1 = min(closure['end_date'], end_date)
             if r0 <= r1:
                 blocked_ranges.append((r0, r1))
-                logger.info(f"   [CLOSURE] {r0} -> {r1}")
+                self._log_if_debug(logging.INFO, "   [CLOSURE] %s -> %s", r0, r1)
 
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Totale range bloccati: {len(blocked_ranges)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Totale range bloccati: %s", len(blocked_ranges))
         return blocked_ranges
     
     def _calculate_checkin_blocks(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> Dict[str, Any]:
@@ -267,7 +383,7 @@ class CalendarService:
         - Min notti prima del prossimo check-in: [bi-(min_nights-1), bi-1]
         - Regole 'no_checkin' (date specifiche / settimanali)
         """
-        logger.info("[BLOCKED] [CALENDAR DEBUG] === CALCOLO CHECK-IN BLOCCATI ===")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] === CALCOLO CHECK-IN BLOCCATI ===")
         bookings = calendar_data['bookings']
         gap_days = calendar_data['gap_days']
         min_nights = calendar_data.get('min_nights', 1)
@@ -320,38 +436,38 @@ class CalendarService:
             'dates': sorted(checkin_block_dates),
             'weekdays': sorted(checkin_block_weekdays),
         }
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Check-in bloccati: {len(result['dates'])} date, {len(result['weekdays'])} weekday")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Check-in bloccati: %s date, %s weekday", len(result['dates']), len(result['weekdays']))
         return result
     
     def _calculate_checkout_blocks(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> Dict[str, Any]:
         """Calcola i giorni bloccati per check-out."""
-        logger.info("[BLOCKED] [CALENDAR DEBUG] === CALCOLO CHECK-OUT BLOCCATI ===")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] === CALCOLO CHECK-OUT BLOCCATI ===")
         
         checkout_block_dates = set()
         checkout_block_weekdays = set()
         
         # Regole check-out
-        logger.info(f"[RULES] [CALENDAR DEBUG] Analizzando regole check-out")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Analizzando regole check-out")
         for i, rule in enumerate(calendar_data['checkinout_rules'], 1):
             if rule.rule_type == 'no_checkout':
                 if rule.recurrence_type == 'specific_date' and rule.specific_date:
                     if start_date <= rule.specific_date <= end_date:
                         checkout_block_dates.add(rule.specific_date.isoformat())
-                        logger.info(f"   [BLOCKED] Regola {i}: Check-out bloccato il {rule.specific_date}")
+                        self._log_if_debug(logging.INFO, "   [BLOCKED] Regola %s: Check-out bloccato il %s", i, rule.specific_date)
                     else:
-                        logger.info(f"   [OK] Regola {i}: Check-out bloccato il {rule.specific_date} (fuori periodo)")
+                        self._log_if_debug(logging.INFO, "   [OK] Regola %s: Check-out bloccato il %s (fuori periodo)", i, rule.specific_date)
                 elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
                     checkout_block_weekdays.add(rule.day_of_week)
                     days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
-                    logger.info(f"   [BLOCKED] Regola {i}: Check-out bloccato ogni {days[rule.day_of_week]}")
+                    self._log_if_debug(logging.INFO, "   [BLOCKED] Regola %s: Check-out bloccato ogni %s", i, days[rule.day_of_week])
         
         result = {
             'dates': sorted(checkout_block_dates),
             'weekdays': sorted(checkout_block_weekdays),
         }
         
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Totale check-out bloccati: {len(result['dates'])} date, {len(result['weekdays'])} giorni settimana")
-        logger.info("[BLOCKED] [CALENDAR DEBUG] === FINE CALCOLO CHECK-OUT BLOCCATI ===")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Totale check-out bloccati: %s date, %s giorni settimana", len(result['dates']), len(result['weekdays']))
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] === FINE CALCOLO CHECK-OUT BLOCCATI ===")
         
         return result
     
@@ -360,7 +476,7 @@ class CalendarService:
         Giorni di turnover = giorni di check-out utilizzabili per iniziare un nuovo soggiorno.
         Consentiti SOLO se gap_days == 0 e non vige un divieto di 'no_checkin' su quel giorno.
         """
-        logger.info("[TURNOVER] [CALENDAR DEBUG] === CALCOLO TURNOVER DAYS ===")
+        self._log_if_debug(logging.INFO, "[TURNOVER] [CALENDAR DEBUG] === CALCOLO TURNOVER DAYS ===")
         turnover_days: Set[str] = set()
         gap_days = calendar_data['gap_days']
 
@@ -384,12 +500,12 @@ class CalendarService:
                 if (co not in no_dates) and (wd not in no_weekdays):
                     turnover_days.add(co.isoformat())
 
-        logger.info(f"[TURNOVER] [CALENDAR DEBUG] Totale turnover days: {len(turnover_days)}")
+        self._log_if_debug(logging.INFO, "[TURNOVER] [CALENDAR DEBUG] Totale turnover days: %s", len(turnover_days))
         return turnover_days
     
     def _extract_real_checkin_dates(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> Set[str]:
         """Estrae i giorni di check-in reali (esclusi i gap days)."""
-        logger.info("[OK] [CALENDAR DEBUG] === ESTRAZIONE CHECK-IN REALI ===")
+        self._log_if_debug(logging.INFO, "[OK] [CALENDAR DEBUG] === ESTRAZIONE CHECK-IN REALI ===")
         
         real_checkin_dates = set()
         
@@ -397,19 +513,19 @@ class CalendarService:
             check_in = booking['check_in_date']
             if check_in and start_date <= check_in <= end_date:
                 real_checkin_dates.add(check_in.isoformat())
-                logger.info(f"   [OK] Check-in reale {i}: {check_in}")
+                self._log_if_debug(logging.INFO, "   [OK] Check-in reale %s: %s", i, check_in)
             elif check_in:
-                logger.info(f"   [OK] Check-in prenotazione {i} ({check_in}) fuori dal periodo richiesto")
+                self._log_if_debug(logging.INFO, "   [OK] Check-in prenotazione %s (%s) fuori dal periodo richiesto", i, check_in)
  
         closures = calendar_data.get('closures', [])
         for closure in closures:
             c_start = closure.get('start_date')
             if c_start and start_date <= c_start <= end_date:
                 real_checkin_dates.add(c_start.isoformat())
-                logger.info(f"   [OK] Check-in chiusura: {c_start}")
+                self._log_if_debug(logging.INFO, "   [OK] Check-in chiusura: %s", c_start)
 
-        logger.info(f"[OK] [CALENDAR DEBUG] Totale check-in reali: {len(real_checkin_dates)}")
-        logger.info("[OK] [CALENDAR DEBUG] === FINE ESTRAZIONE CHECK-IN REALI ===")
+        self._log_if_debug(logging.INFO, "[OK] [CALENDAR DEBUG] Totale check-in reali: %s", len(real_checkin_dates))
+        self._log_if_debug(logging.INFO, "[OK] [CALENDAR DEBUG] === FINE ESTRAZIONE CHECK-IN REALI ===")
  
         return real_checkin_dates
     
@@ -440,9 +556,9 @@ class CalendarService:
                 blocked_end = min(co - timedelta(days=1), end_date)
                 if blocked_start <= blocked_end:
                     blocked_ranges.append((blocked_start, blocked_end))
-                    self._log_if_debug(logging.INFO, f"   [BOOKING] Prenotazione {i}: {blocked_start} -> {blocked_end} (check-in={ci}, check-out={co})")
+                    self._log_if_debug(logging.INFO, "   [BOOKING] Prenotazione %s: %s -> %s (check-in=%s, check-out=%s)", i, blocked_start, blocked_end, ci, co)
                 else:
-                    self._log_if_debug(logging.INFO, f"   [BOOKING] Prenotazione {i}: nessun giorno bloccato (check-in={ci}, check-out={co})")
+                    self._log_if_debug(logging.INFO, "   [BOOKING] Prenotazione %s: nessun giorno bloccato (check-in=%s, check-out=%s)", i, ci, co)
         
         # Chiusure
         for i, closure in enumerate(closures, 1):
@@ -450,9 +566,9 @@ class CalendarService:
             r1 = min(closure['end_date'], end_date)
             if r0 <= r1:
                 blocked_ranges.append((r0, r1))
-                self._log_if_debug(logging.INFO, f"   [CLOSURE] Chiusura {i}: {r0} -> {r1}")
+                self._log_if_debug(logging.INFO, "   [CLOSURE] Chiusura %s: %s -> %s", i, r0, r1)
         
-        self._log_if_debug(logging.INFO, f"[BLOCKED] [CALENDAR DEBUG] Totale range bloccati: {len(blocked_ranges)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Totale range bloccati: %s", len(blocked_ranges))
         return blocked_ranges
     
     def _extract_checkin_dates(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> List[str]:
@@ -468,9 +584,9 @@ class CalendarService:
             check_in = booking['check_in_date']
             if check_in and start_date <= check_in <= end_date:
                 checkin_dates.add(check_in.isoformat())
-                self._log_if_debug(logging.INFO, f"   [CHECKIN] Check-in {i}: {check_in}")
+                self._log_if_debug(logging.INFO, "   [CHECKIN] Check-in %s: %s", i, check_in)
         
-        self._log_if_debug(logging.INFO, f"[CHECKIN] [CALENDAR DEBUG] Totale check-in: {len(checkin_dates)}")
+        self._log_if_debug(logging.INFO, "[CHECKIN] [CALENDAR DEBUG] Totale check-in: %s", len(checkin_dates))
         return sorted(checkin_dates)
     
     def _extract_checkout_dates(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> List[str]:
@@ -486,9 +602,9 @@ class CalendarService:
             check_out = booking['check_out_date']
             if check_out and start_date <= check_out <= end_date:
                 checkout_dates.add(check_out.isoformat())
-                self._log_if_debug(logging.INFO, f"   [CHECKOUT] Check-out {i}: {check_out}")
+                self._log_if_debug(logging.INFO, "   [CHECKOUT] Check-out %s: %s", i, check_out)
         
-        self._log_if_debug(logging.INFO, f"[CHECKOUT] [CALENDAR DEBUG] Totale check-out: {len(checkout_dates)}")
+        self._log_if_debug(logging.INFO, "[CHECKOUT] [CALENDAR DEBUG] Totale check-out: %s", len(checkout_dates))
         return sorted(checkout_dates)
     
     def _calculate_gap_days(self, calendar_data: Dict[str, Any], start_date: date, end_date: date) -> List[str]:
@@ -515,7 +631,7 @@ class CalendarService:
             self._log_if_debug(logging.INFO, "[GAP] [CALENDAR DEBUG] Nessun gap configurato")
             return []
 
-        self._log_if_debug(logging.INFO, f"[GAP] [CALENDAR DEBUG] Gap configurato: {gap_days} giorni")
+        self._log_if_debug(logging.INFO, "[GAP] [CALENDAR DEBUG] Gap configurato: %s giorni", gap_days)
 
         for idx, (period_start, period_end) in enumerate(periods, 1):
             if gap_days > 0:
@@ -524,24 +640,24 @@ class CalendarService:
                 pre_end = min(period_start - timedelta(days=1), end_date)
                 if pre_start <= pre_end:
                     gap_days_set.update(self._date_range(pre_start, pre_end))
-                    self._log_if_debug(logging.INFO, f"   [GAP] Pre-gap periodo {idx}: {pre_start} -> {pre_end}")
+                    self._log_if_debug(logging.INFO, "   [GAP] Pre-gap periodo %s: %s -> %s", idx, pre_start, pre_end)
 
                 # Post-gap: giorno di check-out e successivi gap_days-1 giorni
                 post_start = max(period_end, start_date)
                 post_end = min(period_end + timedelta(days=gap_days - 1), end_date)
                 if post_start <= post_end:
                     gap_days_set.update(self._date_range(post_start, post_end))
-                    self._log_if_debug(logging.INFO, f"   [GAP] Post-gap periodo {idx}: {post_start} -> {post_end}")
+                    self._log_if_debug(logging.INFO, "   [GAP] Post-gap periodo %s: %s -> %s", idx, post_start, post_end)
 
             # Enforce minimum stay
             if min_stay > 1:
                 short_range_end = min(period_start - timedelta(days=1), end_date)
                 short_range_start = max(start_date, short_range_end - timedelta(days=min_stay - 2))
                 if short_range_start <= short_range_end:
-                    self._log_if_debug(logging.INFO, f"   [GAP] Blocked short stay before periodo {idx}: {short_range_start} -> {short_range_end}")
+                    self._log_if_debug(logging.INFO, "   [GAP] Blocked short stay before periodo %s: %s -> %s", idx, short_range_start, short_range_end)
                     gap_days_set.update(self._date_range(short_range_start, short_range_end))
 
-        self._log_if_debug(logging.INFO, f"[GAP] [CALENDAR DEBUG] Totale gap days: {len(gap_days_set)}")
+        self._log_if_debug(logging.INFO, "[GAP] [CALENDAR DEBUG] Totale gap days: %s", len(gap_days_set))
         return sorted(gap_days_set)
     
     def _date_range(self, start: date, end: date):
@@ -565,13 +681,13 @@ class CalendarService:
                 if rule.recurrence_type == 'specific_date' and rule.specific_date:
                     if start_date <= rule.specific_date <= end_date:
                         checkin_blocked_dates.add(rule.specific_date.isoformat())
-                        self._log_if_debug(logging.INFO, f"   [RULE] Data specifica bloccata: {rule.specific_date}")
+                        self._log_if_debug(logging.INFO, "   [RULE] Data specifica bloccata: %s", rule.specific_date)
                 elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
                     checkin_blocked_weekdays.add(rule.day_of_week)
                     days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
-                    self._log_if_debug(logging.INFO, f"   [RULE] Giorno settimana bloccato: {days[rule.day_of_week]}")
+                    self._log_if_debug(logging.INFO, "   [RULE] Giorno settimana bloccato: %s", days[rule.day_of_week])
         
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Check-in bloccati: {len(checkin_blocked_dates)} date, {len(checkin_blocked_weekdays)} weekdays")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Check-in bloccati: %s date, %s weekdays", len(checkin_blocked_dates), len(checkin_blocked_weekdays))
         
         return {
             'dates': sorted(checkin_blocked_dates),
@@ -592,13 +708,13 @@ class CalendarService:
                 if rule.recurrence_type == 'specific_date' and rule.specific_date:
                     if start_date <= rule.specific_date <= end_date:
                         checkout_blocked_dates.add(rule.specific_date.isoformat())
-                        self._log_if_debug(logging.INFO, f"   [RULE] Data specifica bloccata: {rule.specific_date}")
+                        self._log_if_debug(logging.INFO, "   [RULE] Data specifica bloccata: %s", rule.specific_date)
                 elif rule.recurrence_type == 'weekly' and rule.day_of_week is not None:
                     checkout_blocked_weekdays.add(rule.day_of_week)
                     days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
-                    self._log_if_debug(logging.INFO, f"   [RULE] Giorno settimana bloccato: {days[rule.day_of_week]}")
+                    self._log_if_debug(logging.INFO, "   [RULE] Giorno settimana bloccato: %s", days[rule.day_of_week])
         
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Check-out bloccati: {len(checkout_blocked_dates)} date, {len(checkout_blocked_weekdays)} weekdays")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Check-out bloccati: %s date, %s weekdays", len(checkout_blocked_dates), len(checkout_blocked_weekdays))
         
         return {
             'dates': sorted(checkout_blocked_dates),
@@ -637,10 +753,10 @@ class CalendarService:
             return []
         
         if min_nights <= 1:
-            self._log_if_debug(logging.INFO, f"[GAP_CHECKIN] [CALENDAR DEBUG] Min nights = {min_nights}, nessun blocco aggiuntivo necessario")
+            self._log_if_debug(logging.INFO, "[GAP_CHECKIN] [CALENDAR DEBUG] Min nights = %s, nessun blocco aggiuntivo necessario", min_nights)
             return []
         
-        self._log_if_debug(logging.INFO, f"[GAP_CHECKIN] [CALENDAR DEBUG] Gap: {gap_days} giorni, Min nights: {min_nights}")
+        self._log_if_debug(logging.INFO, "[GAP_CHECKIN] [CALENDAR DEBUG] Gap: %s giorni, Min nights: %s", gap_days, min_nights)
 
         for idx, (ci, co) in enumerate(periods, 1):
             first_gap_day = ci - timedelta(days=gap_days)
@@ -652,12 +768,12 @@ class CalendarService:
             
             if block_start <= block_end:
                 checkin_blocked_gap.update(self._date_range(block_start, block_end))
-                self._log_if_debug(logging.INFO, f"   [GAP_CHECKIN] Periodo {idx}: bloccati {block_start} -> {block_end}")
-                self._log_if_debug(logging.INFO, f"      (gap inizia: {first_gap_day}, ultimo check-out: {last_checkout_day}, ultimo check-in valido: {last_valid_checkin})")
+                self._log_if_debug(logging.INFO, "   [GAP_CHECKIN] Periodo %s: bloccati %s -> %s", idx, block_start, block_end)
+                self._log_if_debug(logging.INFO, "      (gap inizia: %s, ultimo check-out: %s, ultimo check-in valido: %s)", first_gap_day, last_checkout_day, last_valid_checkin)
             else:
-                self._log_if_debug(logging.INFO, f"   [GAP_CHECKIN] Periodo {idx}: nessun blocco aggiuntivo necessario")
+                self._log_if_debug(logging.INFO, "   [GAP_CHECKIN] Periodo %s: nessun blocco aggiuntivo necessario", idx)
         
-        self._log_if_debug(logging.INFO, f"[GAP_CHECKIN] [CALENDAR DEBUG] Totale check-in bloccati da gap+min_nights: {len(checkin_blocked_gap)}")
+        self._log_if_debug(logging.INFO, "[GAP_CHECKIN] [CALENDAR DEBUG] Totale check-in bloccati da gap+min_nights: %s", len(checkin_blocked_gap))
         return sorted(checkin_blocked_gap)
     
     # ==================== FINE NUOVI METODI ====================
@@ -672,12 +788,12 @@ class CalendarService:
             self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] Nessun range da consolidare")
             return []
         
-        self._log_if_debug(logging.INFO, f"[CONSOLIDATE] [CALENDAR DEBUG] Consolidando {len(blocked_ranges)} range bloccati")
+        self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] Consolidando %s range bloccati", len(blocked_ranges))
         
         # Usa RangeConsolidator per logica robusta e testata
         result = self.range_consolidator.optimize_ranges_for_api(blocked_ranges)
         
-        self._log_if_debug(logging.INFO, f"[CONSOLIDATE] [CALENDAR DEBUG] Consolidamento completato: {len(blocked_ranges)} -> {len(result)} range")
+        self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] Consolidamento completato: %s -> %s range", len(blocked_ranges), len(result))
         self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] === FINE CONSOLIDAMENTO RANGE ===")
         
         return result
@@ -747,164 +863,174 @@ class CalendarService:
     
     def _debug_calendar_data(self, calendar_data: Dict[str, Any]) -> None:
         """Debug dettagliato dei dati del calendario ottenuti."""
+        if not self._trace.verbose:
+            return
         self._log_if_debug(logging.INFO, "[DATA] [CALENDAR DEBUG] === DATI CALENDARIO OTTENUTI ===")
         
         # Debug prenotazioni
         bookings = calendar_data['bookings']
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Prenotazioni trovate: {len(bookings)}")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Prenotazioni trovate: %s", len(bookings))
         for i, booking in enumerate(bookings, 1):
-            self._log_if_debug(logging.INFO, f"   [ITEM] Prenotazione {i}: Check-in {booking['check_in_date']} -> Check-out {booking['check_out_date']}")
+            self._log_if_debug(logging.INFO, "   [ITEM] Prenotazione %s: Check-in %s -> Check-out %s", i, booking['check_in_date'], booking['check_out_date'])
         
         # Debug chiusure
         closures = calendar_data['closures']
-        self._log_if_debug(logging.INFO, f"[BLOCKED] [CALENDAR DEBUG] Chiusure trovate: {len(closures)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Chiusure trovate: %s", len(closures))
         for i, closure in enumerate(closures, 1):
-            self._log_if_debug(logging.INFO, f"   [BLOCKED] Chiusura {i}: {closure['start_date']} -> {closure['end_date']}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Chiusura %s: %s -> %s", i, closure['start_date'], closure['end_date'])
         
         # Debug regole check-in/out
         checkinout_rules = calendar_data['checkinout_rules']
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Regole check-in/out: {len(checkinout_rules)}")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Regole check-in/out: %s", len(checkinout_rules))
         for i, rule in enumerate(checkinout_rules, 1):
             rule_type = "NO CHECK-IN" if rule.rule_type == 'no_checkin' else "NO CHECK-OUT"
             if rule.recurrence_type == 'specific_date':
-                self._log_if_debug(logging.INFO, f"   [DATE] Regola {i}: {rule_type} il {rule.specific_date}")
+                self._log_if_debug(logging.INFO, "   [DATE] Regola %s: %s il %s", i, rule_type, rule.specific_date)
             elif rule.recurrence_type == 'weekly':
                 days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
-                self._log_if_debug(logging.INFO, f"   [DATE] Regola {i}: {rule_type} ogni {days[rule.day_of_week] if rule.day_of_week is not None else 'N/A'}")
+                self._log_if_debug(logging.INFO, "   [DATE] Regola %s: %s ogni %s", i, rule_type, days[rule.day_of_week] if rule.day_of_week is not None else 'N/A')
         
         # Debug price rules
         price_rules = calendar_data['price_rules']
-        self._log_if_debug(logging.INFO, f"[PRICE] [CALENDAR DEBUG] Regole prezzi: {len(price_rules)}")
+        self._log_if_debug(logging.INFO, "[PRICE] [CALENDAR DEBUG] Regole prezzi: %s", len(price_rules))
         for i, rule in enumerate(price_rules, 1):
-            self._log_if_debug(logging.INFO, f"   [PRICE] Regola {i}: Min notti {rule.get('min_nights', 'N/A')}")
+            self._log_if_debug(logging.INFO, "   [PRICE] Regola %s: Min notti %s", i, rule.get('min_nights', 'N/A'))
         
-        self._log_if_debug(logging.INFO, f"[GAP] [CALENDAR DEBUG] Gap days: {calendar_data['gap_days']}")
+        self._log_if_debug(logging.INFO, "[GAP] [CALENDAR DEBUG] Gap days: %s", calendar_data['gap_days'])
         self._log_if_debug(logging.INFO, "[DATA] [CALENDAR DEBUG] === FINE DATI CALENDARIO ===")
     
     def _debug_calculation_results(self, blocked_ranges, checkin_block_data, checkout_block_data, turnover_days, real_checkin_dates):
         """Debug dettagliato dei risultati dei calcoli."""
-        logger.info("[CALC] [CALENDAR DEBUG] === RISULTATI CALCOLI ===")
+        if not self._trace.verbose:
+            return
+        self._log_if_debug(logging.INFO, "[CALC] [CALENDAR DEBUG] === RISULTATI CALCOLI ===")
         
         # Debug range bloccati
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Range bloccati trovati: {len(blocked_ranges)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Range bloccati trovati: %s", len(blocked_ranges))
         for i, (start, end) in enumerate(blocked_ranges, 1):
-            logger.info(f"   [BLOCKED] Range {i}: {start} -> {end}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Range %s: %s -> %s", i, start, end)
         
         # Debug check-in bloccati
         checkin_dates = checkin_block_data['dates']
         checkin_weekdays = checkin_block_data['weekdays']
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Date check-in bloccate: {len(checkin_dates)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Date check-in bloccate: %s", len(checkin_dates))
         for date_str in checkin_dates:
-            logger.info(f"   [BLOCKED] Check-in bloccato: {date_str}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Check-in bloccato: %s", date_str)
         if checkin_weekdays:
             days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
             weekdays_str = [days[wd] for wd in checkin_weekdays]
-            logger.info(f"   [BLOCKED] Giorni settimana check-in bloccati: {', '.join(weekdays_str)}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Giorni settimana check-in bloccati: %s", ', '.join(weekdays_str))
         
         # Debug check-out bloccati
         checkout_dates = checkout_block_data['dates']
         checkout_weekdays = checkout_block_data['weekdays']
-        logger.info(f"[BLOCKED] [CALENDAR DEBUG] Date check-out bloccate: {len(checkout_dates)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Date check-out bloccate: %s", len(checkout_dates))
         for date_str in checkout_dates:
-            logger.info(f"   [BLOCKED] Check-out bloccato: {date_str}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Check-out bloccato: %s", date_str)
         if checkout_weekdays:
             days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
             weekdays_str = [days[wd] for wd in checkout_weekdays]
-            logger.info(f"   [BLOCKED] Giorni settimana check-out bloccati: {', '.join(weekdays_str)}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Giorni settimana check-out bloccati: %s", ', '.join(weekdays_str))
         
         # Debug turnover days
-        logger.info(f"[TURNOVER] [CALENDAR DEBUG] Giorni di turnover: {len(turnover_days)}")
+        self._log_if_debug(logging.INFO, "[TURNOVER] [CALENDAR DEBUG] Giorni di turnover: %s", len(turnover_days))
         for date_str in sorted(turnover_days):
-            logger.info(f"   [TURNOVER] Turnover: {date_str}")
+            self._log_if_debug(logging.INFO, "   [TURNOVER] Turnover: %s", date_str)
         
         # Debug real check-in dates
-        logger.info(f"[OK] [CALENDAR DEBUG] Date check-in reali: {len(real_checkin_dates)}")
+        self._log_if_debug(logging.INFO, "[OK] [CALENDAR DEBUG] Date check-in reali: %s", len(real_checkin_dates))
         for date_str in sorted(real_checkin_dates):
-            logger.info(f"   [OK] Check-in reale: {date_str}")
+            self._log_if_debug(logging.INFO, "   [OK] Check-in reale: %s", date_str)
         
-        logger.info("[CALC] [CALENDAR DEBUG] === FINE RISULTATI CALCOLI ===")
+        self._log_if_debug(logging.INFO, "[CALC] [CALENDAR DEBUG] === FINE RISULTATI CALCOLI ===")
     
     def _debug_new_calculation_results(self, blocked_ranges, checkin_dates, checkout_dates, gap_days, 
                                        checkin_blocked_rules, checkout_blocked_rules, checkin_blocked_gap):
         """Debug dettagliato dei risultati dei calcoli con la nuova struttura."""
+        if not self._trace.verbose:
+            return
         self._log_if_debug(logging.INFO, "[NEW_CALC] [CALENDAR DEBUG] === RISULTATI NUOVI CALCOLI ===")
         
         # Debug range bloccati
-        self._log_if_debug(logging.INFO, f"[BLOCKED] [CALENDAR DEBUG] Range bloccati (solo prenotazioni): {len(blocked_ranges)}")
+        self._log_if_debug(logging.INFO, "[BLOCKED] [CALENDAR DEBUG] Range bloccati (solo prenotazioni): %s", len(blocked_ranges))
         for i, (start, end) in enumerate(blocked_ranges, 1):
-            self._log_if_debug(logging.INFO, f"   [BLOCKED] Range {i}: {start} -> {end}")
+            self._log_if_debug(logging.INFO, "   [BLOCKED] Range %s: %s -> %s", i, start, end)
         
         # Debug check-in dates
-        self._log_if_debug(logging.INFO, f"[CHECKIN] [CALENDAR DEBUG] Date check-in: {len(checkin_dates)}")
+        self._log_if_debug(logging.INFO, "[CHECKIN] [CALENDAR DEBUG] Date check-in: %s", len(checkin_dates))
         for date_str in checkin_dates:
-            self._log_if_debug(logging.INFO, f"   [CHECKIN] {date_str}")
+            self._log_if_debug(logging.INFO, "   [CHECKIN] %s", date_str)
         
         # Debug check-out dates
-        self._log_if_debug(logging.INFO, f"[CHECKOUT] [CALENDAR DEBUG] Date check-out: {len(checkout_dates)}")
+        self._log_if_debug(logging.INFO, "[CHECKOUT] [CALENDAR DEBUG] Date check-out: %s", len(checkout_dates))
         for date_str in checkout_dates:
-            self._log_if_debug(logging.INFO, f"   [CHECKOUT] {date_str}")
+            self._log_if_debug(logging.INFO, "   [CHECKOUT] %s", date_str)
         
         # Debug gap days
-        self._log_if_debug(logging.INFO, f"[GAP] [CALENDAR DEBUG] Gap days: {len(gap_days)}")
+        self._log_if_debug(logging.INFO, "[GAP] [CALENDAR DEBUG] Gap days: %s", len(gap_days))
         if len(gap_days) <= 20:  # Mostra solo se non troppi
             for date_str in gap_days:
-                self._log_if_debug(logging.INFO, f"   [GAP] {date_str}")
+                self._log_if_debug(logging.INFO, "   [GAP] %s", date_str)
         
         # Debug check-in bloccati da regole
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Check-in bloccati da regole: {len(checkin_blocked_rules['dates'])} date, {len(checkin_blocked_rules['weekdays'])} weekdays")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Check-in bloccati da regole: %s date, %s weekdays", len(checkin_blocked_rules['dates']), len(checkin_blocked_rules['weekdays']))
         for date_str in checkin_blocked_rules['dates']:
-            self._log_if_debug(logging.INFO, f"   [RULE] Check-in bloccato: {date_str}")
+            self._log_if_debug(logging.INFO, "   [RULE] Check-in bloccato: %s", date_str)
         if checkin_blocked_rules['weekdays']:
             days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
             weekdays_str = [days[wd] for wd in checkin_blocked_rules['weekdays']]
-            self._log_if_debug(logging.INFO, f"   [RULE] Weekdays check-in bloccati: {', '.join(weekdays_str)}")
+            self._log_if_debug(logging.INFO, "   [RULE] Weekdays check-in bloccati: %s", ', '.join(weekdays_str))
         
         # Debug check-out bloccati da regole
-        self._log_if_debug(logging.INFO, f"[RULES] [CALENDAR DEBUG] Check-out bloccati da regole: {len(checkout_blocked_rules['dates'])} date, {len(checkout_blocked_rules['weekdays'])} weekdays")
+        self._log_if_debug(logging.INFO, "[RULES] [CALENDAR DEBUG] Check-out bloccati da regole: %s date, %s weekdays", len(checkout_blocked_rules['dates']), len(checkout_blocked_rules['weekdays']))
         for date_str in checkout_blocked_rules['dates']:
-            self._log_if_debug(logging.INFO, f"   [RULE] Check-out bloccato: {date_str}")
+            self._log_if_debug(logging.INFO, "   [RULE] Check-out bloccato: %s", date_str)
         if checkout_blocked_rules['weekdays']:
             days = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
             weekdays_str = [days[wd] for wd in checkout_blocked_rules['weekdays']]
-            self._log_if_debug(logging.INFO, f"   [RULE] Weekdays check-out bloccati: {', '.join(weekdays_str)}")
+            self._log_if_debug(logging.INFO, "   [RULE] Weekdays check-out bloccati: %s", ', '.join(weekdays_str))
         
         # Debug check-in bloccati da gap
-        self._log_if_debug(logging.INFO, f"[GAP_CHECKIN] [CALENDAR DEBUG] Check-in bloccati da gap: {len(checkin_blocked_gap)}")
+        self._log_if_debug(logging.INFO, "[GAP_CHECKIN] [CALENDAR DEBUG] Check-in bloccati da gap: %s", len(checkin_blocked_gap))
         if len(checkin_blocked_gap) <= 20:  # Mostra solo se non troppi
             for date_str in checkin_blocked_gap:
-                self._log_if_debug(logging.INFO, f"   [GAP_CHECKIN] {date_str}")
+                self._log_if_debug(logging.INFO, "   [GAP_CHECKIN] %s", date_str)
         
         self._log_if_debug(logging.INFO, "[NEW_CALC] [CALENDAR DEBUG] === FINE RISULTATI NUOVI CALCOLI ===")
     
     def _debug_consolidated_ranges(self, consolidated_ranges):
         """Debug dei range consolidati."""
+        if not self._trace.verbose:
+            return
         self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] === RANGE CONSOLIDATI ===")
-        self._log_if_debug(logging.INFO, f"[CONSOLIDATE] [CALENDAR DEBUG] Range consolidati finali: {len(consolidated_ranges)}")
+        self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] Range consolidati finali: %s", len(consolidated_ranges))
         for i, range_dict in enumerate(consolidated_ranges, 1):
-            self._log_if_debug(logging.INFO, f"   [CONSOLIDATE] Range {i}: {range_dict['from']} -> {range_dict['to']}")
+            self._log_if_debug(logging.INFO, "   [CONSOLIDATE] Range %s: %s -> %s", i, range_dict['from'], range_dict['to'])
         self._log_if_debug(logging.INFO, "[CONSOLIDATE] [CALENDAR DEBUG] === FINE RANGE CONSOLIDATI ===")
     
     def _debug_final_result(self, result):
         """Debug del risultato finale (supporta sia vecchia che nuova struttura)."""
+        if not self._trace.verbose:
+            return
         self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] === RISULTATO FINALE ===")
-        self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Listing ID: {result['listing_id']}")
-        self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Range bloccati finali: {len(result['blocked_ranges'])}")
+        self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Listing ID: %s", result['listing_id'])
+        self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Range bloccati finali: %s", len(result['blocked_ranges']))
         
         # Nuova struttura
         if 'checkin_dates' in result:
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-in dates: {len(result['checkin_dates'])}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-out dates: {len(result['checkout_dates'])}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Gap days: {len(result['gap_days'])}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-in bloccati da regole: {len(result['checkin_blocked_rules']['dates'])}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-out bloccati da regole: {len(result['checkout_blocked_rules']['dates'])}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-in bloccati da gap: {len(result['checkin_blocked_gap'])}")
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-in dates: %s", len(result['checkin_dates']))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-out dates: %s", len(result['checkout_dates']))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Gap days: %s", len(result['gap_days']))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-in bloccati da regole: %s", len(result['checkin_blocked_rules']['dates']))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-out bloccati da regole: %s", len(result['checkout_blocked_rules']['dates']))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-in bloccati da gap: %s", len(result['checkin_blocked_gap']))
         # Vecchia struttura
         else:
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Giorni turnover: {len(result.get('turnover_days', []))}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-in bloccati: {len(result.get('checkin_block', {}).get('dates', []))}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-out bloccati: {len(result.get('checkout_block', {}).get('dates', []))}")
-            self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Check-in reali: {len(result.get('real_checkin_dates', []))}")
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Giorni turnover: %s", len(result.get('turnover_days', [])))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-in bloccati: %s", len(result.get('checkin_block', {}).get('dates', [])))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-out bloccati: %s", len(result.get('checkout_block', {}).get('dates', [])))
+            self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Check-in reali: %s", len(result.get('real_checkin_dates', [])))
         
-        self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Gap tra prenotazioni: {result['metadata']['gap_between_bookings']}")
-        self._log_if_debug(logging.INFO, f"[RESULT] [CALENDAR DEBUG] Soggiorno minimo: {result['metadata']['min_stay']}")
+        self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Gap tra prenotazioni: %s", result['metadata']['gap_between_bookings'])
+        self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] Soggiorno minimo: %s", result['metadata']['min_stay'])
         self._log_if_debug(logging.INFO, "[RESULT] [CALENDAR DEBUG] === FINE RISULTATO FINALE ===")
@@ -0,0 +1,261 @@
+# calendar_rules/services/combined_calendar.py
+"""
+Calendario combinato dei gruppi, mantenuto in modo incrementale.
+
+Per ogni finestra di date la cache contiene uno stato aggregato: quante
+strutture bloccano ogni data, la somma dei prezzi per notte e la generazione
+calendario (vedi calendar_cache) di ogni listing da cui è stato costruito.
+Il contributo di ciascun listing (date bloccate e prezzi) è in cache con la
+sua generazione.
+
+Quando un listing cambia (prenotazioni, chiusure, regole, prezzi) cambia la
+sua generazione: alla lettura successiva si sottrae dallo stato il contributo
+vecchio e si aggiunge quello nuovo, ricalcolando solo quel listing. Se lo
+stato è aggiornato, l'endpoint è una lettura dalla cache più la serializzazione.
+
+L'elenco dei gruppi e dei loro membri ha una generazione propria ('groups'),
+incrementata dai segnali su ListingGroup e Listing.
+"""
+
+import logging
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+from Rhome_book.metrics import record_cache_access
+
+from .calendar_cache import get_calendar_generation, get_calendar_generations
+from .price_resolver import PriceResolver
+
+logger = logging.getLogger('calendar_debug')
+
+GROUPS_SCOPE = 'groups'
+COMBINED_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _groups_key() -> str:
+    return f"combined:groups:g{get_calendar_generation(GROUPS_SCOPE)}"
+
+
+def _part_key(listing_id, generation, start_date: date, end_date: date) -> str:
+    return f"combined:part:{listing_id}:g{generation}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def _state_key(start_date: date, end_date: date) -> str:
+    return f"combined:state:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def get_groups_payload() -> Dict:
+    """
+    Gruppi attivi serializzati e ID dei loro appartamenti attivi.
+
+    Returns:
+        {'groups': [...], 'listing_ids': [...]} (liste vuote se non ci sono gruppi)
+    """
+    key = _groups_key()
+    payload = cache.get(key)
+    record_cache_access(payload is not None)
+    if payload is not None:
+        return payload
+
+    from listings.models import ListingGroup
+
+    groups_data = []
+    listing_ids = set()
+    for group in ListingGroup.objects.filter(is_active=True).prefetch_related('listings'):
+        group_listings = [listing for listing in group.listings.all() if listing.status == 'active']
+        listing_ids.update(listing.id for listing in group_listings)
+        groups_data.append({
+            'id': group.id,
+            'name': group.name,
+            'description': group.description,
+            'total_capacity': group.total_capacity,
+            'total_bedrooms': group.total_bedrooms,
+            'listing_count': len(group_listings),
+            'listings': [
+                {
+                    'id': listing.id,
+                    'title': listing.title,
+                    'slug': listing.slug,
+                    'max_guests': listing.max_guests,
+                    'bedrooms': listing.bedrooms,
+                    'base_price': float(listing.base_price),
+                    'cleaning_fee': float(listing.cleaning_fee),
+                }
+                for listing in group_listings
+            ]
+        })
+
+    payload = {'groups': groups_data, 'listing_ids': sorted(listing_ids)}
+    cache.set(key, payload, COMBINED_CACHE_TIMEOUT)
+    return payload
+
+
+def build_listing_contribution(listing, start_date: date, end_date: date) -> Dict:
+    """
+    Contributo di un listing al calendario combinato.
+
+    Returns:
+        {'blocked': frozenset di date ISO, 'prices': tupla dei prezzi per notte
+         da start_date a end_date escluso, 'min_stay', 'gap_days'}
+    """
+    from ..availability import AvailabilityChecker
+
+    availability_data = AvailabilityChecker(listing).get_calendar_data(start_date, end_date)
+    resolver = PriceResolver(listing, start_date, end_date - timedelta(days=1))
+    return {
+        'blocked': frozenset(availability_data['blocked_dates']),
+        'prices': tuple(resolver.nightly_prices(start_date, end_date)),
+        'min_stay': availability_data['min_stay'],
+        'gap_days': availability_data['gap_days'],
+    }
+
+
+def _get_contributions(generations: Dict, start_date: date, end_date: date,
+                       compute_missing: bool = True) -> Dict:
+    """
+    Contributi dei listing alle generazioni indicate, dalla cache o ricalcolati.
+
+    Args:
+        generations: Dict {listing_id: generazione}
+        compute_missing: Se False restituisce solo quelli trovati in cache
+
+    Returns:
+        Dict {listing_id: contributo}
+    """
+    keys = {_part_key(listing_id, generation, start_date, end_date): listing_id
+            for listing_id, generation in generations.items()}
+    found = cache.get_many(list(keys))
+    parts = {keys[key]: part for key, part in found.items()}
+    record_cache_access(True, len(parts))
+    record_cache_access(False, len(keys) - len(parts))
+
+    missing = [listing_id for listing_id in generations if listing_id not in parts]
+    if missing and compute_missing:
+        from listings.models import Listing
+
+        computed = {}
+        for listing in Listing.objects.filter(id__in=missing):
+            part = build_listing_contribution(listing, start_date, end_date)
+            parts[listing.id] = part
+            computed[_part_key(listing.id, generations[listing.id], start_date, end_date)] = part
+        cache.set_many(computed, COMBINED_CACHE_TIMEOUT)
+        logger.debug("[COMBINED] Ricalcolati %s contributi per %s - %s", len(computed), start_date, end_date)
+    return parts
+
+
+def _empty_state(start_date: date, end_date: date) -> Dict:
+    return {
+        'generations': {},
+        'blocked_counts': Counter(),
+        'price_sums': [Decimal('0.00')] * (end_date - start_date).days,
+        'min_stays': {},
+        'gap_days': {},
+    }
+
+
+def _apply(state: Dict, listing_id, part: Dict, sign: int) -> None:
+    """Aggiunge (sign=1) o sottrae (sign=-1) il contributo di un listing dallo stato."""
+    for day in part['blocked']:
+        state['blocked_counts'][day] += sign
+    sums = state['price_sums']
+    for offset, price in enumerate(part['prices']):
+        sums[offset] += sign * price
+    if sign > 0:
+        state['min_stays'][listing_id] = part['min_stay']
+        state['gap_days'][listing_id] = part['gap_days']
+    else:
+        state['min_stays'].pop(listing_id, None)
+        state['gap_days'].pop(listing_id, None)
+
+
+def _update_state(state: Optional[Dict], generations: Dict, start_date: date, end_date: date) -> Dict:
+    """
+    Porta lo stato aggregato alle generazioni correnti.
+
+    Sottrae i contributi dei listing cambiati o usciti dai gruppi e aggiunge
+    quelli nuovi; se un contributo vecchio non è più in cache ricostruisce
+    lo stato da zero.
+    """
+    if state is not None:
+        old = state['generations']
+        outdated = {listing_id: generation for listing_id, generation in old.items()
+                    if generations.get(listing_id) != generation}
+        old_parts = _get_contributions(outdated, start_date, end_date, compute_missing=False)
+        if len(old_parts) < len(outdated):
+            state = None
+
+    if state is None:
+        state = _empty_state(start_date, end_date)
+        old_parts = {}
+
+    changed = {listing_id: generation for listing_id, generation in generations.items()
+               if state['generations'].get(listing_id) != generation}
+    new_parts = _get_contributions(changed, start_date, end_date)
+
+    for listing_id, part in old_parts.items():
+        _apply(state, listing_id, part, -1)
+        del state['generations'][listing_id]
+    for listing_id, part in new_parts.items():
+        _apply(state, listing_id, part, 1)
+        state['generations'][listing_id] = generations[listing_id]
+
+    # Listing scomparsi dal database tra la lettura dei gruppi e il ricalcolo
+    state['generations'] = {
+        listing_id: generation for listing_id, generation in state['generations'].items()
+        if listing_id in new_parts or listing_id not in changed
+    }
+    return state
+
+
+def _serialize(state: Dict, start_date: date) -> Dict:
+    blocked = {day for day, count in state['blocked_counts'].items() if count > 0}
+
+    # Somma prezzi: nascondi prezzi per date bloccate
+    prices = {}
+    for offset, total_price in enumerate(state['price_sums']):
+        date_str = (start_date + timedelta(days=offset)).isoformat()
+        if date_str not in blocked and total_price > 0:
+            prices[date_str] = float(total_price)
+
+    return {
+        'blocked_dates': sorted(blocked),
+        # In modalità combinata, non usiamo checkin/checkout disabled
+        'checkin_disabled': [],
+        'checkout_disabled': [],
+        'prices': prices,
+        # Usa il min_stay e gap più restrittivo (il massimo)
+        'min_stay': max(state['min_stays'].values(), default=1),
+        'gap_days': max(state['gap_days'].values(), default=0),
+    }
+
+
+def get_combined_calendar(start_date: date, end_date: date, listing_ids: Iterable[int]) -> Dict:
+    """
+    Calendario aggregato di più listing per la finestra [start_date, end_date).
+
+    Una data è bloccata se almeno un listing la blocca; i prezzi sono sommati
+    e mostrati solo per le date libere.
+
+    Args:
+        start_date: Data inizio
+        end_date: Data fine (esclusa dai prezzi)
+        listing_ids: Listing da aggregare
+
+    Returns:
+        Dict con blocked_dates, checkin_disabled, checkout_disabled, prices,
+        min_stay e gap_days
+    """
+    generations = get_calendar_generations(list(listing_ids))
+    key = _state_key(start_date, end_date)
+    state = cache.get(key)
+    record_cache_access(state is not None and state['generations'] == generations)
+
+    if state is None or state['generations'] != generations:
+        state = _update_state(state, generations, start_date, end_date)
+        cache.set(key, state, COMBINED_CACHE_TIMEOUT)
+
+    return _serialize(state, start_date)
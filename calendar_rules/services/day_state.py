@@ -0,0 +1,151 @@
+# calendar_rules/services/day_state.py
+"""
+Mappa compatta dello stato di ogni giorno di una finestra calendario.
+
+Ogni giorno è un byte di un array('B') indicizzato per offset dal primo giorno;
+ogni bit è un flag (occupato, gap, check-in vietato, ...). Le regole vengono
+applicate come operazioni su slice (OR del flag su un intervallo contiguo)
+e le stringhe ISO vengono create solo in fase di serializzazione.
+"""
+
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+OCCUPIED = 1 << 0          # Notte occupata da prenotazione o chiusura
+GAP = 1 << 1               # Giorno di gap / soggiorno troppo corto
+NO_CHECKIN = 1 << 2        # Check-in vietato da regola su data specifica
+NO_CHECKOUT = 1 << 3       # Check-out vietato da regola su data specifica
+MIN_STAY_BLOCKED = 1 << 4  # Check-in vietato dalla combinazione gap + min_nights
+CHECKIN = 1 << 5           # Check-in di una prenotazione esistente
+CHECKOUT = 1 << 6          # Check-out di una prenotazione esistente
+CLOSED = 1 << 7            # Notte chiusa da ClosureRule (è anche OCCUPIED)
+
+# Tabelle di traduzione byte -> byte | flag, usate per l'OR su slice
+_OR_TABLES = {}
+
+
+def _or_table(flag: int) -> bytes:
+    table = _OR_TABLES.get(flag)
+    if table is None:
+        table = bytes((value | flag) & 0xFF for value in range(256))
+        _OR_TABLES[flag] = table
+    return table
+
+
+class DayStateMap:
+    """
+    Bitmask dello stato dei giorni nella finestra [start_date, end_date].
+    """
+
+    def __init__(self, start_date: date, end_date: date):
+        """
+        Args:
+            start_date: Primo giorno della finestra (incluso)
+            end_date: Ultimo giorno della finestra (incluso)
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.days = max((end_date - start_date).days + 1, 0)
+        self._states = array('B', bytes(self.days))
+
+    def mark(self, flag: int, first: date, last: date) -> None:
+        """
+        Imposta flag su tutti i giorni da first a last inclusi.
+
+        L'intervallo viene troncato alla finestra; intervalli vuoti sono ignorati.
+        """
+        lo = max((first - self.start_date).days, 0)
+        hi = min((last - self.start_date).days, self.days - 1)
+        if lo > hi:
+            return
+        chunk = self._states[lo:hi + 1].tobytes().translate(_or_table(flag))
+        self._states[lo:hi + 1] = array('B', chunk)
+
+    def mark_day(self, flag: int, day: date) -> None:
+        """Imposta flag su un singolo giorno (ignorato se fuori finestra)."""
+        offset = (day - self.start_date).days
+        if 0 <= offset < self.days:
+            self._states[offset] |= flag
+
+    def mark_weekday(self, flag: int, weekday: int) -> None:
+        """
+        Imposta flag su tutti i giorni della finestra con quel giorno della settimana.
+
+        Usa uno slice con passo 7, senza scorrere i giorni uno per uno.
+
+        Args:
+            flag: Flag da impostare
+            weekday: 0=Lunedì, 6=Domenica
+        """
+        first = (weekday - self.start_date.weekday()) % 7
+        if first >= self.days:
+            return
+        chunk = self._states[first::7].tobytes().translate(_or_table(flag))
+        self._states[first::7] = array('B', chunk)
+
+    def has(self, flag: int, day: date) -> bool:
+        """True se il giorno ha il flag impostato."""
+        offset = (day - self.start_date).days
+        return 0 <= offset < self.days and bool(self._states[offset] & flag)
+
+    def items(self) -> Iterator[Tuple[date, int]]:
+        """(data, bitmask) per ogni giorno della finestra."""
+        start = self.start_date
+        for offset, state in enumerate(self._states):
+            yield start + timedelta(days=offset), state
+
+    def dates_by_flag(self, flags: Iterable[int]) -> Dict[int, List[str]]:
+        """
+        Serializza in un solo passaggio le date ISO (ordinate) di ogni flag.
+
+        Args:
+            flags: Flag da estrarre
+
+        Returns:
+            Dict {flag: [date ISO]}
+        """
+        flags = tuple(flags)
+        result: Dict[int, List[str]] = {flag: [] for flag in flags}
+        mask = 0
+        for flag in flags:
+            mask |= flag
+
+        start = self.start_date
+        for offset, state in enumerate(self._states):
+            if not state & mask:
+                continue
+            iso = (start + timedelta(days=offset)).isoformat()
+            for flag in flags:
+                if state & flag:
+                    result[flag].append(iso)
+        return result
+
+    def ranges(self, flag: int) -> List[Dict[str, str]]:
+        """
+        Serializza i giorni con flag come range contigui {'from', 'to'}.
+
+        I range adiacenti sono già fusi, come in RangeConsolidator.
+        """
+        result: List[Dict[str, str]] = []
+        run_start = None
+        start = self.start_date
+
+        for offset, state in enumerate(self._states):
+            if state & flag:
+                if run_start is None:
+                    run_start = offset
+            elif run_start is not None:
+                result.append({
+                    'from': (start + timedelta(days=run_start)).isoformat(),
+                    'to': (start + timedelta(days=offset - 1)).isoformat(),
+                })
+                run_start = None
+
+        if run_start is not None:
+            result.append({
+                'from': (start + timedelta(days=run_start)).isoformat(),
+                'to': (start + timedelta(days=self.days - 1)).isoformat(),
+            })
+        return result
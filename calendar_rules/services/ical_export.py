@@ -0,0 +1,190 @@
+# calendar_rules/services/ical_export.py
+"""
+Export iCal del calendario di un listing, interrogato periodicamente dagli OTA.
+
+Il feed serializzato viene salvato nella cache condivisa (vedi
+shared_cache) con una chiave che include la generazione calendario del
+listing (vedi calendar_cache): viene rigenerato solo quando cambiano
+prenotazioni, chiusure o impostazioni del listing, oppure al cambio di
+giorno. Insieme al feed si salva il suo ETag forte, così le richieste
+servite dalla cache non leggono il database.
+
+Come per gli export degli OTA, l'URL del feed contiene un token non
+indovinabile per listing (ical_export_token), verificato prima di qualsiasi
+accesso a cache o database; vengono esportati solo i listing attivi.
+"""
+
+import hashlib
+import logging
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from Rhome_book.metrics import record_cache_access
+
+from .calendar_cache import calendar_cache_key
+from .shared_cache import get_shared_cache
+
+logger = logging.getLogger('calendar_debug')
+
+ACTIVE_BOOKING_STATUSES = ['pending', 'confirmed']
+
+# Finestra esportata: prenotazioni e chiusure fino a 2 anni avanti
+EXPORT_HORIZON_DAYS = 730
+EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+PRODID = '-//RhomeBook//Calendario//IT'
+TOKEN_SALT = 'calendar_rules.ical_export'
+UID_DOMAIN = 'rhomebook'
+
+
+def _fold(line: str) -> str:
+    # Le righe oltre 75 ottetti vanno piegate (RFC 5545, 3.1)
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _escape_text(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _vevent(uid: str, start: date, end: date, summary: str, stamp: str) -> str:
+    return (
+        'BEGIN:VEVENT\r\n'
+        f'UID:{uid}\r\n'
+        f'DTSTAMP:{stamp}\r\n'
+        f'DTSTART;VALUE=DATE:{start:%Y%m%d}\r\n'
+        f'DTEND;VALUE=DATE:{end:%Y%m%d}\r\n'
+        f'SUMMARY:{summary}\r\n'
+        'STATUS:CONFIRMED\r\n'
+        'TRANSP:OPAQUE\r\n'
+        'END:VEVENT\r\n'
+    )
+
+
+def build_ical_feed(listing, today: date) -> bytes:
+    """
+    Serializza il feed iCal di un listing.
+
+    Esporta solo le date occupate (nessun dato degli ospiti): le prenotazioni
+    attive con check-out da oggi in poi e le chiusure non ancora terminate.
+    DTEND è esclusivo, come da RFC 5545: per le prenotazioni è il giorno di
+    check-out, per le chiusure il giorno successivo all'ultima notte chiusa.
+
+    Args:
+        listing: Listing da esportare
+        today: Primo giorno del feed
+
+    Returns:
+        Feed in bytes UTF-8
+    """
+    from bookings.models import Booking
+    from ..models import ClosureRule
+
+    horizon = today + timedelta(days=EXPORT_HORIZON_DAYS)
+    stamp = f'{today:%Y%m%d}T000000Z'
+
+    events: List[Tuple[date, str]] = []
+    for booking_id, check_in, check_out in Booking.objects.filter(
+        listing_id=listing.id,
+        status__in=ACTIVE_BOOKING_STATUSES,
+        check_out_date__gt=today,
+        check_in_date__lt=horizon
+    ).values_list('id', 'check_in_date', 'check_out_date'):
+        events.append((check_in, _vevent(f'booking-{booking_id}@{UID_DOMAIN}', check_in, check_out, 'Reserved', stamp)))
+
+    for closure_id, start, end in ClosureRule.objects.filter(
+        listing_id=listing.id,
+        end_date__gte=today,
+        start_date__lt=horizon
+    ).values_list('id', 'start_date', 'end_date'):
+        events.append((start, _vevent(
+            f'closure-{closure_id}@{UID_DOMAIN}', start, end + timedelta(days=1), 'Not available', stamp
+        )))
+
+    # Ordine stabile: stesso contenuto, stessi byte, stesso ETag
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    parts = [
+        'BEGIN:VCALENDAR\r\n',
+        'VERSION:2.0\r\n',
+        f'PRODID:{PRODID}\r\n',
+        'CALSCALE:GREGORIAN\r\n',
+        'METHOD:PUBLISH\r\n',
+        _fold(f'X-WR-CALNAME:{_escape_text(listing.title)}'),
+    ]
+    parts.extend(vevent for _, vevent in events)
+    parts.append('END:VCALENDAR\r\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def ical_export_token(listing_id) -> str:
+    """Token dell'URL di export del listing (HMAC dell'ID con SECRET_KEY)."""
+    return salted_hmac(TOKEN_SALT, str(listing_id)).hexdigest()[:32]
+
+
+def check_ical_export_token(listing_id, token: str) -> bool:
+    """True se token è quello del listing."""
+    return constant_time_compare(ical_export_token(listing_id), token)
+
+
+def ical_export_path(listing_id) -> str:
+    """Percorso dell'export iCal del listing, da comunicare agli OTA."""
+    return reverse('calendar:ical-export', args=[listing_id, ical_export_token(listing_id)])
+
+
+def get_ical_feed(listing_id) -> Optional[Tuple[bytes, str]]:
+    """
+    Restituisce il feed iCal del listing e il suo ETag forte, dalla cache se valido.
+
+    Il listing viene letto solo quando il feed va rigenerato: modifica e
+    cancellazione del listing incrementano la generazione, quindi un feed in
+    cache implica che il listing esiste ed è ancora attivo. Il chiamante deve
+    aver verificato il token (check_ical_export_token): la chiave crea la
+    generazione del listing nella cache condivisa.
+
+    Args:
+        listing_id: ID del listing da esportare
+
+    Returns:
+        Tuple (feed in bytes, ETag tra virgolette), o None se il listing non
+        esiste o non è attivo
+    """
+    from listings.models import Listing
+
+    today = date.today()
+    key = calendar_cache_key(listing_id, today, today + timedelta(days=EXPORT_HORIZON_DAYS), prefix='ical')
+    cache = get_shared_cache()
+    cached = cache.get(key)
+    record_cache_access(cached is not None)
+    if cached is not None:
+        return cached
+
+    listing = Listing.objects.filter(pk=listing_id, status='active').only('id', 'title').first()
+    if listing is None:
+        return None
+
+    body = build_ical_feed(listing, today)
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    cache.set(key, (body, etag), EXPORT_CACHE_TIMEOUT)
+    logger.debug("[ICAL] Feed export rigenerato per listing %s: %s bytes", listing_id, len(body))
+    return body, etag
+
+
+def iter_chunks(body: bytes, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Divide il feed in blocchi per StreamingHttpResponse."""
+    for offset in range(0, len(body), chunk_size):
+        yield body[offset:offset + chunk_size]
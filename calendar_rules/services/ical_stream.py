@@ -0,0 +1,201 @@
+# calendar_rules/services/ical_stream.py
+"""
+Parser iCal in streaming per i feed dei calendari esterni.
+
+Legge il feed a blocchi (ad es. response.iter_content()), ricompone le righe
+piegate (RFC 5545, 3.1) e produce un evento per ogni VEVENT senza costruire
+l'albero completo del calendario: la memoria usata resta limitata al blocco
+corrente e al VEVENT in lettura, anche per export di più anni.
+
+Vengono letti solo DTSTART, DTEND, UID, STATUS e SUMMARY, che sono le
+proprietà usate dalla sincronizzazione.
+"""
+
+import codecs
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from django.utils import timezone
+
+from .exceptions import CalendarServiceError
+
+
+class ICalEvent(NamedTuple):
+    """Evento letto da un VEVENT."""
+    start: date
+    end: date
+    uid: str
+    status: str
+    summary: str
+
+
+Chunk = Union[bytes, str]
+
+_WANTED = {'DTSTART', 'DTEND', 'UID', 'STATUS', 'SUMMARY'}
+
+
+def _iter_physical_lines(chunks: Iterable[Chunk]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        if '\n' not in text:
+            pending += text
+            continue
+        lines = (pending + text).split('\n')
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_unfolded_lines(chunks: Iterable[Chunk]) -> Iterator[str]:
+    """
+    Restituisce le righe logiche del feed, con le righe piegate già unite.
+
+    Args:
+        chunks: Blocchi del feed (bytes UTF-8 o str), di qualunque dimensione
+
+    Yields:
+        Righe senza terminatore
+    """
+    current: Optional[str] = None
+    for line in _iter_physical_lines(chunks):
+        if line.endswith('\r'):
+            line = line[:-1]
+        if line[:1] in (' ', '\t'):
+            # Continuazione della riga precedente
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        elif current is None:
+            line = line.lstrip('\ufeff')
+        current = line
+    if current:
+        yield current
+
+
+def split_property(line: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Divide una riga di contenuto in (NOME, parametri, valore).
+
+    I due punti dentro valori di parametro tra virgolette
+    (es. TZID="America/New_York") non chiudono il nome.
+
+    Returns:
+        Tupla (nome maiuscolo, parametri, valore) o None se la riga non è valida
+    """
+    colon = line.find(':')
+    if colon < 0:
+        return None
+    if '"' in line[:colon]:
+        in_quotes = False
+        for index, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ':' and not in_quotes:
+                colon = index
+                break
+        else:
+            return None
+    name, _, params = line[:colon].partition(';')
+    return name.upper(), params, line[colon + 1:]
+
+
+def parse_date_value(value: str) -> date:
+    """
+    Converte il valore di DTSTART/DTEND in data.
+
+    - VALUE=DATE (20260105): la data così com'è
+    - Datetime UTC (20260105T100000Z): data nel fuso orario del progetto
+    - Datetime con TZID o floating (20260105T100000): data locale dell'evento
+
+    Raises:
+        ValueError: Se il valore non è una data iCal
+    """
+    value = value.strip()
+    if len(value) < 8 or not value[:8].isdigit():
+        raise ValueError(f"Data iCal non valida: {value!r}")
+    day = date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    if value.endswith('Z') and len(value) >= 15 and value[8] == 'T':
+        moment = datetime(
+            day.year, day.month, day.day,
+            int(value[9:11]), int(value[11:13]), int(value[13:15]),
+            tzinfo=dt_timezone.utc
+        )
+        return timezone.localtime(moment).date()
+    return day
+
+
+def _unescape_text(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def iter_vevents(chunks: Iterable[Chunk]) -> Iterator[ICalEvent]:
+    """
+    Legge i VEVENT del feed in streaming.
+
+    Gli eventi senza DTSTART o DTEND vengono ignorati. Le proprietà dei
+    componenti annidati (es. VALARM) non sovrascrivono quelle dell'evento.
+
+    Args:
+        chunks: Blocchi del feed (es. response.iter_content())
+
+    Yields:
+        ICalEvent(start, end, uid, status, summary)
+
+    Raises:
+        CalendarServiceError: Se il feed è troncato o contiene date non valide
+    """
+    in_event = False
+    nested = 0
+    props = {}
+
+    for line in iter_unfolded_lines(chunks):
+        parsed = split_property(line)
+        if parsed is None:
+            continue
+        name, _, value = parsed
+
+        if name == 'BEGIN':
+            if in_event:
+                nested += 1
+            elif value.strip().upper() == 'VEVENT':
+                in_event = True
+                props = {}
+            continue
+
+        if name == 'END':
+            if not in_event:
+                continue
+            if nested:
+                nested -= 1
+                continue
+            in_event = False
+            if 'DTSTART' in props and 'DTEND' in props:
+                try:
+                    start = parse_date_value(props['DTSTART'])
+                    end = parse_date_value(props['DTEND'])
+                except ValueError as e:
+                    raise CalendarServiceError(str(e))
+                yield ICalEvent(
+                    start=start,
+                    end=end,
+                    uid=props.get('UID', '').strip(),
+                    status=props.get('STATUS', '').strip().upper(),
+                    summary=_unescape_text(props.get('SUMMARY', '')),
+                )
+            continue
+
+        if in_event and not nested and name in _WANTED:
+            props[name] = value
+
+    if in_event:
+        # Un feed troncato non deve far sparire le prenotazioni successive
+        raise CalendarServiceError("Feed iCal troncato: VEVENT non chiuso")
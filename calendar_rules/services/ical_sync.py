@@ -5,8 +5,12 @@ Scarica i file iCal, li parsa e crea ClosureRule per bloccare le date occupate.
 
 import logging
 import requests
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, datetime, timedelta
-from typing import List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Optional, Union
+from urllib.parse import urlsplit
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 
@@ -19,9 +23,46 @@ except ImportError:
 
 from ..models import ExternalCalendar, ClosureRule
 from .exceptions import CalendarServiceError
+from .ical_stream import ICalEvent, iter_vevents
 
 logger = logging.getLogger('calendar_debug')
 
+# Download paralleli di default e massimo per singolo host (per non martellare un OTA)
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST_LIMIT = 2
+
+# Dimensione dei blocchi letti dalla risposta HTTP dal parser in streaming
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+BOOKING_KEYWORDS = ['RESERVED', 'BOOKED', 'OCCUPIED', 'BLOCKED', 'RENTAL']
+
+# Periodo bloccato importato: (data inizio, data fine, UID evento o '')
+BlockedRange = Tuple[date, date, str]
+
+
+class FetchResult(NamedTuple):
+    """
+    Risultato di ICalSyncService.fetch().
+    
+    ETag e Last-Modified restano qui finché apply() non ha aggiornato le
+    ClosureRule: se parsing o applicazione falliscono non vengono salvati.
+    """
+    blocked_ranges: Optional[List[BlockedRange]]  # None se HTTP 304
+    etag: str = ''
+    last_modified: str = ''
+
+
+def use_streaming_parser() -> bool:
+    """
+    True se usare il parser in streaming; con ICAL_STREAMING_PARSER = False
+    nei settings si torna al parser della libreria icalendar.
+    """
+    return getattr(settings, 'ICAL_STREAMING_PARSER', True)
+
+
+def _parser_unavailable() -> bool:
+    return not use_streaming_parser() and not ICALENDAR_AVAILABLE
+
 
 class ICalSyncService:
     """
@@ -38,6 +79,11 @@ class ICalSyncService:
         self.external_calendar = external_calendar
         self.listing = external_calendar.listing
     
+    @property
+    def host(self) -> str:
+        """Host dell'URL iCal, usato per limitare i download paralleli."""
+        return urlsplit(self.external_calendar.ical_url).netloc.lower()
+    
     def sync(self) -> Tuple[bool, Optional[str]]:
         """
         Sincronizza il calendario esterno.
@@ -45,7 +91,7 @@ class ICalSyncService:
         Returns:
             Tuple (success, error_message)
         """
-        if not ICALENDAR_AVAILABLE:
+        if _parser_unavailable():
             return False, "Libreria icalendar non installata. Esegui: pip install icalendar"
         
         if not self.external_calendar.is_active:
@@ -53,46 +99,113 @@ class ICalSyncService:
             return False, "Calendario non attivo"
         
         try:
-            # Scarica il file iCal
-            ical_data = self._download_ical()
-            
-            # Parsa il file iCal
-            blocked_ranges = self._parse_ical(ical_data)
-            
-            # Aggiorna le ClosureRule
-            self._update_closure_rules(blocked_ranges)
-            
-            # Aggiorna lo stato della sincronizzazione
-            self.external_calendar.last_sync = timezone.now()
-            self.external_calendar.last_sync_status = 'success'
-            self.external_calendar.last_sync_error = ''
-            self.external_calendar.save()
-            
-            logger.info(f"[ICAL] Sincronizzazione completata per {self.external_calendar.name}: {len(blocked_ranges)} periodi bloccati")
+            self.apply(self.fetch())
             return True, None
             
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"[ICAL] Errore sincronizzazione {self.external_calendar.name}: {error_msg}")
-            
-            # Salva l'errore
-            self.external_calendar.last_sync = timezone.now()
-            self.external_calendar.last_sync_status = 'error'
-            self.external_calendar.last_sync_error = error_msg
-            self.external_calendar.save()
-            
+            self.record_error(error_msg)
             return False, error_msg
     
-    def _download_ical(self) -> bytes:
+    def fetch(self) -> FetchResult:
+        """
+        Scarica e parsa il calendario esterno, senza accedere al database.
+        
+        Può essere eseguito in un thread separato: il risultato va poi passato
+        ad apply() nel thread che possiede la connessione al database.
+        
+        Returns:
+            FetchResult con i periodi bloccati (start, end, uid), oppure con
+            blocked_ranges None se il calendario non è cambiato dall'ultimo
+            download (HTTP 304), più ETag e Last-Modified della risposta
+            
+        Raises:
+            CalendarServiceError: Se download o parsing falliscono
+        """
+        response = self._download_ical()
+        if response is None:
+            return FetchResult(None)
+        with response:
+            if use_streaming_parser():
+                blocked_ranges = self._parse_ical(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE))
+            else:
+                blocked_ranges = self._parse_ical(response.content)
+        return FetchResult(
+            blocked_ranges,
+            etag=response.headers.get('ETag', '')[:255],
+            last_modified=response.headers.get('Last-Modified', '')[:64],
+        )
+    
+    def apply(self, result: FetchResult) -> None:
+        """
+        Applica il risultato di fetch(): aggiorna le ClosureRule e lo stato
+        della sincronizzazione.
+        
+        ETag e Last-Modified vengono salvati solo dopo l'aggiornamento delle
+        ClosureRule, così una sincronizzazione fallita non porta a un 304 la
+        volta successiva.
+        
+        Args:
+            result: Risultato di fetch()
+        """
+        blocked_ranges = result.blocked_ranges
+        if blocked_ranges is not None:
+            self._update_closure_rules(blocked_ranges)
+            self.external_calendar.etag = result.etag
+            self.external_calendar.last_modified = result.last_modified
+        
+        # Aggiorna lo stato della sincronizzazione
+        self.external_calendar.last_sync = timezone.now()
+        self.external_calendar.last_sync_status = 'success'
+        self.external_calendar.last_sync_error = ''
+        self.external_calendar.save()
+        
+        if blocked_ranges is None:
+            logger.info(f"[ICAL] Calendario {self.external_calendar.name} non modificato (304), nessun aggiornamento")
+        else:
+            logger.info(f"[ICAL] Sincronizzazione completata per {self.external_calendar.name}: {len(blocked_ranges)} periodi bloccati")
+    
+    def record_error(self, error_msg: str) -> None:
+        """
+        Salva l'errore dell'ultima sincronizzazione.
+        
+        ETag e Last-Modified vengono azzerati: il prossimo tentativo scarica
+        di nuovo l'intero calendario invece di ricevere un 304.
+        
+        Args:
+            error_msg: Messaggio di errore
+        """
+        logger.error(f"[ICAL] Errore sincronizzazione {self.external_calendar.name}: {error_msg}")
+        
+        self.external_calendar.last_sync = timezone.now()
+        self.external_calendar.last_sync_status = 'error'
+        self.external_calendar.last_sync_error = error_msg
+        self.external_calendar.etag = ''
+        self.external_calendar.last_modified = ''
+        self.external_calendar.save()
+    
+    def _download_ical(self) -> Optional[requests.Response]:
         """
         Scarica il file iCal dall'URL configurato.
         
+        Invia If-None-Match / If-Modified-Since con i valori salvati
+        dall'ultima sincronizzazione riuscita.
+        
         Returns:
-            Contenuto del file iCal in bytes
+            Risposta in streaming (il corpo viene letto dal parser), oppure
+            None se il server risponde 304 Not Modified
             
         Raises:
             CalendarServiceError: Se il download fallisce
         """
+        headers = {
+            'User-Agent': 'RhomeBook-iCal-Sync/1.0'
+        }
+        if self.external_calendar.etag:
+            headers['If-None-Match'] = self.external_calendar.etag
+        if self.external_calendar.last_modified:
+            headers['If-Modified-Since'] = self.external_calendar.last_modified
+        
         try:
             logger.info(f"[ICAL] Download iCal da {self.external_calendar.ical_url}")
             
@@ -100,76 +213,69 @@ class ICalSyncService:
             response = requests.get(
                 self.external_calendar.ical_url,
                 timeout=30,
-                headers={
-                    'User-Agent': 'RhomeBook-iCal-Sync/1.0'
-                }
+                headers=headers,
+                stream=True
             )
-            response.raise_for_status()
+            if response.status_code == 304:
+                response.close()
+                return None
+            if not response.ok:
+                response.close()
+                response.raise_for_status()
             
-            logger.info(f"[ICAL] Download completato: {len(response.content)} bytes")
-            return response.content
+            logger.info(f"[ICAL] Download avviato: {response.headers.get('Content-Length', '?')} bytes")
+            return response
             
         except requests.exceptions.RequestException as e:
             raise CalendarServiceError(f"Errore download iCal: {str(e)}")
     
-    def _parse_ical(self, ical_data: bytes) -> List[Tuple[date, date]]:
+    def _parse_ical(self, ical_data: Union[bytes, Iterable[bytes]]) -> List[BlockedRange]:
         """
         Parsa il file iCal e estrae i periodi bloccati.
         
         Args:
-            ical_data: Contenuto del file iCal in bytes
+            ical_data: Contenuto del file iCal in bytes, o iteratore di blocchi
+                (es. response.iter_content()) per il parser in streaming
             
         Returns:
-            Lista di tuple (start_date, end_date) per i periodi bloccati
+            Lista di tuple (start_date, end_date, uid) per i periodi bloccati
             
         Raises:
             CalendarServiceError: Se il parsing fallisce
         """
         try:
-            # Parsa il calendario iCal
-            calendar = Calendar.from_ical(ical_data)
+            if use_streaming_parser():
+                events = iter_vevents([ical_data] if isinstance(ical_data, bytes) else ical_data)
+            else:
+                if not isinstance(ical_data, bytes):
+                    ical_data = b''.join(ical_data)
+                events = self._iter_icalendar_events(ical_data)
             
-            blocked_ranges: List[Tuple[date, date]] = []
+            blocked_ranges: List[BlockedRange] = []
             
-            # Itera su tutti gli eventi nel calendario
-            for component in calendar.walk('VEVENT'):
-                # Estrai date inizio e fine
-                dtstart = component.get('dtstart')
-                dtend = component.get('dtend')
-                
-                if not dtstart or not dtend:
-                    continue
-                
-                # Converti in date Python
-                start_date = self._to_date(dtstart.dt)
-                end_date = self._to_date(dtend.dt)
-                
-                # Salta eventi nel passato (oltre 1 anno fa)
-                if end_date < date.today() - timedelta(days=365):
-                    continue
-                
-                # Salta eventi troppo nel futuro (oltre 2 anni)
-                if start_date > date.today() + timedelta(days=730):
+            # Finestra calcolata una sola volta: salta eventi nel passato
+            # (oltre 1 anno fa) e troppo nel futuro (oltre 2 anni)
+            today = date.today()
+            oldest_end = today - timedelta(days=365)
+            latest_start = today + timedelta(days=730)
+            
+            for event in events:
+                if event.end < oldest_end or event.start > latest_start:
                     continue
                 
-                # Estrai status e summary per determinare se è una prenotazione
-                status = str(component.get('status', '')).upper()
-                summary = str(component.get('summary', '')).upper()
-                
                 # Considera come prenotazione se:
                 # - Status è CONFIRMED o mancante
                 # - Summary contiene parole chiave come "RESERVED", "BOOKED", "OCCUPIED", ecc.
                 # - O se non c'è status/summary, assumiamo che sia una prenotazione
+                summary = event.summary.upper()
                 is_booking = (
-                    status in ['CONFIRMED', ''] or
-                    any(keyword in summary for keyword in ['RESERVED', 'BOOKED', 'OCCUPIED', 'BLOCKED', 'RENTAL'])
+                    event.status in ['CONFIRMED', ''] or
+                    any(keyword in summary for keyword in BOOKING_KEYWORDS)
                 )
                 
                 if is_booking:
-                    # Aggiungi 1 giorno alla fine per includere il giorno di check-out
-                    # (iCal tipicamente include solo fino al check-out escluso)
-                    blocked_ranges.append((start_date, end_date))
-                    logger.debug(f"[ICAL] Prenotazione trovata: {start_date} -> {end_date}")
+                    # iCal include solo fino al check-out escluso: DTEND è già il giorno di check-out
+                    blocked_ranges.append((event.start, event.end, event.uid[:255]))
             
             logger.info(f"[ICAL] Parsing completato: {len(blocked_ranges)} periodi bloccati trovati")
             return blocked_ranges
@@ -177,98 +283,256 @@ class ICalSyncService:
         except Exception as e:
             raise CalendarServiceError(f"Errore parsing iCal: {str(e)}")
     
-    def _to_date(self, dt) -> date:
+    @staticmethod
+    def _iter_icalendar_events(ical_data: bytes) -> Iterator[ICalEvent]:
+        """
+        Eventi letti con la libreria icalendar (costruisce l'intero calendario in memoria).
+        
+        Args:
+            ical_data: Contenuto del file iCal in bytes
+        """
+        calendar = Calendar.from_ical(ical_data)
+        
+        for component in calendar.walk('VEVENT'):
+            dtstart = component.get('dtstart')
+            dtend = component.get('dtend')
+            
+            if not dtstart or not dtend:
+                continue
+            
+            yield ICalEvent(
+                start=ICalSyncService._to_date(dtstart.dt),
+                end=ICalSyncService._to_date(dtend.dt),
+                uid=str(component.get('uid', '')).strip(),
+                status=str(component.get('status', '')).upper(),
+                summary=str(component.get('summary', '')),
+            )
+    
+    @staticmethod
+    def _to_date(dt) -> date:
         """
         Converte un datetime/date in date Python.
         
+        I datetime UTC vengono convertiti nel fuso orario del progetto, gli
+        altri (con TZID o floating) usano la data locale dell'evento.
+        
         Args:
             dt: datetime o date da convertire
             
         Returns:
             date Python
         """
-        if isinstance(dt, date):
-            return dt
-        elif isinstance(dt, datetime):
+        if isinstance(dt, datetime):
+            if dt.tzinfo is not None and dt.utcoffset() == timedelta(0):
+                dt = timezone.localtime(dt)
             return dt.date()
+        elif isinstance(dt, date):
+            return dt
         else:
             # Prova a convertire stringa
             return datetime.fromisoformat(str(dt)).date()
     
     @transaction.atomic
-    def _update_closure_rules(self, blocked_ranges: List[Tuple[date, date]]):
+    def _update_closure_rules(self, blocked_ranges: List[BlockedRange]) -> Dict[str, int]:
         """
-        Aggiorna le ClosureRule con i periodi bloccati dal calendario esterno.
+        Riconcilia le ClosureRule con i periodi bloccati dal calendario esterno.
         
-        Rimuove le ClosureRule esistenti create da questo calendario e ne crea di nuove.
+        Confronta i periodi importati con le regole già create da questo
+        calendario: crea solo i periodi nuovi, elimina quelli spariti dal feed
+        e lascia intatte le regole invariate. Gli eventi vengono abbinati per
+        (UID, start_date, end_date), poi per UID (un evento spostato aggiorna
+        le date della sua regola), infine per (start_date, end_date) quando
+        manca l'UID. Più eventi con lo stesso UID (es. eventi ricorrenti)
+        restano quindi regole distinte. La cache calendario viene invalidata
+        una sola volta, e solo se qualcosa è cambiato.
         
         Args:
-            blocked_ranges: Lista di tuple (start_date, end_date) per i periodi bloccati
+            blocked_ranges: Lista di tuple (start_date, end_date, uid) per i periodi bloccati
+            
+        Returns:
+            Dict con il numero di regole create, aggiornate, eliminate e invariate
         """
-        # Rimuovi le ClosureRule esistenti create da questo calendario
-        # Usiamo il campo is_external_booking=True e il nome del calendario nella reason
-        # per identificare le regole create da questo calendario
-        existing_rules = ClosureRule.objects.filter(
-            listing=self.listing,
-            is_external_booking=True,
-            reason__startswith=f"[{self.external_calendar.name}]"
-        )
-        count_deleted = existing_rules.count()
-        existing_rules.delete()
-        logger.info(f"[ICAL] Rimosse {count_deleted} ClosureRule esistenti")
+        # Le regole create da questo calendario sono identificate da
+        # is_external_booking=True e dal nome del calendario nella reason
+        existing_rules = {
+            rule.id: rule
+            for rule in ClosureRule.objects.filter(
+                listing=self.listing,
+                is_external_booking=True,
+                reason__startswith=f"[{self.external_calendar.name}]"
+            ).only('id', 'start_date', 'end_date', 'external_uid')
+        }
         
-        # Crea nuove ClosureRule per ogni periodo bloccato
-        created_count = 0
-        for start_date, end_date in blocked_ranges:
+        incoming = []
+        seen = set()
+        for start_date, end_date, uid in blocked_ranges:
             # Verifica che il range sia valido
             if start_date >= end_date:
                 logger.warning(f"[ICAL] Range non valido saltato: {start_date} -> {end_date}")
                 continue
-            
-            # Crea la ClosureRule
-            ClosureRule.objects.create(
-                listing=self.listing,
-                start_date=start_date,
-                end_date=end_date,
-                is_external_booking=True,
-                reason=f"[{self.external_calendar.name}] Sincronizzato da {self.external_calendar.provider}"
+            key = (uid, start_date, end_date)
+            if key not in seen:
+                seen.add(key)
+                incoming.append(key)
+        
+        by_key = {}
+        by_uid = {}
+        by_range = {}
+        for rule in existing_rules.values():
+            by_key.setdefault((rule.external_uid, rule.start_date, rule.end_date), []).append(rule)
+            if rule.external_uid:
+                by_uid.setdefault(rule.external_uid, []).append(rule)
+            by_range.setdefault((rule.start_date, rule.end_date), []).append(rule)
+        
+        matched = set()
+        to_update = []
+        
+        # 1. Abbinamento esatto per (UID, date): regola invariata
+        unmatched = []
+        for key in incoming:
+            rule = next((r for r in by_key.get(key, ()) if r.id not in matched), None)
+            if rule is None:
+                unmatched.append(key)
+            else:
+                matched.add(rule.id)
+        
+        # 2. Abbinamento per UID: evento spostato
+        moved, unmatched = unmatched, []
+        for uid, start_date, end_date in moved:
+            rule = next((r for r in by_uid.get(uid, ()) if r.id not in matched), None) if uid else None
+            if rule is None:
+                unmatched.append((uid, start_date, end_date))
+                continue
+            matched.add(rule.id)
+            rule.start_date, rule.end_date = start_date, end_date
+            to_update.append(rule)
+        
+        # 3. Abbinamento per date (regole importate senza UID o eventi senza UID)
+        to_create = []
+        for uid, start_date, end_date in unmatched:
+            rule = next(
+                (r for r in by_range.get((start_date, end_date), ())
+                 if r.id not in matched and (not r.external_uid or not uid)),
+                None
             )
-            created_count += 1
+            if rule is None:
+                to_create.append(ClosureRule(
+                    listing=self.listing,
+                    start_date=start_date,
+                    end_date=end_date,
+                    is_external_booking=True,
+                    external_uid=uid,
+                    reason=f"[{self.external_calendar.name}] Sincronizzato da {self.external_calendar.provider}"
+                ))
+                continue
+            matched.add(rule.id)
+            if uid and not rule.external_uid:
+                rule.external_uid = uid
+                to_update.append(rule)
+        
+        to_delete = [rule_id for rule_id in existing_rules if rule_id not in matched]
+        
+        if to_delete:
+            ClosureRule.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            ClosureRule.objects.bulk_update(to_update, ['start_date', 'end_date', 'external_uid'])
+        if to_create:
+            ClosureRule.objects.bulk_create(to_create)
         
-        logger.info(f"[ICAL] Create {created_count} nuove ClosureRule")
+        # bulk_create/bulk_update/delete su queryset non passano da save():
+        # una sola invalidazione per l'intera sincronizzazione
+        if to_delete or to_update or to_create:
+            ClosureRule._invalidate_calendar_cache_for_listing(self.listing.id)
+        
+        stats = {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+            'unchanged': len(matched) - len(to_update),
+        }
+        logger.info(f"[ICAL] ClosureRule riconciliate: {stats}")
+        return stats
     
     @staticmethod
-    def sync_all_active():
+    def sync_all_active(concurrency: int = DEFAULT_CONCURRENCY,
+                        per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
         """
         Sincronizza tutti i calendari esterni attivi che necessitano di sincronizzazione.
         
+        Download e parsing avvengono in parallelo su un pool di thread, con al
+        massimo per_host_limit richieste contemporanee verso lo stesso host:
+        i calendari sono raggruppati per host e il download successivo di un
+        host viene inviato al pool solo quando uno dei suoi termina, così un
+        host con molti feed non occupa thread lasciando in coda gli altri.
+        Le scritture sul database restano nel thread chiamante, man mano che
+        i download terminano.
+        
+        Args:
+            concurrency: Numero massimo di download paralleli
+            per_host_limit: Numero massimo di download paralleli per host
+        
         Returns:
             Dict con statistiche della sincronizzazione
         """
-        active_calendars = ExternalCalendar.objects.filter(is_active=True)
+        active_calendars = list(
+            ExternalCalendar.objects.filter(is_active=True).select_related('listing')
+        )
         
         stats = {
-            'total': active_calendars.count(),
+            'total': len(active_calendars),
             'synced': 0,
+            'not_modified': 0,
             'skipped': 0,
             'errors': 0,
         }
         
+        services = []
         for calendar in active_calendars:
             if not calendar.needs_sync():
                 stats['skipped'] += 1
                 logger.info(f"[ICAL] Calendario {calendar.name} non necessita sincronizzazione")
                 continue
+            services.append(ICalSyncService(calendar))
+        
+        if services and _parser_unavailable():
+            stats['errors'] += len(services)
+            logger.error("[ICAL] Libreria icalendar non installata. Esegui: pip install icalendar")
+            return stats
+        
+        # Una coda per host: al pool arrivano al massimo per_host_limit download per host
+        host_queues: Dict[str, deque] = {}
+        for service in services:
+            host_queues.setdefault(service.host, deque()).append(service)
+        
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            futures = {}
             
-            service = ICalSyncService(calendar)
-            success, error = service.sync()
+            def submit_next(host):
+                if host_queues[host]:
+                    service = host_queues[host].popleft()
+                    futures[executor.submit(service.fetch)] = service
             
-            if success:
-                stats['synced'] += 1
-            else:
-                stats['errors'] += 1
-                logger.error(f"[ICAL] Errore sincronizzazione {calendar.name}: {error}")
+            for host in host_queues:
+                for _ in range(max(per_host_limit, 1)):
+                    submit_next(host)
+            
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    service = futures.pop(future)
+                    submit_next(service.host)
+                    try:
+                        result = future.result()
+                        service.apply(result)
+                    except Exception as e:
+                        service.record_error(str(e))
+                        stats['errors'] += 1
+                        continue
+                    
+                    if result.blocked_ranges is None:
+                        stats['not_modified'] += 1
+                    else:
+                        stats['synced'] += 1
         
         logger.info(f"[ICAL] Sincronizzazione completata: {stats}")
         return stats
-
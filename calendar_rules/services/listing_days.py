@@ -0,0 +1,284 @@
+# calendar_rules/services/listing_days.py
+"""
+Manutenzione della tabella materializzata ListingDay.
+
+Lo stato dei giorni viene calcolato con le stesse regole di CalendarService
+(_build_day_states sulla DayStateMap) sull'intero orizzonte di prenotazione,
+più i divieti settimanali di check-in/out e le chiusure; prezzo e soggiorno
+minimo vengono da PriceResolver. Le righe esistenti vengono confrontate con
+quelle calcolate: si scrivono solo i giorni cambiati.
+
+Ricalcolare l'orizzonte costa quanto un anno di calendario, quindi non
+avviene nella richiesta: ogni modifica del calendario (segnale
+calendar_changed, vedi calendar_cache) accoda il listing in
+ListingDayRefresh al commit. La coda viene svuotata dal comando
+rebuild_listing_days --pending (cron ogni pochi minuti); il comando senza
+opzioni, eseguito ogni notte, ricostruisce tutti i listing e fa avanzare
+l'orizzonte.
+
+La ricerca (listing_search) usa le righe per scartare in SQL i listing con
+una notte occupata nel soggiorno, ma solo se non sono in coda: per quelli
+in attesa di aggiornamento e per i giorni senza riga decide il calcolo
+completo di BatchAvailabilityEngine.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import day_state
+from Rhome_book.transactions import on_commit_batch
+
+from .day_state import DayStateMap
+from .price_resolver import PriceResolver
+
+logger = logging.getLogger('calendar_debug')
+
+# Stessi limiti di CalendarService._validate_date_range
+HORIZON_DAYS = 365
+BATCH_SIZE = 500
+
+# Flag di CalendarService confrontati dal consistency checker
+SERVICE_FLAGS = (
+    day_state.OCCUPIED, day_state.GAP, day_state.NO_CHECKIN, day_state.NO_CHECKOUT,
+    day_state.MIN_STAY_BLOCKED, day_state.CHECKIN, day_state.CHECKOUT,
+)
+
+
+def horizon(today: Optional[date] = None) -> Tuple[date, date]:
+    """Primo e ultimo giorno (inclusi) materializzati."""
+    today = today or timezone.now().date()
+    return today, today + timedelta(days=HORIZON_DAYS)
+
+
+def compute_listing_days(listing, start_date: date, end_date: date) -> Dict[date, Tuple[int, object, int]]:
+    """
+    Calcola lo stato atteso dei giorni [start_date, end_date].
+
+    Returns:
+        Dict {data: (flags, prezzo, min_nights)}
+    """
+    from .calendar_service import CalendarService
+
+    service = CalendarService(listing)
+    calendar_data = service._get_optimized_calendar_data(start_date, end_date)
+    periods = service._prepare_periods(calendar_data, start_date, end_date)
+    states, checkin_weekdays, checkout_weekdays = service._build_day_states(
+        periods, calendar_data, start_date, end_date
+    )
+
+    for weekday in checkin_weekdays:
+        states.mark_weekday(day_state.NO_CHECKIN, weekday)
+    for weekday in checkout_weekdays:
+        states.mark_weekday(day_state.NO_CHECKOUT, weekday)
+    for closure in calendar_data['closures']:
+        states.mark(day_state.CLOSED, closure['start_date'], closure['end_date'])
+
+    resolver = PriceResolver(listing, start_date, end_date)
+    default_min_nights = listing.min_stay_nights
+    return {
+        day: (
+            flags,
+            resolver.price_for_date(day),
+            resolver.min_nights_for_date(day) or default_min_nights,
+        )
+        for day, flags in states.items()
+    }
+
+
+def refresh_listing_days(listing, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Allinea le righe ListingDay di un listing all'orizzonte corrente.
+
+    Args:
+        listing: Listing da aggiornare
+        today: Primo giorno dell'orizzonte (default: oggi)
+
+    Returns:
+        Dict con statistiche: created, updated, deleted, unchanged
+    """
+    from ..models import ListingDay
+
+    start_date, end_date = horizon(today)
+    expected = compute_listing_days(listing, start_date, end_date)
+
+    stats = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    with transaction.atomic():
+        existing = {
+            row.date: row for row in ListingDay.objects.filter(listing=listing).only(
+                'id', 'date', 'flags', 'price', 'min_nights'
+            )
+        }
+
+        stale = [row.id for day, row in existing.items() if day not in expected]
+        if stale:
+            stats['deleted'] = ListingDay.objects.filter(id__in=stale).delete()[0]
+
+        to_create: List = []
+        to_update: List = []
+        for day, (flags, price, min_nights) in expected.items():
+            row = existing.get(day)
+            if row is None:
+                to_create.append(ListingDay(
+                    listing_id=listing.id, date=day, flags=flags, price=price, min_nights=min_nights
+                ))
+            elif (row.flags, row.price, row.min_nights) != (flags, price, min_nights):
+                row.flags, row.price, row.min_nights = flags, price, min_nights
+                to_update.append(row)
+            else:
+                stats['unchanged'] += 1
+
+        ListingDay.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        ListingDay.objects.bulk_update(to_update, ['flags', 'price', 'min_nights'], batch_size=BATCH_SIZE)
+        stats['created'] = len(to_create)
+        stats['updated'] = len(to_update)
+
+    return stats
+
+
+def exclude_occupied(listings, check_in: date, check_out: date):
+    """
+    Esclude i listing che ListingDay segna occupati in una notte del soggiorno.
+
+    Si usano solo le righe dei listing non accodati in ListingDayRefresh; la
+    condizione è una subquery, nessuna query in più.
+
+    Args:
+        listings: QuerySet di Listing
+        check_in: Data di check-in
+        check_out: Data di check-out (esclusa)
+
+    Returns:
+        QuerySet filtrato
+    """
+    from django.db.models import Exists, F, OuterRef
+
+    from ..models import ListingDay, ListingDayRefresh
+
+    occupied = ListingDay.objects.filter(listing=OuterRef('pk')).window(
+        check_in, check_out - timedelta(days=1)
+    ).alias(matched=F('flags').bitand(day_state.OCCUPIED)).filter(matched__gt=0)
+    pending = ListingDayRefresh.objects.filter(listing=OuterRef('pk'))
+    return listings.exclude(Exists(occupied) & ~Exists(pending))
+
+
+def schedule_listing_days_refresh(listing_id: int) -> None:
+    """
+    Accoda il listing in ListingDayRefresh al commit della transazione corrente.
+
+    Più modifiche nella stessa transazione producono un solo INSERT per
+    tutti i listing coinvolti; i giorni vengono ricalcolati da
+    refresh_pending_listing_days.
+    """
+    on_commit_batch('listing_days', listing_id, _enqueue_listing_days)
+
+
+def _enqueue_listing_days(listing_ids) -> None:
+    from listings.models import Listing
+    from ..models import ListingDayRefresh
+
+    try:
+        existing = Listing.objects.filter(pk__in=listing_ids).values_list('pk', flat=True)
+        ListingDayRefresh.objects.bulk_create(
+            [ListingDayRefresh(listing_id=listing_id) for listing_id in existing],
+            ignore_conflicts=True,
+        )
+    except Exception as e:
+        # Il rebuild notturno riallinea la tabella: non bloccare la scrittura
+        logger.warning("Impossibile accodare l'aggiornamento ListingDay dei listing %s: %s", sorted(listing_ids), e)
+
+
+def refresh_pending_listing_days(limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Aggiorna i listing accodati in ListingDayRefresh, dal più vecchio.
+
+    La richiesta viene rimossa prima del ricalcolo: una modifica che arriva
+    durante l'aggiornamento accoda di nuovo il listing.
+
+    Args:
+        limit: Numero massimo di listing da aggiornare
+
+    Returns:
+        Dict con statistiche: listings, created, updated, deleted, unchanged
+    """
+    from listings.models import Listing
+    from ..models import ListingDayRefresh
+
+    pending = ListingDayRefresh.objects.order_by('requested_at').values_list('listing_id', flat=True)
+    if limit is not None:
+        pending = pending[:limit]
+
+    totals = {'listings': 0, 'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    for listing_id in list(pending):
+        ListingDayRefresh.objects.filter(listing_id=listing_id).delete()
+        listing = Listing.objects.filter(pk=listing_id).first()
+        if listing is None:
+            continue
+        for key, value in refresh_listing_days(listing).items():
+            totals[key] += value
+        totals['listings'] += 1
+    return totals
+
+
+def check_listing_days(listing, today: Optional[date] = None) -> List[Dict]:
+    """
+    Confronta ListingDay con l'output di CalendarService e PriceCalculator.
+
+    Il calcolo di CalendarService viene eseguito senza cache, sull'intero
+    orizzonte materializzato.
+
+    Args:
+        listing: Listing da verificare
+        today: Primo giorno dell'orizzonte (default: oggi)
+
+    Returns:
+        Lista di differenze {'date', 'field', 'expected', 'actual'} (vuota se coerente)
+    """
+    from ..models import ListingDay
+    from ..pricing import PriceCalculator
+    from .calendar_service import CalendarService
+
+    start_date, end_date = horizon(today)
+    # __wrapped__ salta il decoratore di cache
+    result = CalendarService.get_unavailable_dates.__wrapped__(CalendarService(listing), start_date, end_date)
+
+    expected = DayStateMap(start_date, end_date)
+    for blocked in result['blocked_ranges']:
+        expected.mark(day_state.OCCUPIED, date.fromisoformat(blocked['from']), date.fromisoformat(blocked['to']))
+    for key, flag in (('checkin_dates', day_state.CHECKIN), ('checkout_dates', day_state.CHECKOUT),
+                      ('gap_days', day_state.GAP), ('checkin_blocked_gap', day_state.MIN_STAY_BLOCKED)):
+        for iso in result[key]:
+            expected.mark_day(flag, date.fromisoformat(iso))
+    for key, flag in (('checkin_blocked_rules', day_state.NO_CHECKIN),
+                      ('checkout_blocked_rules', day_state.NO_CHECKOUT)):
+        for iso in result[key]['dates']:
+            expected.mark_day(flag, date.fromisoformat(iso))
+        for weekday in result[key]['weekdays']:
+            expected.mark_weekday(flag, weekday)
+
+    prices = PriceCalculator(listing).get_calendar_prices(start_date, end_date)
+    mask = 0
+    for flag in SERVICE_FLAGS:
+        mask |= flag
+
+    rows = {
+        day: (flags, price)
+        for day, flags, price in ListingDay.objects.filter(listing=listing).window(start_date, end_date)
+        .values_list('date', 'flags', 'price')
+    }
+
+    differences = []
+    for day, flags in expected.items():
+        if day not in rows:
+            differences.append({'date': day, 'field': 'row', 'expected': 'presente', 'actual': None})
+            continue
+        actual_flags, actual_price = rows[day]
+        if actual_flags & mask != flags:
+            differences.append({'date': day, 'field': 'flags', 'expected': flags, 'actual': actual_flags & mask})
+        if float(actual_price) != prices[day.isoformat()]:
+            differences.append({'date': day, 'field': 'price', 'expected': prices[day.isoformat()],
+                                'actual': float(actual_price)})
+    return differences
@@ -0,0 +1,72 @@
+# calendar_rules/services/listing_search.py
+"""
+Ricerca dei listing disponibili per un soggiorno.
+
+I candidati (attivi, con capienza sufficiente e senza notti occupate nei
+giorni materializzati aggiornati, vedi listing_days.exclude_occupied) vengono
+filtrati in SQL e valutati tutti insieme con BatchAvailabilityEngine: una
+query per tabella sull'intera finestra, poi gap, soggiorno minimo e regole di
+check-in/out in memoria. I risultati sono ordinati per prezzo totale.
+"""
+
+from datetime import date
+from typing import Dict, List
+
+from .batch_availability import BatchAvailabilityEngine
+from .listing_days import exclude_occupied
+
+# Campi del listing serializzati nei risultati (caricati con only())
+RESULT_FIELDS = (
+    'id', 'title', 'slug', 'city', 'zone', 'max_guests', 'bedrooms',
+    'base_price', 'cleaning_fee', 'included_guests', 'extra_guest_fee',
+    'gap_between_bookings', 'min_stay_nights', 'min_booking_advance', 'max_booking_advance',
+)
+
+
+def search_available_listings(check_in: date, check_out: date, num_guests: int) -> List[Dict]:
+    """
+    Listing attivi liberi dal check_in al check_out per num_guests ospiti.
+
+    Args:
+        check_in: Data di check-in
+        check_out: Data di check-out
+        num_guests: Numero di ospiti
+
+    Returns:
+        Lista di dict (listing e prezzi del soggiorno) ordinata per totale crescente
+    """
+    from listings.models import Listing
+
+    candidates = Listing.objects.filter(
+        status='active',
+        max_guests__gte=num_guests
+    ).only(*RESULT_FIELDS)
+    # Scarto anticipato dai ListingDay: meno righe da caricare nel motore
+    candidates = exclude_occupied(candidates, check_in, check_out)
+
+    engine = BatchAvailabilityEngine(candidates, check_in, check_out)
+
+    results = []
+    for listing in engine.listings.values():
+        available, _ = engine.check_availability(listing)
+        if not available:
+            continue
+        quote = engine.get_price_quote(listing, num_guests)
+        results.append({
+            'id': listing.id,
+            'title': listing.title,
+            'slug': listing.slug,
+            'city': listing.city,
+            'zone': listing.zone,
+            'max_guests': listing.max_guests,
+            'bedrooms': listing.bedrooms,
+            'nights': quote.nights,
+            'subtotal': float(quote.subtotal),
+            'cleaning_fee': float(quote.cleaning_fee),
+            'extra_guest_fee': float(quote.extra_guest_fee),
+            'total': float(quote.total),
+            'price_per_night_avg': float(quote.average_price_per_night),
+        })
+
+    results.sort(key=lambda result: (result['total'], result['id']))
+    return results
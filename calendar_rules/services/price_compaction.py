@@ -0,0 +1,242 @@
+# calendar_rules/services/price_compaction.py
+"""
+Compattazione delle PriceRule di un listing.
+
+Gli import per data lasciano migliaia di regole di un giorno, spesso
+sovrapposte a regole di periodo. Le regole con min_nights restano al loro
+posto: il loro soggiorno minimo conta anche dove sono oscurate (vedi sotto).
+Si riscrive solo lo strato di prezzo (min_nights IS NULL): con PriceResolver
+si trovano i giorni vinti da una regola di quello strato e i giorni
+consecutivi con lo stesso prezzo diventano un'unica regola. I segmenti si
+spezzano all'inizio di ogni regola con min_nights, così la priorità
+("inizio più recente vince") resta quella originale.
+
+Prima di scrivere il risultato viene verificato con le regole risultanti:
+- la risoluzione (prezzo, min_nights) di ogni giorno;
+- il soggiorno minimo aggregato sulle regole sovrapposte, comprese quelle
+  oscurate da altre: CalendarService usa il minimo dei min_nights delle
+  regole che toccano la finestra richiesta, AvailabilityChecker il minimo
+  delle regole che coprono l'intero soggiorno.
+Se anche un solo valore differisce non si modifica nulla. Lettura e
+riscrittura avvengono nella stessa transazione, con le regole bloccate
+(select_for_update, come PriceImporter).
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+
+from .price_resolver import PriceResolver
+
+logger = logging.getLogger('calendar_debug')
+
+BATCH_SIZE = 500
+
+# (start_date, end_date, price, min_nights)
+Segment = Tuple[date, date, object, object]
+
+
+def _rule_key(rule: Dict) -> Segment:
+    return rule['start_date'], rule['end_date'], rule['price'], rule['min_nights']
+
+
+def build_segments(resolver: PriceResolver, kept: List[Dict]) -> List[Segment]:
+    """
+    Segmenti minimi dello strato di prezzo.
+
+    Args:
+        resolver: Risoluzione con tutte le regole del listing
+        kept: Regole con min_nights, che restano invariate
+
+    Returns:
+        Segmenti non sovrapposti (min_nights None) che coprono i giorni vinti
+        da una regola senza min_nights
+    """
+    # Una regola mantenuta che inizia dentro un segmento lo batterebbe sui
+    # giorni successivi: il segmento riparte da quel giorno, isolato (a parità
+    # di inizio vince il range più corto) e dal giorno dopo
+    breaks = set()
+    for rule in kept:
+        breaks.update((rule['start_date'], rule['start_date'] + timedelta(days=1)))
+
+    segments = []
+    current = None
+    for offset, (custom, price, min_nights) in enumerate(resolver.day_states()):
+        if not custom or min_nights is not None:
+            current = None
+            continue
+        day = resolver.start_date + timedelta(days=offset)
+        if current is not None and current[2] == price and day not in breaks:
+            current[1] = day
+            continue
+        current = [day, day, price, None]
+        segments.append(current)
+    return [tuple(segment) for segment in segments]
+
+
+def _min_nights_cover(rules: List[Dict], start_date: date, end_date: date) -> List[List[Tuple[date, int]]]:
+    """Per ogni giorno, (end_date, min_nights) delle regole con min_nights che lo coprono."""
+    cover = [[] for _ in range((end_date - start_date).days + 1)]
+    for rule in rules:
+        if rule['min_nights'] is None:
+            continue
+        first = (max(rule['start_date'], start_date) - start_date).days
+        last = (min(rule['end_date'], end_date) - start_date).days
+        for offset in range(first, last + 1):
+            cover[offset].append((rule['end_date'], rule['min_nights']))
+    return cover
+
+
+def _min_nights_signature(cover: List[Tuple[date, int]], check_in: date, longest: int) -> Tuple:
+    """
+    Soggiorni minimi visti dai controlli di disponibilità per un giorno.
+
+    Returns:
+        (minimo delle regole che coprono il giorno, usato da CalendarService
+        come minimo sulla finestra richiesta; minimo delle regole che coprono
+        ogni soggiorno di 1..longest-1 notti che inizia nel giorno, usato da
+        AvailabilityChecker)
+    """
+    window = min((min_nights for _, min_nights in cover), default=None)
+    stays = tuple(
+        min((min_nights for end, min_nights in cover if end >= check_in + timedelta(days=nights)), default=None)
+        for nights in range(1, longest)
+    )
+    return window, stays
+
+
+def find_differences(listing, rules: List[Dict], before: PriceResolver, after_rules: List[Dict]) -> List[Dict]:
+    """
+    Confronta le regole originali con quelle risultanti, giorno per giorno.
+
+    Il minimo di CalendarService su una finestra è il minimo dei valori dei
+    suoi giorni: confrontarlo per ogni giorno basta per ogni finestra.
+
+    Returns:
+        Lista di {'date', 'field', 'expected', 'actual'}, con field 'day'
+        (prezzo e min_nights del giorno) o 'min_nights' (soggiorno minimo
+        aggregato, vedi _min_nights_signature)
+    """
+    start_date, end_date = before.start_date, before.end_date
+    after = PriceResolver(listing, start_date, end_date, rules=after_rules)
+
+    differences = []
+    for offset, (expected, actual) in enumerate(zip(before.day_states(), after.day_states())):
+        if expected != actual:
+            differences.append({
+                'date': start_date + timedelta(days=offset),
+                'field': 'day',
+                'expected': expected,
+                'actual': actual,
+            })
+
+    # Un soggiorno più lungo di ogni min_nights è sempre accettato
+    longest = max((rule['min_nights'] for rule in rules if rule['min_nights']), default=1)
+    covers = zip(
+        _min_nights_cover(rules, start_date, end_date),
+        _min_nights_cover(after_rules, start_date, end_date),
+    )
+    for offset, (cover_before, cover_after) in enumerate(covers):
+        day = start_date + timedelta(days=offset)
+        expected = _min_nights_signature(cover_before, day, longest)
+        actual = _min_nights_signature(cover_after, day, longest)
+        if expected != actual:
+            differences.append({'date': day, 'field': 'min_nights', 'expected': expected, 'actual': actual})
+
+    differences.sort(key=lambda difference: difference['date'])
+    return differences
+
+
+def compact_price_rules(listing, dry_run: bool = False) -> Dict:
+    """
+    Riscrive le PriceRule del listing come segmenti minimi non sovrapposti.
+
+    Args:
+        listing: Listing da compattare
+        dry_run: Se True calcola solo il diff senza modificare il database
+
+    Returns:
+        Dict con:
+            'before' / 'after': numero di regole prima e dopo
+            'removed': regole eliminate (start, end, prezzo, min_nights)
+            'added': segmenti creati
+            'differences': differenze tra regole e segmenti (vuoto se equivalente), vedi find_differences
+            'applied': True se il database è stato modificato
+    """
+    from ..models import ClosureRule
+
+    with transaction.atomic():
+        result = _compact(listing, dry_run)
+
+    if result['applied']:
+        # Il delete su queryset e bulk_create non passano da PriceRule.save()/delete()
+        ClosureRule._invalidate_calendar_cache_for_listing(listing.pk)
+    return result
+
+
+def _compact(listing, dry_run: bool) -> Dict:
+    from ..models import PriceRule
+
+    # Regole bloccate fino alla riscrittura: un import concorrente attende
+    rules = list(
+        PriceRule.objects.select_for_update().filter(listing=listing)
+        .order_by('id').values(*PriceResolver.RULE_FIELDS)
+    )
+    result = {
+        'before': len(rules), 'after': len(rules),
+        'removed': [], 'added': [], 'differences': [], 'applied': False,
+    }
+    if not rules:
+        return result
+
+    start_date = min(rule['start_date'] for rule in rules)
+    end_date = max(rule['end_date'] for rule in rules)
+    before = PriceResolver(listing, start_date, end_date, rules=rules)
+    kept = [rule for rule in rules if rule['min_nights'] is not None]
+    segments = build_segments(before, kept)
+
+    # Diff come multiset: le regole identiche a un segmento restano al loro posto
+    current = {}
+    for rule in rules:
+        if rule['min_nights'] is None:
+            current.setdefault(_rule_key(rule), []).append(rule)
+    after_rules = list(kept)
+    added = []
+    # I segmenti nuovi avranno id successivi a quelli esistenti (priorità a parità di range)
+    next_id = max(rule['id'] for rule in rules) + 1
+    for segment in segments:
+        matches = current.get(segment)
+        if matches:
+            after_rules.append(matches.pop())
+            continue
+        start, end, price, min_nights = segment
+        after_rules.append({'id': next_id, 'start_date': start, 'end_date': end, 'price': price, 'min_nights': min_nights})
+        next_id += 1
+        added.append(segment)
+    after_ids = {rule['id'] for rule in after_rules}
+    removed = [rule for rule in rules if rule['id'] not in after_ids]
+
+    result['after'] = len(after_rules)
+    result['removed'] = sorted(_rule_key(rule) for rule in removed)
+    result['added'] = added
+    result['differences'] = find_differences(listing, rules, before, after_rules)
+
+    if result['differences']:
+        logger.warning(
+            "Compattazione listing %s annullata: %s differenze",
+            listing.pk, len(result['differences']),
+        )
+        return result
+    if dry_run or not (removed or added):
+        return result
+
+    PriceRule.objects.filter(pk__in=[rule['id'] for rule in removed]).delete()
+    PriceRule.objects.bulk_create(
+        [PriceRule(listing=listing, start_date=start, end_date=end, price=price, min_nights=min_nights)
+         for start, end, price, min_nights in added],
+        batch_size=BATCH_SIZE,
+    )
+    result['applied'] = True
+    return result
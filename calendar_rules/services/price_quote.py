@@ -0,0 +1,101 @@
+# calendar_rules/services/price_quote.py
+"""
+Preventivo immutabile di un soggiorno.
+
+Un PriceQuote viene calcolato una sola volta da un PriceResolver (una query
+sulle PriceRule) e poi passato tra vista, verifica di disponibilità e
+Booking.save: ogni notte di una richiesta di prenotazione viene prezzata
+una volta sola.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List, Tuple
+
+from .price_resolver import PriceResolver
+
+
+@dataclass(frozen=True)
+class PriceQuote:
+    """
+    Prezzi di un soggiorno [check_in, check_out) per un listing e un numero di ospiti.
+
+    Stessa formula di CalendarManager.calculate_total_price:
+    somma delle notti + ospiti extra per notte + pulizie.
+    """
+
+    listing_id: int
+    check_in: date
+    check_out: date
+    num_guests: int
+    nightly_prices: Tuple[Decimal, ...]
+    subtotal: Decimal
+    extra_guest_fee: Decimal
+    cleaning_fee: Decimal
+
+    @classmethod
+    def from_resolver(cls, listing, resolver: PriceResolver, check_in: date, check_out: date,
+                      num_guests: int) -> 'PriceQuote':
+        """
+        Costruisce il preventivo dai prezzi già risolti (nessuna query).
+
+        Args:
+            listing: Listing del soggiorno
+            resolver: PriceResolver che copre le notti del soggiorno
+            check_in: Data di check-in
+            check_out: Data di check-out
+            num_guests: Numero di ospiti
+
+        Returns:
+            PriceQuote
+        """
+        nightly_prices = tuple(resolver.nightly_prices(check_in, check_out))
+        nights = len(nightly_prices)
+
+        extra_guest_fee = Decimal('0.00')
+        if num_guests > listing.included_guests:
+            extra_guests = num_guests - listing.included_guests
+            extra_guest_fee = extra_guests * listing.extra_guest_fee * nights
+
+        return cls(
+            listing_id=listing.id,
+            check_in=check_in,
+            check_out=check_out,
+            num_guests=num_guests,
+            nightly_prices=nightly_prices,
+            subtotal=sum(nightly_prices, Decimal('0.00')),
+            extra_guest_fee=extra_guest_fee,
+            cleaning_fee=listing.cleaning_fee,
+        )
+
+    @classmethod
+    def for_stay(cls, listing, check_in: date, check_out: date, num_guests: int) -> 'PriceQuote':
+        """Calcola il preventivo con una sola query sulle PriceRule."""
+        resolver = PriceResolver(listing, check_in, check_out - timedelta(days=1))
+        return cls.from_resolver(listing, resolver, check_in, check_out, num_guests)
+
+    @property
+    def nights(self) -> int:
+        return len(self.nightly_prices)
+
+    @property
+    def total(self) -> Decimal:
+        return self.subtotal + self.extra_guest_fee + self.cleaning_fee
+
+    @property
+    def average_price_per_night(self) -> Decimal:
+        """Media dei prezzi per notte, senza extra e pulizie."""
+        return self.subtotal / self.nights if self.nights else Decimal('0.00')
+
+    def daily_prices(self) -> List[Tuple[date, Decimal]]:
+        """[(data, prezzo)] per ogni notte del soggiorno."""
+        return [
+            (self.check_in + timedelta(days=offset), price)
+            for offset, price in enumerate(self.nightly_prices)
+        ]
+
+    def matches(self, listing_id: int, check_in: date, check_out: date, num_guests: int) -> bool:
+        """True se il preventivo è stato calcolato per questo soggiorno."""
+        return (self.listing_id, self.check_in, self.check_out, self.num_guests) == \
+            (listing_id, check_in, check_out, num_guests)
@@ -0,0 +1,162 @@
+# calendar_rules/services/price_resolver.py
+"""
+Risoluzione bulk dei prezzi per notte.
+
+Carica con una sola query tutte le PriceRule che si sovrappongono a una finestra
+di date e costruisce un array di prezzi indicizzato per giorno tramite uno sweep
+sugli intervalli, invece di eseguire due query per ogni notte.
+"""
+
+import heapq
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+
+class PriceResolver:
+    """
+    Risolve il prezzo effettivo di ogni giorno in una finestra [start_date, end_date].
+
+    Priorità ("regola più specifica vince"), identica per tutti i chiamanti:
+    1. La regola con start_date più recente (es. prezzo importato per il singolo giorno)
+    2. A parità di inizio, la regola che termina prima (range più piccolo)
+    3. A parità di range, la regola creata per ultima
+    Se nessuna regola copre il giorno si usa il prezzo base del listing.
+    """
+
+    RULE_FIELDS = ('id', 'start_date', 'end_date', 'price', 'min_nights')
+
+    def __init__(self, listing, start_date: date, end_date: date,
+                 rules: Optional[Iterable[Dict]] = None):
+        """
+        Args:
+            listing: Listing di riferimento
+            start_date: Primo giorno della finestra (incluso)
+            end_date: Ultimo giorno della finestra (incluso)
+            rules: Regole già caricate (dict con i campi di RULE_FIELDS).
+                   Se None vengono caricate con una singola query.
+        """
+        self.listing = listing
+        self.start_date = start_date
+        self.end_date = end_date
+
+        if rules is None:
+            rules = self._load_rules()
+
+        self._resolve(rules)
+
+    @classmethod
+    def rules_queryset(cls, listing, start_date: date, end_date: date):
+        """QuerySet delle regole che si sovrappongono alla finestra [start_date, end_date]."""
+        from ..models import PriceRule
+
+        return PriceRule.objects.filter(
+            listing=listing,
+            start_date__lte=end_date,
+            end_date__gte=start_date
+        ).values(*cls.RULE_FIELDS)
+
+    def _load_rules(self) -> List[Dict]:
+        """Carica con una sola query le regole che si sovrappongono alla finestra."""
+        if self.end_date < self.start_date:
+            return []
+
+        return list(self.rules_queryset(self.listing, self.start_date, self.end_date))
+
+    @staticmethod
+    def _priority(rule: Dict) -> tuple:
+        """Chiave di priorità (min-heap): la tupla più piccola vince."""
+        return (
+            -rule['start_date'].toordinal(),
+            rule['end_date'].toordinal(),
+            -(rule.get('id') or 0),
+        )
+
+    def _resolve(self, rules: Iterable[Dict]) -> None:
+        """
+        Costruisce gli array per giorno con uno sweep sugli intervalli.
+
+        Le regole vengono raggruppate per giorno di inizio (troncato alla finestra);
+        scorrendo i giorni si aggiungono a un heap ordinato per priorità e si
+        scartano in modo lazy quelle già terminate. Complessità O((R + D) log R).
+        """
+        days = max((self.end_date - self.start_date).days + 1, 0)
+        base_price = self.listing.base_price
+        window_start = self.start_date.toordinal()
+
+        starts: Dict[int, List[tuple]] = {}
+        for seq, rule in enumerate(rules):
+            first = max(rule['start_date'].toordinal() - window_start, 0)
+            last = min(rule['end_date'].toordinal() - window_start, days - 1)
+            if first > last:
+                continue
+            entry = (self._priority(rule), seq, last, rule['price'], rule.get('min_nights'))
+            starts.setdefault(first, []).append(entry)
+
+        self._prices: List[Decimal] = [base_price] * days
+        self._custom: List[bool] = [False] * days
+        self._min_nights: List[Optional[int]] = [None] * days
+
+        active: List[tuple] = []
+        for offset in range(days):
+            for entry in starts.get(offset, ()):
+                heapq.heappush(active, entry)
+
+            while active and active[0][2] < offset:
+                heapq.heappop(active)
+
+            if active:
+                _, _, _, price, min_nights = active[0]
+                self._prices[offset] = price
+                self._custom[offset] = True
+                self._min_nights[offset] = min_nights
+
+    def _offset(self, target_date: date) -> int:
+        offset = (target_date - self.start_date).days
+        if offset < 0 or offset >= len(self._prices):
+            raise ValueError(
+                f"Data {target_date} fuori dalla finestra {self.start_date} - {self.end_date}"
+            )
+        return offset
+
+    def covers(self, start_date: date, end_date: date) -> bool:
+        """True se il range [start_date, end_date] è interamente nella finestra."""
+        return self.start_date <= start_date and end_date <= self.end_date
+
+    def price_for_date(self, target_date: date) -> Decimal:
+        """Prezzo effettivo per la notte di target_date."""
+        return self._prices[self._offset(target_date)]
+
+    def has_rule(self, target_date: date) -> bool:
+        """True se il prezzo di target_date deriva da una PriceRule."""
+        return self._custom[self._offset(target_date)]
+
+    def min_nights_for_date(self, target_date: date) -> Optional[int]:
+        """min_nights della regola vincente per target_date (None se assente)."""
+        return self._min_nights[self._offset(target_date)]
+
+    def day_states(self) -> List[tuple]:
+        """(ha regola, prezzo, min_nights) di ogni giorno della finestra, in ordine."""
+        return list(zip(self._custom, self._prices, self._min_nights))
+
+    def nightly_prices(self, check_in: date, check_out: date) -> List[Decimal]:
+        """Prezzi delle notti da check_in a check_out escluso."""
+        if check_in >= check_out:
+            return []
+        first = self._offset(check_in)
+        last = self._offset(check_out - timedelta(days=1))
+        return self._prices[first:last + 1]
+
+    def prices_for_range(self, check_in: date, check_out: date) -> Dict[str, Decimal]:
+        """Dict {data ISO: prezzo} per le notti da check_in a check_out escluso."""
+        return {
+            (check_in + timedelta(days=i)).isoformat(): price
+            for i, price in enumerate(self.nightly_prices(check_in, check_out))
+        }
+
+    def calendar_prices(self) -> Dict[str, float]:
+        """Dict {data ISO: prezzo float} per l'intera finestra (estremi inclusi)."""
+        return {
+            (self.start_date + timedelta(days=i)).isoformat(): float(price)
+            for i, price in enumerate(self._prices)
+        }
@@ -0,0 +1,120 @@
+# calendar_rules/services/shared_cache.py
+"""
+Livello di cache condiviso tra i processi per i dati calendario.
+
+Usa l'alias CACHES['calendar'] (file SQLite di default, Redis se configurato,
+vedi settings) e ricade sulla cache 'default' se l'alias non esiste.
+
+get_or_compute protegge i calcoli costosi dalla "stampede" alla scadenza di
+una chiave calda:
+- single-flight: al miss solo il processo che ottiene il lock (cache.add)
+  ricalcola; gli altri attendono il valore scritto da lui;
+- refresh anticipato probabilistico (XFetch): prima della scadenza un singolo
+  chiamante ricalcola con probabilità crescente, mentre gli altri continuano a
+  ricevere il valore ancora valido.
+"""
+
+import logging
+import math
+import random
+import time
+import uuid
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from Rhome_book.metrics import record_cache_access
+
+logger = logging.getLogger('calendar_debug')
+
+CALENDAR_CACHE_ALIAS = 'calendar'
+
+# Durata massima del lock: oltre, un altro processo può riprovare il calcolo
+LOCK_TIMEOUT = 30
+# Attesa massima del valore calcolato da un altro processo
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+# beta > 1 anticipa il refresh, beta < 1 lo ritarda (0 lo disattiva)
+EARLY_REFRESH_BETA = 1.0
+
+
+def get_shared_cache():
+    """Cache condivisa tra i processi per i dati calendario."""
+    if CALENDAR_CACHE_ALIAS in settings.CACHES:
+        return caches[CALENDAR_CACHE_ALIAS]
+    return caches['default']
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+def _should_refresh_early(compute_time: float, expires_at: float, beta: float) -> bool:
+    # XFetch: now - delta * beta * ln(rand) >= expiry, con ln(rand) <= 0
+    return time.time() - compute_time * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _compute_and_store(cache, key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    started = time.perf_counter()
+    value = compute()
+    compute_time = time.perf_counter() - started
+    cache.set(key, (value, compute_time, time.time() + timeout), timeout)
+    return value
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], timeout: int = 300,
+                   beta: float = EARLY_REFRESH_BETA) -> Any:
+    """
+    Legge key dalla cache condivisa o la calcola con compute.
+
+    In cache viene salvata la tupla (valore, tempo di calcolo, scadenza),
+    usata per il refresh anticipato.
+
+    Args:
+        key: Chiave cache
+        compute: Funzione senza argomenti che calcola il valore
+        timeout: Durata della chiave in secondi
+        beta: Aggressività del refresh anticipato
+
+    Returns:
+        Valore in cache o appena calcolato
+    """
+    cache = get_shared_cache()
+    lock_key = _lock_key(key)
+
+    entry = cache.get(key)
+    record_cache_access(entry is not None)
+    if entry is not None:
+        value, compute_time, expires_at = entry
+        if beta <= 0 or not _should_refresh_early(compute_time, expires_at, beta):
+            return value
+        # Refresh anticipato: se un altro processo sta già ricalcolando
+        # restituisci il valore ancora valido
+        if cache.add(lock_key, uuid.uuid4().hex, LOCK_TIMEOUT):
+            try:
+                return _compute_and_store(cache, key, compute, timeout)
+            finally:
+                cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while True:
+        if cache.add(lock_key, uuid.uuid4().hex, LOCK_TIMEOUT):
+            try:
+                # Un altro processo può aver scritto il valore tra get e add
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[0]
+                return _compute_and_store(cache, key, compute, timeout)
+            finally:
+                cache.delete(lock_key)
+
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if time.monotonic() >= deadline:
+            # Il processo con il lock è troppo lento: meglio calcolare che restare bloccati
+            logger.warning("Timeout in attesa del calcolo di %s, ricalcolo senza lock", key)
+            return _compute_and_store(cache, key, compute, timeout)
@@ -0,0 +1,136 @@
+# calendar_rules/services/tracing.py
+"""
+Tracing a fasi per i calcoli del calendario.
+
+Un Trace raccoglie i messaggi di debug e i tempi delle fasi (span) di un
+singolo calcolo:
+- i messaggi usano argomenti in stile logging ("%s", valore): vengono
+  formattati solo se il debug è attivo (DEBUG_CALENDAR o logger
+  'calendar_debug' a livello DEBUG);
+- gli span misurano le fasi solo se il trace è cronometrato: con il debug
+  attivo, quando richiesto esplicitamente (vista di debug) o per una frazione
+  delle richieste (CALENDAR_TRACE_SAMPLE_RATE, tra 0 e 1).
+
+Con il tracing disattivato si usa NULL_TRACE: log() è un controllo su un
+booleano e span() restituisce sempre lo stesso context manager vuoto.
+"""
+
+import logging
+import random
+import time
+from typing import Dict, List
+
+from django.conf import settings
+
+logger = logging.getLogger('calendar_debug')
+
+
+class _NullSpan:
+    """Span che non misura nulla (tracing disattivato)."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Misura la durata di una fase e la registra nel trace."""
+
+    __slots__ = ('trace', 'phase', 'started')
+
+    def __init__(self, trace: 'Trace', phase: str):
+        self.trace = trace
+        self.phase = phase
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.spans.append((self.phase, time.perf_counter() - self.started))
+        return False
+
+
+class Trace:
+    """
+    Messaggi e tempi delle fasi di un calcolo.
+
+    Attributes:
+        name: Nome del calcolo (es. 'get_unavailable_dates listing=5')
+        verbose: Se True i messaggi di log vengono emessi
+        timed: Se True gli span vengono misurati
+        spans: Lista di (fase, secondi) in ordine di chiusura
+    """
+
+    __slots__ = ('name', 'verbose', 'timed', 'spans', 'started')
+
+    def __init__(self, name: str = '', verbose: bool = False, timed: bool = False):
+        self.name = name
+        self.verbose = verbose
+        self.timed = timed
+        self.spans = []
+        self.started = time.perf_counter() if timed else 0.0
+
+    def log(self, level: int, message: str, *args) -> None:
+        """Emette il messaggio solo in modalità verbose; args formattati da logging."""
+        if self.verbose:
+            logger.log(level, message, *args)
+
+    def span(self, phase: str):
+        """Context manager che misura la fase (vuoto se il trace non è cronometrato)."""
+        if self.timed:
+            return _Span(self, phase)
+        return NULL_SPAN
+
+    def timings(self) -> List[Dict]:
+        """Tempi delle fasi in millisecondi."""
+        return [{'phase': phase, 'ms': round(seconds * 1000, 3)} for phase, seconds in self.spans]
+
+    def total_ms(self) -> float:
+        """Tempo dall'inizio del trace in millisecondi."""
+        if not self.timed:
+            return 0.0
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def finish(self) -> None:
+        """Registra il riepilogo dei tempi (solo per i trace cronometrati)."""
+        if self.timed:
+            logger.info(
+                "[TRACE] %s: %.2f ms (%s)", self.name, self.total_ms(),
+                ', '.join(f"{phase} {seconds * 1000:.2f} ms" for phase, seconds in self.spans),
+            )
+
+
+NULL_TRACE = Trace()
+
+
+def debug_enabled() -> bool:
+    """True se i messaggi di debug del calendario vanno emessi."""
+    return getattr(settings, 'DEBUG_CALENDAR', False) or logger.isEnabledFor(logging.DEBUG)
+
+
+def start_trace(name: str, force: bool = False) -> Trace:
+    """
+    Apre il trace di un calcolo.
+
+    Args:
+        name: Nome del calcolo, usato nel riepilogo
+        force: Cronometra sempre (es. per la vista di debug)
+
+    Returns:
+        Trace attivo, oppure NULL_TRACE se il tracing è disattivato
+    """
+    verbose = debug_enabled()
+    sample_rate = getattr(settings, 'CALENDAR_TRACE_SAMPLE_RATE', 0.0)
+    timed = verbose or force or (sample_rate > 0 and random.random() < sample_rate)
+    if not timed:
+        return NULL_TRACE
+    return Trace(name, verbose=verbose, timed=True)
@@ -0,0 +1,33 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from listings.models import Listing, ListingGroup
+from .services.calendar_cache import bump_calendar_generation, calendar_changed
+from .services.combined_calendar import GROUPS_SCOPE
+from .services.listing_days import schedule_listing_days_refresh
+
+
+@receiver([post_save, post_delete], sender=Listing)
+def invalidate_listing_calendar(sender, instance, **kwargs):
+    # Prezzo base, gap, soggiorno minimo e finestra di prenotazione
+    # influenzano tutti i dati calendario del listing
+    bump_calendar_generation(instance.pk)
+    # Stato, titolo e prezzi compaiono anche nell'elenco dei gruppi
+    bump_calendar_generation(GROUPS_SCOPE)
+
+
+@receiver([post_save, post_delete], sender=ListingGroup)
+def invalidate_groups(sender, instance, **kwargs):
+    bump_calendar_generation(GROUPS_SCOPE)
+
+
+@receiver(m2m_changed, sender=ListingGroup.listings.through)
+def invalidate_group_members(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_calendar_generation(GROUPS_SCOPE)
+
+
+@receiver(calendar_changed)
+def refresh_listing_days(sender, listing_id, **kwargs):
+    # Prenotazioni, chiusure, regole e prezzi cambiano i giorni materializzati
+    schedule_listing_days_refresh(listing_id)
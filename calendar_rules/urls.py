@@ -6,7 +6,9 @@ API Endpoints:
 - /api/listings/{id}/check-availability/ - Verifica disponibilità
 - /api/listings/{id}/calculate-price/ - Calcola prezzo
 - /api/listings/{id}/info/ - Info listing
+- /api/listings/search/ - Ricerca appartamenti disponibili
 - /api/calendar/combined/ - Dati calendario combinato (tutti i gruppi)
+- /ical/{id}/{token}.ics - Export iCal per gli OTA
 """
 
 from django.urls import path
@@ -20,7 +22,11 @@ urlpatterns = [
     path('api/listings/<int:listing_id>/check-availability/', api_views.check_availability, name='check-availability'),
     path('api/listings/<int:listing_id>/calculate-price/', api_views.calculate_price, name='calculate-price'),
     path('api/listings/<int:listing_id>/info/', api_views.listing_info, name='listing-info'),
+    path('api/listings/search/', api_views.search_listings, name='search-listings'),
 
     # API calendario combinato
     path('api/calendar/combined/', api_views.combined_calendar_data, name='combined-calendar-data'),
+
+    # Export iCal per gli OTA
+    path('ical/<int:listing_id>/<str:token>.ics', api_views.ical_export, name='ical-export'),
 ]
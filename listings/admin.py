@@ -84,8 +84,17 @@ class ReviewInline(admin.TabularInline):
 class ListingAdmin(admin.ModelAdmin):
     inlines = [RoomInline, BedInline, ImageInline, ReviewInline]
     list_display = ['title', 'bedrooms', 'total_beds', 'reviews_count_display']
+    readonly_fields = ['ical_export_url']
     change_form_template = 'admin/listing_change_form.html'
     
+    def ical_export_url(self, obj):
+        """URL del feed iCal da inserire negli OTA (contiene il token del listing)"""
+        if not obj.pk:
+            return '-'
+        from calendar_rules.services.ical_export import ical_export_path
+        return ical_export_path(obj.pk)
+    ical_export_url.short_description = 'Export iCal'
+    
     def reviews_count_display(self, obj):
         count = obj.get_reviews_count()
         avg = obj.get_average_rating()
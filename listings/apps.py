@@ -7,4 +7,5 @@ class ListingsConfig(AppConfig):
 
     def ready(self):
         print(">>> ListingsConfig ready() chiamato")
-        import listings.translation
\ No newline at end of file
+        import listings.translation
+        import listings.signals
\ No newline at end of file
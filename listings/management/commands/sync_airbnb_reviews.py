@@ -1,10 +1,13 @@
 """
 Management command per sincronizzare le recensioni Airbnb da terminale.
 Utile per cron job o sincronizzazione batch.
+Con --workers N i download da Airbnb di più annunci avvengono in parallelo
+(vedi listings.services.review_sync_pool); le scritture restano sequenziali.
 """
 from django.core.management.base import BaseCommand, CommandError
 from listings.models import Listing
-from listings.services.review_sync import AirbnbReviewSync, AirbnbReviewSyncError
+from listings.services.review_sync import AirbnbReviewSyncError
+from listings.services.review_sync_pool import DEFAULT_RATE, MAX_ATTEMPTS, ReviewSyncPool
 from datetime import date, timedelta
 
 
@@ -41,6 +44,24 @@ class Command(BaseCommand):
             default='',
             help='URL proxy opzionale',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Download concorrenti da Airbnb (default: 1, un annuncio alla volta)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=DEFAULT_RATE,
+            help=f'Chiamate massime a Airbnb al secondo, tra tutti i worker (default: {DEFAULT_RATE}, 0 = nessun limite)',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Tentativi per ogni chiamata a Airbnb, con backoff esponenziale (default: {MAX_ATTEMPTS})',
+        )
 
     def handle(self, *args, **options):
         listing_id = options.get('listing_id')
@@ -75,65 +96,67 @@ class Command(BaseCommand):
         total_skipped = 0
         total_errors = 0
 
+        to_sync = []
         for listing in listings:
             if not listing.airbnb_listing_url:
                 self.stdout.write(
                     self.style.WARNING(f'Listing {listing.id} ({listing.title}) non ha URL Airbnb, saltato')
                 )
                 continue
+            to_sync.append(listing)
+
+        pool = ReviewSyncPool(
+            workers=options['workers'],
+            rate=options['rate'],
+            attempts=options['max_attempts'],
+            language=language,
+            proxy_url=proxy_url,
+        )
+        if pool.workers > 1:
+            self.stdout.write(f'Download concorrente con {pool.workers} worker ({len(to_sync)} annunci)...')
 
+        for listing, stats, error in pool.run(to_sync, min_rating=min_rating, date_from=date_from):
             self.stdout.write(f'Sincronizzazione recensioni per: {listing.title} (ID: {listing.id})...')
 
-            try:
-                sync_service = AirbnbReviewSync(
-                    listing=listing,
-                    airbnb_url=listing.airbnb_listing_url,
-                    language=language,
-                    proxy_url=proxy_url
-                )
-
-                stats = sync_service.sync_reviews(
-                    min_rating=min_rating,
-                    date_from=date_from
+            if isinstance(error, AirbnbReviewSyncError):
+                self.stdout.write(
+                    self.style.ERROR(f'  ✗ Errore: {str(error)}')
                 )
-
-                total_synced += stats['synced']
-                total_skipped += stats['skipped']
-                total_errors += stats['errors']
-
-                # Controlla categorie salvate
-                from listings.models import Review
-                categories_count = Review.objects.filter(
-                    listing=listing,
-                    cleanliness_rating__isnull=False
-                ).count()
-                
+                total_errors += 1
+                continue
+            if error is not None:
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f'  ✓ {stats["synced"]} sincronizzate, '
-                        f'{stats["skipped"]} saltate, {stats["errors"]} errori'
-                    )
+                    self.style.ERROR(f'  ✗ Errore imprevisto: {str(error)}')
                 )
-                
-                if categories_count > 0:
-                    self.stdout.write(
-                        self.style.SUCCESS(f'  ✓ Recensioni con categorie salvate: {categories_count}')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING('  ⚠️ ATTENZIONE: Nessuna recensione con categorie salvata!')
-                    )
+                total_errors += 1
+                continue
 
-            except AirbnbReviewSyncError as e:
+            total_synced += stats['synced']
+            total_skipped += stats['skipped']
+            total_errors += stats['errors']
+
+            # Controlla categorie salvate
+            from listings.models import Review
+            categories_count = Review.objects.filter(
+                listing=listing,
+                cleanliness_rating__isnull=False
+            ).count()
+            
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'  ✓ {stats["synced"]} sincronizzate, '
+                    f'{stats["skipped"]} saltate, {stats["errors"]} errori'
+                )
+            )
+            
+            if categories_count > 0:
                 self.stdout.write(
-                    self.style.ERROR(f'  ✗ Errore: {str(e)}')
+                    self.style.SUCCESS(f'  ✓ Recensioni con categorie salvate: {categories_count}')
                 )
-                total_errors += 1
-            except Exception as e:
+            else:
                 self.stdout.write(
-                    self.style.ERROR(f'  ✗ Errore imprevisto: {str(e)}')
+                    self.style.WARNING('  ⚠️ ATTENZIONE: Nessuna recensione con categorie salvata!')
                 )
-                total_errors += 1
 
         # Riepilogo finale
         self.stdout.write('')
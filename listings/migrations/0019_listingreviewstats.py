@@ -0,0 +1,41 @@
+# Generated by Django 5.1.13 on 2026-10-17 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0018_listing_airbnb_accuracy_avg_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingReviewStats',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='listings.listing', verbose_name='Appartamento')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Recensioni totali')),
+                ('airbnb_count', models.PositiveIntegerField(default=0, verbose_name='Recensioni Airbnb')),
+                ('own_count', models.PositiveIntegerField(default=0, verbose_name='Recensioni del sito')),
+                ('average_rating', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True, verbose_name='Valutazione media')),
+                ('categorized_count', models.PositiveIntegerField(default=0, verbose_name='Recensioni con categorie')),
+                ('cleanliness_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('accuracy_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('checkin_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('communication_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('location_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('value_avg', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aggiornato il')),
+            ],
+            options={
+                'verbose_name': 'Statistiche recensioni',
+                'verbose_name_plural': 'Statistiche recensioni',
+            },
+        ),
+    ]
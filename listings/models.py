@@ -3,7 +3,6 @@ import datetime
 from django.utils.text import slugify
 from amenities.models import Amenity
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Avg, Count, Q
 from decimal import Decimal
 
 class Listing(models.Model):
@@ -238,16 +237,36 @@ class Listing(models.Model):
     def __str__(self):
         return self.title
 
+    def get_review_rollup(self):
+        """
+        Riga ListingReviewStats del listing (creata al primo accesso).
+
+        Aggiornata dai segnali di Review e al termine di AirbnbReviewSync:
+        la lettura non esegue query di aggregazione.
+        """
+        try:
+            return self.review_stats
+        except ListingReviewStats.DoesNotExist:
+            from .services.review_stats import refresh_review_stats
+
+            return refresh_review_stats(self)
+
     def get_reviews_count(self):
         """Restituisce il numero totale di recensioni per questo listing"""
-        return self.reviews.count()
+        return self.get_review_rollup().total_count
 
     def get_average_rating(self):
         """Restituisce la media del rating complessivo"""
-        avg = self.reviews.aggregate(Avg('overall_rating'))['overall_rating__avg']
-        if avg is not None:
-            return Decimal(str(round(avg, 2)))
-        return None
+        return self.get_review_rollup().average_rating
+
+    def get_airbnb_category_averages(self):
+        """Medie per categoria aggregate da Airbnb (solo quelle disponibili)"""
+        category_averages = {}
+        for category in ListingReviewStats.CATEGORIES:
+            value = getattr(self, f'airbnb_{category}_avg')
+            if value is not None:
+                category_averages[category] = value
+        return category_averages
 
     def get_reviews_stats(self):
         """
@@ -257,104 +276,39 @@ class Listing(models.Model):
         - Conteggio totale
         - Distribuzione stelle
         - Numero recensioni Airbnb vs proprietarie
+
+        I valori vengono letti dal rollup ListingReviewStats.
         """
-        reviews = self.reviews.all()
-        total_count = reviews.count()
-        
-        if total_count == 0:
+        rollup = self.get_review_rollup()
+
+        if rollup.total_count == 0:
             # Se non ci sono recensioni, usa solo le medie aggregate di Airbnb se disponibili
-            category_averages = {}
-            if self.airbnb_cleanliness_avg is not None:
-                category_averages['cleanliness'] = self.airbnb_cleanliness_avg
-            if self.airbnb_accuracy_avg is not None:
-                category_averages['accuracy'] = self.airbnb_accuracy_avg
-            if self.airbnb_checkin_avg is not None:
-                category_averages['checkin'] = self.airbnb_checkin_avg
-            if self.airbnb_communication_avg is not None:
-                category_averages['communication'] = self.airbnb_communication_avg
-            if self.airbnb_location_avg is not None:
-                category_averages['location'] = self.airbnb_location_avg
-            if self.airbnb_value_avg is not None:
-                category_averages['value'] = self.airbnb_value_avg
-            
             return {
                 'total_count': 0,
                 'average_rating': None,
-                'category_averages': category_averages,
+                'category_averages': self.get_airbnb_category_averages(),
                 'star_distribution': {1: 0, 2: 0, 3: 0, 4: 0, 5: 0},
                 'airbnb_count': 0,
                 'own_count': 0,
             }
-        
-        # Media generale
-        avg_rating = self.get_average_rating()
-        
-        # Media per categoria: calcola dalle recensioni che hanno categorie
-        # Cerca recensioni che hanno almeno una categoria valorizzata
-        from django.db.models import Q
-        reviews_with_categories = reviews.filter(
-            Q(cleanliness_rating__isnull=False) |
-            Q(accuracy_rating__isnull=False) |
-            Q(checkin_rating__isnull=False) |
-            Q(communication_rating__isnull=False) |
-            Q(location_rating__isnull=False) |
-            Q(value_rating__isnull=False)
-        )
-        
-        category_averages = {}
-        
-        # Calcola medie dalle recensioni che hanno categorie
-        if reviews_with_categories.exists():
+
+        if rollup.categorized_count:
+            # Medie dalle recensioni che hanno almeno una categoria valorizzata
             category_averages = {
-                'cleanliness': reviews_with_categories.aggregate(Avg('cleanliness_rating'))['cleanliness_rating__avg'],
-                'accuracy': reviews_with_categories.aggregate(Avg('accuracy_rating'))['accuracy_rating__avg'],
-                'checkin': reviews_with_categories.aggregate(Avg('checkin_rating'))['checkin_rating__avg'],
-                'communication': reviews_with_categories.aggregate(Avg('communication_rating'))['communication_rating__avg'],
-                'location': reviews_with_categories.aggregate(Avg('location_rating'))['location_rating__avg'],
-                'value': reviews_with_categories.aggregate(Avg('value_rating'))['value_rating__avg'],
+                category: getattr(rollup, f'{category}_avg')
+                for category in ListingReviewStats.CATEGORIES
             }
         else:
             # Se non ci sono recensioni con categorie, usa le medie aggregate di Airbnb
-            if self.airbnb_cleanliness_avg is not None:
-                category_averages['cleanliness'] = self.airbnb_cleanliness_avg
-            if self.airbnb_accuracy_avg is not None:
-                category_averages['accuracy'] = self.airbnb_accuracy_avg
-            if self.airbnb_checkin_avg is not None:
-                category_averages['checkin'] = self.airbnb_checkin_avg
-            if self.airbnb_communication_avg is not None:
-                category_averages['communication'] = self.airbnb_communication_avg
-            if self.airbnb_location_avg is not None:
-                category_averages['location'] = self.airbnb_location_avg
-            if self.airbnb_value_avg is not None:
-                category_averages['value'] = self.airbnb_value_avg
-        
-        # Arrotonda le medie a 2 decimali
-        for key, value in category_averages.items():
-            if value is not None:
-                category_averages[key] = Decimal(str(round(value, 2)))
-            else:
-                category_averages[key] = None
-        
-        # Distribuzione stelle
-        star_distribution = {
-            1: reviews.filter(overall_rating__gte=1, overall_rating__lt=2).count(),
-            2: reviews.filter(overall_rating__gte=2, overall_rating__lt=3).count(),
-            3: reviews.filter(overall_rating__gte=3, overall_rating__lt=4).count(),
-            4: reviews.filter(overall_rating__gte=4, overall_rating__lt=5).count(),
-            5: reviews.filter(overall_rating=5).count(),
-        }
-        
-        # Conteggio recensioni Airbnb vs proprietarie
-        airbnb_count = reviews.filter(airbnb_review_id__isnull=False).count()
-        own_count = reviews.filter(airbnb_review_id__isnull=True).count()
-        
+            category_averages = self.get_airbnb_category_averages()
+
         return {
-            'total_count': total_count,
-            'average_rating': avg_rating,
+            'total_count': rollup.total_count,
+            'average_rating': rollup.average_rating,
             'category_averages': category_averages,
-            'star_distribution': star_distribution,
-            'airbnb_count': airbnb_count,
-            'own_count': own_count,
+            'star_distribution': rollup.star_distribution(),
+            'airbnb_count': rollup.airbnb_count,
+            'own_count': rollup.own_count,
         }
 
     class Meta:
@@ -570,4 +524,57 @@ class Review(models.Model):
         indexes = [
             models.Index(fields=['listing', '-review_date']),
             models.Index(fields=['airbnb_review_id']),
-        ]
\ No newline at end of file
+        ]
+
+class ListingReviewStats(models.Model):
+    """
+    Statistiche delle recensioni di un listing, precalcolate.
+
+    Una riga per listing calcolata con una sola query di aggregazione
+    condizionale (services.review_stats); Listing.get_reviews_stats la legge
+    senza aggregare. Aggiornata dai segnali di Review e al termine della
+    sincronizzazione Airbnb: non va modificata a mano.
+    """
+    CATEGORIES = ('cleanliness', 'accuracy', 'checkin', 'communication', 'location', 'value')
+
+    listing = models.OneToOneField(
+        Listing,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='review_stats',
+        verbose_name='Appartamento'
+    )
+    total_count = models.PositiveIntegerField(default=0, verbose_name='Recensioni totali')
+    airbnb_count = models.PositiveIntegerField(default=0, verbose_name='Recensioni Airbnb')
+    own_count = models.PositiveIntegerField(default=0, verbose_name='Recensioni del sito')
+    average_rating = models.DecimalField(
+        max_digits=3, decimal_places=2, blank=True, null=True, verbose_name='Valutazione media'
+    )
+
+    # Medie per categoria sulle recensioni con almeno una categoria valorizzata
+    categorized_count = models.PositiveIntegerField(default=0, verbose_name='Recensioni con categorie')
+    cleanliness_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    accuracy_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    checkin_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    communication_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    location_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    value_avg = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+
+    # Distribuzione stelle (fasce [n, n+1), 5 solo per il voto pieno)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Aggiornato il')
+
+    def star_distribution(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+    def __str__(self):
+        return f"{self.listing_id}: {self.total_count} recensioni, media {self.average_rating}"
+
+    class Meta:
+        verbose_name = 'Statistiche recensioni'
+        verbose_name_plural = 'Statistiche recensioni'
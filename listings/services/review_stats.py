@@ -0,0 +1,119 @@
+"""
+Rollup delle statistiche recensioni (ListingReviewStats).
+
+Tutte le statistiche di Listing.get_reviews_stats (conteggi, media generale,
+medie per categoria, distribuzione stelle, recensioni Airbnb e del sito)
+vengono calcolate con una sola query di aggregazione condizionale e salvate
+nella riga ListingReviewStats del listing.
+
+Il rollup viene aggiornato al commit di ogni modifica di una Review (segnali,
+vedi listings.signals) e al termine di AirbnbReviewSync.sync_reviews; più
+modifiche nella stessa transazione producono un solo ricalcolo.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Q
+
+from Rhome_book.transactions import on_commit_batch
+
+logger = logging.getLogger(__name__)
+
+# Almeno una categoria valorizzata
+HAS_CATEGORIES = (
+    Q(cleanliness_rating__isnull=False) |
+    Q(accuracy_rating__isnull=False) |
+    Q(checkin_rating__isnull=False) |
+    Q(communication_rating__isnull=False) |
+    Q(location_rating__isnull=False) |
+    Q(value_rating__isnull=False)
+)
+
+STAR_BUCKETS = {
+    1: Q(overall_rating__gte=1, overall_rating__lt=2),
+    2: Q(overall_rating__gte=2, overall_rating__lt=3),
+    3: Q(overall_rating__gte=3, overall_rating__lt=4),
+    4: Q(overall_rating__gte=4, overall_rating__lt=5),
+    5: Q(overall_rating=5),
+}
+
+
+def _round(value):
+    # Come le medie mostrate finora: Decimal con 2 decimali
+    if value is None:
+        return None
+    return Decimal(str(round(value, 2)))
+
+
+def compute_review_stats(listing_id: int) -> dict:
+    """
+    Calcola i campi di ListingReviewStats con una sola query.
+
+    Returns:
+        Dict {campo: valore} pronto per ListingReviewStats
+    """
+    from ..models import ListingReviewStats, Review
+
+    aggregates = {
+        'total_count': Count('pk'),
+        'airbnb_count': Count('pk', filter=Q(airbnb_review_id__isnull=False)),
+        'own_count': Count('pk', filter=Q(airbnb_review_id__isnull=True)),
+        'average_rating': Avg('overall_rating'),
+        'categorized_count': Count('pk', filter=HAS_CATEGORIES),
+    }
+    for category in ListingReviewStats.CATEGORIES:
+        aggregates[f'{category}_avg'] = Avg(f'{category}_rating', filter=HAS_CATEGORIES)
+    for stars, bucket in STAR_BUCKETS.items():
+        aggregates[f'stars_{stars}'] = Count('pk', filter=bucket)
+
+    values = Review.objects.filter(listing_id=listing_id).aggregate(**aggregates)
+
+    values['average_rating'] = _round(values['average_rating'])
+    for category in ListingReviewStats.CATEGORIES:
+        values[f'{category}_avg'] = _round(values[f'{category}_avg'])
+    return values
+
+
+def refresh_review_stats(listing):
+    """
+    Ricalcola e salva il rollup del listing.
+
+    Args:
+        listing: Listing o suo id
+
+    Returns:
+        ListingReviewStats aggiornato
+    """
+    from ..models import ListingReviewStats
+
+    listing_id = getattr(listing, 'pk', listing)
+    stats, _ = ListingReviewStats.objects.update_or_create(
+        listing_id=listing_id,
+        defaults=compute_review_stats(listing_id),
+    )
+    if hasattr(listing, 'pk'):
+        # Le letture successive sullo stesso oggetto non rifanno la query
+        listing.review_stats = stats
+    return stats
+
+
+def schedule_review_stats_refresh(listing_id: int) -> None:
+    """
+    Aggiorna il rollup del listing al commit della transazione corrente.
+
+    Più modifiche nella stessa transazione producono un solo callback e un
+    solo ricalcolo per listing.
+    """
+    on_commit_batch('review_stats', listing_id, _refresh_review_stats_batch)
+
+
+def _refresh_review_stats_batch(listing_ids) -> None:
+    from ..models import Listing
+
+    for listing_id in Listing.objects.filter(pk__in=listing_ids).values_list('pk', flat=True):
+        try:
+            refresh_review_stats(listing_id)
+        except Exception as e:
+            # Il rollup viene ricalcolato al prossimo aggiornamento: non bloccare la scrittura
+            logger.warning("Impossibile aggiornare le statistiche recensioni del listing %s: %s", listing_id, e)
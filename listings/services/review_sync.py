@@ -8,8 +8,19 @@ from django.utils import timezone
 from django.db import transaction
 import pyairbnb
 
+from .review_stats import schedule_review_stats_refresh
+
 logger = logging.getLogger(__name__)
 
+# Righe per ogni INSERT/UPDATE della sincronizzazione a batch
+REVIEW_BATCH_SIZE = 200
+REVIEW_UPDATE_FIELDS = [
+    'reviewer_name', 'reviewer_location', 'reviewer_avatar_url', 'review_date', 'stay_date',
+    'review_text', 'host_response', 'host_response_date', 'overall_rating',
+    'cleanliness_rating', 'accuracy_rating', 'checkin_rating', 'communication_rating',
+    'location_rating', 'value_rating', 'last_synced', 'updated_at',
+]
+
 
 class AirbnbReviewSyncError(Exception):
     """Eccezione personalizzata per errori di sincronizzazione"""
@@ -35,10 +46,44 @@ class AirbnbReviewSync:
         self.airbnb_url = airbnb_url or listing.airbnb_listing_url
         self.language = language
         self.proxy_url = proxy_url
+        # Risposte di pyairbnb già scaricate con prefetch() (chiavi 'reviews' e 'details')
+        self._prefetched = {}
         
         if not self.airbnb_url:
             raise AirbnbReviewSyncError("URL Airbnb non specificato. Inserisci l'URL nell'annuncio o passalo come parametro.")
     
+    def prefetch(self, call=None):
+        """
+        Scarica recensioni e dettagli dell'annuncio senza accedere al database.
+        
+        Pensato per essere eseguito in un thread separato: sync_reviews e
+        sync_category_averages useranno poi questi dati invece di chiamare di
+        nuovo pyairbnb.
+        
+        Args:
+            call: Funzione call(func, *args) usata per le chiamate di rete
+                  (es. rate limiting e retry, vedi review_sync_pool)
+        """
+        call = call or (lambda func, *args: func(*args))
+        args = (self.airbnb_url, self.language, self.proxy_url)
+        
+        self._prefetched['reviews'] = call(pyairbnb.get_reviews, *args)
+        if not self._prefetched['reviews']:
+            # sync_reviews si ferma prima di leggere i dettagli
+            return
+        try:
+            self._prefetched['details'] = call(pyairbnb.get_details, *args)
+        except Exception as e:
+            # Come in sync_category_averages: senza dettagli si saltano solo le medie aggregate
+            logger.warning(f"Impossibile scaricare i dettagli di {self.airbnb_url}: {e}")
+            self._prefetched['details'] = None
+    
+    def _remote(self, key, func):
+        """Risposta pyairbnb già scaricata con prefetch(), altrimenti chiamata diretta."""
+        if key in self._prefetched:
+            return self._prefetched[key]
+        return func(self.airbnb_url, self.language, self.proxy_url)
+    
     def sync_reviews(self, min_rating=None, date_from=None, max_reviews=None):
         """
         Sincronizza le recensioni da Airbnb.
@@ -78,11 +123,7 @@ class AirbnbReviewSync:
             logger.info(f"Inizio sincronizzazione recensioni per listing {self.listing.id} da {self.airbnb_url}")
             
             # Chiama pyairbnb per ottenere le recensioni
-            reviews_data = pyairbnb.get_reviews(
-                self.airbnb_url,
-                self.language,
-                self.proxy_url
-            )
+            reviews_data = self._remote('reviews', pyairbnb.get_reviews)
             
             if not reviews_data:
                 logger.warning(f"Nessuna recensione trovata per {self.airbnb_url}")
@@ -205,10 +246,25 @@ class AirbnbReviewSync:
             # Sincronizza ogni recensione
             categories_saved_count = 0
             with transaction.atomic():
-                for idx, review_data in enumerate(filtered_reviews, 1):
+                # ID dell'intero payload e recensioni esistenti con una sola query
+                review_ids = []
+                for review_data in filtered_reviews:
+                    try:
+                        review_ids.append(self._resolve_review_id(review_data))
+                    except Exception as e:
+                        logger.error(f"Errore estrazione ID recensione: {e}", exc_info=True)
+                        review_ids.append(e)
+                existing = self._load_existing_reviews(
+                    review_id for review_id in review_ids if isinstance(review_id, str)
+                )
+                to_create, to_update = {}, {}
+
+                for idx, (review_data, review_id) in enumerate(zip(filtered_reviews, review_ids), 1):
                     try:
                         logger.debug(f"Processando recensione {idx+1}/{len(filtered_reviews)}")
-                        result = self._sync_single_review(review_data)
+                        if isinstance(review_id, Exception):
+                            raise review_id
+                        result = self._plan_review(review_data, review_id, existing, to_create, to_update)
                         if result:
                             stats['synced'] += 1
                             # result può essere 'created' o 'updated'
@@ -240,6 +296,9 @@ class AirbnbReviewSync:
                     if idx % 20 == 0:
                         print(f"  [PROGRESS] Processate {idx}/{len(filtered_reviews)} recensioni...")
                 
+                # Scrittura a batch: un INSERT e un UPDATE ogni REVIEW_BATCH_SIZE recensioni
+                self._write_reviews(to_create, to_update)
+                
                 if categories_saved_count > 0:
                     logger.info(f"Recensioni con categorie salvate: {categories_saved_count}/{stats['synced']}")
                     print(f"[OK] Recensioni con categorie salvate: {categories_saved_count}/{stats['synced']}")
@@ -254,6 +313,9 @@ class AirbnbReviewSync:
                 self.listing.airbnb_listing_url = self.airbnb_url
                 self.listing.airbnb_reviews_last_synced = timezone.now()
                 self.listing.save(update_fields=['airbnb_listing_url', 'airbnb_reviews_last_synced'])
+
+                # Un solo ricalcolo delle statistiche recensioni, al commit
+                schedule_review_stats_refresh(self.listing.id)
             
             logger.info(f"Sincronizzazione completata: {stats['synced']} recensioni sincronizzate, {stats['skipped']} saltate, {stats['errors']} errori")
             # Stampa anche nella console per visibilità
@@ -390,12 +452,25 @@ class AirbnbReviewSync:
         """
         Sincronizza una singola recensione nel database.
         Se la recensione esiste già, viene aggiornata invece di essere saltata.
-        
+
+        sync_reviews usa lo stesso percorso a batch per l'intero payload.
+
         Returns:
-            True se la recensione è stata creata o aggiornata, False se non è stato possibile
+            'created' o 'updated' se la recensione è stata creata o aggiornata,
+            False se non è stato possibile
+        """
+        airbnb_review_id = self._resolve_review_id(review_data)
+        existing = self._load_existing_reviews([airbnb_review_id])
+        to_create, to_update = {}, {}
+        result = self._plan_review(review_data, airbnb_review_id, existing, to_create, to_update)
+        self._write_reviews(to_create, to_update)
+        return result
+
+    def _resolve_review_id(self, review_data):
+        """
+        ID univoco della recensione: quello Airbnb oppure uno derivato da nome,
+        data e hash del testo. None se non è possibile costruirlo.
         """
-        from listings.models import Review
-        
         # Estrai l'ID univoco della recensione Airbnb
         airbnb_review_id = self._extract_review_id(review_data)
         logger.debug(f"ID estratto da pyairbnb: {airbnb_review_id}")
@@ -412,22 +487,75 @@ class AirbnbReviewSync:
                 import hashlib
                 text_hash = hashlib.md5((review_text or '').encode('utf-8')).hexdigest()[:8]
                 airbnb_review_id = f"{reviewer_name}_{review_date.isoformat()}_{text_hash}"
-            else:
-                logger.warning("Impossibile creare ID univoco per recensione, saltata")
-                return False
         
+        # Come stringa: è la forma salvata nel CharField e usata come chiave dei batch
+        return str(airbnb_review_id) if airbnb_review_id else None
+
+    def _load_existing_reviews(self, review_ids):
+        """Recensioni già presenti per il listing, {airbnb_review_id: Review}, con una sola query."""
+        from listings.models import Review
+
+        review_ids = {review_id for review_id in review_ids if review_id}
+        if not review_ids:
+            return {}
+        existing = {}
+        for review in Review.objects.filter(listing=self.listing, airbnb_review_id__in=review_ids):
+            # Con ID duplicati vale la prima nell'ordinamento del modello, come .first()
+            existing.setdefault(review.airbnb_review_id, review)
+        return existing
+
+    def _plan_review(self, review_data, airbnb_review_id, existing, to_create, to_update):
+        """
+        Decide se creare o aggiornare una recensione, senza scrivere sul database.
+
+        Args:
+            review_data: Dati della recensione da pyairbnb
+            airbnb_review_id: ID risolto con _resolve_review_id
+            existing: Recensioni già presenti {airbnb_review_id: Review}
+            to_create / to_update: Recensioni da scrivere, aggiornate in place
+
+        Returns:
+            'created', 'updated' o False (come _sync_single_review)
+        """
+        if not airbnb_review_id:
+            logger.warning("Impossibile creare ID univoco per recensione, saltata")
+            return False
+
         # Controlla se la recensione esiste già per questo listing
-        existing_review = Review.objects.filter(
-            listing=self.listing,
-            airbnb_review_id=airbnb_review_id
-        ).first()
-        
-        if existing_review:
+        # (o compare più volte nello stesso payload)
+        review = existing.get(airbnb_review_id) or to_create.get(airbnb_review_id)
+        if review is not None:
             # Aggiorna la recensione esistente invece di saltarla
             logger.debug(f"Recensione {airbnb_review_id} già presente per listing {self.listing.id}, aggiornamento...")
-            if self._update_existing_review(existing_review, review_data):
-                return 'updated'
+            if not self._apply_review_update(review, review_data):
+                return False
+            if review.pk is not None:
+                to_update[airbnb_review_id] = review
+            return 'updated'
+
+        review = self._build_review(review_data, airbnb_review_id)
+        if review is None:
             return False
+        to_create[airbnb_review_id] = review
+        return 'created'
+
+    def _write_reviews(self, to_create, to_update):
+        """Scrive le recensioni pianificate con bulk_create e bulk_update."""
+        from listings.models import Review
+
+        if to_create:
+            Review.objects.bulk_create(list(to_create.values()), batch_size=REVIEW_BATCH_SIZE)
+        if to_update:
+            Review.objects.bulk_update(list(to_update.values()), REVIEW_UPDATE_FIELDS, batch_size=REVIEW_BATCH_SIZE)
+
+    def _build_review(self, review_data, airbnb_review_id):
+        """
+        Costruisce (senza salvarla) una nuova recensione dai dati pyairbnb.
+
+        Returns:
+            Review non salvata, None se mancano dati obbligatori
+        """
+        from listings.models import Review
         
         # Estrai tutti i dati necessari
         # pyairbnb struttura: reviewer.firstName, reviewer.pictureUrl, localizedReviewerLocation
@@ -536,10 +664,10 @@ class AirbnbReviewSync:
                 for key in ['id', 'review_id', 'author', 'reviewer', 'name', 'text', 'review_text', 'comment', 'rating', 'overall_rating', 'stars']:
                     if key in review_data:
                         logger.info(f"  {key} = {str(review_data[key])[:100]}")
-            return False
+            return None
         
         # Crea la recensione
-        review = Review.objects.create(
+        return Review(
             listing=self.listing,
             reviewer_name=reviewer_name,
             reviewer_location=reviewer_location or '',
@@ -561,9 +689,6 @@ class AirbnbReviewSync:
             is_verified=True,  # Le recensioni da Airbnb sono verificate
             last_synced=timezone.now()
         )
-        
-        logger.debug(f"Recensione {airbnb_review_id} creata con successo")
-        return 'created'
     
     def _update_existing_review(self, review, review_data):
         """
@@ -576,8 +701,24 @@ class AirbnbReviewSync:
         Returns:
             True se aggiornata con successo, False altrimenti
         """
+        if not self._apply_review_update(review, review_data):
+            return False
+        try:
+            review.save()
+        except Exception as e:
+            logger.error(f"Errore durante aggiornamento recensione: {e}")
+            return False
+        return True
+
+    def _apply_review_update(self, review, review_data):
+        """
+        Applica i nuovi dati a una recensione senza salvarla.
+        
+        Returns:
+            True se i dati sono stati applicati, False in caso di errore
+        """
         try:
-            # Estrai i dati usando la stessa logica di _sync_single_review
+            # Estrai i dati usando la stessa logica di _build_review
             reviewer_obj = review_data.get('reviewer', {}) if isinstance(review_data, dict) else {}
             reviewer_name = reviewer_obj.get('firstName') or reviewer_obj.get('hostName') or reviewer_obj.get('name') or self._extract_field(review_data, 'reviewer_name', 'author', 'name')
             reviewer_location = review_data.get('localizedReviewerLocation') or self._extract_field(review_data, 'reviewer_location', 'location', 'author_location')
@@ -635,9 +776,9 @@ class AirbnbReviewSync:
             if value_rating:
                 review.value_rating = Decimal(str(value_rating))
             
-            # Aggiorna timestamp di sincronizzazione
+            # Aggiorna timestamp di sincronizzazione (updated_at esplicito per bulk_update)
             review.last_synced = timezone.now()
-            review.save()
+            review.updated_at = review.last_synced
             
             logger.debug(f"Recensione {review.airbnb_review_id} aggiornata con successo")
             return True
@@ -839,11 +980,7 @@ class AirbnbReviewSync:
             logger.info(f"Sincronizzazione medie aggregate per listing {self.listing.id}")
             
             # Ottieni i dettagli dell'annuncio
-            details = pyairbnb.get_details(
-                self.airbnb_url,
-                self.language,
-                self.proxy_url
-            )
+            details = self._remote('details', pyairbnb.get_details)
             
             if not details or not isinstance(details, dict):
                 logger.warning(f"Nessun dettaglio trovato per {self.airbnb_url}")
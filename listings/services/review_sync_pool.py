@@ -0,0 +1,165 @@
+"""
+Sincronizzazione concorrente delle recensioni Airbnb di più annunci.
+
+La sincronizzazione di un annuncio è divisa in due fasi:
+- download (AirbnbReviewSync.prefetch): chiamate di rete a pyairbnb, eseguite
+  in parallelo da un pool di thread, con un rate limiter token bucket condiviso
+  e retry con backoff esponenziale e jitter;
+- scrittura (AirbnbReviewSync.sync_reviews): eseguita solo dal thread
+  chiamante, un annuncio alla volta nell'ordine in cui i download terminano.
+
+Il tempo totale dipende così dal download più lento invece che dalla somma
+dei download, e il database ha un solo writer.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from .review_sync import AirbnbReviewSync, AirbnbReviewSyncError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+# Chiamate a pyairbnb al secondo (tra tutti i thread) e burst massimo
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 2
+# Tentativi per ogni chiamata e limiti del backoff in secondi
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """
+    Rate limiter token bucket thread-safe.
+
+    Il secchio contiene al massimo capacity gettoni e si riempie di rate
+    gettoni al secondo; acquire() attende finché un gettone è disponibile.
+    Con rate <= 0 non limita nulla.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def call_with_backoff(func, *args, attempts: int = MAX_ATTEMPTS, limiter: Optional[TokenBucket] = None,
+                      base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP,
+                      sleep: Callable[[float], None] = time.sleep):
+    """
+    Chiama func(*args) ritentando gli errori con backoff esponenziale.
+
+    L'attesa prima del tentativo n+1 è casuale tra 0 e min(cap, base * 2**n)
+    ("full jitter"), così i thread che falliscono insieme non ritentano insieme.
+    Ogni tentativo consuma un gettone di limiter.
+
+    Raises:
+        L'eccezione dell'ultimo tentativo
+    """
+    for attempt in range(attempts):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(cap, base * 2 ** attempt))
+            logger.warning(
+                "Chiamata %s fallita (tentativo %s/%s): %s, nuovo tentativo tra %.1fs",
+                getattr(func, '__name__', func), attempt + 1, attempts, e, delay,
+            )
+            sleep(delay)
+
+
+class ReviewSyncPool:
+    """
+    Sincronizza le recensioni di più annunci con download concorrenti.
+
+    Attributes:
+        workers: Thread che eseguono i download
+        limiter: Rate limiter condiviso dalle chiamate a pyairbnb
+        attempts: Tentativi per ogni chiamata
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST, attempts: int = MAX_ATTEMPTS,
+                 language: str = 'it', proxy_url: str = ''):
+        self.workers = max(1, workers)
+        self.limiter = TokenBucket(rate, burst)
+        self.attempts = max(1, attempts)
+        self.language = language
+        self.proxy_url = proxy_url
+
+    def _call(self, func, *args):
+        return call_with_backoff(func, *args, attempts=self.attempts, limiter=self.limiter)
+
+    def _fetch(self, service: AirbnbReviewSync) -> None:
+        # Solo rete: nessun accesso al database dai thread del pool
+        try:
+            service.prefetch(call=self._call)
+        except Exception as e:
+            raise AirbnbReviewSyncError(f"Errore durante il download delle recensioni: {str(e)}") from e
+
+    def run(self, listings: Iterable, **sync_options) -> Iterator[Tuple[object, Optional[dict], Optional[Exception]]]:
+        """
+        Scarica in parallelo e scrive un annuncio alla volta.
+
+        Args:
+            listings: Listing da sincronizzare (con airbnb_listing_url)
+            sync_options: Argomenti di AirbnbReviewSync.sync_reviews
+
+        Yields:
+            (listing, statistiche, None) oppure (listing, None, errore),
+            nell'ordine di completamento dei download
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='review-sync') as pool:
+            futures = {}
+            for listing in listings:
+                try:
+                    service = AirbnbReviewSync(
+                        listing=listing,
+                        airbnb_url=listing.airbnb_listing_url,
+                        language=self.language,
+                        proxy_url=self.proxy_url,
+                    )
+                except AirbnbReviewSyncError as e:
+                    yield listing, None, e
+                    continue
+                futures[pool.submit(self._fetch, service)] = (listing, service)
+
+            for future in as_completed(futures):
+                listing, service = futures[future]
+                try:
+                    future.result()
+                    # Unico writer: la scrittura avviene nel thread chiamante
+                    stats = service.sync_reviews(**sync_options)
+                except Exception as e:
+                    yield listing, None, e
+                    continue
+                yield listing, stats, None
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Review
+from .services.review_stats import schedule_review_stats_refresh
+
+
+@receiver([post_save, post_delete], sender=Review)
+def refresh_review_stats(sender, instance, **kwargs):
+    # Conteggi, medie e distribuzione stelle del listing
+    schedule_review_stats_refresh(instance.listing_id)
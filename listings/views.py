@@ -1,12 +1,13 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
+from django.utils import timezone
 from datetime import date, timedelta
 from .models import Listing
 from calendar_rules.managers import CalendarManager
 
 def listing_list(request):
     """Vista per mostrare tutti gli annunci attivi"""
-    listings = Listing.objects.filter(status='active')
+    listings = Listing.objects.filter(status='active').select_related('review_stats')
     return render(request, 'listings/listing_list.html', {
         'listings': listings,
         'user': request.user  # Assicura che user sia disponibile nel template
@@ -14,7 +15,8 @@ def listing_list(request):
 
 def listing_detail(request, slug):
     """Vista per mostrare il dettaglio di un singolo annuncio"""
-    listing = get_object_or_404(Listing, slug=slug, status='active')
+    # Statistiche recensioni precalcolate (ListingReviewStats) nella stessa query
+    listing = get_object_or_404(Listing.objects.select_related('review_stats'), slug=slug, status='active')
 
     # Crea la lista di opzioni per gli ospiti
     guest_options = range(1, listing.max_guests + 1)
@@ -117,8 +119,8 @@ def get_unavailable_dates(request, slug):
     listing = get_object_or_404(Listing, slug=slug, status='active')
 
     try:
-        # Calcola range di date
-        start_date = date.today()
+        # Calcola range di date (data locale, come CalendarCacheWarmer)
+        start_date = timezone.localdate()
         booking_window_days = listing.max_booking_advance or 365
         end_date = start_date + timedelta(days=booking_window_days)
         
@@ -0,0 +1,69 @@
+import logging
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def listing(db):
+    from listings.models import Listing
+
+    listing = Listing(
+        title='Test Listing',
+        slug='test-listing',
+        description='Test description',
+        status='active',
+        max_guests=4,
+        bedrooms=2,
+        bathrooms=Decimal('1.0'),
+        address='Test Address',
+        city='Test City',
+        zone='Test Zone',
+        base_price=Decimal('100.00'),
+        cleaning_fee=Decimal('50.00'),
+        included_guests=2,
+        extra_guest_fee=Decimal('10.00'),
+        gap_between_bookings=0,
+    )
+    listing.save()
+    return listing
+
+
+@pytest.fixture
+def guest(db):
+    from django.contrib.auth.models import User
+
+    return User.objects.create_user(username='guest', email='guest@example.com', password='pass')
+
+
+@pytest.fixture
+def shared(tmp_path, settings):
+    """Cache calendario condivisa su un file SQLite temporaneo."""
+    from calendar_rules.services.shared_cache import get_shared_cache
+
+    settings.CACHES = {
+        **settings.CACHES,
+        'calendar': {
+            'BACKEND': 'calendar_rules.cache_backends.SQLiteCache',
+            'LOCATION': str(tmp_path / 'calendar_cache.sqlite3'),
+        },
+    }
+    return get_shared_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_cache(shared):
+    """Nessun test legge o svuota il file della cache condivisa del progetto."""
+    return shared
+
+
+@pytest.fixture(autouse=True)
+def no_log_files():
+    """Nessun test scrive su calendar_debug.log (handler 'file' di settings.LOGGING)."""
+    calendar_logger = logging.getLogger('calendar_debug')
+    file_handlers = [handler for handler in calendar_logger.handlers if isinstance(handler, logging.FileHandler)]
+    for handler in file_handlers:
+        calendar_logger.removeHandler(handler)
+    yield
+    for handler in file_handlers:
+        calendar_logger.addHandler(handler)
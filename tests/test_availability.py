@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from bookings.models import Booking
+from calendar_rules.availability import AvailabilityChecker, AvailabilitySnapshot
+from calendar_rules.models import CheckInOutRule, ClosureRule, PriceRule
+
+
+TODAY = date.today()
+
+
+def day(offset):
+    return TODAY + timedelta(days=offset)
+
+
+def add_bookings(listing, guest, *ranges, status='confirmed'):
+    # bulk_create evita la validazione di Booking.save(): servono anche dati "storici"
+    Booking.objects.bulk_create([
+        Booking(listing=listing, guest=guest, check_in_date=day(ci), check_out_date=day(co),
+                num_guests=2, status=status)
+        for ci, co in ranges
+    ])
+
+
+@pytest.fixture
+def gap_listing(listing):
+    listing.gap_between_bookings = 2
+    listing.save()
+    return listing
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('check_in,check_out,expected', [
+    (20, 18, (False, "La data di check-out deve essere successiva al check-in")),
+    (-1, 3, (False, "Non è possibile prenotare date passate")),
+    (12, 14, (False, "Periodo già prenotato (conflitto con prenotazione dal {} al {})".format(day(10), day(15)))),
+    (16, 20, (False, "Richiesto gap di 2 giorni tra prenotazioni (solo 1 giorni dopo prenotazione precedente)")),
+    (5, 9, (False, "Richiesto gap di 2 giorni tra prenotazioni (solo 1 giorni prima della prossima prenotazione)")),
+    (17, 19, (False, "Soggiorno minimo richiesto: 3 notti per questo periodo")),
+    (40, 44, (False, "Struttura chiusa dal {} al {}".format(day(42), day(43)))),
+    (50, 52, (False, "Periodo non disponibile (prenotazione esterna dal {} al {})".format(day(51), day(55)))),
+    (17, 21, (True, "Disponibile")),
+])
+def test_messages_and_ordering(gap_listing, guest, check_in, check_out, expected):
+    add_bookings(gap_listing, guest, (10, 15), (-400, -390), (-30, -25))
+    add_bookings(gap_listing, guest, (20, 60), status='cancelled')
+    ClosureRule.objects.create(listing=gap_listing, start_date=day(42), end_date=day(43))
+    ClosureRule.objects.create(listing=gap_listing, start_date=day(51), end_date=day(55), is_external_booking=True)
+    PriceRule.objects.create(listing=gap_listing, start_date=day(16), end_date=day(30),
+                             price=Decimal('120.00'), min_nights=3)
+
+    assert AvailabilityChecker(gap_listing).check_availability(day(check_in), day(check_out)) == expected
+
+
+@pytest.mark.django_db
+def test_checkinout_rules(listing):
+    CheckInOutRule.objects.create(listing=listing, rule_type='no_checkin',
+                                  recurrence_type='specific_date', specific_date=day(30))
+    sunday = day(30 + (6 - day(30).weekday()) % 7 + 7)
+    CheckInOutRule.objects.create(listing=listing, rule_type='no_checkout',
+                                  recurrence_type='weekly', day_of_week=6)
+    checker = AvailabilityChecker(listing)
+
+    assert checker.check_availability(day(30), day(32)) == (
+        False, f"Check-in non permesso il {day(30).strftime('%d/%m/%Y')}")
+    assert checker.check_availability(sunday - timedelta(days=2), sunday) == (
+        False, "Check-out non permesso di Domenica")
+    assert checker.check_availability(day(31), day(32))[0] is True
+
+
+@pytest.mark.django_db
+def test_listing_min_stay_and_excluded_booking(listing, guest):
+    listing.min_stay_nights = 2
+    listing.save()
+    add_bookings(listing, guest, (10, 15))
+    booking = Booking.objects.get(listing=listing)
+    checker = AvailabilityChecker(listing)
+
+    assert checker.check_availability(day(20), day(21)) == (False, "Soggiorno minimo richiesto: 2 notti")
+    assert checker.check_availability(day(11), day(14))[0] is False
+    assert checker.check_availability(day(11), day(14), exclude_booking_id=booking.pk) == (True, "Disponibile")
+
+
+@pytest.mark.django_db
+def test_snapshot_is_bounded(gap_listing, guest, django_assert_max_num_queries):
+    # Tanto storico: non deve finire nello snapshot né aumentare le query
+    add_bookings(gap_listing, guest, *[(-360 + i * 3, -358 + i * 3) for i in range(100)])
+    add_bookings(gap_listing, guest, (10, 15), (17, 20), (200, 205))
+
+    snapshot = AvailabilitySnapshot.load(gap_listing, day(21), day(25))
+    assert snapshot.bookings == [(day(17), day(20))]
+
+    with django_assert_max_num_queries(4):
+        assert AvailabilityChecker(gap_listing).check_availability(day(21), day(25)) == (
+            False, "Richiesto gap di 2 giorni tra prenotazioni (solo 1 giorni dopo prenotazione precedente)")
+
+
+@pytest.mark.django_db
+def test_invalid_dates_do_not_query(listing, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert AvailabilityChecker(listing).check_availability(day(5), day(5))[0] is False
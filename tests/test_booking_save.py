@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from bookings.models import Booking
+from calendar_rules.models import PriceRule
+from calendar_rules.services.calendar_cache import get_calendar_generation
+
+
+CHECK_IN = date.today() + timedelta(days=10)
+
+
+def make_booking(listing, guest, offset=0, nights=3):
+    booking = Booking(
+        listing=listing, guest=guest, check_in_date=CHECK_IN + timedelta(days=offset),
+        check_out_date=CHECK_IN + timedelta(days=offset + nights), num_guests=2
+    )
+    booking.save()
+    return Booking.objects.get(pk=booking.pk)
+
+
+@pytest.mark.django_db
+def test_status_only_save_skips_validation_and_pricing(listing, guest):
+    booking = make_booking(listing, guest)
+    generation = get_calendar_generation(listing.id)
+
+    booking.status = 'confirmed'
+    with mock.patch.object(Booking, 'full_clean') as full_clean, \
+            mock.patch.object(Booking, 'calculate_pricing') as calculate_pricing, \
+            CaptureQueriesContext(connection) as queries:
+        booking.save()
+
+    full_clean.assert_not_called()
+    calculate_pricing.assert_not_called()
+    assert len(queries) == 1
+    assert booking.check_in_code
+    assert get_calendar_generation(listing.id) > generation
+
+
+@pytest.mark.django_db
+def test_date_change_reprices(listing, guest):
+    booking = make_booking(listing, guest)
+    assert booking.total_nights == 3
+
+    booking.check_out_date += timedelta(days=2)
+    booking.save(update_fields=['check_out_date'])
+
+    booking.refresh_from_db()
+    assert booking.total_nights == 5
+    assert booking.subtotal == Decimal('500.00')
+
+
+@pytest.mark.django_db
+def test_manual_price_is_preserved(listing, guest):
+    PriceRule.objects.create(listing=listing, start_date=CHECK_IN, end_date=CHECK_IN + timedelta(days=30),
+                             price=Decimal('120.00'))
+    booking = make_booking(listing, guest)
+    booking.base_price_per_night = Decimal('90.00')
+    booking.num_guests = 3
+    booking.save()
+
+    booking.refresh_from_db()
+    assert booking.base_price_per_night == Decimal('90.00')
+
+
+@pytest.mark.django_db
+def test_past_booking_can_be_cancelled(listing, guest):
+    booking = make_booking(listing, guest)
+    Booking.objects.filter(pk=booking.pk).update(
+        check_in_date=date.today() - timedelta(days=5), check_out_date=date.today() - timedelta(days=2)
+    )
+    booking = Booking.objects.get(pk=booking.pk)
+
+    booking.status = 'cancelled'
+    booking.save()
+
+    assert Booking.objects.get(pk=booking.pk).status == 'cancelled'
+
+
+@pytest.mark.django_db
+def test_reactivation_is_validated(listing, guest):
+    from django.core.exceptions import ValidationError
+
+    cancelled = make_booking(listing, guest)
+    cancelled.status = 'cancelled'
+    cancelled.save()
+    make_booking(listing, guest)
+
+    cancelled.status = 'confirmed'
+    with pytest.raises(ValidationError):
+        cancelled.save()
+
+
+@pytest.mark.django_db
+def test_admin_cancel_filtered_changelist_invalidates_once(listing, guest):
+    bookings = [make_booking(listing, guest, offset=i * 5) for i in range(3)]
+    admin = site._registry[Booking]
+    request = RequestFactory().post('/')
+
+    with mock.patch.object(admin, 'message_user'), \
+            mock.patch('calendar_rules.services.calendar_cache.bump_calendar_generation') as bump:
+        admin.cancel_bookings(request, Booking.objects.filter(status='pending'))
+
+    bump.assert_called_once_with(listing.id)
+    assert set(Booking.objects.values_list('status', flat=True)) == {'cancelled'}
+
+    with mock.patch.object(admin, 'message_user'):
+        admin.confirm_bookings(request, Booking.objects.filter(status='cancelled'))
+
+    assert all(booking.check_in_code for booking in Booking.objects.filter(pk__in=[b.pk for b in bookings]))
+
+
+@pytest.mark.django_db
+def test_admin_confirm_revalidates_cancelled(listing, guest):
+    cancelled = make_booking(listing, guest)
+    cancelled.status = 'cancelled'
+    cancelled.save()
+    pending = make_booking(listing, guest)
+    completed = make_booking(listing, guest, offset=20)
+    Booking.objects.filter(pk=completed.pk).update(status='completed')
+    admin = site._registry[Booking]
+    request = RequestFactory().post('/')
+
+    with mock.patch.object(admin, 'message_user') as message_user:
+        admin.confirm_bookings(request, Booking.objects.all())
+
+    statuses = dict(Booking.objects.values_list('pk', 'status'))
+    assert statuses == {cancelled.pk: 'cancelled', pending.pk: 'confirmed', completed.pk: 'completed'}
+    assert message_user.call_args_list[0].args[1] == '1 prenotazioni confermate.'
+    assert f'Prenotazione {cancelled.pk} non confermata' in message_user.call_args_list[1].args[1]
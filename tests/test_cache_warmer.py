@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from calendar_rules.models import ClosureRule
+from calendar_rules.services.cache_warmer import WARM_MONTHS, CalendarCacheWarmer, calendar_data_windows
+from tests.test_combined_availability import make_listing
+
+
+TODAY = timezone.localdate()
+# get_unavailable_dates, finestra iniziale di tre mesi e finestre di due mesi
+WINDOWS = WARM_MONTHS + 2
+
+
+@pytest.fixture
+def listings(db, shared):
+    return [make_listing('first', 2), make_listing('second', 4, gap_between_bookings=1)]
+
+
+def test_calendar_data_windows():
+    windows = calendar_data_windows(date(2026, 11, 17), months=3)
+
+    assert windows == [
+        (date(2026, 11, 1), date(2027, 1, 31)),
+        (date(2026, 11, 1), date(2026, 12, 31)),
+        (date(2026, 12, 1), date(2027, 1, 31)),
+        (date(2027, 1, 1), date(2027, 2, 28)),
+    ]
+
+
+@pytest.mark.django_db
+def test_warmed_windows_are_served_from_cache(client, listings, django_assert_num_queries):
+    first = listings[0]
+    stats = CalendarCacheWarmer(workers=1).warm()
+
+    assert stats['windows'] == stats['computed'] == 2 * WINDOWS
+    assert stats['hit_rate'] == 0 and stats['coverage'] == 1
+
+    # Apertura del calendario (tre mesi) e cambio mese (due mesi): solo la
+    # lettura del listing, disponibilità e prezzi arrivano dalla cache
+    for start, end in (calendar_data_windows(TODAY)[0], calendar_data_windows(TODAY)[2]):
+        with django_assert_num_queries(1):
+            response = client.get(reverse('calendar:calendar-data', args=[first.id]),
+                                  {'start': start.isoformat(), 'end': end.isoformat()})
+        assert response.status_code == 200
+        assert response.json()['listing']['id'] == first.id
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse('listings:unavailable_dates', args=[first.slug]))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_second_pass_rewarms_only_changed_listings(listings):
+    first, second = listings
+    CalendarCacheWarmer(workers=1).warm()
+
+    stats = CalendarCacheWarmer(workers=1).warm()
+    assert stats['computed'] == 0 and stats['hit_rate'] == 1
+
+    ClosureRule.objects.create(listing=second, start_date=TODAY + timedelta(days=3),
+                               end_date=TODAY + timedelta(days=4))
+    stats = CalendarCacheWarmer(workers=1).warm()
+
+    assert stats['warmed_listings'] == 1
+    assert stats['computed'] == WINDOWS
+    assert stats['hit_rate'] == 0.5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_pool(listings):
+    stats = CalendarCacheWarmer(workers=3).warm()
+
+    assert stats['errors'] == 0
+    assert stats['computed'] == 2 * WINDOWS
+    assert CalendarCacheWarmer(workers=3).warm()['hit_rate'] == 1
+
+
+@pytest.mark.django_db
+def test_command_reports_statistics(listings, capsys):
+    call_command('warm_calendar_cache', '--workers', '1', '--listing-id', str(listings[0].id))
+
+    out = capsys.readouterr().out
+    assert f'Calcolate: {WINDOWS}' in out
+    assert 'Copertura: 100.0%' in out
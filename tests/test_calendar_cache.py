@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+
+from bookings.models import Booking
+from calendar_rules.models import CheckInOutRule, ClosureRule, PriceRule
+from calendar_rules.services.calendar_cache import get_calendar_generation
+from calendar_rules.services.calendar_service import CalendarService
+
+
+TODAY = date.today()
+START, END = TODAY, TODAY + timedelta(days=60)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(shared):
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def calendar(listing):
+    return CalendarService(listing).get_unavailable_dates(START, END)
+
+
+def blocked(listing):
+    return calendar(listing)['blocked_ranges']
+
+
+def make_booking(listing, guest, check_in_offset, nights, **kwargs):
+    booking = Booking(
+        listing=listing,
+        guest=guest,
+        check_in_date=TODAY + timedelta(days=check_in_offset),
+        check_out_date=TODAY + timedelta(days=check_in_offset + nights),
+        num_guests=2,
+        status=kwargs.pop('status', 'confirmed'),
+        **kwargs,
+    )
+    booking.save()
+    return booking
+
+
+@pytest.mark.django_db
+def test_cached_result_is_served_without_queries(listing, django_assert_num_queries):
+    calendar(listing)
+    with django_assert_num_queries(0):
+        calendar(listing)
+
+
+@pytest.mark.django_db
+def test_booking_save_and_delete_invalidate(listing, guest):
+    assert blocked(listing) == []
+
+    booking = make_booking(listing, guest, 10, 4)
+    assert blocked(listing) == [{
+        'from': (TODAY + timedelta(days=10)).isoformat(),
+        'to': (TODAY + timedelta(days=13)).isoformat(),
+    }]
+
+    booking.status = 'cancelled'
+    booking.save()
+    assert blocked(listing) == []
+
+    booking.status = 'confirmed'
+    booking.save()
+    assert blocked(listing) != []
+
+    booking.delete()
+    assert blocked(listing) == []
+
+
+@pytest.mark.django_db
+def test_closure_rule_edits_invalidate(listing):
+    rule = ClosureRule.objects.create(
+        listing=listing,
+        start_date=TODAY + timedelta(days=5),
+        end_date=TODAY + timedelta(days=7),
+    )
+    assert blocked(listing) == [{
+        'from': (TODAY + timedelta(days=5)).isoformat(),
+        'to': (TODAY + timedelta(days=7)).isoformat(),
+    }]
+
+    rule.end_date = TODAY + timedelta(days=9)
+    rule.save()
+    assert blocked(listing)[0]['to'] == (TODAY + timedelta(days=9)).isoformat()
+
+    rule.delete()
+    assert blocked(listing) == []
+
+
+@pytest.mark.django_db
+def test_checkinout_and_price_rule_edits_invalidate(listing):
+    rule = CheckInOutRule.objects.create(
+        listing=listing,
+        rule_type='no_checkin',
+        recurrence_type='weekly',
+        day_of_week=6,
+    )
+    assert calendar(listing)['checkin_blocked_rules']['weekdays'] == [6]
+
+    rule.delete()
+    assert calendar(listing)['checkin_blocked_rules']['weekdays'] == []
+
+    assert calendar(listing)['metadata']['min_stay'] == 1
+    price_rule = PriceRule.objects.create(
+        listing=listing,
+        start_date=START,
+        end_date=END,
+        price=Decimal('120.00'),
+        min_nights=3,
+    )
+    assert calendar(listing)['metadata']['min_stay'] == 3
+
+    price_rule.min_nights = 4
+    price_rule.save()
+    assert calendar(listing)['metadata']['min_stay'] == 4
+
+
+@pytest.mark.django_db
+def test_listing_change_invalidates(listing):
+    assert calendar(listing)['metadata']['gap_between_bookings'] == 0
+
+    listing.gap_between_bookings = 2
+    listing.save()
+    assert calendar(listing)['metadata']['gap_between_bookings'] == 2
+
+
+@pytest.mark.django_db
+def test_generation_is_per_listing(listing, guest):
+    other = get_calendar_generation(listing.id + 1000)
+    before = get_calendar_generation(listing.id)
+
+    make_booking(listing, guest, 3, 2)
+
+    assert get_calendar_generation(listing.id) > before
+    assert get_calendar_generation(listing.id + 1000) == other
@@ -203,3 +203,88 @@ def test_consolidation_with_closure_overlap():
     res = run_with_calendar_data(svc, start, end, calendar_data)
     # interni (11..15) ∪ chiusura (14..18) ⇒ consolidato (11..18)
     assert res['blocked_ranges'] == [{'from': '2025-03-11', 'to': '2025-03-18'}]
+
+
+# ---------------------------------------------------------------------------
+# Bitmask dei giorni: deve produrre esattamente le stesse sezioni dei metodi
+# per singola sezione, sugli stessi scenari dei test sopra.
+# ---------------------------------------------------------------------------
+
+def _bookings(*pairs):
+    return [{'check_in_date': ci, 'check_out_date': co} for ci, co in pairs]
+
+
+BITMASK_CASES = [
+    ('gap0_no_rules', 0, 1, date(2025, 1, 1), date(2025, 1, 31),
+     _bookings((date(2025, 1, 10), date(2025, 1, 15))), [], []),
+    ('gap1_min3', 1, 3, date(2025, 1, 1), date(2025, 1, 31),
+     _bookings((date(2025, 1, 10), date(2025, 1, 15))), [], []),
+    ('weekly_no_checkin', 0, 1, date(2025, 1, 1), date(2025, 1, 31),
+     _bookings((date(2025, 1, 10), date(2025, 1, 12))), [],
+     [RuleStub(rule_type='no_checkin', recurrence_type='weekly', specific_date=None, day_of_week=6)]),
+    ('back_to_back', 0, 1, date(2025, 1, 1), date(2025, 1, 31),
+     _bookings((date(2025, 1, 10), date(2025, 1, 15)), (date(2025, 1, 15), date(2025, 1, 20))), [], []),
+    ('checkout_before_window', 2, 1, date(2025, 1, 10), date(2025, 1, 20),
+     _bookings((date(2025, 1, 1), date(2025, 1, 9))), [], []),
+    ('weekly_overlaps_min_nights', 0, 4, date(2025, 2, 1), date(2025, 2, 28),
+     _bookings((date(2025, 2, 10), date(2025, 2, 12))), [],
+     [RuleStub(rule_type='no_checkin', recurrence_type='weekly', specific_date=None, day_of_week=6)]),
+    ('closure_overlap', 0, 1, date(2025, 3, 1), date(2025, 3, 31),
+     _bookings((date(2025, 3, 10), date(2025, 3, 16))),
+     [{'start_date': date(2025, 3, 14), 'end_date': date(2025, 3, 18)}], []),
+    ('everything_at_the_edges', 2, 3, date(2025, 4, 1), date(2025, 4, 30),
+     _bookings((date(2025, 3, 25), date(2025, 4, 2)), (date(2025, 4, 12), date(2025, 4, 14)),
+               (date(2025, 4, 28), date(2025, 5, 6))),
+     [{'start_date': date(2025, 4, 20), 'end_date': date(2025, 4, 21)},
+      {'start_date': date(2025, 3, 1), 'end_date': date(2025, 3, 2)}],
+     [RuleStub(rule_type='no_checkin', recurrence_type='specific_date', specific_date=date(2025, 4, 5), day_of_week=None),
+      RuleStub(rule_type='no_checkout', recurrence_type='specific_date', specific_date=date(2025, 4, 30), day_of_week=None),
+      RuleStub(rule_type='no_checkout', recurrence_type='specific_date', specific_date=date(2025, 5, 30), day_of_week=None),
+      RuleStub(rule_type='no_checkout', recurrence_type='weekly', specific_date=None, day_of_week=0)]),
+]
+
+
+def _legacy_sections(svc, data, start, end):
+    periods = svc._prepare_periods(data, start, end)
+    return {
+        'blocked_ranges': svc._consolidate_ranges(
+            svc._calculate_blocked_ranges_only_bookings(data, start, end)),
+        'checkin_dates': svc._extract_checkin_dates(data, start, end),
+        'checkout_dates': svc._extract_checkout_dates(data, start, end),
+        'gap_days': svc._calculate_gap_days_optimized(periods, data, start, end),
+        'checkin_blocked_rules': svc._calculate_checkin_blocked_by_rules(data, start, end),
+        'checkout_blocked_rules': svc._calculate_checkout_blocked_by_rules(data, start, end),
+        'checkin_blocked_gap': svc._calculate_checkin_blocked_by_gap_optimized(periods, data, start, end),
+    }
+
+
+@pytest.mark.parametrize(
+    'name,gap,min_nights,start,end,bookings,closures,rules',
+    BITMASK_CASES, ids=[case[0] for case in BITMASK_CASES],
+)
+def test_day_state_bitmask_matches_section_methods(name, gap, min_nights, start, end, bookings, closures, rules):
+    svc = make_service(gap=gap)
+    calendar_data = {
+        'bookings': bookings,
+        'closures': closures,
+        'checkinout_rules': rules,
+        'price_rules': [{'min_nights': min_nights}],
+        'gap_days': gap,
+        'min_nights': min_nights,
+        'start_date': start,
+        'end_date': end,
+        'gap_start_date': start - timedelta(days=gap),
+    }
+    svc._validate_date_range = lambda s, e: None
+    svc._get_optimized_calendar_data = lambda s, e: calendar_data
+    svc._generate_metadata = lambda s, e: fake_metadata(s, e) | {'min_stay': min_nights}
+
+    result = svc.get_unavailable_dates.__wrapped__(svc, start, end)
+    expected = _legacy_sections(svc, calendar_data, start, end)
+
+    for key, value in expected.items():
+        assert result[key] == value, key
+    assert list(result) == [
+        'blocked_ranges', 'checkin_dates', 'checkout_dates', 'gap_days', 'checkin_blocked_rules',
+        'checkout_blocked_rules', 'checkin_blocked_gap', 'metadata', 'listing_id',
+    ]
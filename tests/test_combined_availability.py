@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from bookings.models import Booking
+from bookings.views import find_combined_availability
+from calendar_rules.managers import CalendarManager
+from calendar_rules.models import PriceRule
+from listings.models import Listing, ListingGroup
+
+
+CHECK_IN = date.today() + timedelta(days=20)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+
+def make_listing(slug, max_guests, **kwargs):
+    listing = Listing(
+        title=slug.title(), slug=slug, description='x', status=kwargs.pop('status', 'active'),
+        max_guests=max_guests, bedrooms=1, bathrooms=Decimal('1.0'), address='a', city='c', zone='z',
+        base_price=Decimal('80.00'), cleaning_fee=Decimal('30.00'), included_guests=2,
+        extra_guest_fee=Decimal('10.00'), **kwargs
+    )
+    listing.save()
+    return listing
+
+
+def make_group(name, *listings):
+    group = ListingGroup.objects.create(name=name)
+    group.listings.add(*listings)
+    return group
+
+
+@pytest.fixture
+def groups(guest):
+    small = make_listing('small', 2)
+    large = make_listing('large', 4, gap_between_bookings=1)
+    PriceRule.objects.create(listing=large, start_date=CHECK_IN, end_date=CHECK_IN, price=Decimal('150.00'))
+    pair = make_group('Coppia', large, small)
+
+    booked = make_listing('booked', 6)
+    Booking.objects.bulk_create([Booking(listing=booked, guest=guest, check_in_date=CHECK_IN,
+                                         check_out_date=CHECK_OUT, num_guests=2, status='confirmed')])
+    single = make_group('Singolo', booked)
+
+    make_group('Inattivo', make_listing('hidden', 6, status='inactive'))
+    return pair, single, small, large
+
+
+@pytest.mark.django_db
+def test_payload(groups):
+    pair, single, small, large = groups
+
+    result = find_combined_availability(CHECK_IN, CHECK_OUT, 5)
+
+    assert [combo['group_id'] for combo in result] == [pair.id]
+    combo = result[0]
+    assert combo['combo_type'] == 'double'
+    assert combo['combo_name'] == 'Coppia - Small + Large'
+    assert [item['listing']['id'] for item in combo['combination']] == [small.id, large.id]
+    assert [item['guests'] for item in combo['combination']] == [2, 3]
+
+    # Stesso prezzo del percorso per singolo listing (incluso il doppio conteggio ospiti extra)
+    expected_large = CalendarManager(large).calculate_total_price(CHECK_IN, CHECK_OUT, 3) + 1 * 10 * 3
+    expected_small = CalendarManager(small).calculate_total_price(CHECK_IN, CHECK_OUT, 2)
+    assert combo['combination'][1]['price'] == float(expected_large)
+    assert combo['total_price'] == float(expected_large + expected_small)
+    assert combo['total_cleaning_fee'] == 60.0
+    assert combo['nights'] == 3
+    assert combo['price_per_night'] == float((expected_large + expected_small) / 3)
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_groups(groups, django_assert_max_num_queries):
+    for i in range(10):
+        make_group(f'Extra {i}', make_listing(f'extra-{i}-a', 3), make_listing(f'extra-{i}-b', 3))
+
+    with django_assert_max_num_queries(7):
+        result = find_combined_availability(CHECK_IN, CHECK_OUT, 5)
+
+    assert len(result) == 11
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from bookings.models import Booking
+from calendar_rules.availability import AvailabilityChecker
+from calendar_rules.models import ClosureRule, PriceRule
+from calendar_rules.pricing import PriceCalculator
+from calendar_rules.services import combined_calendar
+from tests.test_combined_availability import make_group, make_listing
+
+
+START = date.today() + timedelta(days=5)
+END = START + timedelta(days=40)
+
+
+def reference(listings):
+    """Aggregazione naive, come faceva la vista: un calcolo completo per listing."""
+    blocked, prices = set(), []
+    for listing in listings:
+        blocked |= set(AvailabilityChecker(listing).get_calendar_data(START, END)['blocked_dates'])
+        prices.append(PriceCalculator(listing).get_calendar_prices(START, END))
+    summed = {}
+    for offset in range((END - START).days):
+        day = (START + timedelta(days=offset)).isoformat()
+        if day not in blocked:
+            summed[day] = float(sum(p[day] for p in prices))
+    return sorted(blocked), summed
+
+
+def fetch(client):
+    response = client.get(reverse('calendar:combined-calendar-data'),
+                          {'start': START.isoformat(), 'end': END.isoformat()})
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def members(guest):
+    cache.clear()
+    first = make_listing('first', 2)
+    second = make_listing('second', 4, gap_between_bookings=1)
+    Booking.objects.bulk_create([Booking(listing=first, guest=guest, check_in_date=START + timedelta(days=3),
+                                         check_out_date=START + timedelta(days=6), num_guests=2,
+                                         status='confirmed')])
+    ClosureRule.objects.create(listing=second, start_date=START + timedelta(days=10),
+                               end_date=START + timedelta(days=12))
+    PriceRule.objects.create(listing=second, start_date=START, end_date=START + timedelta(days=20),
+                             price=Decimal('140.00'))
+    make_group('Coppia', first, second)
+    return first, second
+
+
+@pytest.mark.django_db
+def test_matches_full_recomputation(client, members):
+    data = fetch(client)
+
+    blocked, prices = reference(members)
+    assert data['blocked_dates'] == blocked
+    assert data['prices'] == prices
+    assert data['gap_days'] == 1
+    assert data['total_listings'] == 2
+    assert data['groups'][0]['listing_count'] == 2
+
+
+@pytest.mark.django_db
+def test_cached_read_runs_no_queries(client, members, django_assert_num_queries):
+    fetch(client)
+    with django_assert_num_queries(0):
+        fetch(client)
+
+
+@pytest.mark.django_db
+def test_change_recomputes_only_that_listing(client, members, guest):
+    first, second = members
+    fetch(client)
+
+    ClosureRule.objects.create(listing=first, start_date=START + timedelta(days=30),
+                               end_date=START + timedelta(days=31))
+    build = mock.Mock(wraps=combined_calendar.build_listing_contribution)
+    with mock.patch.object(combined_calendar, 'build_listing_contribution', build):
+        data = fetch(client)
+
+    assert [call.args[0].id for call in build.call_args_list] == [first.id]
+    assert (START + timedelta(days=30)).isoformat() in data['blocked_dates']
+    assert (data['blocked_dates'], data['prices']) == reference(members)
+
+
+@pytest.mark.django_db
+def test_membership_change(client, members):
+    first, second = members
+    fetch(client)
+
+    third = make_listing('third', 2)
+    PriceRule.objects.create(listing=third, start_date=START, end_date=END, price=Decimal('60.00'))
+    group = make_group('Tris', third)
+    data = fetch(client)
+    assert data['total_listings'] == 3
+    assert (data['blocked_dates'], data['prices']) == reference([first, second, third])
+
+    group.listings.remove(third)
+    data = fetch(client)
+    assert data['total_listings'] == 2
+    assert (data['blocked_dates'], data['prices']) == reference(members)
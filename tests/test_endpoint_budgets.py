@@ -0,0 +1,130 @@
+"""
+Budget di query, tempo e dimensione della risposta per gli endpoint calendario e prenotazioni.
+
+I limiti sono in tests/budgets.json: se un endpoint li supera il test fallisce
+mostrando i valori misurati. Aggiornare il file solo insieme alla modifica
+che giustifica il nuovo costo. Su macchine lente i limiti di tempo si possono
+scalare con la variabile d'ambiente BUDGET_TIME_FACTOR (es. 3).
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from bookings.models import Booking
+from calendar_rules.benchmarking import create_benchmark_listing, seed_price_rules
+from calendar_rules.models import CheckInOutRule, ClosureRule
+from listings.models import ListingGroup
+
+
+BUDGETS = json.loads((Path(__file__).parent / 'budgets.json').read_text())
+TIME_FACTOR = float(os.environ.get('BUDGET_TIME_FACTOR', '1'))
+
+TODAY = date.today()
+# Finestra lasciata libera per le richieste di disponibilità e prenotazione
+FREE_FROM, FREE_TO = TODAY + timedelta(days=50), TODAY + timedelta(days=80)
+CHECK_IN = next(FREE_FROM + timedelta(days=i) for i in range(7) if (FREE_FROM + timedelta(days=i)).weekday() == 2)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+
+def seed_listing(title, guest, bookings=200, closures=20):
+    listing = create_benchmark_listing(title, slug=title.lower().replace(' ', '-'))
+    seed_price_rules(listing, TODAY - timedelta(days=30), 400)
+
+    rows = []
+    for i in range(bookings):
+        check_in = TODAY - timedelta(days=400) + timedelta(days=i * 4)
+        check_out = check_in + timedelta(days=2)
+        if check_out > FREE_FROM and check_in < FREE_TO:
+            continue
+        rows.append(Booking(
+            listing=listing, guest=guest, check_in_date=check_in, check_out_date=check_out,
+            num_guests=2, status='confirmed' if i % 5 else 'pending'
+        ))
+    Booking.objects.bulk_create(rows)
+
+    ClosureRule.objects.bulk_create([
+        ClosureRule(listing=listing, start_date=start, end_date=start, reason='Manutenzione')
+        for start in (TODAY + timedelta(days=90 + i * 13) for i in range(closures))
+    ])
+    CheckInOutRule.objects.bulk_create([
+        CheckInOutRule(listing=listing, rule_type='no_checkin', recurrence_type='weekly', day_of_week=6),
+        CheckInOutRule(listing=listing, rule_type='no_checkout', recurrence_type='weekly', day_of_week=0),
+        CheckInOutRule(listing=listing, rule_type='no_checkin', recurrence_type='specific_date',
+                       specific_date=TODAY + timedelta(days=100)),
+    ])
+    return listing
+
+
+@pytest.fixture
+def dataset(guest, shared):
+    listings = [seed_listing(f'Budget {i}', guest) for i in range(3)]
+    group = ListingGroup.objects.create(name='Budget')
+    group.listings.add(*listings)
+    cache.clear()
+    shared.clear()
+    return listings
+
+
+def window(days=90):
+    return {'start': CHECK_IN.isoformat(), 'end': (CHECK_IN + timedelta(days=days)).isoformat()}
+
+
+def stay(**extra):
+    return json.dumps({'check_in': CHECK_IN.isoformat(), 'check_out': CHECK_OUT.isoformat(), **extra})
+
+
+ENDPOINTS = {
+    'calendar_data': lambda client, listings: client.get(
+        reverse('calendar:calendar-data', args=[listings[0].id]), window()),
+    'check_availability': lambda client, listings: client.post(
+        reverse('calendar:check-availability', args=[listings[0].id]), stay(), content_type='application/json'),
+    'calculate_price': lambda client, listings: client.post(
+        reverse('calendar:calculate-price', args=[listings[0].id]), stay(num_guests=3),
+        content_type='application/json'),
+    'combined_calendar_data': lambda client, listings: client.get(
+        reverse('calendar:combined-calendar-data'), window()),
+    'get_unavailable_dates': lambda client, listings: client.get(
+        reverse('listings:unavailable_dates', args=[listings[0].slug])),
+    'combined_availability': lambda client, listings: client.post(
+        reverse('bookings:combined_availability'), stay(total_guests=10), content_type='application/json'),
+    'create_booking': lambda client, listings: client.post(
+        reverse('bookings:create_booking'), stay(listing_id=listings[0].id, num_guests=2),
+        content_type='application/json'),
+}
+
+
+def measure(call):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        response = call()
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = (time.perf_counter() - started) * 1000
+    return response, {'queries': len(ctx.captured_queries), 'ms': elapsed, 'bytes': len(content)}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', sorted(ENDPOINTS))
+def test_endpoint_budget(client, guest, dataset, shared, endpoint):
+    budget = BUDGETS[endpoint]
+    client.force_login(guest)
+    # Riscaldamento (URLconf, middleware, import pigri) fuori dalla misura
+    client.get(reverse('calendar:listing-info', args=[dataset[0].id]))
+    cache.clear()
+    shared.clear()
+
+    response, measured = measure(lambda: ENDPOINTS[endpoint](client, dataset))
+
+    assert response.status_code == 200, response.content[:500]
+    report = f"{endpoint}: misurato {measured}, budget {budget}"
+    assert measured['queries'] <= budget['max_queries'], report
+    assert measured['ms'] <= budget['max_ms'] * TIME_FACTOR, report
+    assert measured['bytes'] <= budget['max_bytes'], report
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+
+from bookings.models import Booking
+from calendar_rules.models import ClosureRule
+from calendar_rules.services.ical_export import ical_export_path
+from calendar_rules.services.ical_stream import iter_vevents
+
+
+TODAY = date.today()
+
+
+def day(offset):
+    return TODAY + timedelta(days=offset)
+
+
+@pytest.fixture
+def calendar_rows(listing, guest):
+    Booking.objects.bulk_create([
+        Booking(listing=listing, guest=guest, check_in_date=day(5), check_out_date=day(8),
+                num_guests=2, status='confirmed'),
+        Booking(listing=listing, guest=guest, check_in_date=day(10), check_out_date=day(12),
+                num_guests=2, status='cancelled'),
+        Booking(listing=listing, guest=guest, check_in_date=day(-10), check_out_date=day(-7),
+                num_guests=2, status='confirmed'),
+    ])
+    ClosureRule.objects.bulk_create([ClosureRule(listing=listing, start_date=day(20), end_date=day(22))])
+
+
+@pytest.mark.django_db
+def test_feed_contains_occupied_dates(client, listing, calendar_rows):
+    response = client.get(ical_export_path(listing.id))
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/calendar; charset=utf-8'
+    body = b''.join(response.streaming_content)
+    assert int(response['Content-Length']) == len(body)
+    assert [(event.start, event.end, event.summary) for event in iter_vevents([body])] == [
+        (day(5), day(8), 'Reserved'),
+        # DTEND esclusivo: la chiusura comprende la notte del giorno 22
+        (day(20), day(23), 'Not available'),
+    ]
+
+
+@pytest.mark.django_db
+def test_conditional_get(client, listing, calendar_rows, django_assert_num_queries):
+    url = ical_export_path(listing.id)
+    etag = client.get(url)['ETag']
+
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+    with django_assert_num_queries(0):
+        assert client.get(url)['ETag'] == etag
+
+    ClosureRule.objects.create(listing=listing, start_date=day(30), end_date=day(31))
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_missing_listing(client):
+    assert client.get(ical_export_path(999999)).status_code == 404
+
+
+@pytest.mark.django_db
+def test_token_and_status_are_checked(client, listing, shared, django_assert_num_queries):
+    # Token errato: nessuna query e nessuna chiave di generazione creata
+    with django_assert_num_queries(0):
+        assert client.get(reverse('calendar:ical-export', args=[listing.id, 'x' * 32])).status_code == 404
+        assert client.get(reverse('calendar:ical-export', args=[424242, 'x' * 32])).status_code == 404
+    assert shared.get('calendar:gen:424242') is None
+
+    listing.status = 'inactive'
+    listing.save()
+    assert client.get(ical_export_path(listing.id)).status_code == 404
@@ -0,0 +1,322 @@
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from calendar_rules.models import ClosureRule, ExternalCalendar
+from calendar_rules.services.ical_sync import ICalSyncService
+
+
+START = date.today() + timedelta(days=10)
+
+
+def ics_feed(*ranges):
+    events = ''.join(
+        'BEGIN:VEVENT\r\n'
+        f'UID:{i}@stub\r\n'
+        f'DTSTART;VALUE=DATE:{start:%Y%m%d}\r\n'
+        f'DTEND;VALUE=DATE:{end:%Y%m%d}\r\n'
+        'SUMMARY:Reserved\r\n'
+        'END:VEVENT\r\n'
+        for i, (start, end) in enumerate(ranges)
+    )
+    return ('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//stub//EN\r\n' + events + 'END:VCALENDAR\r\n').encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve i feed .ics registrati sul server, con ETag e 304."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            body = server.feeds.get(self.path)
+            etag = f'"{self.path.strip("/")}-v1"'
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+            elif self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/calendar')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 05 Oct 2026 10:00:00 GMT')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.feeds = {}
+    server.requests = []
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_calendars(listing, server, count):
+    calendars = []
+    for i in range(count):
+        path = f'/feed-{i}.ics'
+        server.feeds[path] = ics_feed((START + timedelta(days=5 * i), START + timedelta(days=5 * i + 2)))
+        calendars.append(ExternalCalendar.objects.create(
+            listing=listing, name=f'Feed {i}', provider='airbnb', ical_url=server.url + path
+        ))
+    return calendars
+
+
+@pytest.mark.django_db
+def test_sync_all_active_downloads_in_parallel(listing, stub_server):
+    calendars = make_calendars(listing, stub_server, 4)
+
+    stats = ICalSyncService.sync_all_active(concurrency=4)
+
+    assert stats == {'total': 4, 'synced': 4, 'not_modified': 0, 'skipped': 0, 'errors': 0}
+    closures = ClosureRule.objects.filter(listing=listing, is_external_booking=True)
+    assert sorted(closures.values_list('start_date', flat=True)) == [
+        START + timedelta(days=5 * i) for i in range(4)
+    ]
+    calendars[0].refresh_from_db()
+    assert calendars[0].etag == '"feed-0.ics-v1"'
+    assert calendars[0].last_modified == 'Mon, 05 Oct 2026 10:00:00 GMT'
+    assert calendars[0].last_sync_status == 'success'
+
+
+@pytest.mark.django_db
+def test_not_modified_skips_update(listing, stub_server):
+    make_calendars(listing, stub_server, 2)
+    ICalSyncService.sync_all_active()
+    closure_ids = set(ClosureRule.objects.values_list('id', flat=True))
+    ExternalCalendar.objects.update(last_sync=None)
+    stub_server.requests.clear()
+
+    stats = ICalSyncService.sync_all_active()
+
+    assert stats['not_modified'] == 2
+    assert stats['synced'] == 0
+    assert all(etag for _, etag in stub_server.requests)
+    assert set(ClosureRule.objects.values_list('id', flat=True)) == closure_ids
+    assert ExternalCalendar.objects.filter(last_sync__isnull=False, last_sync_status='success').count() == 2
+
+
+@pytest.mark.django_db
+def test_per_host_limit(listing, stub_server):
+    make_calendars(listing, stub_server, 4)
+    stub_server.delay = 0.05
+
+    ICalSyncService.sync_all_active(concurrency=4, per_host_limit=1)
+
+    assert len(stub_server.requests) == 4
+    assert stub_server.max_in_flight == 1
+
+
+@pytest.mark.django_db
+def test_busy_host_does_not_hold_pool_slots(listing, stub_server):
+    make_calendars(listing, stub_server, 4)
+    # Stesso server raggiunto con un altro host
+    stub_server.feeds['/other.ics'] = ics_feed((START + timedelta(days=40), START + timedelta(days=42)))
+    ExternalCalendar.objects.create(
+        listing=listing, name='Zeta', ical_url=stub_server.url.replace('127.0.0.1', 'localhost') + '/other.ics'
+    )
+    stub_server.delay = 0.05
+
+    stats = ICalSyncService.sync_all_active(concurrency=2, per_host_limit=1)
+
+    assert stats['synced'] == 5
+    # Il feed dell'altro host parte subito invece di attendere i feed in coda del primo
+    assert [path for path, _ in stub_server.requests].index('/other.ics') <= 1
+
+
+@pytest.mark.django_db
+def test_download_error_is_recorded(listing, stub_server):
+    calendar = ExternalCalendar.objects.create(
+        listing=listing, name='Rotto', ical_url=stub_server.url + '/missing.ics'
+    )
+    make_calendars(listing, stub_server, 1)
+
+    stats = ICalSyncService.sync_all_active()
+
+    assert stats['errors'] == 1
+    assert stats['synced'] == 1
+    calendar.refresh_from_db()
+    assert calendar.last_sync_status == 'error'
+    assert '404' in calendar.last_sync_error
+
+
+@pytest.mark.django_db
+def test_failed_parse_does_not_store_validators(listing, stub_server):
+    calendar, = make_calendars(listing, stub_server, 1)
+    valid_feed = stub_server.feeds['/feed-0.ics']
+    # Feed troncato a metà evento: il parsing fallisce dopo il download
+    stub_server.feeds['/feed-0.ics'] = valid_feed[:valid_feed.index(b'SUMMARY')]
+
+    assert ICalSyncService(calendar).sync()[0] is False
+    calendar.refresh_from_db()
+    assert (calendar.etag, calendar.last_modified) == ('', '')
+
+    stub_server.feeds['/feed-0.ics'] = valid_feed
+    stub_server.requests.clear()
+    assert ICalSyncService(calendar).sync() == (True, None)
+
+    # Nessun If-None-Match: il feed viene riscaricato e applicato
+    assert stub_server.requests == [('/feed-0.ics', None)]
+    assert ClosureRule.objects.filter(listing=listing, is_external_booking=True).count() == 1
+    calendar.refresh_from_db()
+    assert calendar.etag == '"feed-0.ics-v1"'
+
+
+def closure_rows(listing):
+    return list(
+        ClosureRule.objects.filter(listing=listing)
+        .order_by('start_date')
+        .values_list('id', 'start_date', 'end_date', 'external_uid')
+    )
+
+
+@pytest.mark.django_db
+def test_reconcile_unchanged_feed_writes_nothing(listing, django_assert_num_queries):
+    from calendar_rules.services.calendar_cache import get_calendar_generation
+
+    calendar = ExternalCalendar.objects.create(listing=listing, name='Airbnb', ical_url='http://example.com/a.ics')
+    service = ICalSyncService(calendar)
+    ranges = [(START + timedelta(days=i * 4), START + timedelta(days=i * 4 + 2), f'ev-{i}') for i in range(50)]
+    assert service._update_closure_rules(ranges)['created'] == 50
+    before = closure_rows(listing)
+    generation = get_calendar_generation(listing.id)
+
+    # SAVEPOINT + SELECT + RELEASE
+    with django_assert_num_queries(3):
+        stats = service._update_closure_rules(ranges)
+
+    assert stats == {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 50}
+    assert closure_rows(listing) == before
+    assert get_calendar_generation(listing.id) == generation
+
+
+@pytest.mark.django_db
+def test_reconcile_diff(listing):
+    from calendar_rules.services.calendar_cache import get_calendar_generation
+
+    calendar = ExternalCalendar.objects.create(listing=listing, name='Airbnb', ical_url='http://example.com/a.ics')
+    service = ICalSyncService(calendar)
+    day = lambda n: START + timedelta(days=n)
+    service._update_closure_rules([(day(0), day(2), 'a'), (day(5), day(7), 'b'), (day(10), day(12), 'c')])
+    # Regola importata prima dell'introduzione degli UID
+    legacy = ClosureRule.objects.create(
+        listing=listing, start_date=day(20), end_date=day(22), is_external_booking=True,
+        reason='[Airbnb] Sincronizzato da other'
+    )
+    manual = ClosureRule.objects.create(listing=listing, start_date=day(30), end_date=day(31), reason='Manutenzione')
+    ids = {uid: rule_id for rule_id, _, _, uid in closure_rows(listing)}
+    generation = get_calendar_generation(listing.id)
+
+    stats = service._update_closure_rules([
+        (day(0), day(2), 'a'),      # invariato
+        (day(6), day(8), 'b'),      # spostato
+        (day(20), day(22), 'd'),    # regola legacy, abbinata per date
+        (day(40), day(43), 'e'),    # nuovo
+    ])                              # 'c' sparito
+
+    assert stats == {'created': 1, 'updated': 2, 'deleted': 1, 'unchanged': 1}
+    rows = {uid: (rule_id, start, end) for rule_id, start, end, uid in closure_rows(listing)}
+    assert rows['a'] == (ids['a'], day(0), day(2))
+    assert rows['b'] == (ids['b'], day(6), day(8))
+    assert rows['d'] == (legacy.id, day(20), day(22))
+    assert rows['e'][1:] == (day(40), day(43))
+    assert 'c' not in rows
+    assert rows[''] == (manual.id, day(30), day(31))
+    assert get_calendar_generation(listing.id) > generation
+
+
+@pytest.mark.django_db
+def test_reconcile_repeated_uid(listing):
+    calendar = ExternalCalendar.objects.create(listing=listing, name='Airbnb', ical_url='http://example.com/a.ics')
+    service = ICalSyncService(calendar)
+    day = lambda n: START + timedelta(days=n)
+    # Evento ricorrente: stesso UID per ogni occorrenza
+    weekly = [(day(7 * week), day(7 * week + 2), 'weekly@stub') for week in range(4)]
+    assert service._update_closure_rules(weekly)['created'] == 4
+    before = closure_rows(listing)
+
+    assert service._update_closure_rules(weekly) == {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 4}
+    assert closure_rows(listing) == before
+
+    # Un'occorrenza spostata aggiorna una sola regola
+    stats = service._update_closure_rules(weekly[:3] + [(day(22), day(24), 'weekly@stub')])
+    assert stats == {'created': 0, 'updated': 1, 'deleted': 0, 'unchanged': 3}
+    assert [row[0] for row in closure_rows(listing)] == [row[0] for row in before]
+
+
+MIXED_FEED = (
+    'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//stub//EN\r\n'
+    'BEGIN:VEVENT\r\nUID:folded-\r\n uid@stub\r\n'
+    f'DTSTART;VALUE=DATE:{START:%Y%m%d}\r\nDTEND;VALUE=DATE:{START + timedelta(days=3):%Y%m%d}\r\n'
+    'SUMMARY:Airbnb (Not avail\r\n able)\r\nBEGIN:VALARM\r\nACTION:DISPLAY\r\nSUMMARY:promemoria\r\nEND:VALARM\r\n'
+    'END:VEVENT\r\n'
+    'BEGIN:VEVENT\r\nUID:tzid@stub\r\n'
+    f'DTSTART;TZID=Europe/Rome:{START + timedelta(days=5):%Y%m%d}T150000\r\n'
+    f'DTEND;TZID=Europe/Rome:{START + timedelta(days=7):%Y%m%d}T100000\r\n'
+    'STATUS:CONFIRMED\r\nEND:VEVENT\r\n'
+    'BEGIN:VEVENT\r\nUID:utc@stub\r\n'
+    f'DTSTART:{START + timedelta(days=9):%Y%m%d}T230000Z\r\n'
+    f'DTEND:{START + timedelta(days=11):%Y%m%d}T090000Z\r\n'
+    'STATUS:TENTATIVE\r\nSUMMARY:Reserved\r\nEND:VEVENT\r\n'
+    'BEGIN:VEVENT\r\nUID:cancelled@stub\r\n'
+    f'DTSTART;VALUE=DATE:{START + timedelta(days=20):%Y%m%d}\r\n'
+    f'DTEND;VALUE=DATE:{START + timedelta(days=22):%Y%m%d}\r\n'
+    'STATUS:CANCELLED\r\nSUMMARY:Annullata\r\nEND:VEVENT\r\n'
+    'BEGIN:VEVENT\r\nUID:old@stub\r\nDTSTART;VALUE=DATE:20000101\r\nDTEND;VALUE=DATE:20000103\r\nEND:VEVENT\r\n'
+    'END:VCALENDAR\r\n'
+).encode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_streaming_parser_matches_icalendar(listing, settings, chunk_size):
+    service = ICalSyncService(ExternalCalendar(listing=listing, name='Feed', ical_url='http://example.com/a.ics'))
+    chunks = (MIXED_FEED[i:i + chunk_size] for i in range(0, len(MIXED_FEED), chunk_size))
+
+    streamed = service._parse_ical(chunks)
+    settings.ICAL_STREAMING_PARSER = False
+    reference = service._parse_ical(MIXED_FEED)
+
+    assert streamed == reference
+    assert streamed == [
+        (START, START + timedelta(days=3), 'folded-uid@stub'),
+        (START + timedelta(days=5), START + timedelta(days=7), 'tzid@stub'),
+        (START + timedelta(days=10), START + timedelta(days=11), 'utc@stub'),
+    ]
+
+
+@pytest.mark.django_db
+def test_streaming_parser_rejects_truncated_feed(listing):
+    from calendar_rules.services.exceptions import CalendarServiceError
+
+    service = ICalSyncService(ExternalCalendar(listing=listing, name='Feed', ical_url='http://example.com/a.ics'))
+    truncated = MIXED_FEED[:MIXED_FEED.index(b'STATUS:CONFIRMED')]
+
+    with pytest.raises(CalendarServiceError):
+        service._parse_ical(truncated)
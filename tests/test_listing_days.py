@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+
+from Rhome_book.transactions import on_commit_batch
+from bookings.models import Booking
+from calendar_rules.models import CheckInOutRule, ClosureRule, ListingDay, ListingDayRefresh, PriceRule
+from calendar_rules.services import day_state, listing_days
+from calendar_rules.services.day_state import DayStateMap
+from calendar_rules.services.listing_days import check_listing_days, horizon, refresh_listing_days
+
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def calendar(listing, guest):
+    listing.gap_between_bookings = 1
+    listing.save()
+    Booking.objects.bulk_create([
+        Booking(listing=listing, guest=guest, check_in_date=TODAY + timedelta(days=10),
+                check_out_date=TODAY + timedelta(days=14), num_guests=2, status='confirmed'),
+        Booking(listing=listing, guest=guest, check_in_date=TODAY + timedelta(days=40),
+                check_out_date=TODAY + timedelta(days=42), num_guests=2, status='pending'),
+    ])
+    ClosureRule.objects.create(listing=listing, start_date=TODAY + timedelta(days=20),
+                               end_date=TODAY + timedelta(days=22))
+    CheckInOutRule.objects.create(listing=listing, rule_type='no_checkin', recurrence_type='weekly', day_of_week=6)
+    CheckInOutRule.objects.create(listing=listing, rule_type='no_checkout', recurrence_type='specific_date',
+                                  specific_date=TODAY + timedelta(days=30))
+    PriceRule.objects.create(listing=listing, start_date=TODAY + timedelta(days=50),
+                             end_date=TODAY + timedelta(days=60), price=Decimal('150.00'), min_nights=3)
+    return listing
+
+
+def test_mark_weekday():
+    start = date(2026, 1, 1)  # giovedì
+    states = DayStateMap(start, start + timedelta(days=20))
+    states.mark_weekday(day_state.NO_CHECKIN, 0)
+
+    marked = [day for day, flags in states.items() if flags & day_state.NO_CHECKIN]
+    assert marked == [date(2026, 1, 5), date(2026, 1, 12), date(2026, 1, 19)]
+
+
+@pytest.mark.django_db
+def test_refresh_materializes_horizon(calendar):
+    stats = refresh_listing_days(calendar)
+
+    start, end = horizon()
+    assert stats['created'] == (end - start).days + 1
+    days = {row.date: row for row in ListingDay.objects.filter(listing=calendar)}
+    booked = days[TODAY + timedelta(days=11)]
+    assert booked.has_flag(day_state.OCCUPIED) and not booked.has_flag(day_state.CLOSED)
+    assert days[TODAY + timedelta(days=21)].has_flag(day_state.CLOSED)
+    assert days[TODAY + timedelta(days=14)].has_flag(day_state.GAP)
+    assert days[TODAY + timedelta(days=30)].has_flag(day_state.NO_CHECKOUT)
+    sunday = next(day for day in days if day.weekday() == 6)
+    assert days[sunday].has_flag(day_state.NO_CHECKIN)
+    assert days[TODAY + timedelta(days=55)].price == Decimal('150.00')
+    assert days[TODAY + timedelta(days=55)].min_nights == 3
+    assert days[TODAY + timedelta(days=5)].min_nights == calendar.min_stay_nights
+
+    free = ListingDay.objects.filter(listing=calendar).window(TODAY + timedelta(days=1), TODAY + timedelta(days=5))
+    assert free.without_flags(day_state.OCCUPIED | day_state.GAP).count() == 5
+
+    assert check_listing_days(calendar) == []
+
+
+@pytest.mark.django_db
+def test_refresh_writes_only_changed_days(calendar):
+    refresh_listing_days(calendar)
+    ClosureRule.objects.filter(listing=calendar).update(end_date=TODAY + timedelta(days=23))
+
+    stats = refresh_listing_days(calendar)
+
+    assert stats['created'] == stats['deleted'] == 0
+    assert 0 < stats['updated'] <= 3
+    assert check_listing_days(calendar) == []
+
+
+@pytest.mark.django_db
+def test_horizon_moves_forward(calendar):
+    refresh_listing_days(calendar, today=TODAY - timedelta(days=2))
+
+    stats = refresh_listing_days(calendar)
+
+    assert stats['deleted'] == 2
+    assert stats['created'] == 2
+    assert ListingDay.objects.filter(listing=calendar).earliest('date').date == TODAY
+
+
+@pytest.mark.django_db(transaction=True)
+def test_signal_queues_refresh_on_commit(calendar):
+    refresh_listing_days(calendar)
+    ListingDayRefresh.objects.all().delete()
+    check_in = TODAY + timedelta(days=70)
+
+    refresh = mock.Mock(wraps=listing_days.refresh_listing_days)
+    with mock.patch.object(listing_days, 'refresh_listing_days', refresh):
+        with transaction.atomic():
+            ClosureRule.objects.create(listing=calendar, start_date=check_in, end_date=check_in)
+            ClosureRule.objects.create(listing=calendar, start_date=check_in + timedelta(days=3),
+                                       end_date=check_in + timedelta(days=3))
+            assert not ListingDayRefresh.objects.exists()
+        # Fuori da una transazione: accodato subito, senza ricalcolo
+        CheckInOutRule.objects.filter(listing=calendar).first().save()
+
+        # Nessun ricalcolo nella richiesta, un solo listing in coda
+        assert refresh.call_count == 0
+        assert list(ListingDayRefresh.objects.values_list('listing_id', flat=True)) == [calendar.pk]
+
+        call_command('rebuild_listing_days', '--pending', stdout=StringIO())
+
+    assert refresh.call_count == 1
+    assert not ListingDayRefresh.objects.exists()
+    assert ListingDay.objects.get(listing=calendar, date=check_in).has_flag(day_state.CLOSED)
+    assert check_listing_days(calendar) == []
+
+
+@pytest.mark.django_db
+def test_on_commit_batch_after_rollback(django_capture_on_commit_callbacks):
+    callback = mock.Mock()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            on_commit_batch('test', 1, callback)
+            raise RuntimeError
+        # Il batch scartato dal rollback del savepoint non blocca i successivi
+        on_commit_batch('test', 2, callback)
+        on_commit_batch('test', 3, callback)
+
+    callback.assert_called_once_with({2, 3})
+
+
+@pytest.mark.django_db
+def test_checker_reports_drift(calendar):
+    refresh_listing_days(calendar)
+    ListingDay.objects.filter(listing=calendar, date=TODAY + timedelta(days=11)).update(flags=0)
+
+    differences = check_listing_days(calendar)
+
+    assert [(d['date'], d['field']) for d in differences] == [(TODAY + timedelta(days=11), 'flags')]
+
+
+@pytest.mark.django_db
+def test_rebuild_command(calendar, capsys):
+    call_command('rebuild_listing_days', '--check')
+
+    assert ListingDay.objects.filter(listing=calendar).count() == (horizon()[1] - horizon()[0]).days + 1
+    assert 'Creati: 366' in capsys.readouterr().out
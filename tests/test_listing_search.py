@@ -0,0 +1,153 @@
+import os
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from bookings.models import Booking
+from calendar_rules.models import CheckInOutRule, ClosureRule, ListingDay, ListingDayRefresh, PriceRule
+from calendar_rules.services import day_state
+from calendar_rules.services.listing_days import refresh_listing_days
+from calendar_rules.services.listing_search import search_available_listings
+from listings.models import Listing
+from tests.test_combined_availability import make_listing
+
+
+TIME_FACTOR = float(os.environ.get('BUDGET_TIME_FACTOR', '1'))
+
+TODAY = date.today()
+CHECK_IN = next(TODAY + timedelta(days=30 + i) for i in range(7) if (TODAY + timedelta(days=30 + i)).weekday() == 2)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+
+def search(client, **params):
+    query = {'check_in': CHECK_IN.isoformat(), 'check_out': CHECK_OUT.isoformat(), 'guests': 2, **params}
+    return client.get(reverse('calendar:search-listings'), query)
+
+
+@pytest.fixture
+def candidates(guest):
+    cheap = make_listing('cheap', 4)
+    PriceRule.objects.create(listing=cheap, start_date=CHECK_IN, end_date=CHECK_OUT, price=Decimal('50.00'))
+    regular = make_listing('regular', 4)
+    small = make_listing('small', 1)
+    make_listing('inactive', 4, status='inactive')
+
+    booked = make_listing('booked', 4)
+    Booking.objects.bulk_create([Booking(listing=booked, guest=guest, check_in_date=CHECK_IN - timedelta(days=1),
+                                         check_out_date=CHECK_IN + timedelta(days=1), num_guests=2,
+                                         status='confirmed')])
+    closed = make_listing('closed', 4)
+    ClosureRule.objects.create(listing=closed, start_date=CHECK_OUT - timedelta(days=1),
+                               end_date=CHECK_OUT - timedelta(days=1))
+    gap = make_listing('gap', 4, gap_between_bookings=2)
+    Booking.objects.bulk_create([Booking(listing=gap, guest=guest, check_in_date=CHECK_OUT + timedelta(days=1),
+                                         check_out_date=CHECK_OUT + timedelta(days=3), num_guests=2,
+                                         status='pending')])
+    make_listing('long-stay', 4, min_stay_nights=5)
+    no_checkin = make_listing('no-checkin', 4)
+    CheckInOutRule.objects.create(listing=no_checkin, rule_type='no_checkin', recurrence_type='weekly',
+                                  day_of_week=CHECK_IN.weekday())
+    return cheap, regular, small
+
+
+@pytest.mark.django_db
+def test_ranked_results(client, candidates):
+    cheap, regular, small = candidates
+
+    response = search(client)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [result['id'] for result in data['results']] == [cheap.id, regular.id]
+    assert data['count'] == 2
+    first = data['results'][0]
+    assert first['nights'] == 3
+    assert first['subtotal'] == 150.0
+    assert first['total'] == 180.0
+    assert data['results'][1]['total'] == 270.0
+
+
+@pytest.mark.django_db
+def test_guest_count_filters_and_prices(candidates):
+    cheap, regular, small = candidates
+
+    results = search_available_listings(CHECK_IN, CHECK_OUT, 1)
+    assert small.id in [result['id'] for result in results]
+
+    results = search_available_listings(CHECK_IN, CHECK_OUT, 4)
+    assert [result['id'] for result in results] == [cheap.id, regular.id]
+    assert results[0]['extra_guest_fee'] == 60.0
+
+
+@pytest.mark.django_db
+def test_materialized_days_filter_candidates(candidates):
+    cheap, regular, small = candidates
+    for listing in (cheap, regular):
+        refresh_listing_days(listing)
+    ListingDayRefresh.objects.all().delete()
+    assert [result['id'] for result in search_available_listings(CHECK_IN, CHECK_OUT, 2)] == [cheap.id, regular.id]
+
+    # Le righe aggiornate decidono: una notte segnata occupata esclude il listing
+    ListingDay.objects.filter(listing=regular, date=CHECK_IN + timedelta(days=1)).update(flags=day_state.OCCUPIED)
+    assert [result['id'] for result in search_available_listings(CHECK_IN, CHECK_OUT, 2)] == [cheap.id]
+
+    # Listing in coda: righe ignorate, calcolo completo
+    ListingDayRefresh.objects.create(listing=regular)
+    assert [result['id'] for result in search_available_listings(CHECK_IN, CHECK_OUT, 2)] == [cheap.id, regular.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'check_in': ''},
+    {'check_out': 'domani'},
+    {'check_out': CHECK_IN.isoformat()},
+    {'guests': 0},
+    {'check_out': (CHECK_IN + timedelta(days=400)).isoformat()},
+])
+def test_invalid_parameters(client, params):
+    assert search(client, **params).status_code == 400
+
+
+@pytest.mark.django_db
+def test_scales_to_hundreds_of_listings(client, guest, django_assert_max_num_queries):
+    listings = []
+    for i in range(300):
+        listing = Listing(
+            title=f'Search {i}', slug=f'search-{i}', description='x', status='active', max_guests=2 + i % 4,
+            bedrooms=1, bathrooms=Decimal('1.0'), address='a', city='c', zone='z',
+            base_price=Decimal(60 + i % 50), cleaning_fee=Decimal('30.00'), included_guests=2,
+            extra_guest_fee=Decimal('10.00'), gap_between_bookings=i % 2,
+        )
+        listing.save()
+        listings.append(listing)
+    Booking.objects.bulk_create([
+        Booking(listing=listing, guest=guest, check_in_date=CHECK_IN + timedelta(days=i % 5 - 2),
+                check_out_date=CHECK_IN + timedelta(days=i % 5), num_guests=2, status='confirmed')
+        for i, listing in enumerate(listings) if i % 3 == 0
+    ])
+    ClosureRule.objects.bulk_create([
+        ClosureRule(listing=listing, start_date=CHECK_IN, end_date=CHECK_IN)
+        for i, listing in enumerate(listings) if i % 7 == 0
+    ])
+    PriceRule.objects.bulk_create([
+        PriceRule(listing=listing, start_date=CHECK_IN - timedelta(days=10), end_date=CHECK_OUT + timedelta(days=10),
+                  price=Decimal(90 + i % 20))
+        for i, listing in enumerate(listings) if i % 2 == 0
+    ])
+    search(client, guests=3)
+
+    # Listing, prenotazioni, chiusure, regole check-in/out e prezzi: una query ciascuno
+    with django_assert_max_num_queries(5):
+        started = time.perf_counter()
+        response = search(client, guests=3)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+    results = response.json()['results']
+    assert results
+    assert all(result['max_guests'] >= 3 for result in results)
+    totals = [result['total'] for result in results]
+    assert totals == sorted(totals)
+    assert elapsed_ms < 100 * TIME_FACTOR, f"{elapsed_ms:.1f} ms"
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from calendar_rules.models import PriceRule
+from calendar_rules.pricing import PriceImporter
+from calendar_rules.services.price_compaction import compact_price_rules
+from calendar_rules.services.price_resolver import PriceResolver
+
+
+START = date.today() + timedelta(days=10)
+END = START + timedelta(days=60)
+
+
+def add_rule(listing, start_offset, end_offset, price, min_nights=None):
+    PriceRule(
+        listing=listing,
+        start_date=START + timedelta(days=start_offset),
+        end_date=START + timedelta(days=end_offset),
+        price=Decimal(price),
+        min_nights=min_nights,
+    ).save()
+
+
+def resolution(listing):
+    return PriceResolver(listing, START - timedelta(days=5), END).day_states()
+
+
+@pytest.fixture
+def rules(listing):
+    add_rule(listing, 0, 30, '120.00')                 # stagione
+    add_rule(listing, 5, 12, '150.00')                 # evento annidato
+    add_rule(listing, 8, 20, '130.00')                 # stesso prezzo dei giorni importati
+    add_rule(listing, 25, 40, '90.00', min_nights=2)   # esce dalla stagione
+    # Prezzi importati per giorno, quasi tutti uguali alla stagione
+    PriceImporter(listing).import_prices_from_dict({
+        START + timedelta(days=offset): Decimal('130.00') for offset in range(14, 20)
+    })
+    return listing
+
+
+@pytest.mark.django_db
+def test_compaction_preserves_resolution(rules):
+    expected = resolution(rules)
+
+    result = compact_price_rules(rules)
+
+    assert result['applied'] and result['differences'] == []
+    assert (result['before'], result['after']) == (10, 5)
+    assert resolution(rules) == expected
+
+    segments = sorted(PriceRule.objects.filter(listing=rules).values_list('start_date', 'end_date'))
+    assert all(previous[1] < current[0] for previous, current in zip(segments, segments[1:]))
+
+    # Già compatto: nessuna modifica
+    assert not compact_price_rules(rules)['applied']
+
+
+@pytest.mark.django_db
+def test_dry_run_reports_diff_without_writing(rules):
+    with mock.patch('calendar_rules.services.calendar_cache.bump_calendar_generation') as bump:
+        result = compact_price_rules(rules, dry_run=True)
+
+    assert not result['applied']
+    assert len(result['removed']) == 10 - result['after'] + len(result['added'])
+    assert PriceRule.objects.filter(listing=rules).count() == 10
+    bump.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_non_equivalent_plan_is_not_applied(rules):
+    expected = resolution(rules)
+    broken = lambda resolver, kept: [(START, END, Decimal('1.00'), None)]
+
+    with mock.patch('calendar_rules.services.price_compaction.build_segments', broken):
+        result = compact_price_rules(rules)
+
+    assert result['differences'] and not result['applied']
+    assert resolution(rules) == expected
+
+
+@pytest.mark.django_db
+def test_shadowed_min_nights_rule_is_kept(listing):
+    # Il min_nights della stagione vale anche sotto l'evento per CalendarService
+    # (minimo sulla finestra) e per i soggiorni a cavallo: la stagione non si tocca
+    add_rule(listing, 0, 30, '120.00', min_nights=3)
+    add_rule(listing, 10, 12, '150.00')
+
+    result = compact_price_rules(listing)
+
+    assert result['differences'] == [] and not result['applied']
+    assert PriceRule.objects.filter(listing=listing).count() == 2
+
+
+@pytest.mark.django_db
+def test_season_with_imported_days_is_compacted(listing):
+    # Caso tipico: stagione con soggiorno minimo e prezzi importati per giorno
+    add_rule(listing, 0, 59, '120.00', min_nights=3)
+    PriceImporter(listing).import_prices_from_dict({
+        START + timedelta(days=offset): Decimal('150.00' if 20 <= offset < 30 else '130.00')
+        for offset in range(60)
+    })
+    expected = resolution(listing)
+    season = PriceRule.objects.get(listing=listing, min_nights=3)
+
+    result = compact_price_rules(listing)
+
+    assert result['applied'] and result['differences'] == []
+    assert (result['before'], result['after']) == (61, 5)
+    assert resolution(listing) == expected
+    assert PriceRule.objects.filter(pk=season.pk, start_date=START, min_nights=3).exists()
+
+
+@pytest.mark.django_db
+def test_command(rules):
+    out = StringIO()
+    call_command('compact_price_rules', '--dry-run', stdout=out)
+    assert 'Regole: 10 -> 5' in out.getvalue()
+    assert PriceRule.objects.filter(listing=rules).count() == 10
+
+    call_command('compact_price_rules', '--listing-id', str(rules.pk), stdout=StringIO())
+    assert PriceRule.objects.filter(listing=rules).count() == 5
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import pytest
+
+from calendar_rules.models import PriceRule
+from calendar_rules.pricing import PriceImporter
+from calendar_rules.services.price_resolver import PriceResolver
+
+
+START = date.today() + timedelta(days=1)
+
+
+def year_of_prices():
+    # Prezzo per settimana: 7 giorni consecutivi con lo stesso valore
+    return {START + timedelta(days=offset): Decimal(100 + offset // 7) for offset in range(365)}
+
+
+def resolved_prices(listing, prices):
+    resolver = PriceResolver(listing, min(prices), max(prices))
+    return {day: resolver.price_for_date(day) for day in prices}
+
+
+@pytest.fixture
+def bump():
+    with mock.patch('calendar_rules.services.calendar_cache.bump_calendar_generation') as patched:
+        yield patched
+
+
+@pytest.mark.django_db
+def test_year_import_is_bulk(listing, bump, django_assert_max_num_queries):
+    prices = year_of_prices()
+
+    with django_assert_max_num_queries(6):
+        stats = PriceImporter(listing).import_prices_from_dict(prices)
+
+    assert stats['created'] == stats['rules'] == 365
+    assert stats['errors'] == []
+    bump.assert_called_once_with(listing.id)
+    assert resolved_prices(listing, prices) == prices
+
+
+@pytest.mark.django_db
+def test_overwrite_and_skip(listing, bump):
+    day = START + timedelta(days=3)
+    PriceRule(listing=listing, start_date=day, end_date=day, price=Decimal('80')).save()
+    prices = {day: Decimal('90'), day + timedelta(days=1): Decimal('95')}
+    bump.reset_mock()
+
+    stats = PriceImporter(listing).import_prices_from_dict(prices)
+    assert (stats['created'], stats['updated'], stats['skipped']) == (1, 0, 1)
+    assert PriceRule.objects.get(start_date=day).price == Decimal('80')
+
+    stats = PriceImporter(listing).import_prices_from_dict(prices, overwrite=True)
+    assert (stats['created'], stats['updated'], stats['skipped']) == (0, 2, 0)
+    assert PriceRule.objects.get(start_date=day).price == Decimal('90')
+    assert bump.call_count == 2
+
+    # Nessuna modifica: nessuna invalidazione
+    PriceImporter(listing).import_prices_from_dict(prices)
+    assert bump.call_count == 2
+
+
+@pytest.mark.django_db
+def test_coalesce_matches_single_day_rules(listing, bump):
+    prices = year_of_prices()
+    # Regole esistenti dentro i range: un giorno singolo e un range più corto
+    PriceRule(listing=listing, start_date=START + timedelta(days=10),
+              end_date=START + timedelta(days=10), price=Decimal('70')).save()
+    PriceRule(listing=listing, start_date=START + timedelta(days=16),
+              end_date=START + timedelta(days=17), price=Decimal('60')).save()
+    expected = {**prices, START + timedelta(days=10): Decimal('70')}
+
+    stats = PriceImporter(listing).import_prices_from_dict(prices, coalesce=True)
+
+    assert stats['created'] == 364 and stats['skipped'] == 1
+    assert stats['rules'] < 60
+    assert resolved_prices(listing, prices) == expected
+
+
+@pytest.mark.django_db
+def test_csv_is_streamed_in_batches(listing, bump):
+    lines = ['date,price'] + [f'{(START + timedelta(days=offset)).isoformat()},120.00' for offset in range(10)]
+    lines.insert(4, 'not-a-date,10')
+    content = StringIO('\n'.join(lines))
+
+    stats = PriceImporter(listing).import_prices_from_csv(content, batch_size=3)
+
+    assert stats['created'] == 10
+    assert [error['line'] for error in stats['errors']] == [5]
+    assert PriceRule.objects.filter(listing=listing).count() == 10
+    bump.assert_called_once_with(listing.id)
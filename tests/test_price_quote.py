@@ -0,0 +1,88 @@
+import dataclasses
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+
+from bookings.models import Booking
+from calendar_rules.managers import CalendarManager
+from calendar_rules.models import PriceRule
+from calendar_rules.services import PriceQuote, PriceResolver
+
+
+CHECK_IN = date.today() + timedelta(days=10)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+
+
+@pytest.fixture
+def rules(listing):
+    PriceRule.objects.create(listing=listing, start_date=CHECK_IN, end_date=CHECK_IN + timedelta(days=30),
+                             price=Decimal('120.00'))
+    PriceRule.objects.create(listing=listing, start_date=CHECK_IN + timedelta(days=1),
+                             end_date=CHECK_IN + timedelta(days=1), price=Decimal('99.00'))
+
+
+@pytest.mark.django_db
+def test_quote_matches_calendar_manager(listing, rules, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        quote = PriceQuote.for_stay(listing, CHECK_IN, CHECK_OUT, 3)
+
+    assert quote.nightly_prices == (Decimal('120.00'), Decimal('99.00'), Decimal('120.00'))
+    assert quote.subtotal == Decimal('339.00')
+    assert quote.extra_guest_fee == Decimal('30.00')
+    assert quote.total == CalendarManager(listing).calculate_total_price(CHECK_IN, CHECK_OUT, 3)
+    assert quote.daily_prices()[1] == (CHECK_IN + timedelta(days=1), Decimal('99.00'))
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        quote.subtotal = Decimal('0.00')
+
+
+@pytest.mark.django_db
+def test_booking_save_reuses_quote(listing, guest, rules):
+    quote = PriceQuote.for_stay(listing, CHECK_IN, CHECK_OUT, 3)
+    booking = Booking(listing=listing, guest=guest, check_in_date=CHECK_IN, check_out_date=CHECK_OUT, num_guests=3)
+    booking.price_quote = quote
+
+    with mock.patch.object(PriceResolver, '_resolve') as resolve:
+        booking.save()
+
+    resolve.assert_not_called()
+    assert booking.total_amount == quote.total
+    assert booking.subtotal == Decimal('339.00')
+
+    # Un preventivo per un altro soggiorno viene ignorato
+    booking.num_guests = 2
+    booking.save()
+    assert booking.total_amount == Decimal('339.00') + listing.cleaning_fee
+
+
+@pytest.mark.django_db
+def test_create_booking_prices_each_night_once(client, listing, guest, rules):
+    client.force_login(guest)
+    payload = {'listing_id': listing.id, 'check_in': CHECK_IN.isoformat(),
+               'check_out': CHECK_OUT.isoformat(), 'num_guests': 3}
+
+    with mock.patch.object(PriceResolver, '_resolve', autospec=True,
+                           side_effect=PriceResolver._resolve) as resolve:
+        response = client.post(reverse('bookings:create_booking'), json.dumps(payload),
+                               content_type='application/json')
+
+    assert response.json()['success'] is True
+    assert resolve.call_count == 1
+    assert Booking.objects.get().total_amount == Decimal('339.00') + Decimal('30.00') + listing.cleaning_fee
+
+
+@pytest.mark.django_db
+def test_check_availability_breakdown(client, listing, rules):
+    payload = {'listing_id': listing.id, 'check_in': CHECK_IN.isoformat(),
+               'check_out': CHECK_OUT.isoformat(), 'num_guests': 2}
+
+    pricing = client.post(reverse('bookings:check_availability'), json.dumps(payload),
+                          content_type='application/json').json()['pricing']
+
+    assert [day['price'] for day in pricing['daily_prices']] == [120.0, 99.0, 120.0]
+    assert pricing['subtotal'] == 339.0
+    assert pricing['total_amount'] == 339.0 + float(listing.cleaning_fee)
@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from calendar_rules.managers import CalendarManager
+from calendar_rules.models import PriceRule
+from calendar_rules.pricing import PriceCalculator
+from calendar_rules.services.price_resolver import PriceResolver
+
+
+START = date.today() + timedelta(days=10)
+
+
+def add_rule(listing, start_offset, end_offset, price, min_nights=None):
+    return PriceRule.objects.create(
+        listing=listing,
+        start_date=START + timedelta(days=start_offset),
+        end_date=START + timedelta(days=end_offset),
+        price=Decimal(price),
+        min_nights=min_nights,
+    )
+
+
+def reference_price(listing, day):
+    """Risoluzione naive per giorno: la regola più specifica vince."""
+    rules = [r for r in PriceRule.objects.filter(listing=listing) if r.start_date <= day <= r.end_date]
+    if not rules:
+        return listing.base_price
+    rules.sort(key=lambda r: (-r.start_date.toordinal(), r.end_date.toordinal(), -r.id))
+    return rules[0].price
+
+
+@pytest.fixture
+def rules(listing):
+    add_rule(listing, 0, 30, '120.00', min_nights=3)   # stagione
+    add_rule(listing, 5, 12, '150.00')                 # evento annidato
+    add_rule(listing, 8, 8, '99.00')                   # prezzo importato per il giorno
+    add_rule(listing, 8, 20, '130.00')                 # stesso inizio, range più lungo
+    add_rule(listing, 25, 40, '90.00', min_nights=2)   # esce dalla stagione
+
+
+@pytest.mark.django_db
+def test_resolver_matches_per_day_resolution(listing, rules):
+    end = START + timedelta(days=45)
+    resolver = PriceResolver(listing, START - timedelta(days=3), end)
+
+    day = START - timedelta(days=3)
+    while day <= end:
+        assert resolver.price_for_date(day) == reference_price(listing, day), day
+        day += timedelta(days=1)
+
+    assert resolver.price_for_date(START + timedelta(days=8)) == Decimal('99.00')
+    assert resolver.price_for_date(START + timedelta(days=9)) == Decimal('130.00')
+    assert resolver.has_rule(START - timedelta(days=1)) is False
+    assert resolver.min_nights_for_date(START + timedelta(days=1)) == 3
+
+
+@pytest.mark.django_db
+def test_resolver_rejects_dates_outside_window(listing):
+    resolver = PriceResolver(listing, START, START + timedelta(days=2))
+    with pytest.raises(ValueError):
+        resolver.price_for_date(START + timedelta(days=3))
+
+
+@pytest.mark.django_db
+def test_calendar_prices_use_a_single_query(listing, rules, django_assert_num_queries):
+    calculator = PriceCalculator(listing)
+    with django_assert_num_queries(1):
+        prices = calculator.get_calendar_prices(START, START + timedelta(days=364))
+    assert len(prices) == 365
+    assert prices[(START + timedelta(days=8)).isoformat()] == 99.0
+
+
+@pytest.mark.django_db
+def test_calculate_total_uses_a_single_query(listing, rules, django_assert_num_queries):
+    calculator = PriceCalculator(listing)
+    with django_assert_num_queries(1):
+        result = calculator.calculate_total(START + timedelta(days=7), START + timedelta(days=10), 3)
+
+    assert result['nightly_prices'] == [150.0, 99.0, 130.0]
+    assert result['subtotal'] == 379.0
+    assert result['extra_guest_fee'] == 30.0
+    assert result['total'] == 459.0
+
+
+@pytest.mark.django_db
+def test_calendar_manager_shares_resolver(listing, rules, django_assert_num_queries):
+    manager = CalendarManager(listing)
+    check_in, check_out = START + timedelta(days=7), START + timedelta(days=10)
+
+    with django_assert_num_queries(1):
+        total = manager.calculate_total_price(check_in, check_out, 2)
+        nightly = [manager.get_price_per_day(check_in + timedelta(days=i)) for i in range(3)]
+
+    assert nightly == [Decimal('150.00'), Decimal('99.00'), Decimal('130.00')]
+    assert total == Decimal('379.00') + listing.cleaning_fee
+    assert PriceCalculator(listing).get_price_for_date(check_in) == nightly[0]
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+import pytest
+from django.db import connection
+
+from calendar_rules.benchmarking import calendar_hot_queries, find_full_scans
+
+
+COMPOSITE_INDEXES = {
+    'bookings_booking': ('booking_listing_status_idx', 'booking_active_dates_idx'),
+    'calendar_rules_closurerule': ('closure_listing_dates_idx',),
+    'calendar_rules_pricerule': ('pricerule_listing_dates_idx',),
+    'calendar_rules_checkinoutrule': ('checkinout_listing_type_idx', 'checkinout_listing_date_idx'),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='Piani EXPLAIN nel formato SQLite')
+def test_hot_queries_use_composite_indexes(listing):
+    check_in = date.today() + timedelta(days=10)
+
+    for name, queryset in calendar_hot_queries(listing, check_in, check_in + timedelta(days=5)):
+        plan = queryset.explain()
+        assert not find_full_scans(plan), f'{name}: {plan}'
+        indexes = COMPOSITE_INDEXES[queryset.model._meta.db_table]
+        assert any(index in plan for index in indexes), f'{name}: {plan}'
+
+
+def test_find_full_scans():
+    assert find_full_scans('2 0 0 SCAN bookings_booking') == ['2 0 0 SCAN bookings_booking']
+    assert find_full_scans('3 0 0 SEARCH bookings_booking USING INDEX booking_listing_status_idx (listing_id=?)') == []
+    assert find_full_scans('Seq Scan on bookings_booking  (cost=0.00..1.01 rows=1 width=8)')
@@ -0,0 +1,129 @@
+from datetime import date, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from Rhome_book import metrics
+from Rhome_book.metrics import RequestMetrics, RouteHistogram
+from calendar_rules.services.ical_export import ical_export_path
+
+
+START = date.today() + timedelta(days=10)
+END = START + timedelta(days=30)
+
+
+@pytest.fixture(autouse=True)
+def empty_histogram(shared):
+    metrics.histogram.reset()
+    yield
+    metrics.histogram.reset()
+
+
+def calendar_request(client, listing):
+    return client.get(reverse('calendar:calendar-data', args=[listing.id]),
+                      {'start': START.isoformat(), 'end': END.isoformat()})
+
+
+def parse_server_timing(header):
+    entries = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        entries[name] = dict(param.split('=', 1) for param in params)
+    return entries
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, listing, settings):
+    settings.REQUEST_METRICS_SERVER_TIMING = True
+    with CaptureQueriesContext(connection) as ctx:
+        response = calendar_request(client, listing)
+
+    timing = parse_server_timing(response['Server-Timing'])
+    assert timing['db']['desc'] == f'"{len(ctx.captured_queries)} query"'
+    assert float(timing['db']['dur']) <= float(timing['app']['dur'])
+    assert timing['cache']['desc'] == '"hit=0 miss=1"'
+
+    response = calendar_request(client, listing)
+    timing = parse_server_timing(response['Server-Timing'])
+    assert timing['cache']['desc'] == '"hit=1 miss=0"'
+    # Solo la lettura del listing: il calendario arriva dalla cache
+    assert timing['db']['desc'] == '"1 query"'
+
+
+@pytest.mark.django_db
+def test_server_timing_only_for_staff(client, listing, guest, settings):
+    settings.DEBUG = False
+    assert 'Server-Timing' not in calendar_request(client, listing)
+
+    client.force_login(guest)
+    assert 'Server-Timing' not in calendar_request(client, listing)
+
+    client.force_login(User.objects.create_user(username='staff', password='pass', is_staff=True))
+    assert 'Server-Timing' in client.get(reverse('admin_panel:metrics'))
+
+
+@pytest.mark.django_db
+def test_streaming_responses_are_not_measured(client, listing, settings):
+    settings.REQUEST_METRICS_SERVER_TIMING = True
+
+    response = client.get(ical_export_path(listing.id))
+    b''.join(response.streaming_content)
+
+    assert 'Server-Timing' not in response
+    assert metrics.histogram.snapshot() == []
+
+
+def test_histogram_percentiles():
+    histogram = RouteHistogram(max_samples=100)
+    sample = RequestMetrics()
+    for ms in range(1, 101):
+        sample.queries = ms % 7
+        histogram.add('calendar:calendar-data', float(ms), sample)
+    histogram.add('other', 1.0, RequestMetrics())
+
+    [route, other] = histogram.snapshot()
+
+    assert route['route'] == 'calendar:calendar-data'
+    assert route['count'] == 100
+    assert (route['ms_p50'], route['ms_p95'], route['ms_p99']) == (50, 95, 99)
+    assert route['queries_p99'] == 6
+    assert route['cache_hit_rate'] is None
+    assert other['route'] == 'other'
+
+
+def test_histogram_is_rolling(monkeypatch):
+    histogram = RouteHistogram(max_samples=3, window=60)
+    clock = [1000.0]
+    monkeypatch.setattr(metrics.time, 'monotonic', lambda: clock[0])
+
+    for ms in (500.0, 1.0, 2.0, 3.0):
+        histogram.add('route', ms, RequestMetrics())
+    assert histogram.snapshot()[0]['ms_p99'] == 3
+
+    clock[0] += 61
+    histogram.add('route', 9.0, RequestMetrics())
+    assert histogram.snapshot()[0]['count'] == 1
+
+
+@pytest.mark.django_db
+def test_staff_endpoint(client, listing, guest):
+    calendar_request(client, listing)
+    calendar_request(client, listing)
+
+    client.force_login(guest)
+    assert client.get(reverse('admin_panel:metrics')).status_code == 302
+
+    staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+    client.force_login(staff)
+    data = client.get(reverse('admin_panel:metrics')).json()
+
+    routes = {row['route']: row for row in data['routes']}
+    row = routes['calendar:calendar-data']
+    assert row['count'] == 2
+    assert row['cache_hits'] == 1 and row['cache_misses'] == 1
+    assert row['cache_hit_rate'] == 0.5
+    assert {'ms_p50', 'ms_p95', 'ms_p99', 'queries_p95', 'db_ms_p95'} <= set(row)
+    assert data['window_seconds'] == metrics.histogram.window
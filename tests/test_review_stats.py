@@ -0,0 +1,104 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from listings.models import ListingReviewStats, Review
+from listings.services.review_stats import compute_review_stats
+
+
+def add_review(listing, rating, airbnb_id=None, **categories):
+    return Review.objects.create(
+        listing=listing,
+        reviewer_name='Ospite',
+        review_date=date(2025, 5, 1),
+        review_text='Ottimo soggiorno',
+        overall_rating=Decimal(rating),
+        airbnb_review_id=airbnb_id,
+        **{f'{category}_rating': Decimal(value) for category, value in categories.items()},
+    )
+
+
+@pytest.fixture
+def reviews(listing, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        add_review(listing, '5.0', airbnb_id='a1', cleanliness='5.0', value='4.0')
+        add_review(listing, '4.5', airbnb_id='a2', cleanliness='4.0')
+        add_review(listing, '3.0')
+        add_review(listing, '1.5')
+    return listing
+
+
+@pytest.mark.django_db
+def test_single_aggregate_query(reviews, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        values = compute_review_stats(reviews.pk)
+
+    assert values['total_count'] == 4
+    assert (values['airbnb_count'], values['own_count']) == (2, 2)
+    assert values['average_rating'] == Decimal('3.50')
+    assert values['categorized_count'] == 2
+    assert values['cleanliness_avg'] == Decimal('4.50')
+    assert values['value_avg'] == Decimal('4.00')
+    assert values['accuracy_avg'] is None
+    assert [values[f'stars_{stars}'] for stars in range(1, 6)] == [1, 0, 1, 1, 1]
+
+
+@pytest.mark.django_db
+def test_stats_read_from_rollup(reviews, django_assert_num_queries):
+    listing = type(reviews).objects.select_related('review_stats').get(pk=reviews.pk)
+
+    with django_assert_num_queries(0):
+        stats = listing.get_reviews_stats()
+
+    assert stats['total_count'] == 4
+    assert stats['average_rating'] == Decimal('3.50')
+    assert stats['category_averages']['cleanliness'] == Decimal('4.50')
+    assert stats['star_distribution'] == {1: 1, 2: 0, 3: 1, 4: 1, 5: 1}
+    assert (stats['airbnb_count'], stats['own_count']) == (2, 2)
+
+
+@pytest.mark.django_db
+def test_signals_refresh_once_per_transaction(listing, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        add_review(listing, '5.0')
+        add_review(listing, '2.0')
+        Review.objects.filter(overall_rating=Decimal('5.0')).get().delete()
+
+    assert len(callbacks) == 1
+    stats = ListingReviewStats.objects.get(listing=listing)
+    assert stats.total_count == 1
+    assert stats.stars_5 == 0 and stats.stars_2 == 1
+
+    # Dopo il commit (callback eseguito) una nuova transazione registra di nuovo il ricalcolo
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        add_review(listing, '4.0')
+
+    assert len(callbacks) == 1
+    assert ListingReviewStats.objects.get(listing=listing).total_count == 2
+
+
+@pytest.mark.django_db
+def test_airbnb_averages_without_reviews(listing):
+    listing.airbnb_cleanliness_avg = Decimal('4.80')
+    listing.save()
+
+    stats = listing.get_reviews_stats()
+
+    assert stats['total_count'] == 0
+    assert stats['category_averages'] == {'cleanliness': Decimal('4.80')}
+    # Rollup creato al primo accesso
+    assert ListingReviewStats.objects.filter(listing=listing).exists()
+
+
+@pytest.mark.django_db
+def test_detail_page_runs_no_aggregates(client, reviews):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse('listings:detail', args=[reviews.slug]))
+
+    assert response.status_code == 200
+    assert response.context['reviews_stats']['total_count'] == 4
+    assert not [query['sql'] for query in ctx.captured_queries if 'AVG(' in query['sql'].upper()]
@@ -0,0 +1,73 @@
+import math
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.db import connection
+
+from listings.models import ListingReviewStats, Review
+from listings.services.review_sync import REVIEW_BATCH_SIZE, AirbnbReviewSync
+
+
+def payload(review_id, rating=5, text='Soggiorno perfetto', **extra):
+    return {
+        'id': review_id,
+        'reviewer': {'firstName': f'Ospite {review_id}'},
+        'comments': text,
+        'rating': rating,
+        'createdAt': '2025-05-01T10:00:00Z',
+        **extra,
+    }
+
+
+@pytest.fixture
+def airbnb(listing):
+    listing.airbnb_listing_url = 'https://www.airbnb.it/rooms/1'
+    listing.save()
+    Review.objects.bulk_create([Review(
+        listing=listing, reviewer_name='Vecchio', review_date=date(2024, 1, 1),
+        review_text='Testo da aggiornare', overall_rating=Decimal('3.0'), airbnb_review_id='1',
+    )])
+    return listing
+
+
+def run_sync(listing, reviews):
+    with mock.patch('listings.services.review_sync.pyairbnb') as pyairbnb:
+        pyairbnb.get_reviews.return_value = reviews
+        pyairbnb.get_details.return_value = {}
+        return AirbnbReviewSync(listing).sync_reviews()
+
+
+@pytest.mark.django_db
+def test_bulk_sync_keeps_stats(airbnb, django_capture_on_commit_callbacks):
+    reviews = [payload(1, text='Aggiornata', rating=4)] + [payload(i) for i in range(2, 300)]
+    reviews.append({'id': 999, 'rating': 5})   # dati incompleti: saltata
+    reviews.append(payload(2, rating=3))         # duplicato nel payload: aggiornata
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stats = run_sync(airbnb, reviews)
+
+    assert (stats['created'], stats['updated'], stats['skipped'], stats['errors']) == (298, 2, 1, 0)
+    assert stats['synced'] == 300
+    assert Review.objects.filter(listing=airbnb).count() == 299
+
+    updated = Review.objects.get(airbnb_review_id='1')
+    assert updated.review_text == 'Aggiornata' and updated.overall_rating == Decimal('4.0')
+    assert updated.last_synced is not None
+    assert Review.objects.get(airbnb_review_id='2').overall_rating == Decimal('3.0')
+    assert ListingReviewStats.objects.get(listing=airbnb).total_count == 299
+
+
+@pytest.mark.django_db
+def test_bulk_sync_query_count_is_constant(airbnb, django_assert_max_num_queries):
+    reviews = [payload(i) for i in range(1, 500)]
+    # SQLite limita il numero di parametri per INSERT: batch più piccoli di REVIEW_BATCH_SIZE
+    fields = [field for field in Review._meta.concrete_fields if not field.primary_key]
+    batch_size = min(REVIEW_BATCH_SIZE, connection.ops.bulk_batch_size(fields, reviews))
+
+    # Savepoint, lettura delle esistenti, INSERT/UPDATE a batch, salvataggio del listing
+    with django_assert_max_num_queries(5 + math.ceil(498 / batch_size)):
+        stats = run_sync(airbnb, reviews)
+
+    assert (stats['created'], stats['updated']) == (498, 1)
@@ -0,0 +1,130 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from listings.models import Review
+from listings.services import review_sync_pool
+from listings.services.review_sync import AirbnbReviewSync
+from listings.services.review_sync_pool import ReviewSyncPool, TokenBucket, call_with_backoff
+from tests.test_combined_availability import make_listing
+
+
+FETCH_DELAY = 0.2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(6):
+        bucket.acquire()
+
+    # Due gettoni subito, poi uno ogni mezzo secondo
+    assert clock.now == pytest.approx(2.0)
+    assert all(seconds == pytest.approx(0.5) for seconds in clock.sleeps)
+
+
+def test_backoff_is_jittered_and_bounded(monkeypatch):
+    monkeypatch.setattr(review_sync_pool.random, 'uniform', lambda low, high: high)
+    sleeps = []
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 4:
+            raise ConnectionError('timeout')
+        return 'ok'
+
+    assert call_with_backoff(flaky, attempts=4, base=1, cap=3, sleep=sleeps.append) == 'ok'
+    assert sleeps == [1, 2, 3]
+
+    def always_fails():
+        raise ConnectionError('timeout')
+
+    with pytest.raises(ConnectionError):
+        call_with_backoff(always_fails, attempts=2, sleep=sleeps.append)
+    assert len(sleeps) == 4
+
+
+def slow_airbnb(fetch_threads):
+    def get_reviews(url, language, proxy_url):
+        fetch_threads.add(threading.current_thread().name)
+        time.sleep(FETCH_DELAY)
+        if url.endswith('/broken'):
+            raise ConnectionError('rete non disponibile')
+        return [{
+            'id': f'{url}-1', 'reviewer': {'firstName': 'Anna'}, 'comments': 'Ottimo',
+            'rating': 5, 'createdAt': '2025-05-01T10:00:00Z',
+        }]
+
+    return get_reviews
+
+
+@pytest.fixture
+def portfolio(db):
+    return [
+        make_listing(f'airbnb-{index}', 4, airbnb_listing_url=f'https://www.airbnb.it/rooms/{index}')
+        for index in range(4)
+    ]
+
+
+@pytest.mark.django_db
+def test_fetch_runs_concurrently_with_single_writer(portfolio):
+    fetch_threads = set()
+    write_threads = set()
+    write_reviews = AirbnbReviewSync._write_reviews
+
+    def recording_write(self, to_create, to_update):
+        write_threads.add(threading.current_thread().name)
+        return write_reviews(self, to_create, to_update)
+
+    with mock.patch('listings.services.review_sync.pyairbnb') as pyairbnb, \
+            mock.patch.object(AirbnbReviewSync, '_write_reviews', recording_write):
+        pyairbnb.get_reviews.side_effect = slow_airbnb(fetch_threads)
+        pyairbnb.get_details.return_value = {}
+
+        started = time.perf_counter()
+        results = list(ReviewSyncPool(workers=4, rate=0).run(portfolio))
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < FETCH_DELAY * 2.5
+    assert [error for _, _, error in results] == [None] * 4
+    assert all(stats['created'] == 1 for _, stats, _ in results)
+    assert len(fetch_threads) > 1
+    assert write_threads == {threading.current_thread().name}
+    assert Review.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_command_reports_failed_fetch(portfolio, monkeypatch):
+    monkeypatch.setattr(review_sync_pool.random, 'uniform', lambda low, high: 0)
+    portfolio[0].airbnb_listing_url = 'https://www.airbnb.it/rooms/broken'
+    portfolio[0].save()
+
+    out = StringIO()
+    with mock.patch('listings.services.review_sync.pyairbnb') as pyairbnb:
+        pyairbnb.get_reviews.side_effect = slow_airbnb(set())
+        pyairbnb.get_details.return_value = {}
+        call_command('sync_airbnb_reviews', '--workers', '4', '--rate', '0', '--max-attempts', '2',
+                     '--date-filter', 'all', stdout=out)
+
+    assert 'Errore durante il download' in out.getvalue()
+    assert 'Totale sincronizzate: 3' in out.getvalue()
+    assert Review.objects.count() == 3
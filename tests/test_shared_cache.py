@@ -0,0 +1,112 @@
+import multiprocessing
+import time
+
+import pytest
+
+from calendar_rules.cache_backends import SQLiteCache
+from calendar_rules.services import shared_cache
+from calendar_rules.services.calendar_cache import bump_calendar_generation, get_calendar_generation
+from calendar_rules.services.shared_cache import get_or_compute
+
+
+WORKERS = 8
+
+
+def concurrent_miss(barrier, counter_path, results):
+    def compute():
+        with open(counter_path, 'a') as counter:
+            counter.write('x\n')
+        time.sleep(0.3)
+        return {'blocked_ranges': ['calcolato']}
+
+    barrier.wait()
+    results.put(get_or_compute('calendar:test', compute, 60))
+
+
+def bump_in_child():
+    bump_calendar_generation('groups')
+
+
+def test_concurrent_misses_compute_once(shared, tmp_path):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    counter_path = tmp_path / 'computations'
+    counter_path.touch()
+
+    processes = [
+        context.Process(target=concurrent_miss, args=(barrier, str(counter_path), results))
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    values = [results.get(timeout=20) for _ in processes]
+    for process in processes:
+        process.join(timeout=20)
+
+    assert [process.exitcode for process in processes] == [0] * WORKERS
+    assert counter_path.read_text().count('x') == 1
+    assert values == [{'blocked_ranges': ['calcolato']}] * WORKERS
+
+
+def test_generations_are_shared_between_processes(shared):
+    before = get_calendar_generation('groups')
+
+    process = multiprocessing.get_context('fork').Process(target=bump_in_child)
+    process.start()
+    process.join(timeout=20)
+
+    assert get_calendar_generation('groups') == before + 1
+
+
+def test_early_refresh_recomputes_before_expiry(shared, monkeypatch):
+    monkeypatch.setattr(shared_cache.random, 'random', lambda: 0.5)
+    # Calcolo lento e scadenza imminente: il refresh anticipato scatta
+    shared.set('calendar:hot', ('vecchio', 100.0, time.time() + 1), 60)
+    assert get_or_compute('calendar:hot', lambda: 'nuovo', 60) == 'nuovo'
+    assert shared.get('calendar:hot')[0] == 'nuovo'
+
+    # Un altro processo sta già ricalcolando: si riceve il valore ancora valido
+    shared.set('calendar:hot', ('vecchio', 100.0, time.time() + 1), 60)
+    shared.add('lock:calendar:hot', 'altro', 30)
+    assert get_or_compute('calendar:hot', lambda: 'nuovo', 60) == 'vecchio'
+
+    # Con beta 0 il refresh anticipato è disattivato
+    shared.delete('lock:calendar:hot')
+    assert get_or_compute('calendar:hot', lambda: 'nuovo', 60, beta=0) == 'vecchio'
+
+
+def test_waits_for_lock_holder_then_falls_back(shared, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'WAIT_TIMEOUT', 0.2)
+    shared.add('lock:calendar:slow', 'altro', 30)
+
+    assert get_or_compute('calendar:slow', lambda: 'calcolato', 60) == 'calcolato'
+    assert shared.get('calendar:slow')[0] == 'calcolato'
+
+
+def test_sqlite_backend(shared):
+    assert shared.add('a', 1, 60)
+    assert not shared.add('a', 2, 60)
+    assert shared.incr('a', 5) == 6
+    with pytest.raises(ValueError):
+        shared.incr('assente')
+
+    shared.set('scaduta', 'x', 0.05)
+    time.sleep(0.1)
+    assert shared.get('scaduta') is None
+    assert shared.add('scaduta', 'y', 60)
+
+    shared.set_many({'b': 2, 'c': 3}, 60)
+    assert shared.get_many(['a', 'b', 'c', 'd']) == {'a': 6, 'b': 2, 'c': 3}
+    assert shared.delete('b') and not shared.has_key('b')
+
+
+
+def test_sqlite_backend_culls(tmp_path):
+    small = SQLiteCache(str(tmp_path / 'small.sqlite3'), {'OPTIONS': {'MAX_ENTRIES': 50}})
+    small.set('permanente', True, None)
+    for i in range(100):
+        small.set(f'k{i}', i, 60)
+
+    assert small.get('permanente') is True
+    assert small._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0] <= 51
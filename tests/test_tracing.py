@@ -0,0 +1,112 @@
+import json
+import logging
+from datetime import date, timedelta
+
+import pytest
+from django.test import RequestFactory
+
+from bookings.models import Booking
+from calendar_rules.debug.views_debug import CalendarDebugView
+from calendar_rules.services.calendar_service import CalendarService
+from calendar_rules.services.tracing import NULL_SPAN, NULL_TRACE, start_trace
+
+
+TODAY = date.today()
+START, END = TODAY, TODAY + timedelta(days=60)
+PHASES = ['load', 'periods', 'day_states', 'serialize_dates', 'consolidate', 'format']
+
+
+class Exploding:
+    """Argomento che fallisce se qualcuno prova a formattarlo."""
+
+    def __str__(self):
+        raise AssertionError('messaggio formattato con il debug spento')
+
+
+@pytest.fixture
+def calendar_log(caplog):
+    # Come in settings.LOGGING: livello INFO e nessuna propagazione alla root
+    # Gli handler configurati (console, file) vengono staccati durante il test
+    calendar_logger = logging.getLogger('calendar_debug')
+    level, propagate = calendar_logger.level, calendar_logger.propagate
+    handlers = calendar_logger.handlers[:]
+    for handler in handlers:
+        calendar_logger.removeHandler(handler)
+    calendar_logger.setLevel(logging.INFO)
+    calendar_logger.propagate = False
+    calendar_logger.addHandler(caplog.handler)
+    yield caplog
+    calendar_logger.removeHandler(caplog.handler)
+    for handler in handlers:
+        calendar_logger.addHandler(handler)
+    calendar_logger.setLevel(level)
+    calendar_logger.propagate = propagate
+
+
+@pytest.fixture
+def booked(listing, guest):
+    Booking.objects.bulk_create([Booking(listing=listing, guest=guest, check_in_date=TODAY + timedelta(days=5),
+                                         check_out_date=TODAY + timedelta(days=8), num_guests=2,
+                                         status='confirmed')])
+    return listing
+
+
+def test_disabled_trace_is_shared_and_empty(settings):
+    settings.DEBUG_CALENDAR = False
+    settings.CALENDAR_TRACE_SAMPLE_RATE = 0
+
+    trace = start_trace('calcolo')
+    assert trace is NULL_TRACE
+    assert trace.span('load') is NULL_SPAN
+    trace.log(logging.INFO, "%s", Exploding())
+    assert trace.timings() == []
+
+
+@pytest.mark.django_db
+def test_debug_off_formats_nothing(booked, settings, calendar_log):
+    settings.DEBUG_CALENDAR = False
+    settings.CALENDAR_TRACE_SAMPLE_RATE = 0
+    service = CalendarService(booked)
+
+    service._log_if_debug(logging.INFO, "%s", Exploding())
+    service._calculate_blocked_ranges(service._get_optimized_calendar_data(START, END), START, END)
+    CalendarService.get_unavailable_dates.__wrapped__(service, START, END)
+
+    assert calendar_log.records == []
+
+
+@pytest.mark.django_db
+def test_debug_on_logs_details(booked, settings, calendar_log):
+    settings.DEBUG_CALENDAR = True
+    settings.CALENDAR_TRACE_SAMPLE_RATE = 0
+
+    CalendarService.get_unavailable_dates.__wrapped__(CalendarService(booked), START, END)
+
+    messages = [record.getMessage() for record in calendar_log.records]
+    assert f"[CALENDAR DEBUG] Periodo richiesto: {START} -> {END}" in messages
+    assert any(message.startswith('[TRACE] get_unavailable_dates') for message in messages)
+
+
+@pytest.mark.django_db
+def test_sampled_trace_logs_phase_timings(booked, settings, calendar_log):
+    settings.DEBUG_CALENDAR = False
+    settings.CALENDAR_TRACE_SAMPLE_RATE = 1
+
+    CalendarService.get_unavailable_dates.__wrapped__(CalendarService(booked), START, END)
+
+    [record] = calendar_log.records
+    summary = record.getMessage()
+    assert summary.startswith(f'[TRACE] get_unavailable_dates listing={booked.id}')
+    assert all(f'{phase} ' in summary for phase in PHASES)
+
+
+@pytest.mark.django_db
+def test_debug_view_reports_timings(booked):
+    request = RequestFactory().get('/', {'start_date': START.isoformat(), 'days': 60})
+
+    response = CalendarDebugView.as_view()(request, listing_id=booked.id)
+
+    assert response.status_code == 200
+    timings = json.loads(response.content)['timings']
+    assert [phase['phase'] for phase in timings['phases']] == PHASES
+    assert timings['total_ms'] >= sum(phase['ms'] for phase in timings['phases'])